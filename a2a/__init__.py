@@ -4,5 +4,10 @@ A2A (Agent-to-Agent) 协议实现
 from .agent_card import AgentCard
 from .client import A2AClient
 from .server import A2AServer
+from .async_client import AsyncA2AClient
+from .async_server import AsyncA2AServer
+from .session import AgentSession, SessionManager
+from .hash_ring import HashRing, AffinitySelector
 
-__all__ = ['AgentCard', 'A2AClient', 'A2AServer']
+__all__ = ['AgentCard', 'A2AClient', 'A2AServer', 'AsyncA2AClient', 'AsyncA2AServer',
+           'AgentSession', 'SessionManager', 'HashRing', 'AffinitySelector']
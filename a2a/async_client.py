@@ -0,0 +1,198 @@
+"""
+Async A2A Client - asyncio 版本的 A2A 客户端，用于在事件循环中调用其他 Agent
+"""
+import json
+import time
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from service_discovery import ServiceDiscovery
+from http_transport import AsyncHTTPTransport, get_default_async_transport
+from load_balancer import LoadBalancer, get_default_balancer
+from .agent_card import AgentCard
+from .hash_ring import AffinitySelector
+
+# 尝试导入可选依赖
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+
+class AsyncA2AClient:
+    """asyncio 版本的 A2A 协议客户端 - 等待响应时不占用线程"""
+    
+    def __init__(self, service_discovery: Optional[ServiceDiscovery] = None,
+                 transport: Optional[AsyncHTTPTransport] = None,
+                 selector: Optional[AffinitySelector] = None,
+                 balancer: Optional[LoadBalancer] = None):
+        """
+        初始化 A2A 客户端
+        
+        Args:
+            service_discovery: 服务发现实例，如果为 None 则创建默认实例
+            transport: asyncio 版本的 HTTP 传输层，如果为 None 则使用当前事件循环共享的默认实例
+            selector: 副本选择器（Agent 有多个副本时按 chat_id 一致性哈希选择），如果为 None 则创建默认实例
+            balancer: 负载均衡器（没有 chat_id 的请求按负载均衡策略选择副本，并跟踪副本健康状况），
+                      如果为 None 则使用进程内共享的默认实例
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError("请安装 aiohttp: pip install aiohttp")
+        self.sd = service_discovery or ServiceDiscovery(method="config")
+        self._transport = transport
+        self.selector = selector or AffinitySelector()
+        self.balancer = balancer or get_default_balancer()
+        # 实例被删除时删除其负载统计（aiohttp 的空闲连接在 keep-alive 超时后关闭）
+        self.sd.add_listener(self.balancer.forget_instances)
+    
+    @property
+    def transport(self) -> AsyncHTTPTransport:
+        """HTTP 传输层（未指定时在第一次使用时获取当前事件循环的默认实例）"""
+        if self._transport is None:
+            self._transport = get_default_async_transport()
+        return self._transport
+    
+    def get_agent_card(self, agent_name: str) -> Optional[AgentCard]:
+        """
+        获取 Agent 卡片信息（只读取服务发现，不需要网络请求）
+        
+        Args:
+            agent_name: Agent 名称
+        
+        Returns:
+            AgentCard 对象，如果未找到则返回 None
+        """
+        service = self.sd.discover(agent_name)
+        if not service:
+            return None
+        
+        return AgentCard(
+            name=agent_name,
+            description=service.get("description", ""),
+            version=service.get("version", "1.0.0"),
+            url=service.get("url"),
+            provider=service.get("provider")
+        )
+    
+    def _candidates(self, agent_name: str, input_data: Dict) -> Tuple[List[str], str]:
+        """获取 Agent 所有副本的 URL 和亲和键（chat_id）"""
+        instances = self.sd.discover_all(agent_name)
+        if not instances:
+            raise ValueError(f"Agent {agent_name} not found")
+        return [instance["url"] for instance in instances], str(input_data.get("chat_id") or "")
+    
+    def _select(self, agent_name: str, urls: List[str], key: str, tried: List[str]) -> Optional[str]:
+        """选择副本：有 chat_id 时在未被摘除的副本中按一致性哈希选择，否则按负载均衡策略选择"""
+        if not key:
+            return self.balancer.select(agent_name, urls, exclude=tried)
+        url = self.selector.select(agent_name, self.balancer.available(agent_name, urls), key, exclude=tried)
+        if url is None:
+            url = self.selector.select(agent_name, urls, key, exclude=tried)
+        if url is not None:
+            self.balancer.acquire(url)
+        return url
+    
+    def _release(self, url: str, key: str, latency: Optional[float] = None,
+                 failed: bool = False, unreachable: bool = False):
+        """请求结束：更新副本的在途请求数和健康状况"""
+        if key:
+            self.selector.release(url, failed=unreachable)
+        self.balancer.release(url, latency=latency, failed=failed or unreachable)
+    
+    @staticmethod
+    def _is_failure(error: Exception) -> bool:
+        """超时、5xx 和无法解析的响应计入副本的失败次数"""
+        return isinstance(error, (asyncio.TimeoutError, ValueError)) or (
+            isinstance(error, aiohttp.ClientResponseError) and error.status >= 500
+        )
+    
+    async def call_agent(self, agent_name: str, input_data: Dict, timeout: int = 30) -> Dict:
+        """
+        调用其他 Agent（A2A 协议）
+        
+        有 chat_id 时按一致性哈希选择副本，否则按负载均衡策略选择；连接失败时换到下一个副本（请求已经发出后不重试）
+        
+        Args:
+            agent_name: Agent 名称
+            input_data: 输入数据，包含 input, chat_id, user_id 等
+            timeout: 超时时间（秒）
+        
+        Returns:
+            Agent 的响应结果
+        """
+        urls, key = self._candidates(agent_name, input_data)
+        tried = []
+        while True:
+            url = self._select(agent_name, urls, key, tried)
+            if url is None:
+                raise ConnectionError(f"Failed to call agent {agent_name}: all {len(urls)} instances unreachable")
+            started = time.perf_counter()
+            try:
+                result = await self.transport.post_json(f"{url}/a2a/invoke", json=input_data, timeout=timeout)
+            except aiohttp.ClientConnectorError as e:
+                self._release(url, key, unreachable=True)
+                tried.append(url)
+                if len(tried) >= len(urls):
+                    raise ConnectionError(f"Failed to call agent {agent_name}: {str(e)}")
+                continue
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                # ValueError：响应不是合法的 JSON（非 JSON 的 Content-Type 由 aiohttp 报 ContentTypeError）
+                self._release(url, key, failed=self._is_failure(e))
+                raise ConnectionError(f"Failed to call agent {agent_name}: {str(e)}")
+            except BaseException:
+                self._release(url, key)
+                raise
+            self._release(url, key, latency=time.perf_counter() - started)
+            return result
+    
+    async def call_agent_stream(self, agent_name: str, input_data: Dict,
+                                timeout: int = 30) -> AsyncIterator[Dict]:
+        """
+        流式调用其他 Agent（SSE 方式）
+        
+        Args:
+            agent_name: Agent 名称
+            input_data: 输入数据
+            timeout: 连接和读取每个数据块的超时时间（秒）
+        
+        Yields:
+            解析后的 SSE 事件，如 {"delta": "..."}、{"output": "..."}、{"error": "..."}，
+            收到 {"done": true} 时结束
+        """
+        urls, key = self._candidates(agent_name, input_data)
+        tried = []
+        while True:
+            url = self._select(agent_name, urls, key, tried)
+            if url is None:
+                raise ConnectionError(f"Failed to call agent {agent_name}: all {len(urls)} instances unreachable")
+            started = time.perf_counter()
+            latency = None
+            failed = False
+            unreachable = False
+            received = False
+            try:
+                async with self.transport.post_stream(f"{url}/a2a/stream", json=input_data,
+                                                      timeout=timeout) as response:
+                    # 流式调用的响应时间按收到响应头的时间计算
+                    latency = time.perf_counter() - started
+                    async for line in response.content:
+                        line = line.strip()
+                        if not line.startswith(b"data:"):
+                            continue
+                        event = json.loads(line[len(b"data:"):].decode('utf-8'))
+                        if event.get("done"):
+                            return
+                        received = True
+                        yield event
+                return
+            except aiohttp.ClientConnectorError as e:
+                # 连接阶段失败（还没有收到任何事件），换下一个副本
+                unreachable = True
+                tried.append(url)
+                if received or len(tried) >= len(urls):
+                    raise ConnectionError(f"Failed to call agent {agent_name}: {str(e)}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                failed = self._is_failure(e)
+                raise ConnectionError(f"Failed to call agent {agent_name}: {str(e)}")
+            finally:
+                self._release(url, key, latency=latency, failed=failed, unreachable=unreachable)
@@ -0,0 +1,154 @@
+"""
+Async A2A Server - asyncio 版本的 A2A 服务端（基于 aiohttp），
+等待 LLM / 下游服务时不占用线程，单进程即可同时保持大量在途请求
+"""
+import json
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+from serving import ServerOptions, run_async_app
+
+# 尝试导入可选依赖
+try:
+    from aiohttp import web
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+
+class AsyncA2AServer:
+    """asyncio 版本的 A2A 协议服务端，接口与 A2AServer 相同"""
+    
+    def __init__(self, agent_name: str, port: int = 10006):
+        """
+        初始化 A2A 服务端
+        
+        Args:
+            agent_name: Agent 名称
+            port: 服务端口
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError("请安装 aiohttp: pip install aiohttp")
+        self.agent_name = agent_name
+        self.port = port
+        self.app = web.Application()
+        self.handler: Optional[Callable[[Dict], Awaitable[str]]] = None
+        self.stream_handler: Optional[Callable[[Dict], AsyncIterator[str]]] = None
+        self.metrics_handler: Optional[Callable[[], Dict]] = None
+        
+        # 注册路由
+        self._register_routes()
+    
+    def _register_routes(self):
+        """注册 A2A 协议路由"""
+        self.app.router.add_post('/a2a/invoke', self._invoke)
+        self.app.router.add_post('/a2a/stream', self._stream)
+        self.app.router.add_get('/a2a/health', self._health)
+        self.app.router.add_get('/a2a/metrics', self._metrics)
+    
+    async def _read_json(self, request: "web.Request") -> Optional[Dict]:
+        """读取 JSON 请求体，格式错误时返回 None"""
+        try:
+            data = await request.json()
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) and data else None
+    
+    async def _invoke(self, request: "web.Request") -> "web.Response":
+        """A2A 协议调用接口"""
+        data = await self._read_json(request)
+        if not data:
+            return web.json_response({"error": "Invalid request"}, status=400)
+        if not self.handler:
+            return web.json_response({"error": "Handler not set"}, status=500)
+        
+        try:
+            result = await self.handler(data)
+            return web.json_response({
+                "output": result,
+                "status": "success"
+            })
+        except Exception as e:
+            return web.json_response({
+                "error": str(e),
+                "status": "error"
+            }, status=500)
+    
+    async def _stream(self, request: "web.Request") -> "web.StreamResponse":
+        """A2A 协议流式调用接口（SSE），事件格式与 A2AServer 相同"""
+        data = await self._read_json(request)
+        if not data:
+            return web.json_response({"error": "Invalid request"}, status=400)
+        
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # 禁止反向代理缓冲
+        })
+        await response.prepare(request)
+        
+        async def send(payload: Dict):
+            await response.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+        
+        try:
+            if self.stream_handler:
+                async for chunk in self.stream_handler(data):
+                    if chunk:
+                        await send({"delta": chunk})
+            elif self.handler:
+                await send({"output": await self.handler(data)})
+            else:
+                await send({"error": "Handler not set"})
+        except Exception as e:
+            await send({"error": str(e)})
+        await send({"done": True})
+        await response.write_eof()
+        return response
+    
+    async def _health(self, request: "web.Request") -> "web.Response":
+        """健康检查接口"""
+        return web.json_response({
+            "status": "healthy",
+            "agent": self.agent_name
+        })
+    
+    async def _metrics(self, request: "web.Request") -> "web.Response":
+        """运行指标接口（由 Agent 通过 set_metrics_handler 提供）"""
+        if not self.metrics_handler:
+            return web.json_response({"agent": self.agent_name})
+        return web.json_response({"agent": self.agent_name, **self.metrics_handler()})
+    
+    def set_handler(self, handler: Callable[[Dict], Awaitable[str]]):
+        """
+        设置请求处理函数
+        
+        Args:
+            handler: 协程函数，接收输入数据，返回处理结果
+        """
+        self.handler = handler
+    
+    def set_stream_handler(self, handler: Callable[[Dict], AsyncIterator[str]]):
+        """
+        设置流式请求处理函数（用于 /a2a/stream）
+        
+        Args:
+            handler: 异步生成器函数，接收输入数据，逐段产出回复内容
+        """
+        self.stream_handler = handler
+    
+    def set_metrics_handler(self, handler: Callable[[], Dict]):
+        """
+        设置运行指标函数（用于 /a2a/metrics）
+        
+        Args:
+            handler: 返回指标字典的函数
+        """
+        self.metrics_handler = handler
+    
+    def run(self, host: str = '0.0.0.0', options: Optional[ServerOptions] = None):
+        """
+        启动 A2A 服务（阻塞直到收到退出信号）
+        
+        Args:
+            host: 监听地址
+            options: 服务运行参数（backlog、keepalive、graceful_timeout 等），为 None 时使用默认配置
+        """
+        run_async_app(self.app, host=host, port=self.port, options=options)
@@ -1,23 +1,40 @@
 """
 A2A Client - 用于调用其他 Agent
 """
+import json
 import requests
-from typing import Dict, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 from service_discovery import ServiceDiscovery
+from http_transport import HTTPTransport, get_default_transport, is_connect_error
+from load_balancer import LoadBalancer, get_default_balancer
 from .agent_card import AgentCard
+from .hash_ring import AffinitySelector
 
 
 class A2AClient:
     """A2A 协议客户端 - 用于调用其他 Agent"""
     
-    def __init__(self, service_discovery: Optional[ServiceDiscovery] = None):
+    def __init__(self, service_discovery: Optional[ServiceDiscovery] = None,
+                 transport: Optional[HTTPTransport] = None,
+                 selector: Optional[AffinitySelector] = None,
+                 balancer: Optional[LoadBalancer] = None):
         """
         初始化 A2A 客户端
         
         Args:
             service_discovery: 服务发现实例，如果为 None 则创建默认实例
+            transport: HTTP 传输层（连接池），如果为 None 则使用进程内共享的默认实例
+            selector: 副本选择器（Agent 有多个副本时按 chat_id 一致性哈希选择），如果为 None 则创建默认实例
+            balancer: 负载均衡器（没有 chat_id 的请求按负载均衡策略选择副本，并跟踪副本健康状况），
+                      如果为 None 则使用进程内共享的默认实例
         """
         self.sd = service_discovery or ServiceDiscovery(method="config")
+        self.transport = transport or get_default_transport()
+        self.selector = selector or AffinitySelector()
+        self.balancer = balancer or get_default_balancer()
+        # 实例被删除时关闭到该实例的连接、删除其负载统计
+        self.sd.add_listener(self.transport.drain_instances)
+        self.sd.add_listener(self.balancer.forget_instances)
     
     def get_agent_card(self, agent_name: str) -> Optional[AgentCard]:
         """
@@ -25,7 +42,7 @@ class A2AClient:
         
         Args:
             agent_name: Agent 名称
-            
+        
         Returns:
             AgentCard 对象，如果未找到则返回 None
         """
@@ -42,6 +59,76 @@ class A2AClient:
             provider=service.get("provider")
         )
     
+    def _select(self, agent_name: str, urls: List[str], key: str, tried: List[str]) -> Optional[str]:
+        """选择副本：有 chat_id 时在未被摘除的副本中按一致性哈希选择，否则按负载均衡策略选择"""
+        if not key:
+            return self.balancer.select(agent_name, urls, exclude=tried)
+        url = self.selector.select(agent_name, self.balancer.available(agent_name, urls), key, exclude=tried)
+        if url is None:
+            url = self.selector.select(agent_name, urls, key, exclude=tried)
+        if url is not None:
+            self.balancer.acquire(url)
+        return url
+    
+    def _release(self, url: str, key: str, latency: Optional[float] = None,
+                 failed: bool = False, unreachable: bool = False):
+        """请求结束：更新副本的在途请求数和健康状况"""
+        if key:
+            self.selector.release(url, failed=unreachable)
+        self.balancer.release(url, latency=latency, failed=failed or unreachable)
+    
+    def _post(self, agent_name: str, path: str, input_data: Dict, timeout: int,
+              stream: bool = False) -> Tuple[str, requests.Response]:
+        """
+        选择副本并发送请求，请求发出之前失败（连接建立失败等）时换到下一个副本
+        （请求已经发出后连接断开也不重试，避免重复下单等副作用）
+        
+        Args:
+            agent_name: Agent 名称
+            path: 接口路径（如 /a2a/invoke）
+            input_data: 输入数据
+            timeout: 超时时间（秒）
+            stream: 是否流式读取响应
+        
+        Returns:
+            (副本 URL, 响应) 二元组，调用方使用完响应后需要调用 self._release
+        """
+        instances = self.sd.discover_all(agent_name)
+        if not instances:
+            raise ValueError(f"Agent {agent_name} not found")
+        urls = [instance["url"] for instance in instances]
+        key = str(input_data.get("chat_id") or "")
+        
+        tried = []
+        while True:
+            url = self._select(agent_name, urls, key, tried)
+            if url is None:
+                raise ConnectionError(f"Failed to call agent {agent_name}: all {len(urls)} instances unreachable")
+            try:
+                response = self.transport.post(
+                    f"{url}{path}",
+                    json=input_data,
+                    timeout=timeout,
+                    stream=stream,
+                    headers={"Content-Type": "application/json"}
+                )
+                response.raise_for_status()
+                return url, response
+            except requests.exceptions.RequestException as e:
+                if is_connect_error(e):
+                    # 请求还没有发出（副本不可达）：进入冷却，换下一个副本
+                    self._release(url, key, unreachable=True)
+                    tried.append(url)
+                    if len(tried) >= len(urls):
+                        raise ConnectionError(f"Failed to call agent {agent_name}: {str(e)}")
+                    continue
+                # 请求发出后连接断开、超时和 5xx 计入副本的失败次数，不重发（副本可能已经处理了这轮对话）
+                failed = isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)) or (
+                    e.response is not None and e.response.status_code >= 500
+                )
+                self._release(url, key, failed=failed)
+                raise ConnectionError(f"Failed to call agent {agent_name}: {str(e)}")
+    
     def call_agent(self, agent_name: str, input_data: Dict, timeout: int = 30) -> Dict:
         """
         调用其他 Agent（A2A 协议）
@@ -50,52 +137,45 @@ class A2AClient:
             agent_name: Agent 名称
             input_data: 输入数据，包含 input, chat_id, user_id 等
             timeout: 超时时间（秒）
-            
+        
         Returns:
             Agent 的响应结果
         """
-        # 1. 发现服务
-        service = self.sd.discover(agent_name)
-        if not service:
-            raise ValueError(f"Agent {agent_name} not found")
-        
-        # 2. 构建 A2A 协议请求
-        url = f"{service['url']}/a2a/invoke"
-        
-        # 3. 发送请求
+        url, response = self._post(agent_name, "/a2a/invoke", input_data, timeout)
+        key = str(input_data.get("chat_id") or "")
         try:
-            response = requests.post(
-                url,
-                json=input_data,
-                timeout=timeout,
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            result = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # 读取响应体时连接断开或响应不是合法的 JSON：与请求失败一样按连接错误处理
+            self._release(url, key, latency=response.elapsed.total_seconds(), failed=True)
             raise ConnectionError(f"Failed to call agent {agent_name}: {str(e)}")
+        self._release(url, key, latency=response.elapsed.total_seconds())
+        return result
     
-    def call_agent_stream(self, agent_name: str, input_data: Dict):
+    def call_agent_stream(self, agent_name: str, input_data: Dict, timeout: int = 30) -> Iterator[Dict]:
         """
-        流式调用其他 Agent（SSE 方式，可选实现）
+        流式调用其他 Agent（SSE 方式）
         
         Args:
             agent_name: Agent 名称
             input_data: 输入数据
-            
+            timeout: 连接和读取每个数据块的超时时间（秒）
+        
         Yields:
-            流式响应数据
+            解析后的 SSE 事件，如 {"delta": "..."}、{"output": "..."}、{"error": "..."}，
+            收到 {"done": true} 时结束
         """
-        service = self.sd.discover(agent_name)
-        if not service:
-            raise ValueError(f"Agent {agent_name} not found")
-        
-        url = f"{service['url']}/a2a/stream"
-        
-        # 使用 SSE 接收流式数据
-        response = requests.post(url, json=input_data, stream=True)
-        response.raise_for_status()
-        
-        for line in response.iter_lines():
-            if line:
-                yield line.decode('utf-8')
+        # 使用 SSE 接收流式数据（读取完毕后连接归还连接池）
+        url, response = self._post(agent_name, "/a2a/stream", input_data, timeout, stream=True)
+        try:
+            with response:
+                for line in response.iter_lines(chunk_size=None):
+                    if not line or not line.startswith(b"data:"):
+                        continue
+                    event = json.loads(line[len(b"data:"):].decode('utf-8'))
+                    if event.get("done"):
+                        break
+                    yield event
+        finally:
+            # 流式调用的响应时间按收到响应头的时间计算
+            self._release(url, str(input_data.get("chat_id") or ""), latency=response.elapsed.total_seconds())
@@ -0,0 +1,182 @@
+"""
+一致性哈希 - 按 chat_id 把对话固定到同一个 Agent 副本（会话亲和）
+
+同一个对话的每一轮都发往同一个副本，该副本内存中的会话（SessionManager）可以直接使用，
+不需要每一轮都从会话存储重新读取。增减副本时只有约 1/N 的对话换到其他副本。
+
+为避免热点对话把某个副本压垮，使用有界负载的一致性哈希（consistent hashing with bounded loads）：
+每个副本的在途请求数不超过平均值的 load_factor 倍，超过时沿哈希环顺延到下一个副本；
+连接失败的副本在冷却时间内跳过。
+"""
+import os
+import sys
+import math
+import time
+import bisect
+import hashlib
+import threading
+from typing import Dict, Iterator, List, Optional
+
+# 默认配置（可通过环境变量覆盖）
+A2A_HASH_VNODES = int(os.getenv("A2A_HASH_VNODES", "160"))  # 每个副本在哈希环上的虚拟节点数
+A2A_AFFINITY_LOAD_FACTOR = float(os.getenv("A2A_AFFINITY_LOAD_FACTOR", "1.25"))  # 单个副本的在途请求数上限（平均值的倍数）
+A2A_INSTANCE_COOLDOWN = float(os.getenv("A2A_INSTANCE_COOLDOWN", "10"))  # 连接失败的副本被跳过的时间（秒）
+
+
+def _hash(value: str) -> int:
+    """64 位哈希值（md5 前 8 字节，分布均匀且与进程无关）"""
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """一致性哈希环"""
+    
+    def __init__(self, nodes: List[str], vnodes: int = A2A_HASH_VNODES):
+        """
+        构建哈希环
+        
+        Args:
+            nodes: 节点列表（如副本的 URL）
+            vnodes: 每个节点的虚拟节点数，越多分布越均匀
+        """
+        self.nodes = list(dict.fromkeys(nodes))
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+    
+    def iter_nodes(self, key: str) -> Iterator[str]:
+        """
+        按哈希环顺序返回负责该键的节点（第一个为首选节点，之后为顺延的备选节点，不重复）
+        
+        Args:
+            key: 键（如 chat_id）
+        
+        Yields:
+            节点
+        """
+        if not self._hashes:
+            return
+        start = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        seen = set()
+        for offset in range(len(self._owners)):
+            node = self._owners[(start + offset) % len(self._owners)]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self.nodes):
+                    return
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        获取负责该键的节点
+        
+        Args:
+            key: 键
+        
+        Returns:
+            节点，环为空时返回 None
+        """
+        return next(self.iter_nodes(key), None)
+
+
+class AffinitySelector:
+    """按 chat_id 选择 Agent 副本：一致性哈希 + 有界负载 + 失败副本冷却"""
+    
+    def __init__(self, load_factor: float = A2A_AFFINITY_LOAD_FACTOR,
+                 cooldown: float = A2A_INSTANCE_COOLDOWN, vnodes: int = A2A_HASH_VNODES):
+        """
+        初始化副本选择器
+        
+        Args:
+            load_factor: 单个副本的在途请求数上限为平均在途请求数的 load_factor 倍（>= 1）
+            cooldown: 连接失败的副本被跳过的时间（秒）
+            vnodes: 每个副本的虚拟节点数
+        """
+        self.load_factor = max(1.0, load_factor)
+        self.cooldown = cooldown
+        self.vnodes = vnodes
+        
+        self._rings: Dict[str, HashRing] = {}  # agent_name -> 哈希环（副本列表变化时重建）
+        self._in_flight: Dict[str, int] = {}  # 副本 URL -> 在途请求数
+        self._down_until: Dict[str, float] = {}  # 副本 URL -> 冷却结束时间
+        self._lock = threading.Lock()
+        self.affinity_hits = 0  # 选中首选副本的次数
+        self.spills = 0  # 首选副本过载或不可用、顺延到其他副本的次数
+    
+    def select(self, agent_name: str, urls: List[str], key: str, exclude: Optional[List[str]] = None) -> Optional[str]:
+        """
+        选择副本并将其在途请求数加 1（请求结束后必须调用 release）
+        
+        Args:
+            agent_name: Agent 名称
+            urls: 该 Agent 所有副本的 URL
+            key: 亲和键（chat_id）
+            exclude: 本次请求已经尝试失败的副本
+        
+        Returns:
+            副本 URL，没有可用副本时返回 None
+        """
+        if not urls:
+            return None
+        exclude = set(exclude or [])
+        now = time.time()
+        with self._lock:
+            ring = self._rings.get(agent_name)
+            if ring is None or ring.nodes != list(dict.fromkeys(urls)):
+                ring = self._rings[agent_name] = HashRing(urls, self.vnodes)
+            
+            # 有界负载：上限为 ceil(load_factor * (总在途请求数 + 1) / 副本数)
+            total = sum(self._in_flight.get(url, 0) for url in ring.nodes)
+            capacity = math.ceil(self.load_factor * (total + 1) / len(ring.nodes))
+            
+            chosen = None
+            fallback = None
+            for url in ring.iter_nodes(key):
+                if url in exclude:
+                    continue
+                if self._down_until.get(url, 0) > now:
+                    continue
+                if fallback is None:
+                    fallback = url
+                if self._in_flight.get(url, 0) < capacity:
+                    chosen = url
+                    break
+            # 所有可用副本都满载时使用第一个可用的副本；都在冷却中时仍然尝试首选副本
+            if chosen is None:
+                chosen = fallback or next((url for url in ring.iter_nodes(key) if url not in exclude), None)
+            if chosen is None:
+                return None
+            
+            if chosen == ring.get(key):
+                self.affinity_hits += 1
+            else:
+                self.spills += 1
+            self._in_flight[chosen] = self._in_flight.get(chosen, 0) + 1
+            return chosen
+    
+    def release(self, url: str, failed: bool = False):
+        """
+        请求结束：在途请求数减 1，连接失败时让该副本进入冷却
+        
+        Args:
+            url: select 返回的副本 URL
+            failed: 是否连接失败
+        """
+        with self._lock:
+            self._in_flight[url] = max(0, self._in_flight.get(url, 0) - 1)
+            if failed:
+                self._down_until[url] = time.time() + self.cooldown
+                print(f"[A2A] 副本 {url} 连接失败，{self.cooldown:.0f} 秒内跳过", file=sys.stderr, flush=True)
+            else:
+                self._down_until.pop(url, None)
+    
+    def stats(self) -> Dict:
+        """获取副本选择统计"""
+        with self._lock:
+            now = time.time()
+            return {
+                "affinity_hits": self.affinity_hits,
+                "spills": self.spills,
+                "in_flight": {url: count for url, count in self._in_flight.items() if count},
+                "down": [url for url, until in self._down_until.items() if until > now]
+            }
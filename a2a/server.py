@@ -2,7 +2,8 @@
 A2A Server - Agent 服务端，暴露 A2A 协议接口
 """
 from flask import Flask, request, jsonify, Response
-from typing import Dict, Callable, Optional
+from typing import Dict, Callable, Optional, Iterator
+from serving import ServerOptions, run_app
 import json
 
 
@@ -21,6 +22,8 @@ class A2AServer:
         self.port = port
         self.app = Flask(__name__)
         self.handler: Optional[Callable] = None
+        self.stream_handler: Optional[Callable] = None
+        self.metrics_handler: Optional[Callable[[], Dict]] = None
         
         # 注册路由
         self._register_routes()
@@ -54,22 +57,50 @@ class A2AServer:
         
         @self.app.route('/a2a/stream', methods=['POST'])
         def stream():
-            """A2A 协议流式调用接口（SSE）"""
+            """
+            A2A 协议流式调用接口（SSE）
+            
+            事件格式（每个事件一行 data: JSON）:
+            - {"delta": "..."}: 回复的增量片段（设置了流式处理函数时）
+            - {"output": "..."}: 完整回复（只设置了普通处理函数时）
+            - {"error": "..."}: 处理出错
+            - {"done": true}: 结束标记
+            """
+            # 请求体必须在生成器外读取，生成器执行时请求上下文已经结束
+            data = request.json
+            if not data:
+                return jsonify({"error": "Invalid request"}), 400
+            
+            def event(payload: Dict) -> str:
+                return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            
             def generate():
                 try:
-                    data = request.json
-                    if self.handler:
-                        # 如果 handler 支持流式，调用它
-                        if hasattr(self.handler, '__iter__'):
-                            for chunk in self.handler(data):
-                                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
-                        else:
-                            result = self.handler(data)
-                            yield f"data: {json.dumps({'output': result}, ensure_ascii=False)}\n\n"
+                    if self.stream_handler:
+                        # 流式处理函数：每生成一段就立即发送
+                        for chunk in self.stream_handler(data):
+                            if chunk:
+                                yield event({"delta": chunk})
+                    elif self.handler:
+                        result = self.handler(data)
+                        yield event({"output": result})
+                    else:
+                        yield event({"error": "Handler not set"})
                 except Exception as e:
-                    yield f"data: {json.dumps({'error': str(e)}, ensure_ascii=False)}\n\n"
+                    yield event({"error": str(e)})
+                yield event({"done": True})
             
-            return Response(generate(), mimetype='text/event-stream')
+            return Response(generate(), mimetype='text/event-stream', headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no"  # 禁止反向代理缓冲
+            })
+        
+        @self.app.route('/a2a/metrics', methods=['GET'])
+        def metrics():
+            """运行指标接口（由 Agent 通过 set_metrics_handler 提供）"""
+            if not self.metrics_handler:
+                return jsonify({"agent": self.agent_name})
+            return jsonify({"agent": self.agent_name, **self.metrics_handler()})
         
         @self.app.route('/a2a/health', methods=['GET'])
         def health():
@@ -88,12 +119,32 @@ class A2AServer:
         """
         self.handler = handler
     
-    def run(self, host: str = '0.0.0.0', debug: bool = False):
+    def set_stream_handler(self, handler: Callable[[Dict], Iterator[str]]):
+        """
+        设置流式请求处理函数（用于 /a2a/stream）
+        
+        Args:
+            handler: 处理函数，接收输入数据，逐段产出回复内容
+        """
+        self.stream_handler = handler
+    
+    def set_metrics_handler(self, handler: Callable[[], Dict]):
+        """
+        设置运行指标函数（用于 /a2a/metrics）
+        
+        Args:
+            handler: 返回指标字典的函数
+        """
+        self.metrics_handler = handler
+    
+    def run(self, host: str = '0.0.0.0', debug: bool = False, options: Optional[ServerOptions] = None):
         """
         启动 A2A 服务
         
         Args:
             host: 监听地址
-            debug: 是否开启调试模式
+            debug: 是否开启调试模式（仅 dev 模式有效）
+            options: 服务运行参数（dev / production 模式、进程数、线程数等），
+                     为 None 时使用默认配置
         """
-        self.app.run(host=host, port=self.port, debug=debug)
+        run_app(self.app, host=host, port=self.port, options=options, debug=debug)
@@ -0,0 +1,413 @@
+"""
+A2A 会话管理 - 按 (user_id, chat_id) 隔离每个对话的上下文
+"""
+import sys
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from session_store import SessionStore
+
+SessionKey = Tuple[str, str]  # (user_id, chat_id)
+
+
+@dataclass
+class AgentSession:
+    """单个对话的轻量级上下文（对话历史 + 用户信息）"""
+    
+    chat_id: str  # 对话ID
+    user_id: str  # 用户ID
+    history: List[Dict[str, str]] = field(default_factory=list)  # 对话历史
+    created_at: float = field(default_factory=time.time)  # 创建时间
+    last_access: float = field(default_factory=time.time)  # 最近访问时间
+    size_bytes: int = 0  # 估算占用的内存（字节）
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)  # 同一会话的请求串行处理
+    async_lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)  # asyncio 运行时使用的会话锁
+    version: int = 0  # 会话存储中的版本号（0 表示还没有保存过）
+    snapshot: List[Dict[str, str]] = field(default_factory=list, repr=False)  # 本轮开始时的历史记录（用于找出本轮新增的消息）
+    
+    def busy(self) -> bool:
+        """会话是否正在处理请求"""
+        return self.lock.locked() or self.async_lock.locked()
+    
+    def estimate_size(self) -> int:
+        """估算对话历史占用的内存（按 UTF-8 字节数粗略计算）"""
+        size = 0
+        for message in self.history:
+            for key, value in message.items():
+                size += len(key) + len(str(value).encode("utf-8"))
+        self.size_bytes = size
+        return size
+    
+    @property
+    def key(self) -> SessionKey:
+        """会话在 SessionManager 中的键"""
+        return self.user_id, self.chat_id
+
+
+class SessionManager:
+    """
+    会话管理器 - 按 (user_id, chat_id) 为每个请求分配独立的 AgentSession
+    
+    不同用户使用相同的 chat_id 时也是不同的会话，一个会话的用户ID创建后不再改变。
+    
+    使用 LRU + TTL 淘汰策略，并限制会话总数和总内存占用，
+    使同一个 Agent 进程可以并发处理大量对话而互不干扰。
+    
+    设置了会话存储（SessionStore）时，每轮对话开始前从存储读取最新的历史记录，结束后写回，
+    多个 Agent 副本可以处理同一个对话的任意一轮，进程重启也不会丢失对话。
+    
+    推测调用（SupervisorAgent 在路由确定前提前发起的调用）使用 speculative_session：
+    本轮新增的消息先暂存，调用方确认使用（commit_speculation）后才写入会话，猜测错误时不留下记录。
+    """
+    
+    def __init__(self, history_factory: Optional[Callable[[], List[Dict[str, str]]]],
+                 max_sessions: int = 1000, ttl: float = 1800,
+                 max_memory_bytes: int = 64 * 1024 * 1024,
+                 store: Optional[SessionStore] = None, namespace: str = "agent",
+                 max_speculations: int = 1000, speculation_ttl: float = 60):
+        """
+        初始化会话管理器
+        
+        Args:
+            history_factory: 新会话的初始历史记录生成函数（通常只包含系统提示词），
+                             子类覆盖 _new_session 时可以为 None
+            max_sessions: 最多保留的会话数
+            ttl: 会话空闲超时时间（秒），超时的会话会被淘汰
+            max_memory_bytes: 所有会话历史记录的总内存上限（字节）
+            store: 会话存储，为 None 时会话只保存在进程内存中
+            namespace: 会话存储中的键前缀（通常为 Agent 名称），键为 "namespace:user_id:chat_id"
+            max_speculations: 最多暂存的推测调用结果数
+            speculation_ttl: 推测调用结果的暂存时间（秒），超时未确认的直接丢弃
+        """
+        self.history_factory = history_factory
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_memory_bytes = max_memory_bytes
+        self.store = store
+        self.namespace = namespace
+        
+        self._sessions: "OrderedDict[SessionKey, AgentSession]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        
+        self.max_speculations = max_speculations
+        self.speculation_ttl = speculation_ttl
+        # 推测调用 ID -> (会话键, 本轮新增的消息, 暂存时间)
+        self._speculations: "OrderedDict[str, Tuple[SessionKey, List[Dict[str, str]], float]]" = OrderedDict()
+    
+    def get(self, chat_id: str, user_id: Optional[str] = None) -> AgentSession:
+        """
+        获取（或创建）会话
+        
+        Args:
+            chat_id: 对话ID
+            user_id: 用户ID，为空时使用 "default_user"
+        
+        Returns:
+            AgentSession 对象
+        """
+        key = self._key(chat_id, user_id)
+        now = time.time()
+        with self._lock:
+            self._evict_expired(now)
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._new_session(chat_id, key[0])
+                session.estimate_size()
+                self._sessions[key] = session
+                self._total_bytes += session.size_bytes
+                self._enforce_limits(keep=key)
+            else:
+                self._sessions.move_to_end(key)
+            session.last_access = now
+            return session
+    
+    def _new_session(self, chat_id: str, user_id: str) -> AgentSession:
+        """
+        创建新会话（调用方持有 self._lock；子类可以覆盖以使用自己的会话类型）
+        
+        Args:
+            chat_id: 对话ID
+            user_id: 用户ID
+        
+        Returns:
+            新的 AgentSession
+        """
+        return AgentSession(chat_id=chat_id, user_id=user_id, history=self.history_factory())
+    
+    @contextmanager
+    def session(self, chat_id: str, user_id: Optional[str] = None) -> Iterator[AgentSession]:
+        """
+        以上下文管理器的方式使用会话：进入时加锁，退出时更新内存统计并执行淘汰
+        
+        Args:
+            chat_id: 对话ID
+            user_id: 用户ID
+        """
+        session = self.get(chat_id, user_id)
+        with session.lock:
+            self._load_from_store(session)
+            try:
+                yield session
+            finally:
+                self._save_to_store(session)
+                self.release(session)
+    
+    @asynccontextmanager
+    async def asession(self, chat_id: str, user_id: Optional[str] = None) -> AsyncIterator[AgentSession]:
+        """
+        session() 的 asyncio 版本：等待会话锁时让出事件循环，而不是阻塞线程
+        
+        Args:
+            chat_id: 对话ID
+            user_id: 用户ID
+        """
+        session = self.get(chat_id, user_id)
+        async with session.async_lock:
+            loop = asyncio.get_running_loop()
+            if self.store is not None:
+                await loop.run_in_executor(None, self._load_from_store, session)
+            try:
+                yield session
+            finally:
+                if self.store is not None:
+                    await loop.run_in_executor(None, self._save_to_store, session)
+                self.release(session)
+    
+    @contextmanager
+    def speculative_session(self, chat_id: str, user_id: Optional[str],
+                            speculation_id: str) -> Iterator[AgentSession]:
+        """
+        推测调用使用的临时会话：复制对话当前的历史记录，本轮结束后不写回会话和会话存储，
+        新增的消息暂存到调用方通过 commit_speculation 确认使用
+        
+        Args:
+            chat_id: 对话ID
+            user_id: 用户ID
+            speculation_id: 推测调用 ID
+        """
+        session = self.get(chat_id, user_id)
+        with session.lock:
+            self._load_from_store(session)
+            history = list(session.history)
+            self.release(session)
+        before = {id(message) for message in history}
+        scratch = AgentSession(chat_id=session.chat_id, user_id=session.user_id, history=history)
+        yield scratch
+        # 只暂存完整处理完的一轮（调用方提前断开时不暂存）
+        self._put_speculation(speculation_id, session.key,
+                              [message for message in scratch.history if id(message) not in before])
+    
+    @asynccontextmanager
+    async def aspeculative_session(self, chat_id: str, user_id: Optional[str],
+                                   speculation_id: str) -> AsyncIterator[AgentSession]:
+        """
+        speculative_session() 的 asyncio 版本
+        
+        Args:
+            chat_id: 对话ID
+            user_id: 用户ID
+            speculation_id: 推测调用 ID
+        """
+        session = self.get(chat_id, user_id)
+        async with session.async_lock:
+            if self.store is not None:
+                await asyncio.get_running_loop().run_in_executor(None, self._load_from_store, session)
+            history = list(session.history)
+            self.release(session)
+        before = {id(message) for message in history}
+        scratch = AgentSession(chat_id=session.chat_id, user_id=session.user_id, history=history)
+        yield scratch
+        self._put_speculation(speculation_id, session.key,
+                              [message for message in scratch.history if id(message) not in before])
+    
+    def commit_speculation(self, chat_id: str, user_id: Optional[str], speculation_id: str) -> bool:
+        """
+        确认使用推测调用的结果：把暂存的消息写入会话（和会话存储）
+        
+        Args:
+            chat_id: 对话ID
+            user_id: 用户ID
+            speculation_id: 推测调用 ID
+        
+        Returns:
+            是否写入成功（推测调用不存在、已超时或不属于该会话时返回 False）
+        """
+        messages = self._pop_speculation(speculation_id, self._key(chat_id, user_id))
+        if messages is None:
+            return False
+        with self.session(chat_id, user_id) as session:
+            session.history.extend(messages)
+        return True
+    
+    async def acommit_speculation(self, chat_id: str, user_id: Optional[str], speculation_id: str) -> bool:
+        """
+        commit_speculation() 的 asyncio 版本
+        
+        Args:
+            chat_id: 对话ID
+            user_id: 用户ID
+            speculation_id: 推测调用 ID
+        
+        Returns:
+            是否写入成功
+        """
+        messages = self._pop_speculation(speculation_id, self._key(chat_id, user_id))
+        if messages is None:
+            return False
+        async with self.asession(chat_id, user_id) as session:
+            session.history.extend(messages)
+        return True
+    
+    def _put_speculation(self, speculation_id: str, key: SessionKey, messages: List[Dict[str, str]]):
+        """暂存推测调用新增的消息，同时丢弃超时和超出数量上限的暂存结果"""
+        now = time.time()
+        with self._lock:
+            self._speculations[speculation_id] = (key, messages, now)
+            while self._speculations:
+                oldest_id, (_, _, stored_at) = next(iter(self._speculations.items()))
+                if len(self._speculations) <= self.max_speculations and now - stored_at < self.speculation_ttl:
+                    break
+                del self._speculations[oldest_id]
+    
+    def _pop_speculation(self, speculation_id: str, key: SessionKey) -> Optional[List[Dict[str, str]]]:
+        """取出暂存的推测调用结果（不存在、已超时或不属于该会话时返回 None）"""
+        with self._lock:
+            pending = self._speculations.get(speculation_id)
+            if pending is None or pending[0] != key:
+                return None
+            del self._speculations[speculation_id]
+        if time.time() - pending[2] >= self.speculation_ttl:
+            return None
+        return pending[1]
+    
+    def release(self, session: AgentSession):
+        """
+        请求处理完成后更新会话的内存统计，必要时淘汰其他会话
+        
+        Args:
+            session: 刚处理完请求的会话
+        """
+        with self._lock:
+            old_size = session.size_bytes
+            new_size = session.estimate_size()
+            session.last_access = time.time()
+            if self._sessions.get(session.key) is session:
+                self._total_bytes += new_size - old_size
+                self._enforce_limits(keep=session.key)
+    
+    @staticmethod
+    def _key(chat_id: str, user_id: Optional[str] = None) -> SessionKey:
+        """会话的键（没有用户ID时使用 "default_user"）"""
+        return str(user_id) if user_id else "default_user", chat_id
+    
+    def _store_key(self, session: AgentSession) -> str:
+        """会话在存储中的键"""
+        return f"{self.namespace}:{session.user_id}:{session.chat_id}"
+    
+    def _load_from_store(self, session: AgentSession):
+        """一轮对话开始前：存储中有更新的版本（其他副本处理过该对话）时使用存储中的历史记录"""
+        if self.store is None:
+            return
+        try:
+            state = self.store.load(self._store_key(session))
+            if state is None:
+                # 存储中没有记录（已过期或被删除）：保留内存中的历史，本轮结束后作为新记录保存
+                session.version = 0
+            elif state.version != session.version:
+                session.history = state.history
+                session.version = state.version
+        except Exception as e:
+            print(f"[SessionManager] 读取会话 {session.chat_id} 失败: {str(e)}", file=sys.stderr, flush=True)
+        session.snapshot = list(session.history)
+    
+    def _save_to_store(self, session: AgentSession):
+        """一轮对话结束后：把历史记录写回存储（版本冲突时与存储中的最新状态合并）"""
+        if self.store is None:
+            return
+        before = {id(message) for message in session.snapshot}
+        new_messages = [message for message in session.history if id(message) not in before]
+        try:
+            session.history, session.version = self.store.commit(
+                self._store_key(session), session.history, session.version,
+                new_messages, meta={"user_id": session.user_id}
+            )
+        except Exception as e:
+            print(f"[SessionManager] 保存会话 {session.chat_id} 失败: {str(e)}", file=sys.stderr, flush=True)
+        session.snapshot = []
+    
+    def remove(self, chat_id: str, user_id: Optional[str] = None) -> bool:
+        """
+        删除会话
+        
+        Args:
+            chat_id: 对话ID
+            user_id: 用户ID，为空时使用 "default_user"
+        
+        Returns:
+            是否删除成功
+        """
+        key = self._key(chat_id, user_id)
+        with self._lock:
+            session = self._sessions.pop(key, None)
+            if session is not None:
+                self._total_bytes -= session.size_bytes
+        # 同时删除会话存储中的记录，其他副本也不会再使用该对话的历史
+        stored = self.store.delete(f"{self.namespace}:{key[0]}:{chat_id}") if self.store is not None else False
+        return session is not None or stored
+    
+    def stats(self) -> Dict:
+        """获取会话统计信息"""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "memory_bytes": self._total_bytes,
+                "max_sessions": self.max_sessions,
+                "max_memory_bytes": self.max_memory_bytes,
+                "evictions": self.evictions,
+                "pending_speculations": len(self._speculations),
+                "store": self.store.stats() if self.store is not None else None
+            }
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+    
+    def _evict_expired(self, now: float):
+        """淘汰空闲超时的会话，跳过正在处理请求的会话（调用方需持有 self._lock）"""
+        if self.ttl is None or self.ttl <= 0:
+            return
+        # OrderedDict 按最近访问排序，最久未访问的在最前面
+        expired = []
+        for key, session in self._sessions.items():
+            if now - session.last_access < self.ttl:
+                break
+            if not session.busy():
+                expired.append(key)
+        for key in expired:
+            self._drop(key)
+    
+    def _enforce_limits(self, keep: SessionKey):
+        """按 LRU 顺序淘汰会话，直到满足数量和内存上限（调用方需持有 self._lock）"""
+        while len(self._sessions) > self.max_sessions or self._total_bytes > self.max_memory_bytes:
+            # 跳过当前会话和正在处理请求的会话
+            victim = next(
+                (key for key, session in self._sessions.items()
+                 if key != keep and not session.busy()),
+                None
+            )
+            if victim is None:
+                break
+            self._drop(victim)
+    
+    def _drop(self, key: SessionKey):
+        """移除会话并更新统计（调用方需持有 self._lock）"""
+        session = self._sessions.pop(key)
+        self._total_bytes -= session.size_bytes
+        self.evictions += 1
+        print(f"[SessionManager] 淘汰会话: {key[0]}:{key[1]}", file=sys.stderr, flush=True)
@@ -0,0 +1,622 @@
+"""
+子智能体的对话轮次处理 - 订单、咨询、反馈智能体共用
+
+一轮对话：记录用户输入并裁剪历史 -> 判断是否调用工具（快速路径、LLM、关键词匹配）-> 调用 MCP 工具
+-> 用回复模板或 LLM 生成回复。chat / chat_stream / achat / achat_stream 只在生成回复的方式上不同。
+
+各智能体继承 AgentTurnMixin 并提供工具相关的方法：
+- _should_use_tool / _ashould_use_tool: 使用 LLM 判断是否需要调用工具
+- _extract_tool_call: LLM 判断失败时的关键词匹配
+- _fast_path_tool_call（可选）: 不调用 LLM 的确定性解析，默认不使用
+以及 mcp_client、service_discovery、history_manager、response_templates 属性和 _default_session 方法。
+MCP 工具调用（_invoke_tool / _ainvoke_tool）在这里统一实现。
+
+A2A 服务端（start_a2a_server / start_async_a2a_server）也在这里统一创建：会话管理器、请求处理函数和运行指标，
+智能体特有的指标通过 _extra_metrics 提供（如订单智能体的快速路径命中率），默认端口由 default_port 指定。
+"""
+import sys
+import traceback
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from dashscope import Generation, AioGeneration
+
+from config import DASHSCOPE_MODEL
+from mcp.async_client import AsyncMCPClient
+from a2a.server import A2AServer
+from a2a.async_server import AsyncA2AServer
+from a2a.session import AgentSession, SessionManager
+from session_store import create_session_store
+from load_balancer import get_default_balancer
+from serving import ServerOptions
+
+
+class AgentTurnMixin:
+    """子智能体的 chat / chat_stream / achat / achat_stream 实现"""
+    
+    # 不需要调用工具、LLM 生成回复也失败时返回给用户的内容
+    no_tool_fallback = "抱歉，处理您的请求时出现了问题，请稍后再试。"
+    # 让 LLM 根据工具调用结果生成回复的提示
+    tool_reply_prompt = "请根据工具调用结果，生成友好的回复给用户。"
+    # A2A 服务端的默认端口（由子类设置）
+    default_port: int = 0
+    
+    def _fast_path_tool_call(self, user_input: str, user_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        不调用 LLM 直接确定工具调用（默认不使用，由子类覆盖）
+        
+        Args:
+            user_input: 用户输入
+            user_id: 用户ID
+        
+        Returns:
+            工具调用信息，无法确定时返回 None
+        """
+        return None
+    
+    def _error_reply(self, error: Exception) -> str:
+        """
+        处理一轮对话时出现异常：记录错误并返回给用户的内容
+        
+        Args:
+            error: 异常
+        
+        Returns:
+            返回给用户的内容
+        """
+        error_msg = f"处理请求时出现错误: {str(error)}"
+        print(f"[{type(self).__name__}] 错误: {error_msg}", file=sys.stderr, flush=True)
+        traceback.print_exc(file=sys.stderr)
+        return "抱歉，处理您的请求时出现了问题，请稍后再试。"
+    
+    def _invoke_tool(self, tool_name: str, mcp_server: str, parameters: Dict) -> str:
+        """
+        调用工具
+        
+        Args:
+            tool_name: 工具名称
+            mcp_server: MCP Server 名称
+            parameters: 工具参数
+        
+        Returns:
+            工具执行结果
+        """
+        try:
+            print(f"[DEBUG] 调用工具: {tool_name}, 参数: {parameters}", file=sys.stderr, flush=True)
+            result = self.mcp_client.invoke_tool(mcp_server, tool_name, parameters)
+            return self._format_tool_result(result)
+        except Exception as e:
+            error_msg = f"工具调用异常: {str(e)}"
+            print(f"[ERROR] {error_msg}", file=sys.stderr, flush=True)
+            traceback.print_exc(file=sys.stderr)
+            return error_msg
+    
+    async def _ainvoke_tool(self, tool_name: str, mcp_server: str, parameters: Dict) -> str:
+        """
+        调用工具（asyncio 版本，等待 MCP Server 响应时让出事件循环）
+        
+        Args:
+            tool_name: 工具名称
+            mcp_server: MCP Server 名称
+            parameters: 工具参数
+        
+        Returns:
+            工具执行结果
+        """
+        if self._async_mcp_client is None:
+            self._async_mcp_client = AsyncMCPClient(service_discovery=self.service_discovery)
+        try:
+            print(f"[DEBUG] 调用工具: {tool_name}, 参数: {parameters}", file=sys.stderr, flush=True)
+            result = await self._async_mcp_client.invoke_tool(mcp_server, tool_name, parameters)
+            return self._format_tool_result(result)
+        except Exception as e:
+            error_msg = f"工具调用异常: {str(e)}"
+            print(f"[ERROR] {error_msg}", file=sys.stderr, flush=True)
+            return error_msg
+    
+    def _format_tool_result(self, result: Dict) -> str:
+        """将 MCP 工具的响应转换为文本结果"""
+        print(f"[DEBUG] 工具调用结果: {result}", file=sys.stderr, flush=True)
+        if result.get("status") == "success":
+            return str(result.get("result", ""))
+        error_msg = f"工具调用失败: {result.get('error', '未知错误')}"
+        print(f"[ERROR] {error_msg}", file=sys.stderr, flush=True)
+        return error_msg
+    
+    
+    def _prepare_reply(self, user_input: str, session: AgentSession) -> Tuple[Optional[str], List[Dict[str, str]], str]:
+        """
+        处理一轮对话中生成回复之前的部分：记录用户输入、判断并调用工具
+        
+        Args:
+            user_input: 用户输入
+            session: 对话会话
+        
+        Returns:
+            (reply, messages, fallback) 三元组：
+            - reply: 不为 None 时表示已得到最终回复（如工具调用失败），无需再调用 LLM
+            - messages: 需要调用 LLM 生成回复时使用的消息列表
+            - fallback: LLM 调用失败时返回给用户的内容
+        """
+        history = session.history
+        
+        # 添加用户输入到历史记录
+        history.append({
+            "role": "user",
+            "content": user_input
+        })
+        # 按 token 预算裁剪对话历史（保留系统提示词和最近的工具调用结果）
+        self.history_manager.trim(history)
+        
+        # 先用确定性解析器解析，只有无法完全确定时才调用 LLM 判断
+        tool_call = self._fast_path_tool_call(user_input, session.user_id)
+        
+        # 使用 LLM 判断是否需要调用工具
+        if not tool_call:
+            tool_call = self._should_use_tool(user_input, session.user_id)
+        
+        # 如果 LLM 判断失败，尝试简单的关键词匹配
+        if not tool_call:
+            tool_call = self._extract_tool_call(user_input, session.user_id)
+        
+        if not tool_call:
+            # 一般性对话，直接使用 LLM 处理
+            return None, history, self.no_tool_fallback
+        
+        # 输出到 stderr，确保能看到（即使后台运行）
+        print(f"[{type(self).__name__}] 检测到工具调用: {tool_call}", file=sys.stderr, flush=True)
+        # 调用工具
+        tool_result = self._invoke_tool(
+            tool_call["tool"],
+            tool_call["mcp_server"],
+            tool_call["parameters"]
+        )
+        
+        return self._apply_tool_result(tool_call["tool"], tool_result, session)
+    
+    async def _aprepare_reply(self, user_input: str, session: AgentSession) -> Tuple[Optional[str], List[Dict[str, str]], str]:
+        """
+        _prepare_reply 的 asyncio 版本（LLM 判断和工具调用都不阻塞事件循环）
+        
+        Args:
+            user_input: 用户输入
+            session: 对话会话
+        
+        Returns:
+            (reply, messages, fallback) 三元组：
+            - reply: 不为 None 时表示已得到最终回复（如工具调用失败），无需再调用 LLM
+            - messages: 需要调用 LLM 生成回复时使用的消息列表
+            - fallback: LLM 调用失败时返回给用户的内容
+        """
+        history = session.history
+        
+        # 添加用户输入到历史记录
+        history.append({
+            "role": "user",
+            "content": user_input
+        })
+        # 按 token 预算裁剪对话历史（保留系统提示词和最近的工具调用结果）
+        self.history_manager.trim(history)
+        
+        # 先用确定性解析器解析，只有无法完全确定时才调用 LLM 判断
+        tool_call = self._fast_path_tool_call(user_input, session.user_id)
+        
+        # 使用 LLM 判断是否需要调用工具
+        if not tool_call:
+            tool_call = await self._ashould_use_tool(user_input, session.user_id)
+        
+        # 如果 LLM 判断失败，尝试简单的关键词匹配
+        if not tool_call:
+            tool_call = self._extract_tool_call(user_input, session.user_id)
+        
+        if not tool_call:
+            # 一般性对话，直接使用 LLM 处理
+            return None, history, self.no_tool_fallback
+        
+        # 输出到 stderr，确保能看到（即使后台运行）
+        print(f"[{type(self).__name__}] 检测到工具调用: {tool_call}", file=sys.stderr, flush=True)
+        # 调用工具
+        tool_result = await self._ainvoke_tool(
+            tool_call["tool"],
+            tool_call["mcp_server"],
+            tool_call["parameters"]
+        )
+        
+        return self._apply_tool_result(tool_call["tool"], tool_result, session)
+    
+    def _apply_tool_result(self, tool_name: str, tool_result: str, session: AgentSession) -> Tuple[Optional[str], List[Dict[str, str]], str]:
+        """
+        将工具调用结果写入对话历史，并构建生成最终回复的消息列表
+        
+        Args:
+            tool_name: 工具名称
+            tool_result: 工具调用结果
+            session: 对话会话
+        
+        Returns:
+            (reply, messages, fallback) 三元组，含义同 _prepare_reply
+        """
+        history = session.history
+        
+        # 将工具结果添加到对话历史
+        print(f"[{type(self).__name__}] 工具调用结果: {tool_result[:200]}", file=sys.stderr, flush=True)
+        
+        # 检查工具调用是否成功
+        if "失败" in tool_result or "错误" in tool_result or "异常" in tool_result:
+            # 工具调用失败，直接返回错误信息
+            print(f"[{type(self).__name__}] 工具调用失败，返回错误信息", file=sys.stderr, flush=True)
+            history.append({
+                "role": "assistant",
+                "content": tool_result
+            })
+            return tool_result, history, tool_result
+        
+        history.append({
+            "role": "assistant",
+            "content": f"工具调用结果: {tool_result}"
+        })
+        self.history_manager.trim(history)
+        
+        # 结果格式确定的工具（下单、查询、删除、记录反馈等）直接用模板生成回复，省去一次 LLM 调用
+        reply = self.response_templates.render(tool_name, tool_result)
+        if reply is not None:
+            print(f"[{type(self).__name__}] 使用回复模板生成回复: {tool_name}", file=sys.stderr, flush=True)
+            history.append({
+                "role": "assistant",
+                "content": reply
+            })
+            return reply, history, reply
+        
+        # 使用 LLM 整合工具结果，生成友好回复（LLM 调用失败时直接返回工具结果）
+        messages = history + [{
+            "role": "user",
+            "content": f"{self.tool_reply_prompt}工具结果: {tool_result}"
+        }]
+        return None, messages, tool_result
+    
+    def chat(self, user_input: str, session: Optional[AgentSession] = None) -> str:
+        """
+        处理用户输入并返回回复
+        
+        Args:
+            user_input: 用户输入
+            session: 对话会话（A2A 请求按 user_id 和 chat_id 分配），为 None 时使用智能体自身的历史记录
+        
+        Returns:
+            AI 回复
+        """
+        session = session or self._default_session()
+        
+        try:
+            reply, messages, fallback = self._prepare_reply(user_input, session)
+            if reply is not None:
+                return reply
+            
+            response = Generation.call(
+                model=DASHSCOPE_MODEL,
+                messages=messages,
+                temperature=0.7,
+                result_format='message'
+            )
+            
+            if response.status_code == 200:
+                ai_message = response.output.choices[0].message.content
+                
+                # 添加到历史记录
+                session.history.append({
+                    "role": "assistant",
+                    "content": ai_message
+                })
+                
+                return ai_message
+            else:
+                error_msg = f"API 调用失败: {response.message}"
+                print(f"[{type(self).__name__}] 错误: {error_msg}", file=sys.stderr, flush=True)
+                return fallback
+        
+        except Exception as e:
+            return self._error_reply(e)
+    
+    def chat_stream(self, user_input: str, session: Optional[AgentSession] = None) -> Iterator[str]:
+        """
+        处理用户输入并以流式方式返回回复（LLM 生成的内容逐段返回）
+        
+        Args:
+            user_input: 用户输入
+            session: 对话会话（A2A 请求按 user_id 和 chat_id 分配），为 None 时使用智能体自身的历史记录
+        
+        Yields:
+            AI 回复的增量片段
+        """
+        session = session or self._default_session()
+        
+        try:
+            reply, messages, fallback = self._prepare_reply(user_input, session)
+            if reply is not None:
+                yield reply
+                return
+            
+            responses = Generation.call(
+                model=DASHSCOPE_MODEL,
+                messages=messages,
+                temperature=0.7,
+                result_format='message',
+                stream=True,
+                incremental_output=True
+            )
+            
+            ai_message = ""
+            for response in responses:
+                if response.status_code != 200:
+                    error_msg = f"API 调用失败: {response.message}"
+                    print(f"[{type(self).__name__}] 错误: {error_msg}", file=sys.stderr, flush=True)
+                    if not ai_message:
+                        yield fallback
+                    return
+                delta = response.output.choices[0].message.content
+                if delta:
+                    ai_message += delta
+                    yield delta
+            
+            # 添加到历史记录
+            session.history.append({
+                "role": "assistant",
+                "content": ai_message
+            })
+        
+        except Exception as e:
+            yield self._error_reply(e)
+    
+    async def achat(self, user_input: str, session: Optional[AgentSession] = None) -> str:
+        """
+        chat 的 asyncio 版本：等待 LLM 和 MCP 工具时让出事件循环
+        
+        Args:
+            user_input: 用户输入
+            session: 对话会话（A2A 请求按 user_id 和 chat_id 分配），为 None 时使用智能体自身的历史记录
+        
+        Returns:
+            AI 回复
+        """
+        session = session or self._default_session()
+        
+        try:
+            reply, messages, fallback = await self._aprepare_reply(user_input, session)
+            if reply is not None:
+                return reply
+            
+            response = await AioGeneration.call(
+                model=DASHSCOPE_MODEL,
+                messages=messages,
+                temperature=0.7,
+                result_format='message'
+            )
+            
+            if response.status_code == 200:
+                ai_message = response.output.choices[0].message.content
+                
+                # 添加到历史记录
+                session.history.append({
+                    "role": "assistant",
+                    "content": ai_message
+                })
+                
+                return ai_message
+            else:
+                error_msg = f"API 调用失败: {response.message}"
+                print(f"[{type(self).__name__}] 错误: {error_msg}", file=sys.stderr, flush=True)
+                return fallback
+        
+        except Exception as e:
+            return self._error_reply(e)
+    
+    async def achat_stream(self, user_input: str, session: Optional[AgentSession] = None) -> AsyncIterator[str]:
+        """
+        chat_stream 的 asyncio 版本
+        
+        Args:
+            user_input: 用户输入
+            session: 对话会话（A2A 请求按 user_id 和 chat_id 分配），为 None 时使用智能体自身的历史记录
+        
+        Yields:
+            AI 回复的增量片段
+        """
+        session = session or self._default_session()
+        
+        try:
+            reply, messages, fallback = await self._aprepare_reply(user_input, session)
+            if reply is not None:
+                yield reply
+                return
+            
+            responses = await AioGeneration.call(
+                model=DASHSCOPE_MODEL,
+                messages=messages,
+                temperature=0.7,
+                result_format='message',
+                stream=True,
+                incremental_output=True
+            )
+            
+            ai_message = ""
+            async for response in responses:
+                if response.status_code != 200:
+                    error_msg = f"API 调用失败: {response.message}"
+                    print(f"[{type(self).__name__}] 错误: {error_msg}", file=sys.stderr, flush=True)
+                    if not ai_message:
+                        yield fallback
+                    return
+                delta = response.output.choices[0].message.content
+                if delta:
+                    ai_message += delta
+                    yield delta
+            
+            # 添加到历史记录
+            session.history.append({
+                "role": "assistant",
+                "content": ai_message
+            })
+        
+        except Exception as e:
+            yield self._error_reply(e)
+    
+    def _extra_metrics(self) -> Dict:
+        """
+        智能体特有的运行指标（默认没有，由子类覆盖）
+        
+        Returns:
+            合并到 /a2a/metrics 返回结果中的指标
+        """
+        return {}
+    
+    def _metrics(self) -> Dict:
+        """A2A 服务端 /a2a/metrics 返回的运行指标"""
+        metrics = self._extra_metrics()
+        metrics.update({
+            "response_templates": self.response_templates.stats(),
+            "history": self.history_manager.stats(),
+            "sessions": self.session_manager.stats(),
+            "load_balancer": get_default_balancer().stats()
+        })
+        return metrics
+    
+    def _create_session_manager(self, max_sessions: int, session_ttl: float) -> SessionManager:
+        """创建 A2A 服务端的会话管理器（按 user_id 和 chat_id 隔离对话上下文）"""
+        return SessionManager(
+            history_factory=self._new_history,
+            max_sessions=max_sessions,
+            ttl=session_ttl,
+            store=create_session_store(),
+            namespace=self.agent_name
+        )
+    
+    def _request_context(self, data: Dict) -> Tuple[str, str, str]:
+        """
+        从 A2A 请求中取出用户输入、chat_id 和 user_id
+        
+        Args:
+            data: A2A 请求数据
+        
+        Returns:
+            (用户输入, chat_id, user_id)，未提供 chat_id / user_id 时使用智能体默认值
+        """
+        user_input = data.get("input", "")
+        chat_id = str(data.get("chat_id") or self.chat_id)
+        request_user_id = data.get("user_id") or self.user_id
+        return user_input, chat_id, request_user_id
+    
+    def _request_session(self, data: Dict, chat_id: str, user_id: str):
+        """
+        A2A 请求使用的会话：推测调用（带 speculation_id）使用不写回的临时会话，其他请求使用对话的会话
+        
+        Args:
+            data: A2A 请求数据
+            chat_id: 对话ID
+            user_id: 用户ID
+        
+        Returns:
+            会话的上下文管理器
+        """
+        if data.get("speculation_id"):
+            return self.session_manager.speculative_session(chat_id, user_id, str(data["speculation_id"]))
+        return self.session_manager.session(chat_id, user_id)
+    
+    def _arequest_session(self, data: Dict, chat_id: str, user_id: str):
+        """_request_session 的 asyncio 版本（返回异步上下文管理器）"""
+        if data.get("speculation_id"):
+            return self.session_manager.aspeculative_session(chat_id, user_id, str(data["speculation_id"]))
+        return self.session_manager.asession(chat_id, user_id)
+    
+    def _handle_request(self, data: Dict) -> str:
+        """处理 A2A 协议请求"""
+        user_input, chat_id, request_user_id = self._request_context(data)
+        if data.get("commit_speculation"):
+            # 推测调用的结果被使用：把暂存的这一轮写入会话
+            committed = self.session_manager.commit_speculation(chat_id, request_user_id, str(data["commit_speculation"]))
+            return "committed" if committed else "expired"
+        with self._request_session(data, chat_id, request_user_id) as session:
+            return self.chat(user_input, session)
+    
+    def _handle_stream_request(self, data: Dict) -> Iterator[str]:
+        """处理 A2A 协议流式请求（逐段返回回复内容）"""
+        user_input, chat_id, request_user_id = self._request_context(data)
+        # 生成结束前一直持有会话锁，保证同一对话的历史按顺序写入
+        with self._request_session(data, chat_id, request_user_id) as session:
+            yield from self.chat_stream(user_input, session)
+    
+    async def _ahandle_request(self, data: Dict) -> str:
+        """处理 A2A 协议请求（asyncio 版本）"""
+        user_input, chat_id, request_user_id = self._request_context(data)
+        if data.get("commit_speculation"):
+            committed = await self.session_manager.acommit_speculation(chat_id, request_user_id, str(data["commit_speculation"]))
+            return "committed" if committed else "expired"
+        async with self._arequest_session(data, chat_id, request_user_id) as session:
+            return await self.achat(user_input, session)
+    
+    async def _ahandle_stream_request(self, data: Dict) -> AsyncIterator[str]:
+        """处理 A2A 协议流式请求（asyncio 版本）"""
+        user_input, chat_id, request_user_id = self._request_context(data)
+        async with self._arequest_session(data, chat_id, request_user_id) as session:
+            async for chunk in self.achat_stream(user_input, session):
+                yield chunk
+    
+    def start_a2a_server(self, host: str = '0.0.0.0', port: Optional[int] = None, debug: bool = False,
+                         max_sessions: int = 1000, session_ttl: float = 1800,
+                         options: Optional[ServerOptions] = None):
+        """
+        启动 A2A 服务端，使其他 Agent 可以通过 A2A 协议调用
+        
+        每个请求按 user_id 和 chat_id 分配独立的会话上下文（对话历史、用户ID），
+        不同对话可以并行处理，同一对话的请求串行处理。
+        
+        Args:
+            host: 监听地址
+            port: 服务端口，为 None 时使用智能体的默认端口（default_port）
+            debug: 是否开启调试模式
+            max_sessions: 最多保留的会话数
+            session_ttl: 会话空闲超时时间（秒）
+            options: 服务运行参数（dev / production / async 模式等），为 None 时使用默认配置
+        """
+        port = port or self.default_port
+        if options is not None and options.mode == "async":
+            self.start_async_a2a_server(host=host, port=port, max_sessions=max_sessions,
+                                        session_ttl=session_ttl, options=options)
+            return
+        
+        a2a_server = A2AServer(agent_name=self.agent_name, port=port)
+        self.session_manager = self._create_session_manager(max_sessions, session_ttl)
+        a2a_server.set_handler(self._handle_request)
+        a2a_server.set_stream_handler(self._handle_stream_request)
+        a2a_server.set_metrics_handler(self._metrics)
+        
+        print(f"{self.agent_name} A2A Server 启动在 http://{host}:{port}", file=sys.stderr, flush=True)
+        print(f"可用工具: {len(self.available_tools)} 个", file=sys.stderr, flush=True)
+        
+        a2a_server.run(host=host, debug=debug, options=options)
+    
+    def start_async_a2a_server(self, host: str = '0.0.0.0', port: Optional[int] = None,
+                               max_sessions: int = 1000, session_ttl: float = 1800,
+                               options: Optional[ServerOptions] = None):
+        """
+        以 asyncio 运行时启动 A2A 服务端（aiohttp）
+        
+        LLM 调用和 MCP 工具调用都以协程方式执行，等待 I/O 时不占用线程，
+        单个进程即可同时保持数千个在途对话。
+        
+        Args:
+            host: 监听地址
+            port: 服务端口，为 None 时使用智能体的默认端口（default_port）
+            max_sessions: 最多保留的会话数
+            session_ttl: 会话空闲超时时间（秒）
+            options: 服务运行参数（backlog、keepalive 等），为 None 时使用默认配置
+        """
+        port = port or self.default_port
+        a2a_server = AsyncA2AServer(agent_name=self.agent_name, port=port)
+        self.session_manager = self._create_session_manager(max_sessions, session_ttl)
+        a2a_server.set_handler(self._ahandle_request)
+        a2a_server.set_stream_handler(self._ahandle_stream_request)
+        a2a_server.set_metrics_handler(self._metrics)
+        
+        print(f"{self.agent_name} A2A Server（asyncio）启动在 http://{host}:{port}", file=sys.stderr, flush=True)
+        print(f"可用工具: {len(self.available_tools)} 个", file=sys.stderr, flush=True)
+        
+        a2a_server.run(host=host, options=options)
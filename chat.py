@@ -25,6 +25,18 @@ class ChatSession:
         """
         return self.supervisor.chat(user_input)
     
+    def chat_stream(self, user_input: str):
+        """
+        处理用户输入并流式返回回复
+        
+        Args:
+            user_input: 用户输入
+            
+        Yields:
+            AI 回复的增量片段
+        """
+        return self.supervisor.chat_stream(user_input)
+    
     def clear_history(self):
         """清空对话历史"""
         self.supervisor.clear_history()
@@ -62,18 +74,14 @@ def main():
                 print("对话历史已清空\n")
                 continue
             
-            # 显示思考中
-            print("思考中...")
-            
-            # 获取 AI 回复
-            response = session.chat(user_input)
-            
-            # 显示回复
+            # 流式显示回复（收到一段就打印一段）
             print()
             print("-" * 60)
             print("智能助手:")
             print("-" * 60)
-            print(response)
+            for chunk in session.chat_stream(user_input):
+                print(chunk, end="", flush=True)
+            print()
             print("-" * 60)
             print()
             
@@ -2,6 +2,7 @@
 启动咨询智能体 A2A Server
 """
 import sys
+import argparse
 from pathlib import Path
 
 # 添加项目根目录到路径
@@ -9,8 +10,13 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from consult_agent import ConsultAgent
+from serving import ServerOptions, add_server_arguments
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="启动咨询智能体 A2A Server")
+    add_server_arguments(parser)
+    options = ServerOptions.from_args(parser.parse_args())
+    
     print("=" * 60)
     print("启动咨询智能体 (ConsultAgent)")
     print("=" * 60)
@@ -30,4 +36,4 @@ if __name__ == "__main__":
     )
     
     # 启动 A2A Server
-    consult_agent.start_a2a_server(host='0.0.0.0', port=10005, debug=False)
+    consult_agent.start_a2a_server(host='0.0.0.0', port=10005, debug=False, options=options)
@@ -11,34 +11,9 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from mcp.server import MCPServer, Tool, ToolDefinition
+from serving import ServerOptions
 from .consult_service import ConsultService
 
-# 尝试导入数据库管理器
-try:
-    from database.db_manager import DatabaseManager
-    from database.config import DB_TYPE, MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE
-    
-    if DB_TYPE == "mysql":
-        db_manager = DatabaseManager(
-            db_type="mysql",
-            host=MYSQL_HOST,
-            port=MYSQL_PORT,
-            user=MYSQL_USER,
-            password=MYSQL_PASSWORD,
-            database=MYSQL_DATABASE
-        )
-    else:
-        db_manager = DatabaseManager(db_type="sqlite")
-    
-    # 确保数据库表已初始化
-    if db_manager:
-        db_manager.init_tables()
-        db_manager.init_products()
-        print(f"[ConsultMCPServer] 数据库初始化完成. 路径: {db_manager.db_path if db_manager.db_type == 'sqlite' else MYSQL_DATABASE}", file=sys.stderr, flush=True)
-except Exception as e:
-    print(f"[ConsultMCPServer] 警告: 无法初始化数据库，将使用内存存储: {str(e)}", file=sys.stderr, flush=True)
-    db_manager = None
-
 
 class ConsultMCPServer:
     """咨询 MCP Server - 提供咨询相关的工具"""
@@ -55,8 +30,17 @@ class ConsultMCPServer:
         # 初始化服务层
         self.consult_service = ConsultService()
         
+        # 确保产品数据已初始化（表结构由数据库注册表按版本初始化）
+        if self.consult_service.db is not None:
+            try:
+                self.consult_service.db.init_products()
+            except Exception as e:
+                print(f"[ConsultMCPServer] 警告: 初始化产品数据失败: {str(e)}", file=sys.stderr, flush=True)
+        
         # 创建 MCP Server
         self.mcp_server = MCPServer(server_name="consult-mcp-server", port=port)
+        if self.consult_service.db is not None:
+            self.mcp_server.register_metrics("database", self.consult_service.db.stats)
         
         # 注册工具
         self._register_tools()
@@ -184,13 +168,14 @@ class ConsultMCPServer:
             print(f"[ConsultMCPServer] _search_products 失败: {str(e)}", file=sys.stderr, flush=True)
             return f"搜索产品失败: {str(e)}"
     
-    def run(self, host: str = '0.0.0.0', debug: bool = False):
+    def run(self, host: str = '0.0.0.0', debug: bool = False, options: Optional[ServerOptions] = None):
         """
         启动 MCP 服务
         
         Args:
             host: 监听地址
             debug: 是否开启调试模式
+            options: 服务运行参数（dev / production 模式等），为 None 时使用默认配置
         """
         print(f"ConsultMCPServer 启动在 http://{host}:{self.port}", file=sys.stderr, flush=True)
-        self.mcp_server.run(host=host, port=self.port, debug=debug)
+        self.mcp_server.run(host=host, debug=debug, options=options)
@@ -10,27 +10,7 @@ from typing import List, Dict, Optional
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-# 尝试导入数据库管理器
-try:
-    from database.db_manager import DatabaseManager
-    from database.config import DB_TYPE, MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE
-    
-    if DB_TYPE == "mysql":
-        db_manager = DatabaseManager(
-            db_type="mysql",
-            host=MYSQL_HOST,
-            port=MYSQL_PORT,
-            user=MYSQL_USER,
-            password=MYSQL_PASSWORD,
-            database=MYSQL_DATABASE
-        )
-    else:
-        db_manager = DatabaseManager(db_type="sqlite")
-    DB_AVAILABLE = True
-except Exception as e:
-    DB_AVAILABLE = False
-    db_manager = None
-    print(f"[ConsultService] 警告: 无法初始化数据库: {str(e)}", file=sys.stderr, flush=True)
+from database.registry import get_default_database
 
 
 class ConsultService:
@@ -38,7 +18,12 @@ class ConsultService:
     
     def __init__(self):
         """初始化咨询服务"""
-        self.db = db_manager
+        # 获取进程内共享的数据库（创建时检查表结构，连接在执行查询时才从连接池借出）
+        try:
+            self.db = get_default_database()
+        except Exception as e:
+            print(f"[ConsultService] 警告: 无法初始化数据库: {str(e)}", file=sys.stderr, flush=True)
+            self.db = None
         
         # 初始化本地 RAG 服务（使用 DashScope Embeddings，不依赖 LangChain）
         try:
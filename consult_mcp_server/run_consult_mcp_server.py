@@ -2,6 +2,7 @@
 启动咨询 MCP Server
 """
 import sys
+import argparse
 from pathlib import Path
 
 # 添加项目根目录到路径
@@ -9,8 +10,13 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from consult_mcp_server import ConsultMCPServer
+from serving import ServerOptions, add_server_arguments
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="启动咨询 MCP Server")
+    add_server_arguments(parser)
+    options = ServerOptions.from_args(parser.parse_args())
+    
     print("=" * 60)
     print("启动咨询 MCP Server (ConsultMCPServer)")
     print("=" * 60)
@@ -24,4 +30,4 @@ if __name__ == "__main__":
     consult_mcp_server = ConsultMCPServer(port=10003)
     
     # 启动服务
-    consult_mcp_server.run(host='0.0.0.0', debug=False)
+    consult_mcp_server.run(host='0.0.0.0', debug=False, options=options)
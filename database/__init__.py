@@ -3,6 +3,10 @@
 """
 try:
     from .db_manager import DatabaseManager
-    __all__ = ['DatabaseManager']
+    from .pool import ConnectionPool, PoolTimeoutError
+    from .registry import get_database, get_default_database
+    from .migrations import SCHEMA_VERSION, migrate
+    __all__ = ['DatabaseManager', 'ConnectionPool', 'PoolTimeoutError', 'get_database', 'get_default_database',
+               'SCHEMA_VERSION', 'migrate']
 except ImportError:
     __all__ = []
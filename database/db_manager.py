@@ -1,11 +1,28 @@
 """
 数据库管理器 - 支持 SQLite 和 MySQL
+
+- 连接来自有界连接池（ConnectionPool），多个请求线程可以同时访问数据库，互不干扰游标和事务
+- transaction() 在一个连接上执行多条语句，正常结束时提交、出错时回滚；
+  同一线程内嵌套的 transaction() / execute() / fetch_*() 使用同一个连接（能读到未提交的写入）
+- stats() 返回连接池统计（在用连接数、等待时间、超时次数等）
+- SQLite 的每个连接建立时应用性能配置（SQLITE_PRAGMAS：WAL、synchronous=NORMAL、mmap、页缓存等），
+  并每隔 SQLITE_MAINTENANCE_INTERVAL 秒在归还连接前执行一次 wal_checkpoint 和 optimize
+- 表结构由 database.migrations 中按版本号排序的迁移创建和升级，已执行的版本记录在 schema_migrations 表中，
+  创建时只有版本落后于 SCHEMA_VERSION 才执行迁移；
+  同一个数据库在进程内应通过 database.registry 共享一个 DatabaseManager
 """
 import os
+import sys
+import time
 import sqlite3
-from typing import Optional, List, Dict, Any
+import threading
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Iterator
 from pathlib import Path
 
+from .pool import ConnectionPool
+from .migrations import SCHEMA_VERSION, migrate
+
 # 尝试导入 MySQL 相关库（可选）
 try:
     import pymysql
@@ -13,22 +30,61 @@ try:
 except ImportError:
     MYSQL_AVAILABLE = False
 
+# 连接池配置（可通过环境变量覆盖）
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))  # 每个数据库的最大连接数
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # 等待可用连接的最长时间（秒）
+DB_POOL_PING_INTERVAL = float(os.getenv("DB_POOL_PING_INTERVAL", "30"))  # MySQL 连接空闲超过多少秒后借出前先 ping
+
+# SQLite 性能配置（可通过环境变量覆盖）
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")  # WAL：读写互不阻塞，提交只追加写 WAL 文件
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # WAL 下 NORMAL 只在检查点时 fsync（断电可能丢失最近的事务，但不会损坏数据库）
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # 内存映射读取的最大字节数，0 表示不使用
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-16000"))  # 每个连接的页缓存，负数表示 KiB（-16000 约 16MB）
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")  # 临时表和排序使用内存
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # 数据库被其他连接锁定时的等待时间（毫秒）
+SQLITE_MAINTENANCE_INTERVAL = float(os.getenv("SQLITE_MAINTENANCE_INTERVAL", "300"))  # 每隔多少秒执行一次 wal_checkpoint 和 optimize，0 表示不执行
+
+# 每个 SQLite 连接建立时按顺序执行的 PRAGMA（busy_timeout 在前，切换 WAL 时可能需要等待其他连接）
+SQLITE_PRAGMAS = {
+    "busy_timeout": SQLITE_BUSY_TIMEOUT,
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    "synchronous": SQLITE_SYNCHRONOUS,
+    "cache_size": SQLITE_CACHE_SIZE,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    "temp_store": SQLITE_TEMP_STORE,
+}
+
+DEFAULT_SQLITE_PATH = Path(__file__).parent.parent / "data" / "milk_tea.db"  # 默认 SQLite 数据库文件
+
 
 class DatabaseManager:
     """数据库管理器 - 支持 SQLite 和 MySQL"""
     
-    def __init__(self, db_type: str = "sqlite", **kwargs):
+    def __init__(self, db_type: str = "sqlite", pool_size: int = DB_POOL_SIZE,
+                 pool_timeout: float = DB_POOL_TIMEOUT, init_schema: bool = True, **kwargs):
         """
         初始化数据库管理器
         
         Args:
             db_type: 数据库类型，"sqlite" 或 "mysql"
+            pool_size: 连接池最大连接数
+            pool_timeout: 等待可用连接的最长时间（秒）
+            init_schema: 是否检查表结构版本并在需要时建表
             **kwargs: 数据库连接参数
-                - SQLite: db_path (可选，默认: ./data/milk_tea.db)
+                - SQLite: db_path (可选，默认: ./data/milk_tea.db),
+                          pragmas (可选，默认: SQLITE_PRAGMAS，传 {} 使用 SQLite 的默认设置),
+                          maintenance_interval (可选，默认: SQLITE_MAINTENANCE_INTERVAL)
                 - MySQL: host, port, user, password, database
         """
         self.db_type = db_type.lower()
-        self.connection = None
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.pool: Optional[ConnectionPool] = None
+        self._local = threading.local()  # 当前线程借出的连接和嵌套层数
+        self.maintenance_interval = 0.0  # 例行维护的间隔（秒），只用于 SQLite
+        self.maintenance_runs = 0
+        self._last_maintenance = time.monotonic()
+        self._maintenance_lock = threading.Lock()
         
         if self.db_type == "sqlite":
             self._init_sqlite(**kwargs)
@@ -39,39 +95,187 @@ class DatabaseManager:
         else:
             raise ValueError(f"不支持的数据库类型: {db_type}")
         
-        # 初始化数据库表
-        self._init_tables()
+        # 初始化数据库表（表结构已是最新版本时跳过）
+        if init_schema:
+            self.ensure_schema()
+            # 通常在主进程中创建，之后才 fork 出工作进程：不把检查表结构用过的连接留在连接池里
+            self.close_idle()
     
-    def _init_sqlite(self, db_path: Optional[str] = None):
-        """初始化 SQLite 连接"""
+    def _init_sqlite(self, db_path: Optional[str] = None, pragmas: Optional[Dict[str, Any]] = None,
+                     maintenance_interval: float = SQLITE_MAINTENANCE_INTERVAL):
+        """初始化 SQLite 连接池"""
         if db_path is None:
             # 默认路径：项目根目录下的 data 文件夹
-            data_dir = Path(__file__).parent.parent / "data"
-            data_dir.mkdir(exist_ok=True)
-            db_path = str(data_dir / "milk_tea.db")
+            DEFAULT_SQLITE_PATH.parent.mkdir(exist_ok=True)
+            db_path = str(DEFAULT_SQLITE_PATH)
+        self.db_path = db_path
+        self.pragmas = dict(SQLITE_PRAGMAS if pragmas is None else pragmas)
+        self.maintenance_interval = maintenance_interval
         
-        self.connection = sqlite3.connect(db_path, check_same_thread=False)
-        self.connection.row_factory = sqlite3.Row  # 返回字典格式的结果
+        def connect() -> sqlite3.Connection:
+            # 连接会在线程之间传递（同一时间只被一个线程使用）
+            connection = sqlite3.connect(db_path, check_same_thread=False, timeout=self.pool_timeout)
+            connection.row_factory = sqlite3.Row  # 返回字典格式的结果
+            for name, value in self.pragmas.items():
+                connection.execute(f"PRAGMA {name}={value}").fetchall()
+            return connection
+        
+        # 内存数据库的每个连接都是独立的数据库，只能使用一个连接
+        pool_size = 1 if db_path == ":memory:" else self.pool_size
+        self.pool = ConnectionPool(connect, max_size=pool_size, timeout=self.pool_timeout)
     
     def _init_mysql(self, host: str = "localhost", port: int = 3306, 
                     user: str = "root", password: str = "", 
                     database: str = "multi_agent_demo", **kwargs):
-        """初始化 MySQL 连接"""
-        self.connection = pymysql.connect(
-            host=host,
-            port=port,
-            user=user,
-            password=password,
-            database=database,
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor,
-            **kwargs
+        """初始化 MySQL 连接池"""
+        def connect():
+            # autocommit: 连接池中的连接在两次借出之间不能保留事务快照，事务由 transaction() 显式开始
+            return pymysql.connect(
+                host=host,
+                port=port,
+                user=user,
+                password=password,
+                database=database,
+                charset='utf8mb4',
+                cursorclass=pymysql.cursors.DictCursor,
+                autocommit=True,
+                **kwargs
+            )
+        
+        self.pool = ConnectionPool(
+            connect,
+            max_size=self.pool_size,
+            timeout=self.pool_timeout,
+            ping=lambda connection: connection.ping(reconnect=True),
+            ping_interval=DB_POOL_PING_INTERVAL
         )
     
-    def _init_tables(self):
-        """初始化数据库表结构"""
-        cursor = self.connection.cursor()
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        从连接池借出连接，退出时归还（同一线程内嵌套调用时使用同一个连接）
+        
+        Yields:
+            数据库连接
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            yield connection
+            return
+        
+        connection = self.pool.acquire()
+        self._local.connection = connection
+        self._local.depth = 0
+        broken = False
+        try:
+            yield connection
+        except Exception:
+            # 回滚失败说明连接已经不可用（如 MySQL 连接断开），不再放回连接池
+            try:
+                connection.rollback()
+            except Exception:
+                broken = True
+            raise
+        else:
+            if self._maintenance_due(connection):
+                self.maintain()
+        finally:
+            self._local.connection = None
+            self.pool.release(connection, discard=broken)
+    
+    def _maintenance_due(self, connection: Any) -> bool:
+        """判断是否该执行例行维护（同一时间只有一个线程执行，连接上有未提交的事务时推迟）"""
+        if self.maintenance_interval <= 0 or getattr(connection, "in_transaction", True):
+            return False
+        if time.monotonic() - self._last_maintenance < self.maintenance_interval:
+            return False
+        with self._maintenance_lock:
+            if time.monotonic() - self._last_maintenance < self.maintenance_interval:
+                return False
+            self._last_maintenance = time.monotonic()
+            return True
+    
+    def maintain(self) -> Optional[Dict]:
+        """
+        SQLite 例行维护：把 WAL 中已提交的页写回数据库文件（wal_checkpoint(PASSIVE)，不等待读写），
+        避免 WAL 文件一直增长；并按需更新查询优化器的统计信息（optimize）
+        
+        Returns:
+            检查点结果 {"busy": 是否有页因为读写未能写回, "wal_pages": WAL 中的页数, "checkpointed": 已写回的页数}，
+            MySQL 或维护失败时返回 None
+        """
+        if self.db_type != "sqlite":
+            return None
+        self._last_maintenance = time.monotonic()
+        try:
+            with self.connection() as connection:
+                busy, wal_pages, checkpointed = connection.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+                connection.execute("PRAGMA optimize").fetchall()
+        except Exception as e:
+            print(f"[DatabaseManager] SQLite 例行维护失败: {e}", file=sys.stderr, flush=True)
+            return None
+        self.maintenance_runs += 1
+        return {"busy": bool(busy), "wal_pages": wal_pages, "checkpointed": checkpointed}
+    
+    @contextmanager
+    def transaction(self) -> Iterator[Any]:
+        """
+        在一个连接上执行事务：正常结束时提交，出错时回滚
+        
+        嵌套的 transaction() 加入外层事务，由最外层提交
+        
+        Yields:
+            数据库游标
+        """
+        with self.connection() as connection:
+            outermost = self._local.depth == 0
+            if outermost and self.db_type == "mysql":
+                connection.begin()
+            self._local.depth += 1
+            cursor = connection.cursor()
+            try:
+                yield cursor
+                if outermost:
+                    connection.commit()
+            except Exception:
+                if outermost:
+                    connection.rollback()
+                raise
+            finally:
+                self._local.depth -= 1
+                cursor.close()
+    
+    def schema_version(self) -> int:
+        """
+        读取数据库的表结构版本
+        
+        Returns:
+            已应用的最高版本，还没有建表时返回 0
+        """
+        try:
+            row = self.fetch_one("SELECT MAX(version) AS version FROM schema_migrations")
+        except Exception:
+            return 0  # schema_migrations 表不存在
+        return int(row["version"] or 0) if row else 0
+    
+    def ensure_schema(self) -> bool:
+        """
+        表结构版本落后于 SCHEMA_VERSION 时执行迁移（多个进程同时执行也是安全的）
         
+        Returns:
+            是否执行了迁移
+        """
+        if self.schema_version() >= SCHEMA_VERSION:
+            return False
+        self._init_tables()
+        return True
+    
+    def _init_tables(self):
+        """执行还没有执行的迁移，把表结构升级到最新版本"""
+        migrate(self)
+    
+    def _create_tables(self, cursor):
+        """创建基础表结构（迁移版本 1，新的表结构改动请在 database.migrations 中追加迁移）"""
         # 创建用户表
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS users (
@@ -226,13 +430,15 @@ class DatabaseManager:
                 )
             """)
         
-        self.connection.commit()
-        # self._init_products()  # 注释掉，避免每次创建表都初始化产品
+        # 产品数据由 init_products() 按需初始化，避免每次创建表都初始化产品
     
-    def _init_products(self):
-        """初始化产品数据"""
-        cursor = self.connection.cursor()
-        
+    def init_products(self):
+        """初始化产品数据（已有产品时跳过）"""
+        with self.transaction() as cursor:
+            self._insert_products(cursor)
+    
+    def _insert_products(self, cursor):
+        """插入默认产品"""
         # 检查是否已有产品数据
         if self.db_type == "sqlite":
             cursor.execute("SELECT COUNT(*) as count FROM products")
@@ -240,7 +446,7 @@ class DatabaseManager:
             cursor.execute("SELECT COUNT(*) as count FROM products")
         
         result = cursor.fetchone()
-        count = result[0] if isinstance(result, dict) else result['count'] if hasattr(result, '__getitem__') else 0
+        count = result['count'] if result else 0  # sqlite3.Row 和 MySQL 的字典结果都支持按列名取值
         
         if count > 0:
             return  # 已有数据，不重复插入
@@ -268,27 +474,44 @@ class DatabaseManager:
                     """, (name, desc, price, stock))
             except Exception:
                 pass  # 如果已存在则跳过
-        
-        self.connection.commit()
     
     def execute(self, query: str, params: tuple = None) -> Any:
-        """执行 SQL 查询"""
-        cursor = self.connection.cursor()
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        self.connection.commit()
+        """
+        执行 SQL 语句并提交（在 transaction() 中调用时由外层事务提交）
+        
+        Returns:
+            已关闭的游标，只能读取 rowcount、lastrowid
+        """
+        with self.transaction() as cursor:
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+        return cursor
+    
+    def executemany(self, query: str, params_list: List[tuple]) -> Any:
+        """
+        批量执行 SQL 语句并在一个事务中提交
+        
+        Returns:
+            已关闭的游标，只能读取 rowcount
+        """
+        with self.transaction() as cursor:
+            cursor.executemany(query, params_list)
         return cursor
     
     def fetch_one(self, query: str, params: tuple = None) -> Optional[Dict]:
         """执行查询并返回一条记录"""
-        cursor = self.connection.cursor()
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        row = cursor.fetchone()
+        with self.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
         if row:
             if self.db_type == "sqlite":
                 return dict(row)
@@ -298,21 +521,44 @@ class DatabaseManager:
     
     def fetch_all(self, query: str, params: tuple = None) -> List[Dict]:
         """执行查询并返回所有记录"""
-        cursor = self.connection.cursor()
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        rows = cursor.fetchall()
+        with self.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
         if self.db_type == "sqlite":
             return [dict(row) for row in rows]
         else:
             return rows
     
+    def stats(self) -> Dict:
+        """获取连接池统计（SQLite 还包括日志模式和例行维护次数）"""
+        stats = {"db_type": self.db_type, **self.pool.stats()}
+        if self.db_type == "sqlite":
+            stats["journal_mode"] = self.pragmas.get("journal_mode", "default")
+            stats["maintenance_runs"] = self.maintenance_runs
+        return stats
+    
+    def close_idle(self) -> int:
+        """
+        关闭连接池中的空闲连接（SQLite / MySQL 连接不能在 fork 出的子进程中继续使用），之后按需重新连接
+        
+        Returns:
+            关闭的连接数（SQLite 内存数据库关闭连接会丢失数据，不关闭）
+        """
+        if not self.pool or (self.db_type == "sqlite" and self.db_path == ":memory:"):
+            return 0
+        return self.pool.close_idle()
+    
     def close(self):
-        """关闭数据库连接"""
-        if self.connection:
-            self.connection.close()
+        """关闭连接池"""
+        if self.pool:
+            self.pool.close()
     
     def __enter__(self):
         return self
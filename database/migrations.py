@@ -0,0 +1,122 @@
+"""
+数据库表结构迁移 - 按版本号顺序执行的升级迁移（SQLite 和 MySQL）
+
+- 已执行的版本记录在 schema_migrations 表中，migrate() 只执行还没有记录的迁移，每个迁移在一个事务中执行并记录版本
+- 迁移语句都是幂等的（IF NOT EXISTS / 先检查索引是否存在），重复执行或多个进程同时执行都是安全的；
+  SQLite 用 BEGIN IMMEDIATE 串行化各进程的迁移，MySQL 的 DDL 会隐式提交，依靠幂等保证安全
+- 修改表结构时在 MIGRATIONS 末尾追加新的迁移（版本号加 1），不要修改已发布的迁移
+"""
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+
+@dataclass(frozen=True)
+class Migration:
+    """一个表结构升级迁移"""
+    version: int
+    description: str
+    up: Callable[[Any, Any], None]  # up(db, cursor)，db 为 DatabaseManager
+
+
+def _create_base_tables(db, cursor):
+    """版本 1：基础表结构（用户、产品、订单、订单项、反馈）"""
+    db._create_tables(cursor)
+
+
+def _create_index(db, cursor, table: str, name: str, columns: str):
+    """创建索引（已存在时跳过）"""
+    if db.db_type == "sqlite":
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+        return
+    # MySQL 的 CREATE INDEX 不支持 IF NOT EXISTS
+    cursor.execute("""
+        SELECT COUNT(*) AS count FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table, name))
+    if cursor.fetchone()["count"] == 0:
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+
+def _create_query_indexes(db, cursor):
+    """版本 2：按用户 / 订单查询订单、订单项和反馈时使用的索引（查询都按 created_at 倒序，一并放入索引避免排序）"""
+    _create_index(db, cursor, "orders", "idx_orders_user_created", "user_id, created_at")
+    _create_index(db, cursor, "order_items", "idx_order_items_order", "order_id")
+    _create_index(db, cursor, "feedback", "idx_feedback_user_created", "user_id, created_at")
+    _create_index(db, cursor, "feedback", "idx_feedback_order_created", "order_id, created_at")
+
+
+# 所有迁移（按版本号顺序）
+MIGRATIONS: List[Migration] = [
+    Migration(1, "基础表结构", _create_base_tables),
+    Migration(2, "订单 / 订单项 / 反馈的查询索引", _create_query_indexes),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version  # 最新的表结构版本
+
+
+def _placeholder(db) -> str:
+    return "?" if db.db_type == "sqlite" else "%s"
+
+
+def _create_version_table(db):
+    """创建 schema_migrations 表"""
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(db) -> List[int]:
+    """
+    读取已执行的迁移版本
+    
+    Args:
+        db: DatabaseManager
+    
+    Returns:
+        已执行的版本号（升序），还没有 schema_migrations 表时返回空列表
+    """
+    try:
+        rows = db.fetch_all("SELECT version FROM schema_migrations ORDER BY version")
+    except Exception:
+        return []  # schema_migrations 表不存在
+    return [int(row["version"]) for row in rows]
+
+
+def migrate(db, target: Optional[int] = None) -> List[int]:
+    """
+    按顺序执行还没有执行的迁移
+    
+    Args:
+        db: DatabaseManager
+        target: 升级到的版本，为 None 时升级到最新版本
+    
+    Returns:
+        本次执行的版本号
+    """
+    target = SCHEMA_VERSION if target is None else target
+    _create_version_table(db)
+    applied = set(applied_versions(db))
+    placeholder = _placeholder(db)
+    
+    executed = []
+    for migration in MIGRATIONS:
+        if migration.version > target or migration.version in applied:
+            continue
+        with db.transaction() as cursor:
+            if db.db_type == "sqlite":
+                # 获取写锁后再检查一次，其他进程可能已经执行了这个迁移
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute(f"SELECT 1 FROM schema_migrations WHERE version = {placeholder}", (migration.version,))
+                if cursor.fetchone():
+                    continue
+            migration.up(db, cursor)
+            ignore = "OR IGNORE" if db.db_type == "sqlite" else "IGNORE"
+            cursor.execute(f"INSERT {ignore} INTO schema_migrations (version) VALUES ({placeholder})",
+                           (migration.version,))
+        executed.append(migration.version)
+        print(f"[Migrations] 已升级到版本 {migration.version}: {migration.description}", file=sys.stderr, flush=True)
+    return executed
@@ -0,0 +1,187 @@
+"""
+数据库连接池 - DatabaseManager 使用的有界连接池（SQLite 和 MySQL 共用）
+
+- 借出 / 归还方式：每个连接同一时间只被一个线程使用，用完归还给其他线程复用
+- 连接数有上限，连接都被借出时等待归还，超过等待时间抛出 PoolTimeoutError
+- 健康检查：空闲超过 ping_interval 秒的连接借出前先检查（MySQL 的 ping 会自动重连），
+  检查失败的连接被丢弃并重新建立；使用中出错且无法回滚的连接也被丢弃
+- 统计借出次数、等待时间、在用连接数和超时次数
+"""
+import sys
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class PoolTimeoutError(TimeoutError):
+    """等待可用连接超时"""
+
+
+class ConnectionPool:
+    """有界连接池（线程安全）"""
+    
+    def __init__(self, connect: Callable[[], Any], max_size: int = 10, timeout: float = 10.0,
+                 ping: Optional[Callable[[Any], None]] = None, ping_interval: float = 30.0):
+        """
+        初始化连接池（连接在第一次借出时才建立）
+        
+        Args:
+            connect: 建立新连接的函数
+            max_size: 最大连接数
+            timeout: 等待可用连接的最长时间（秒）
+            ping: 检查连接是否可用的函数，连接不可用时抛出异常；为 None 时不检查
+            ping_interval: 空闲超过多少秒的连接借出前需要检查
+        """
+        self._connect = connect
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self._ping = ping
+        self.ping_interval = ping_interval
+        
+        self._idle: List[Tuple[Any, float]] = []  # (连接, 归还时间)，后进先出（优先复用最近用过的连接）
+        self._size = 0  # 已建立（含正在建立）的连接数
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        
+        self.checkouts = 0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+    
+    def acquire(self) -> Any:
+        """
+        借出连接（用完后必须调用 release）
+        
+        Returns:
+            数据库连接
+        
+        Raises:
+            PoolTimeoutError: 超过等待时间仍没有可用连接
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("连接池已关闭")
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, released_at = None, 0.0
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeoutError(f"等待数据库连接超时（{self.timeout:g} 秒，最大连接数 {self.max_size}）")
+                self._cond.wait(remaining)
+            
+            waited = time.monotonic() - start
+            self._in_use += 1
+            self.checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        
+        try:
+            if conn is None:
+                return self._open()
+            if self._ping is not None and time.monotonic() - released_at >= self.ping_interval:
+                return self._check(conn)
+            return conn
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+    
+    def _open(self) -> Any:
+        conn = self._connect()
+        with self._cond:
+            self.created += 1
+        return conn
+    
+    def _check(self, conn: Any) -> Any:
+        """检查空闲连接，不可用时丢弃并重新建立"""
+        try:
+            self._ping(conn)
+            return conn
+        except Exception as e:
+            print(f"[ConnectionPool] 连接不可用，重新连接: {e}", file=sys.stderr, flush=True)
+            self._close_quietly(conn)
+            with self._cond:
+                self.discarded += 1
+            return self._open()
+    
+    def release(self, conn: Any, discard: bool = False):
+        """
+        归还连接
+        
+        Args:
+            conn: acquire 借出的连接
+            discard: 连接已经不可用（如网络断开），关闭而不是放回连接池
+        """
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._size -= 1
+                if discard:
+                    self.discarded += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+            self._cond.notify()
+        if conn is not None:
+            self._close_quietly(conn)
+    
+    @staticmethod
+    def _close_quietly(conn: Any):
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    def close(self):
+        """关闭空闲连接；借出中的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+    
+    def close_idle(self) -> int:
+        """
+        关闭所有空闲连接（连接池仍可继续使用，之后按需重新建立）
+        
+        Returns:
+            关闭的连接数
+        """
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+        return len(idle)
+    
+    def stats(self) -> Dict:
+        """获取连接池统计"""
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "created": self.created,
+                "discarded": self.discarded,
+                "avg_wait_ms": round(self._wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 3)
+            }
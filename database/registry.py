@@ -0,0 +1,122 @@
+"""
+进程内共享的数据库注册表
+
+- 同一个数据库（DSN：类型 + 地址 + 库名，SQLite 为文件的绝对路径）在一个进程中只创建一个
+  DatabaseManager，各个 MCP Server、服务层和 DAO 共用它的连接池
+- 第一次使用时才创建（懒加载），导入模块时不连接数据库；创建时只有表结构版本落后才执行建表语句
+- 创建失败时不缓存，下次调用时重试
+- 创建时检查完表结构就关闭空闲连接；gunicorn 多进程模式下 fork 工作进程前也会调用 close_idle，
+  每个工作进程使用自己建立的连接
+"""
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from .db_manager import DatabaseManager, DEFAULT_SQLITE_PATH
+
+_databases: Dict[str, DatabaseManager] = {}  # DSN -> 共享的 DatabaseManager
+_lock = threading.Lock()
+
+
+def make_dsn(db_type: str = "sqlite", **kwargs) -> str:
+    """
+    生成数据库的唯一标识（不包含密码和连接池参数）
+    
+    Args:
+        db_type: 数据库类型，"sqlite" 或 "mysql"
+        **kwargs: 与 DatabaseManager 相同的连接参数
+    
+    Returns:
+        DSN 字符串，如 "sqlite:///abs/path/milk_tea.db"、"mysql://root@localhost:3306/multi_agent_demo"
+    """
+    db_type = db_type.lower()
+    if db_type == "sqlite":
+        db_path = kwargs.get("db_path")
+        if db_path is None:
+            db_path = DEFAULT_SQLITE_PATH
+        if db_path != ":memory:":
+            db_path = Path(db_path).resolve()
+        return f"sqlite:///{db_path}"
+    return (f"{db_type}://{kwargs.get('user', 'root')}@{kwargs.get('host', 'localhost')}:"
+            f"{kwargs.get('port', 3306)}/{kwargs.get('database', 'multi_agent_demo')}")
+
+
+def get_database(db_type: str = "sqlite", **kwargs) -> DatabaseManager:
+    """
+    获取进程内共享的 DatabaseManager（同一个 DSN 只创建一次）
+    
+    连接池参数（pool_size、pool_timeout）以第一次创建时的为准
+    
+    Args:
+        db_type: 数据库类型，"sqlite" 或 "mysql"
+        **kwargs: 与 DatabaseManager 相同的连接参数
+    
+    Returns:
+        DatabaseManager 实例
+    """
+    dsn = make_dsn(db_type, **kwargs)
+    db = _databases.get(dsn)
+    if db is None:
+        with _lock:
+            db = _databases.get(dsn)
+            if db is None:
+                db = _databases[dsn] = DatabaseManager(db_type=db_type, **kwargs)
+    return db
+
+
+def get_default_database() -> DatabaseManager:
+    """
+    按 database.config 的配置获取进程内共享的 DatabaseManager
+    
+    Returns:
+        DatabaseManager 实例
+    """
+    from .config import (DB_TYPE, SQLITE_DB_PATH, MYSQL_HOST, MYSQL_PORT,
+                         MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE)
+    if DB_TYPE == "mysql":
+        return get_database(
+            db_type="mysql",
+            host=MYSQL_HOST,
+            port=MYSQL_PORT,
+            user=MYSQL_USER,
+            password=MYSQL_PASSWORD,
+            database=MYSQL_DATABASE
+        )
+    return get_database(db_type="sqlite", db_path=SQLITE_DB_PATH)
+
+
+def registered_databases() -> Dict[str, Dict]:
+    """获取所有已创建的数据库及其连接池统计"""
+    with _lock:
+        databases = dict(_databases)
+    return {dsn: db.stats() for dsn, db in databases.items()}
+
+
+def close_idle() -> int:
+    """
+    关闭所有共享数据库的空闲连接（fork 工作进程前调用，子进程不继承父进程的连接）
+    
+    Returns:
+        关闭的连接数
+    """
+    with _lock:
+        databases = list(_databases.values())
+    return sum(db.close_idle() for db in databases)
+
+
+def close_all(dsn: Optional[str] = None):
+    """
+    关闭并移除共享的 DatabaseManager
+    
+    Args:
+        dsn: 只关闭指定的数据库，为 None 时关闭全部
+    """
+    with _lock:
+        if dsn is None:
+            databases = list(_databases.values())
+            _databases.clear()
+        else:
+            db = _databases.pop(dsn, None)
+            databases = [db] if db is not None else []
+    for db in databases:
+        db.close()
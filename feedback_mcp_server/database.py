@@ -84,20 +84,13 @@ class FeedbackDAO:
             """
             params = (user_id, order_id, feedback_type, rating, content, now, now)
         
-        cursor = self.db.connection.cursor()
-        cursor.execute(query, params)
-        self.db.connection.commit()
-        
-        # 获取插入的ID
-        if self.db.db_type == "sqlite":
-            feedback_id = cursor.lastrowid
-        else:
+        # 插入和查询在同一个事务（同一个连接）中执行
+        with self.db.transaction() as cursor:
+            cursor.execute(query, params)
             feedback_id = cursor.lastrowid
-        
-        cursor.close()
-        
-        # 查询创建的反馈
-        return self.get_feedback_by_id(feedback_id)
+            
+            # 查询创建的反馈
+            return self.get_feedback_by_id(feedback_id)
     
     def get_feedback_by_id(self, feedback_id: int) -> Optional[Dict]:
         """
@@ -188,11 +181,9 @@ class FeedbackDAO:
         else:
             query = "UPDATE feedback SET solution = %s, updated_at = %s WHERE id = %s"
         
-        cursor = self.db.connection.cursor()
-        cursor.execute(query, (solution, now, feedback_id))
-        self.db.connection.commit()
-        affected_rows = cursor.rowcount
-        cursor.close()
+        with self.db.transaction() as cursor:
+            cursor.execute(query, (solution, now, feedback_id))
+            affected_rows = cursor.rowcount
         
         return affected_rows > 0
 
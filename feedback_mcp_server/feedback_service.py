@@ -10,30 +10,9 @@ from typing import List, Dict, Optional
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+from database.registry import get_default_database
 from .database import FeedbackDAO
 
-# 尝试导入数据库管理器
-try:
-    from database.db_manager import DatabaseManager
-    from database.config import DB_TYPE, MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE
-    
-    if DB_TYPE == "mysql":
-        feedback_db = DatabaseManager(
-            db_type="mysql",
-            host=MYSQL_HOST,
-            port=MYSQL_PORT,
-            user=MYSQL_USER,
-            password=MYSQL_PASSWORD,
-            database=MYSQL_DATABASE
-        )
-    else:
-        feedback_db = DatabaseManager(db_type="sqlite")
-    FEEDBACK_DB_AVAILABLE = True
-except Exception as e:
-    FEEDBACK_DB_AVAILABLE = False
-    feedback_db = None
-    print(f"警告: 无法初始化反馈数据库: {str(e)}")
-
 
 class FeedbackService:
     """反馈服务 - 处理反馈相关的业务逻辑"""
@@ -141,11 +120,17 @@ class FeedbackService:
         return f"{rating}星"
 
 
-# 初始化服务实例
-if FEEDBACK_DB_AVAILABLE:
-    feedback_dao = FeedbackDAO(feedback_db)
-    feedback_service = FeedbackService(feedback_dao)
-else:
-    feedback_dao = FeedbackDAO(None)  # 使用内存存储
-    feedback_service = FeedbackService(feedback_dao)
+_feedback_service: Optional[FeedbackService] = None
+
 
+def get_feedback_service() -> FeedbackService:
+    """获取默认的反馈服务实例（第一次调用时连接进程内共享的数据库，失败时使用内存存储）"""
+    global _feedback_service
+    if _feedback_service is None:
+        try:
+            feedback_db = get_default_database()
+        except Exception as e:
+            print(f"警告: 无法初始化反馈数据库: {str(e)}")
+            feedback_db = None
+        _feedback_service = FeedbackService(FeedbackDAO(feedback_db))
+    return _feedback_service
@@ -2,6 +2,7 @@
 启动反馈 MCP Server
 """
 import sys
+import argparse
 from pathlib import Path
 
 # 添加项目根目录到路径
@@ -9,9 +10,15 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from feedback_mcp_server.feedback_mcp_server import FeedbackMCPServer
+from serving import ServerOptions, add_server_arguments
+
 
 def main():
     """启动反馈 MCP Server"""
+    parser = argparse.ArgumentParser(description="启动反馈 MCP Server")
+    add_server_arguments(parser)
+    options = ServerOptions.from_args(parser.parse_args())
+    
     print("=" * 60)
     print("反馈 MCP Server")
     print("=" * 60)
@@ -31,7 +38,7 @@ def main():
     
     # 启动服务
     try:
-        server.start(host='0.0.0.0', debug=False)
+        server.start(host='0.0.0.0', debug=False, options=options)
     except KeyboardInterrupt:
         print("\n服务已停止")
 
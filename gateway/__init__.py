@@ -0,0 +1,7 @@
+"""
+多会话 HTTP 网关模块
+"""
+from .session_pool import SupervisorSessionPool, GatewaySession
+from .gateway_server import SupervisorGateway
+
+__all__ = ['SupervisorGateway', 'SupervisorSessionPool', 'GatewaySession']
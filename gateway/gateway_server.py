@@ -0,0 +1,141 @@
+"""
+多会话 HTTP 网关 - 在一个进程中为大量用户的对话提供 SupervisorAgent 服务
+
+接口:
+- POST /chat          {"user_id", "chat_id", "input"} -> {"output", "chat_id", "status"}
+- POST /chat/stream   同上，SSE 流式返回（事件格式与 A2A /a2a/stream 相同: delta / error / done），
+                      对话ID在响应头 X-Chat-Id 中返回
+请求没有 chat_id 时为本次请求生成新的对话ID（不会与其他请求共享会话），客户端使用返回的 chat_id 继续对话
+- DELETE /sessions/<user_id>/<chat_id>  结束会话
+- GET /metrics        会话池统计
+- GET /health         健康检查
+"""
+import json
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from flask import Flask, request, jsonify, Response
+
+from serving import ServerOptions, run_app
+from gateway.session_pool import SupervisorSessionPool
+from session_store import create_session_store
+
+
+class SupervisorGateway:
+    """多会话 HTTP 网关：每个 (user_id, chat_id) 对应一个 SupervisorAgent 会话"""
+    
+    def __init__(self, port: int = 10001,
+                 factory: Optional[Callable[[str, str], Any]] = None,
+                 pool: Optional[SupervisorSessionPool] = None):
+        """
+        初始化网关
+        
+        Args:
+            port: 服务端口
+            factory: 会话创建函数 (user_id, chat_id) -> SupervisorAgent，为 None 时创建一个模板
+                     SupervisorAgent，所有会话共享它的路由组件（见 SupervisorAgent.new_session）
+            pool: 会话池，为 None 时使用 factory 和默认配置（环境变量，包括 SESSION_STORE 会话存储）创建
+        """
+        # 所有会话共享路由组件的模板 SupervisorAgent（使用自定义的 factory / pool 时为 None）
+        self.template = None
+        if pool is None:
+            if factory is None:
+                from supervisor_agent import SupervisorAgent
+                self.template = SupervisorAgent(user_id="gateway", chat_id="gateway")
+                factory = self.template.new_session
+            pool = SupervisorSessionPool(factory, store=create_session_store())
+        self.port = port
+        self.pool = pool
+        self.app = Flask(__name__)
+        
+        self._register_routes()
+    
+    @staticmethod
+    def _parse_request() -> Optional[Dict]:
+        """解析对话请求，缺少输入时返回 None，缺少 chat_id 时生成新的对话ID"""
+        data = request.get_json(silent=True) or {}
+        user_input = str(data.get("input", "")).strip()
+        if not user_input:
+            return None
+        return {
+            "user_id": str(data.get("user_id") or "default_user"),
+            "chat_id": str(data.get("chat_id") or f"chat_{uuid.uuid4().hex}"),
+            "input": user_input
+        }
+    
+    def _register_routes(self):
+        """注册网关路由"""
+        
+        @self.app.route('/chat', methods=['POST'])
+        def chat():
+            """对话接口（同一会话的请求按顺序处理）"""
+            data = self._parse_request()
+            if data is None:
+                return jsonify({"error": "Invalid request", "status": "error"}), 400
+            try:
+                with self.pool.session(data["chat_id"], data["user_id"]) as session:
+                    output = session.agent.chat(data["input"])
+                return jsonify({"output": output, "chat_id": data["chat_id"], "status": "success"})
+            except Exception as e:
+                return jsonify({"error": str(e), "status": "error"}), 500
+        
+        @self.app.route('/chat/stream', methods=['POST'])
+        def chat_stream():
+            """对话接口（SSE 流式返回）"""
+            # 请求体必须在生成器外读取，生成器执行时请求上下文已经结束
+            data = self._parse_request()
+            if data is None:
+                return jsonify({"error": "Invalid request", "status": "error"}), 400
+            
+            def event(payload: Dict) -> str:
+                return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            
+            def generate():
+                try:
+                    # 会话锁在整个流式响应期间保持，客户端断开时生成器关闭并释放锁
+                    with self.pool.session(data["chat_id"], data["user_id"]) as session:
+                        for chunk in session.agent.chat_stream(data["input"]):
+                            if chunk:
+                                yield event({"delta": chunk})
+                except Exception as e:
+                    yield event({"error": str(e)})
+                yield event({"done": True})
+            
+            return Response(generate(), mimetype='text/event-stream', headers={
+                "Cache-Control": "no-cache",
+                "X-Chat-Id": data["chat_id"],
+                "X-Accel-Buffering": "no"  # 禁止反向代理缓冲
+            })
+        
+        @self.app.route('/sessions/<user_id>/<chat_id>', methods=['DELETE'])
+        def delete_session(user_id: str, chat_id: str):
+            """结束会话"""
+            if not self.pool.remove(chat_id, user_id):
+                return jsonify({"error": "Session not found", "status": "error"}), 404
+            return jsonify({"status": "success"})
+        
+        @self.app.route('/metrics', methods=['GET'])
+        def metrics():
+            """会话池统计"""
+            return jsonify(self.pool.stats())
+        
+        @self.app.route('/health', methods=['GET'])
+        def health():
+            """健康检查接口"""
+            return jsonify({"status": "healthy", "sessions": len(self.pool)})
+    
+    def run(self, host: str = '0.0.0.0', debug: bool = False, options: Optional[ServerOptions] = None):
+        """
+        启动网关服务
+        
+        Args:
+            host: 监听地址
+            debug: 是否开启调试模式（仅 dev 模式有效）
+            options: 服务运行参数，为 None 时使用默认配置。注意会话保存在进程内存中，
+                     production 模式下多个工作进程之间不共享会话，需要在前面按 user_id 做粘性路由
+        """
+        options = options or ServerOptions()
+        if self.template is not None:
+            # 所有会话共用模板的推测调用和多意图线程池，按每个进程同时处理的请求数设置线程数
+            self.template.size_executors(options.threads)
+        run_app(self.app, host=host, port=self.port, options=options, debug=debug)
@@ -0,0 +1,46 @@
+"""
+启动多会话 HTTP 网关
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from gateway import SupervisorGateway
+from serving import ServerOptions, add_server_arguments
+
+GATEWAY_PORT = int(os.getenv("GATEWAY_PORT", "10001"))  # 网关监听端口
+
+
+def main():
+    """启动网关"""
+    parser = argparse.ArgumentParser(description="启动多会话 HTTP 网关")
+    parser.add_argument("--port", type=int, default=GATEWAY_PORT, help="监听端口（默认: %(default)s）")
+    add_server_arguments(parser, modes=["dev", "production"])  # 网关是 Flask 应用，没有 asyncio 运行时
+    args = parser.parse_args()
+    options = ServerOptions.from_args(args)
+    
+    print("=" * 60)
+    print("云边奶茶铺 多会话网关")
+    print("=" * 60)
+    print()
+    
+    gateway = SupervisorGateway(port=args.port)
+    stats = gateway.pool.stats()
+    print(f"最多会话数: {stats['max_sessions']}，空闲超时: {stats['idle_ttl']:.0f} 秒")
+    print(f"对话接口: POST http://localhost:{args.port}/chat")
+    print(f"流式接口: POST http://localhost:{args.port}/chat/stream")
+    print()
+    
+    try:
+        gateway.run(host='0.0.0.0', options=options)
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+网关会话池 - 按 (user_id, chat_id) 管理多个 SupervisorAgent 会话
+
+会话的 LRU / 空闲超时淘汰、会话锁和会话存储同步都复用 a2a.session.SessionManager，
+这里只把会话换成持有 SupervisorAgent 的 GatewaySession（对话历史就是 SupervisorAgent 的历史记录）。
+"""
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from a2a.session import AgentSession, SessionManager
+from session_store import SessionStore
+
+# 默认配置（可通过环境变量覆盖）
+GATEWAY_MAX_SESSIONS = int(os.getenv("GATEWAY_MAX_SESSIONS", "10000"))  # 最多保留的会话数，超出时淘汰最久未使用的会话
+GATEWAY_MAX_MEMORY_MB = int(os.getenv("GATEWAY_MAX_MEMORY_MB", "512"))  # 所有会话对话历史的总内存上限（MB）
+GATEWAY_IDLE_TTL = float(os.getenv("GATEWAY_IDLE_TTL", "1800"))  # 会话空闲超时时间（秒）
+GATEWAY_EVICT_INTERVAL = float(os.getenv("GATEWAY_EVICT_INTERVAL", "60"))  # 后台清理空闲会话的间隔（秒），0 表示不启动后台清理
+
+
+class GatewaySession(AgentSession):
+    """网关中的一个对话会话（history 读写的是 SupervisorAgent 的对话历史）"""
+    
+    def __init__(self, chat_id: str, user_id: str, agent: Any):
+        """
+        初始化会话
+        
+        Args:
+            chat_id: 对话ID
+            user_id: 用户ID
+            agent: 该会话的 SupervisorAgent
+        """
+        self.agent = agent
+        self.turns = 0  # 已处理的轮数
+        super().__init__(chat_id=chat_id, user_id=user_id, history=agent.history)
+    
+    @property
+    def history(self) -> List[Dict]:
+        """对话历史（即 SupervisorAgent 的历史记录）"""
+        return self.agent.history
+    
+    @history.setter
+    def history(self, value: List[Dict]):
+        self.agent.history = value
+
+
+class SupervisorSessionPool(SessionManager):
+    """
+    SupervisorAgent 会话池
+    
+    使用 LRU + 空闲超时淘汰策略；正在处理请求的会话不会被淘汰。
+    每个会话有独立的锁：同一会话的多轮对话串行执行，不同会话之间并行执行。
+    设置了会话存储时，每轮对话前后与存储同步对话历史，多个网关副本可以处理同一个对话的任意一轮。
+    """
+    
+    def __init__(self, factory: Callable[[str, str], Any],
+                 max_sessions: int = GATEWAY_MAX_SESSIONS,
+                 idle_ttl: float = GATEWAY_IDLE_TTL,
+                 evict_interval: float = GATEWAY_EVICT_INTERVAL,
+                 store: Optional[SessionStore] = None,
+                 max_memory_bytes: int = GATEWAY_MAX_MEMORY_MB * 1024 * 1024):
+        """
+        初始化会话池
+        
+        Args:
+            factory: 新会话的创建函数，参数为 (user_id, chat_id)，返回 SupervisorAgent
+            max_sessions: 最多保留的会话数
+            idle_ttl: 会话空闲超时时间（秒），<= 0 表示不按空闲时间淘汰
+            evict_interval: 后台清理空闲会话的间隔（秒），<= 0 表示只在获取会话时顺带清理
+            store: 会话存储，为 None 时会话只保存在进程内存中
+            max_memory_bytes: 所有会话对话历史的总内存上限（字节）
+        """
+        super().__init__(history_factory=None, max_sessions=max_sessions, ttl=idle_ttl,
+                         max_memory_bytes=max_memory_bytes, store=store, namespace="supervisor")
+        self.factory = factory
+        self.idle_ttl = idle_ttl
+        self.created = 0
+        self._stop = threading.Event()
+        
+        if evict_interval > 0 and idle_ttl > 0:
+            threading.Thread(target=self._evict_loop, args=(evict_interval,),
+                             name="gateway-session-evictor", daemon=True).start()
+    
+    def _new_session(self, chat_id: str, user_id: str) -> GatewaySession:
+        """为新对话创建 SupervisorAgent 会话"""
+        self.created += 1
+        return GatewaySession(chat_id=chat_id, user_id=user_id, agent=self.factory(user_id, chat_id))
+    
+    @contextmanager
+    def session(self, chat_id: str, user_id: Optional[str] = None) -> Iterator[GatewaySession]:
+        """
+        以上下文管理器的方式处理一轮对话：进入时获取会话锁（同一会话的请求排队），退出时记录轮数并写回存储
+        
+        Args:
+            chat_id: 对话ID
+            user_id: 用户ID
+        """
+        with super().session(chat_id, user_id) as session:
+            try:
+                yield session
+            finally:
+                session.turns += 1
+    
+    def evict_idle(self) -> int:
+        """
+        淘汰空闲超时的会话
+        
+        Returns:
+            淘汰的会话数
+        """
+        with self._lock:
+            before = self.evictions
+            self._evict_expired(time.time())
+            return self.evictions - before
+    
+    def stats(self) -> Dict:
+        """获取会话池统计信息"""
+        stats = super().stats()
+        with self._lock:
+            stats["busy"] = sum(1 for session in self._sessions.values() if session.busy())
+        stats["created"] = self.created
+        stats["idle_ttl"] = self.idle_ttl
+        return stats
+    
+    def close(self):
+        """停止后台清理线程"""
+        self._stop.set()
+    
+    def _evict_loop(self, interval: float):
+        """后台线程：定期淘汰空闲超时的会话"""
+        while not self._stop.wait(interval):
+            self.evict_idle()
@@ -0,0 +1,177 @@
+"""
+对话历史管理 - 按 token 预算裁剪对话历史，四个智能体共用
+
+- 滑动窗口：从最新的消息开始向前保留，直到用完 token 预算或达到消息数上限
+- 系统提示词、最近的工具调用结果和最新一条消息始终保留
+- token 数按字符粗略估算（不依赖分词器），用于控制预算足够
+"""
+import os
+import threading
+from typing import Callable, Dict, List
+
+# 默认配置（可通过环境变量覆盖）
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "4000"))  # 发送给 LLM 的对话历史 token 上限
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "40"))  # 对话历史最多保留的消息数（不含系统提示词）
+HISTORY_KEEP_TOOL_RESULTS = int(os.getenv("HISTORY_KEEP_TOOL_RESULTS", "2"))  # 始终保留的最近工具调用结果数
+
+# 子智能体写入对话历史的工具调用结果前缀
+TOOL_RESULT_PREFIX = "工具调用结果:"
+
+# 每条消息的固定开销（角色、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的 token 数：中文等非 ASCII 字符约 1 个 token，ASCII 字符约 4 个字符 1 个 token
+    
+    只用 len() 和 encode() 计算，不逐字符遍历，开销远低于真正的分词。
+    
+    Args:
+        text: 文本
+    
+    Returns:
+        估算的 token 数
+    """
+    if not text:
+        return 0
+    chars = len(text)
+    extra_bytes = len(text.encode("utf-8")) - chars
+    # 常用汉字在 UTF-8 中占 3 个字节，按每个非 ASCII 字符多出 2 个字节估算
+    non_ascii = min(chars, (extra_bytes + 1) // 2)
+    ascii_chars = chars - non_ascii
+    return non_ascii + (ascii_chars + 3) // 4
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    """
+    估算单条消息的 token 数
+    
+    Args:
+        message: {"role": ..., "content": ...} 格式的消息
+    
+    Returns:
+        估算的 token 数
+    """
+    return estimate_tokens(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS
+
+
+def is_tool_result(message: Dict[str, str]) -> bool:
+    """判断消息是否为子智能体写入的工具调用结果"""
+    return message.get("role") == "assistant" and str(message.get("content", "")).startswith(TOOL_RESULT_PREFIX)
+
+
+class HistoryManager:
+    """对话历史管理器 - 按 token 预算和消息数上限裁剪对话历史"""
+    
+    def __init__(self, max_tokens: int = HISTORY_MAX_TOKENS,
+                 max_messages: int = HISTORY_MAX_MESSAGES,
+                 keep_tool_results: int = HISTORY_KEEP_TOOL_RESULTS,
+                 tool_result_filter: Callable[[Dict[str, str]], bool] = is_tool_result):
+        """
+        初始化对话历史管理器
+        
+        Args:
+            max_tokens: 对话历史的 token 预算（包含系统提示词）
+            max_messages: 最多保留的消息数（不含系统提示词），<= 0 表示不限制
+            keep_tool_results: 始终保留的最近工具调用结果数
+            tool_result_filter: 判断消息是否为工具调用结果的函数
+        """
+        self.max_tokens = max_tokens
+        self.max_messages = max_messages
+        self.keep_tool_results = keep_tool_results
+        self.tool_result_filter = tool_result_filter
+        
+        self._lock = threading.Lock()
+        self.trims = 0  # 发生裁剪的次数
+        self.dropped_messages = 0  # 累计丢弃的消息数
+        self.dropped_tokens = 0  # 累计丢弃的 token 数（估算）
+    
+    def count_tokens(self, history: List[Dict[str, str]]) -> int:
+        """
+        估算对话历史的 token 总数
+        
+        Args:
+            history: 对话历史
+        
+        Returns:
+            估算的 token 数
+        """
+        return sum(message_tokens(message) for message in history)
+    
+    def window(self, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        计算裁剪后的对话历史（不修改原列表）
+        
+        Args:
+            history: 对话历史
+        
+        Returns:
+            裁剪后的对话历史（保持原有顺序）
+        """
+        if not history:
+            return []
+        
+        tokens = [message_tokens(message) for message in history]
+        keep = [False] * len(history)
+        used = 0
+        
+        # 1. 系统提示词、最新一条消息和最近的工具调用结果始终保留
+        tool_results_left = self.keep_tool_results
+        for index in range(len(history) - 1, -1, -1):
+            message = history[index]
+            pinned = message.get("role") == "system" or index == len(history) - 1
+            if not pinned and tool_results_left > 0 and self.tool_result_filter(message):
+                tool_results_left -= 1
+                pinned = True
+            if pinned:
+                keep[index] = True
+                used += tokens[index]
+        
+        # 2. 剩余预算从最新的消息开始向前填充，遇到放不下的消息就停止（保证窗口连续）
+        kept_messages = sum(1 for index, message in enumerate(history)
+                            if keep[index] and message.get("role") != "system")
+        for index in range(len(history) - 1, -1, -1):
+            if keep[index]:
+                continue
+            if self.max_messages > 0 and kept_messages >= self.max_messages:
+                break
+            if used + tokens[index] > self.max_tokens:
+                break
+            keep[index] = True
+            used += tokens[index]
+            kept_messages += 1
+        
+        return [message for index, message in enumerate(history) if keep[index]]
+    
+    def trim(self, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        原地裁剪对话历史（会话中保存的历史也随之变短，内存占用不再随对话长度增长）
+        
+        Args:
+            history: 对话历史
+        
+        Returns:
+            裁剪后的对话历史（与传入的是同一个列表）
+        """
+        window = self.window(history)
+        if len(window) < len(history):
+            dropped = len(history) - len(window)
+            dropped_tokens = self.count_tokens(history) - self.count_tokens(window)
+            history[:] = window
+            with self._lock:
+                self.trims += 1
+                self.dropped_messages += dropped
+                self.dropped_tokens += dropped_tokens
+        return history
+    
+    def stats(self) -> Dict:
+        """获取裁剪统计信息"""
+        with self._lock:
+            return {
+                "max_tokens": self.max_tokens,
+                "max_messages": self.max_messages,
+                "trims": self.trims,
+                "dropped_messages": self.dropped_messages,
+                "dropped_tokens": self.dropped_tokens
+            }
@@ -0,0 +1,305 @@
+"""
+HTTP 传输层 - A2AClient 和 MCPClient 共享的连接池
+
+- 按目标主机维护连接池，复用 Keep-Alive 连接，避免每次调用都重新建立 TCP 连接
+- 幂等请求（GET 等）在连接失败、读取失败或 502/503/504 时按指数退避重试
+- 非幂等请求（POST）只在连接建立失败时重试（此时请求尚未发出，重试是安全的）；
+  is_connect_error() 供客户端判断失败的 POST 能否换到其他实例重发
+- AsyncHTTPTransport 为 asyncio 版本的客户端提供同样的连接池和重试策略（基于 aiohttp）
+"""
+import os
+import sys
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ClosedPoolError, ConnectTimeoutError, EmptyPoolError, MaxRetryError, NewConnectionError
+from urllib3.util.retry import Retry
+
+# 尝试导入可选依赖
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# 默认配置（可通过环境变量覆盖）
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "32"))  # 缓存的主机连接池数量
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "64"))  # 每个主机的最大连接数
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))  # 最大重试次数
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.2"))  # 退避系数（秒）
+# asyncio 版本的连接不占用线程，上限可以远高于线程版本
+HTTP_ASYNC_MAX_CONNECTIONS = int(os.getenv("HTTP_ASYNC_MAX_CONNECTIONS", "4096"))  # 最大并发连接数（所有主机）
+HTTP_ASYNC_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_ASYNC_MAX_CONNECTIONS_PER_HOST", "2048"))  # 每个主机的最大并发连接数
+
+# 允许重试读取失败和错误状态码的幂等方法
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+
+# 请求发出之前（建立连接、从连接池取连接）的失败
+_CONNECT_PHASE_ERRORS = (NewConnectionError, ConnectTimeoutError, EmptyPoolError, ClosedPoolError)
+
+
+def is_connect_error(error: BaseException) -> bool:
+    """
+    判断 requests 的异常是否发生在请求发出之前（连接建立失败、连接超时、没有拿到连接池中的连接）
+    
+    只有这类失败可以把非幂等请求换到其他实例重发；连接在发送请求后被断开（RemoteDisconnected、
+    连接被重置等）时服务端可能已经执行了请求，重发会重复创建订单等
+    
+    Args:
+        error: requests 抛出的异常
+    
+    Returns:
+        请求是否一定没有发出
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError):
+        return False
+    reason = error.args[0] if error.args else None
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    return isinstance(reason, _CONNECT_PHASE_ERRORS)
+
+
+class HTTPTransport:
+    """共享的 HTTP 传输层 - 基于 requests.Session 的连接池"""
+    
+    def __init__(self, pool_connections: int = HTTP_POOL_CONNECTIONS,
+                 pool_maxsize: int = HTTP_POOL_MAXSIZE,
+                 max_retries: int = HTTP_MAX_RETRIES,
+                 backoff_factor: float = HTTP_BACKOFF_FACTOR):
+        """
+        初始化 HTTP 传输层
+        
+        Args:
+            pool_connections: 缓存的主机连接池数量（每个 host:port 一个连接池）
+            pool_maxsize: 每个主机连接池保留的最大连接数
+            max_retries: 最大重试次数
+            backoff_factor: 指数退避系数，第 n 次重试前等待 backoff_factor * 2^(n-1) 秒
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=IDEMPOTENT_METHODS,
+            raise_on_status=False
+        )
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry
+        )
+        
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+    
+    def get(self, url: str, timeout: float = 10, **kwargs) -> requests.Response:
+        """
+        发送 GET 请求（幂等，失败时自动重试）
+        
+        Args:
+            url: 请求地址
+            timeout: 超时时间（秒）
+        
+        Returns:
+            响应对象
+        """
+        return self.session.get(url, timeout=timeout, **kwargs)
+    
+    def post(self, url: str, json: Optional[Dict] = None, timeout: float = 30,
+             stream: bool = False, **kwargs) -> requests.Response:
+        """
+        发送 POST 请求（非幂等，只在连接建立失败时重试）
+        
+        Args:
+            url: 请求地址
+            json: JSON 请求体
+            timeout: 超时时间（秒）
+            stream: 是否流式读取响应体
+        
+        Returns:
+            响应对象
+        """
+        return self.session.post(url, json=json, timeout=timeout, stream=stream, **kwargs)
+    
+    def drain_instances(self, service_name: str, removed_urls: List[str]) -> int:
+        """
+        关闭到已删除实例的连接池（可直接注册为 ServiceDiscovery 的变更回调）
+        
+        空闲连接立即关闭，正在使用的连接在请求结束归还时关闭
+        
+        Args:
+            service_name: 服务名称
+            removed_urls: 被删除的实例 URL
+        
+        Returns:
+            关闭的连接池数量
+        """
+        targets = set()
+        for url in removed_urls:
+            parsed = urlparse(url)
+            if parsed.hostname:
+                targets.add((parsed.scheme, parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80)))
+        if not targets:
+            return 0
+        
+        pools = self.adapter.poolmanager.pools
+        drained = 0
+        for key in list(pools.keys()):
+            if (key.key_scheme, key.key_host, key.key_port) in targets:
+                # 从容器中删除时会关闭连接池
+                pools.pop(key, None)
+                drained += 1
+        if drained:
+            print(f"[HTTPTransport] 服务 {service_name} 的实例已删除，关闭 {drained} 个连接池", file=sys.stderr, flush=True)
+        return drained
+    
+    def close(self):
+        """关闭所有连接"""
+        self.session.close()
+
+
+_default_transport: Optional[HTTPTransport] = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport() -> HTTPTransport:
+    """获取进程内共享的默认传输层实例（懒加载）"""
+    global _default_transport
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = HTTPTransport()
+    return _default_transport
+
+
+class AsyncHTTPTransport:
+    """asyncio 版本的 HTTP 传输层 - 基于 aiohttp.ClientSession 的连接池"""
+    
+    def __init__(self, max_connections: int = HTTP_ASYNC_MAX_CONNECTIONS,
+                 max_connections_per_host: int = HTTP_ASYNC_MAX_CONNECTIONS_PER_HOST,
+                 max_retries: int = HTTP_MAX_RETRIES,
+                 backoff_factor: float = HTTP_BACKOFF_FACTOR):
+        """
+        初始化 asyncio 版本的 HTTP 传输层（ClientSession 在第一次请求时于当前事件循环中创建）
+        
+        Args:
+            max_connections: 所有主机的最大并发连接数，超出的请求排队等待空闲连接
+            max_connections_per_host: 每个主机的最大并发连接数
+            max_retries: 连接建立失败时的最大重试次数
+            backoff_factor: 指数退避系数，第 n 次重试前等待 backoff_factor * 2^(n-1) 秒
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError("请安装 aiohttp: pip install aiohttp")
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._session: Optional["aiohttp.ClientSession"] = None
+    
+    @property
+    def session(self) -> "aiohttp.ClientSession":
+        """获取（或创建）ClientSession"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=30
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+    
+    async def _request(self, method: str, url: str, timeout: float, **kwargs) -> "aiohttp.ClientResponse":
+        """发送请求，只在连接建立失败时按指数退避重试（此时请求尚未发出，重试是安全的）"""
+        attempt = 0
+        while True:
+            try:
+                return await self.session.request(
+                    method, url, timeout=aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout),
+                    **kwargs
+                )
+            except aiohttp.ClientConnectorError:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+                attempt += 1
+    
+    async def get_json(self, url: str, timeout: float = 10) -> Dict:
+        """
+        发送 GET 请求并解析 JSON 响应
+        
+        Args:
+            url: 请求地址
+            timeout: 超时时间（秒）
+        
+        Returns:
+            响应 JSON
+        """
+        async with await self._request("GET", url, timeout) as response:
+            response.raise_for_status()
+            return await response.json()
+    
+    async def post_json(self, url: str, json: Optional[Dict] = None, timeout: float = 30) -> Dict:
+        """
+        发送 POST 请求并解析 JSON 响应
+        
+        Args:
+            url: 请求地址
+            json: JSON 请求体
+            timeout: 超时时间（秒）
+        
+        Returns:
+            响应 JSON
+        """
+        async with await self._request("POST", url, timeout, json=json) as response:
+            response.raise_for_status()
+            return await response.json()
+    
+    @asynccontextmanager
+    async def post_stream(self, url: str, json: Optional[Dict] = None,
+                          timeout: float = 30) -> AsyncIterator["aiohttp.ClientResponse"]:
+        """
+        发送 POST 请求并以流式方式读取响应体（退出上下文时连接归还连接池）
+        
+        Args:
+            url: 请求地址
+            json: JSON 请求体
+            timeout: 连接和读取每个数据块的超时时间（秒）
+        """
+        response = await self._request("POST", url, timeout, json=json)
+        async with response:
+            response.raise_for_status()
+            yield response
+    
+    async def close(self):
+        """关闭所有连接"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+# 每个事件循环一个默认实例（aiohttp 的连接池不能跨事件循环使用）
+_default_async_transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncHTTPTransport]" = weakref.WeakKeyDictionary()
+
+
+def get_default_async_transport() -> AsyncHTTPTransport:
+    """获取当前事件循环共享的默认 asyncio 传输层实例（懒加载，需在事件循环中调用）"""
+    loop = asyncio.get_running_loop()
+    transport = _default_async_transports.get(loop)
+    if transport is None:
+        transport = _default_async_transports[loop] = AsyncHTTPTransport()
+    return transport
@@ -0,0 +1,252 @@
+"""
+客户端负载均衡 - A2AClient 和 MCPClient 在服务的多个实例之间分配请求
+
+- 负载均衡策略：round_robin（轮询）、least_outstanding（在途请求最少）、p2c（随机选两个取负载较低者）
+- 被动健康检查：根据每次调用的结果（失败、超时、5xx）和响应时间（EWMA）跟踪实例健康状况，不额外发送探测请求
+- 自动摘除和恢复：连续失败达到阈值的实例被摘除一段时间，到期后自动恢复接收请求；
+  恢复后再次失败会被更快摘除，摘除时间逐次翻倍；同一服务最多摘除一定比例的实例，
+  所有实例都被摘除时忽略摘除状态（避免整个服务不可用）
+"""
+import os
+import sys
+import time
+import random
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# 默认配置（可通过环境变量覆盖）
+LB_POLICY = os.getenv("LB_POLICY", "p2c")  # 负载均衡策略: round_robin / least_outstanding / p2c
+LB_EJECT_FAILURES = int(os.getenv("LB_EJECT_FAILURES", "3"))  # 连续失败多少次后摘除实例
+LB_EJECT_TIME = float(os.getenv("LB_EJECT_TIME", "30"))  # 首次摘除时间（秒），之后每次摘除翻倍
+LB_MAX_EJECT_TIME = float(os.getenv("LB_MAX_EJECT_TIME", "300"))  # 最长摘除时间（秒）
+LB_MAX_EJECT_PERCENT = float(os.getenv("LB_MAX_EJECT_PERCENT", "50"))  # 同一服务最多摘除的实例比例（%）
+LB_LATENCY_ALPHA = float(os.getenv("LB_LATENCY_ALPHA", "0.3"))  # 响应时间 EWMA 的平滑系数
+
+POLICIES = ("round_robin", "least_outstanding", "p2c")
+
+
+@dataclass
+class InstanceHealth:
+    """单个实例的负载和健康状况"""
+    url: str
+    outstanding: int = 0  # 在途请求数
+    latency: float = 0.0  # 响应时间 EWMA（秒），0 表示还没有成功的调用
+    consecutive_failures: int = 0  # 连续失败次数
+    ejected_until: float = 0.0  # 摘除结束时间
+    ejections: int = 0  # 恢复正常前被连续摘除的次数（决定下次摘除时间）
+    requests: int = 0
+    failures: int = 0
+    
+    def load(self) -> float:
+        """负载评分：(在途请求数 + 1) × 响应时间，越低越优先"""
+        return (self.outstanding + 1) * self.latency
+
+
+class LoadBalancer:
+    """客户端负载均衡器（线程安全，同一进程内的客户端共享实例健康状况）"""
+    
+    def __init__(self, policy: str = LB_POLICY, eject_failures: int = LB_EJECT_FAILURES,
+                 eject_time: float = LB_EJECT_TIME, max_eject_time: float = LB_MAX_EJECT_TIME,
+                 max_eject_percent: float = LB_MAX_EJECT_PERCENT, latency_alpha: float = LB_LATENCY_ALPHA,
+                 rng: Optional[random.Random] = None):
+        """
+        初始化负载均衡器
+        
+        Args:
+            policy: 负载均衡策略 "round_robin", "least_outstanding", "p2c"
+            eject_failures: 连续失败多少次后摘除实例
+            eject_time: 首次摘除时间（秒）
+            max_eject_time: 最长摘除时间（秒）
+            max_eject_percent: 同一服务最多摘除的实例比例（%）
+            latency_alpha: 响应时间 EWMA 的平滑系数（越大越看重最近的调用）
+            rng: 随机数生成器（p2c 使用，测试时可固定种子）
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"不支持的负载均衡策略: {policy}")
+        self.policy = policy
+        self.eject_failures = max(1, eject_failures)
+        self.eject_time = eject_time
+        self.max_eject_time = max_eject_time
+        self.max_eject_percent = max_eject_percent
+        self.latency_alpha = latency_alpha
+        self._rng = rng or random.Random()
+        
+        self._instances: Dict[str, InstanceHealth] = {}  # 实例 URL -> 健康状况
+        self._services: Dict[str, List[str]] = {}  # 服务名称 -> 最近一次看到的实例 URL 列表
+        self._cursors: Dict[str, int] = {}  # 服务名称 -> 轮询位置
+        self._lock = threading.Lock()
+    
+    def _health(self, url: str) -> InstanceHealth:
+        """获取实例的健康状况（调用方需持有锁）"""
+        health = self._instances.get(url)
+        if health is None:
+            health = self._instances[url] = InstanceHealth(url=url)
+        return health
+    
+    def _available(self, service_name: str, urls: List[str], now: float) -> List[str]:
+        """未被摘除的实例（调用方需持有锁）；全部被摘除时返回所有实例"""
+        self._services[service_name] = list(urls)
+        healthy = [url for url in urls if self._health(url).ejected_until <= now]
+        return healthy or list(urls)
+    
+    def available(self, service_name: str, urls: List[str]) -> List[str]:
+        """
+        过滤掉被摘除的实例（供按其他规则选择实例的调用方使用，如按 chat_id 一致性哈希）
+        
+        Args:
+            service_name: 服务名称
+            urls: 服务所有实例的 URL
+        
+        Returns:
+            未被摘除的实例 URL；全部被摘除时返回所有实例
+        """
+        with self._lock:
+            return self._available(service_name, urls, time.time())
+    
+    def select(self, service_name: str, urls: List[str], exclude: Optional[List[str]] = None) -> Optional[str]:
+        """
+        按负载均衡策略选择实例并将其在途请求数加 1（请求结束后必须调用 release）
+        
+        Args:
+            service_name: 服务名称
+            urls: 服务所有实例的 URL
+            exclude: 本次请求已经尝试失败的实例
+        
+        Returns:
+            实例 URL，没有可选的实例时返回 None
+        """
+        exclude = set(exclude or [])
+        with self._lock:
+            candidates = [url for url in self._available(service_name, urls, time.time()) if url not in exclude]
+            if not candidates:
+                # 未被摘除的实例都已经失败过，再尝试被摘除的实例
+                candidates = [url for url in urls if url not in exclude]
+            if not candidates:
+                return None
+            
+            if self.policy == "round_robin" or len(candidates) == 1:
+                cursor = self._cursors.get(service_name, 0)
+                self._cursors[service_name] = cursor + 1
+                url = candidates[cursor % len(candidates)]
+            elif self.policy == "least_outstanding":
+                url = min(candidates, key=lambda u: (self._health(u).outstanding, self._health(u).latency))
+            else:
+                first, second = self._rng.sample(candidates, 2)
+                url = first if self._health(first).load() <= self._health(second).load() else second
+            
+            self._acquire(url)
+            return url
+    
+    def _acquire(self, url: str):
+        """在途请求数加 1（调用方需持有锁）"""
+        health = self._health(url)
+        health.outstanding += 1
+        health.requests += 1
+    
+    def acquire(self, url: str):
+        """
+        记录发往实例的请求（实例由调用方自行选择时使用，请求结束后必须调用 release）
+        
+        Args:
+            url: 实例 URL
+        """
+        with self._lock:
+            self._acquire(url)
+    
+    def release(self, url: str, latency: Optional[float] = None, failed: bool = False):
+        """
+        请求结束：更新在途请求数、响应时间和连续失败次数，连续失败达到阈值时摘除实例
+        
+        Args:
+            url: 实例 URL
+            latency: 响应时间（秒），失败或未知时为 None
+            failed: 是否失败（连接失败、超时或 5xx）
+        """
+        with self._lock:
+            health = self._health(url)
+            health.outstanding = max(0, health.outstanding - 1)
+            if not failed:
+                health.consecutive_failures = 0
+                health.ejections = 0
+                if latency is not None:
+                    health.latency = latency if health.latency == 0 else (
+                        self.latency_alpha * latency + (1 - self.latency_alpha) * health.latency
+                    )
+                return
+            
+            health.failures += 1
+            health.consecutive_failures += 1
+            now = time.time()
+            if health.consecutive_failures < self.eject_failures or health.ejected_until > now:
+                return
+            if not self._can_eject(url, now):
+                return
+            eject_time = min(self.eject_time * (2 ** health.ejections), self.max_eject_time)
+            health.ejected_until = now + eject_time
+            health.ejections += 1
+            # 恢复后再失败一次就重新摘除
+            health.consecutive_failures = self.eject_failures - 1
+            print(f"[LoadBalancer] 实例 {url} 连续失败，摘除 {eject_time:g} 秒", file=sys.stderr, flush=True)
+    
+    def _can_eject(self, url: str, now: float) -> bool:
+        """同一服务被摘除的实例是否还没有达到上限（调用方需持有锁）"""
+        for urls in self._services.values():
+            if url in urls:
+                ejected = sum(1 for u in urls if self._health(u).ejected_until > now)
+                return ejected + 1 <= len(urls) * self.max_eject_percent / 100
+        return True
+    
+    def forget_instances(self, service_name: str, removed_urls: List[str]):
+        """
+        删除已下线实例的统计（可直接注册为 ServiceDiscovery 的变更回调）
+        
+        Args:
+            service_name: 服务名称
+            removed_urls: 被删除的实例 URL
+        """
+        with self._lock:
+            for url in removed_urls:
+                health = self._instances.get(url)
+                if health is not None and health.outstanding == 0:
+                    del self._instances[url]
+            if service_name in self._services:
+                self._services[service_name] = [url for url in self._services[service_name] if url not in removed_urls]
+    
+    def is_ejected(self, url: str) -> bool:
+        """实例当前是否被摘除"""
+        with self._lock:
+            health = self._instances.get(url)
+            return health is not None and health.ejected_until > time.time()
+    
+    def stats(self) -> Dict:
+        """获取负载均衡统计"""
+        with self._lock:
+            now = time.time()
+            return {
+                "policy": self.policy,
+                "instances": {
+                    url: {
+                        "outstanding": health.outstanding,
+                        "latency_ms": round(health.latency * 1000, 1),
+                        "requests": health.requests,
+                        "failures": health.failures,
+                        "ejected": health.ejected_until > now
+                    }
+                    for url, health in self._instances.items()
+                }
+            }
+
+
+_default_balancer: Optional[LoadBalancer] = None
+_default_balancer_lock = threading.Lock()
+
+
+def get_default_balancer() -> LoadBalancer:
+    """获取进程内共享的默认负载均衡器实例（懒加载，所有客户端共享实例健康状况）"""
+    global _default_balancer
+    if _default_balancer is None:
+        with _default_balancer_lock:
+            if _default_balancer is None:
+                _default_balancer = LoadBalancer()
+    return _default_balancer
@@ -0,0 +1,228 @@
+"""
+进程内的 Redis 替身 - 实现会话存储和服务发现用到的 Redis 命令
+
+用于测试和没有 Redis 服务的单机开发环境，接口与 redis.Redis(decode_responses=True) 一致：
+- 字符串: GET / SET PX EX / DELETE / EXPIRE
+- 哈希: HSET / HGET / HGETALL
+- 集合: SADD / SREM / SMEMBERS
+- SCAN（scan_iter）、管道和 WATCH 事务、发布订阅（PUBLISH / pubsub）
+"""
+import time
+import queue
+import fnmatch
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+# 尝试导入可选依赖
+try:
+    from redis.exceptions import WatchError
+except ImportError:
+    class WatchError(Exception):
+        """WATCH 的键在事务执行前被修改（未安装 redis 时供 LocalRedis 使用）"""
+
+
+class LocalRedis:
+    """进程内的 Redis 替身（线程安全）"""
+    
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, float]] = {}  # key -> (值, 过期时间)，值为 bytes/str、dict（哈希）或 set（集合）
+        self._revisions: Dict[str, int] = {}  # key -> 修改次数（用于 WATCH 检查）
+        self._subscribers: Dict[str, List["_LocalPubSub"]] = {}  # 频道 -> 订阅者
+        self._lock = threading.RLock()
+    
+    def _get(self, key: str) -> Any:
+        """读取未过期的值（调用方需持有 self._lock）"""
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] and item[1] <= time.time():
+            self._remove(key)
+            return None
+        return item[0]
+    
+    def _put(self, key: str, value: Any, expire_at: Optional[float] = None):
+        """写入值并记录修改，expire_at 为 None 时保留原来的过期时间（调用方需持有 self._lock）"""
+        if expire_at is None:
+            expire_at = self._data[key][1] if self._get(key) is not None else 0.0
+        self._data[key] = (value, expire_at)
+        self._revisions[key] = self._revisions.get(key, 0) + 1
+    
+    def _remove(self, key: str) -> bool:
+        """删除键并记录修改（调用方需持有 self._lock）"""
+        if self._data.pop(key, None) is None:
+            return False
+        self._revisions[key] = self._revisions.get(key, 0) + 1
+        return True
+    
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._get(key)
+    
+    def set(self, key: str, value: bytes, px: Optional[int] = None, ex: Optional[int] = None) -> bool:
+        with self._lock:
+            ttl = px / 1000.0 if px else (ex or 0)
+            self._put(key, value, time.time() + ttl if ttl else 0.0)
+            return True
+    
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(1 for key in keys if self._remove(key))
+    
+    def expire(self, key: str, seconds: float) -> bool:
+        with self._lock:
+            value = self._get(key)
+            if value is None:
+                return False
+            self._data[key] = (value, time.time() + seconds)
+            return True
+    
+    def hset(self, name: str, key: Optional[str] = None, value: Any = None,
+             mapping: Optional[Dict[str, Any]] = None) -> int:
+        with self._lock:
+            fields = dict(self._get(name) or {})
+            items = dict(mapping or {})
+            if key is not None:
+                items[key] = value
+            added = sum(1 for field in items if field not in fields)
+            fields.update({field: str(item) for field, item in items.items()})
+            self._put(name, fields)
+            return added
+    
+    def hget(self, name: str, key: str) -> Optional[str]:
+        with self._lock:
+            return (self._get(name) or {}).get(key)
+    
+    def hgetall(self, name: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._get(name) or {})
+    
+    def sadd(self, name: str, *values: str) -> int:
+        with self._lock:
+            members: Set[str] = set(self._get(name) or set())
+            added = len(set(values) - members)
+            members.update(values)
+            self._put(name, members)
+            return added
+    
+    def srem(self, name: str, *values: str) -> int:
+        with self._lock:
+            members: Set[str] = set(self._get(name) or set())
+            removed = len(members & set(values))
+            members.difference_update(values)
+            if members:
+                self._put(name, members)
+            else:
+                self._remove(name)
+            return removed
+    
+    def smembers(self, name: str) -> Set[str]:
+        with self._lock:
+            return set(self._get(name) or set())
+    
+    def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None) -> Iterator[str]:
+        with self._lock:
+            keys = [key for key in list(self._data) if self._get(key) is not None]
+        for key in keys:
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key
+    
+    def publish(self, channel: str, message: str) -> int:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, []))
+        for subscriber in subscribers:
+            subscriber._messages.put({"type": "message", "channel": channel, "data": message})
+        return len(subscribers)
+    
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> "_LocalPubSub":
+        return _LocalPubSub(self)
+    
+    def pipeline(self, transaction: bool = True) -> "_LocalPipeline":
+        return _LocalPipeline(self)
+
+
+class _LocalPipeline:
+    """
+    LocalRedis 的管道和事务：WATCH 之后、MULTI 之前命令立即执行；
+    其余情况命令排队，EXEC 时检查 WATCH 的键并按顺序执行
+    """
+    
+    def __init__(self, client: LocalRedis):
+        self.client = client
+        self._watched: Dict[str, int] = {}
+        self._queued: List[Tuple[str, tuple, dict]] = []
+        self._in_multi = False
+    
+    def __enter__(self) -> "_LocalPipeline":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.reset()
+    
+    def __getattr__(self, name: str):
+        command = getattr(self.client, name)
+        
+        def call(*args, **kwargs):
+            if self._watched and not self._in_multi:
+                return command(*args, **kwargs)
+            self._queued.append((name, args, kwargs))
+            return self
+        return call
+    
+    def watch(self, *keys: str):
+        with self.client._lock:
+            for key in keys:
+                self._watched[key] = self.client._revisions.get(key, 0)
+    
+    def multi(self):
+        self._in_multi = True
+    
+    def execute(self) -> List[Any]:
+        with self.client._lock:
+            if any(self.client._revisions.get(key, 0) != revision for key, revision in self._watched.items()):
+                self.reset()
+                raise WatchError("Watched variable changed.")
+            results = [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self._queued]
+        self.reset()
+        return results
+    
+    def reset(self):
+        self._watched = {}
+        self._queued = []
+        self._in_multi = False
+
+
+class _LocalPubSub:
+    """LocalRedis 的订阅连接"""
+    
+    def __init__(self, client: LocalRedis):
+        self.client = client
+        self._messages: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._channels: Set[str] = set()
+    
+    def subscribe(self, *channels: str):
+        with self.client._lock:
+            for channel in channels:
+                if channel not in self._channels:
+                    self._channels.add(channel)
+                    self.client._subscribers.setdefault(channel, []).append(self)
+                    self._messages.put({"type": "subscribe", "channel": channel, "data": len(self._channels)})
+    
+    def unsubscribe(self, *channels: str):
+        with self.client._lock:
+            for channel in channels or list(self._channels):
+                if channel in self._channels:
+                    self._channels.discard(channel)
+                    self.client._subscribers[channel].remove(self)
+    
+    def get_message(self, ignore_subscribe_messages: bool = False, timeout: float = 0.0) -> Optional[Dict[str, Any]]:
+        deadline = time.time() + timeout
+        while True:
+            try:
+                message = self._messages.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                return None
+            if not (ignore_subscribe_messages and message["type"] != "message"):
+                return message
+    
+    def close(self):
+        self.unsubscribe()
@@ -3,6 +3,8 @@ MCP (Model Context Protocol) 协议实现
 """
 from .client import MCPClient
 from .server import MCPServer
+from .async_client import AsyncMCPClient
+from .async_server import AsyncMCPServer
 from .tool import Tool, ToolDefinition
 
-__all__ = ['MCPClient', 'MCPServer', 'Tool', 'ToolDefinition']
+__all__ = ['MCPClient', 'MCPServer', 'AsyncMCPClient', 'AsyncMCPServer', 'Tool', 'ToolDefinition']
@@ -0,0 +1,137 @@
+"""
+Async MCP Client - asyncio 版本的 MCP 客户端，用于在事件循环中调用 MCP Server 的工具
+"""
+import time
+import asyncio
+from typing import Dict, List, Optional
+from service_discovery import ServiceDiscovery
+from http_transport import AsyncHTTPTransport, get_default_async_transport
+from load_balancer import LoadBalancer, get_default_balancer
+from .tool import ToolDefinition
+
+# 尝试导入可选依赖
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+
+class AsyncMCPClient:
+    """asyncio 版本的 MCP 协议客户端 - 等待工具执行结果时不占用线程"""
+    
+    def __init__(self, service_discovery: Optional[ServiceDiscovery] = None,
+                 transport: Optional[AsyncHTTPTransport] = None,
+                 balancer: Optional[LoadBalancer] = None):
+        """
+        初始化 MCP 客户端
+        
+        Args:
+            service_discovery: 服务发现实例
+            transport: asyncio 版本的 HTTP 传输层，如果为 None 则使用当前事件循环共享的默认实例
+            balancer: 负载均衡器（MCP Server 有多个实例时选择实例），如果为 None 则使用进程内共享的默认实例
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError("请安装 aiohttp: pip install aiohttp")
+        self.sd = service_discovery or ServiceDiscovery(method="config")
+        self._transport = transport
+        self.balancer = balancer or get_default_balancer()
+        # 实例被删除时删除其负载统计（aiohttp 的空闲连接在 keep-alive 超时后关闭）
+        self.sd.add_listener(self.balancer.forget_instances)
+    
+    @property
+    def transport(self) -> AsyncHTTPTransport:
+        """HTTP 传输层（未指定时在第一次使用时获取当前事件循环的默认实例）"""
+        if self._transport is None:
+            self._transport = get_default_async_transport()
+        return self._transport
+    
+    async def _request(self, mcp_server_name: str, path: str, error_message: str,
+                       json: Optional[Dict] = None, timeout: int = 30) -> Dict:
+        """
+        按负载均衡策略选择 MCP Server 实例并发送请求（json 为 None 时发送 GET，否则发送 POST）
+        
+        连接失败时换下一个实例；GET 是幂等的，超时和 5xx 也换下一个实例重试，POST 请求已经发出后不重试
+        
+        Args:
+            mcp_server_name: MCP Server 名称
+            path: 接口路径
+            error_message: 失败时的错误信息前缀
+            json: POST 请求体
+            timeout: 超时时间（秒）
+        
+        Returns:
+            响应 JSON
+        """
+        instances = self.sd.discover_all(mcp_server_name)
+        if not instances:
+            raise ValueError(f"MCP Server {mcp_server_name} not found")
+        urls = [instance["url"] for instance in instances]
+        
+        tried = []
+        while True:
+            url = self.balancer.select(mcp_server_name, urls, exclude=tried)
+            if url is None:
+                raise ConnectionError(f"{error_message}: all {len(urls)} instances unreachable")
+            started = time.perf_counter()
+            try:
+                if json is None:
+                    result = await self.transport.get_json(f"{url}{path}", timeout=timeout)
+                else:
+                    result = await self.transport.post_json(f"{url}{path}", json=json, timeout=timeout)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # 连接失败、超时和 5xx 计入实例的失败次数
+                failed = isinstance(e, (aiohttp.ClientConnectorError, asyncio.TimeoutError)) or (
+                    isinstance(e, aiohttp.ClientResponseError) and e.status >= 500
+                )
+                self.balancer.release(url, failed=failed)
+                tried.append(url)
+                retryable = isinstance(e, aiohttp.ClientConnectorError) or (json is None and failed)
+                if not retryable or len(tried) >= len(urls):
+                    raise ConnectionError(f"{error_message}: {str(e)}")
+                continue
+            except BaseException:
+                self.balancer.release(url)
+                raise
+            self.balancer.release(url, latency=time.perf_counter() - started)
+            return result
+    
+    async def list_tools(self, mcp_server_name: str) -> List[ToolDefinition]:
+        """
+        获取 MCP Server 的工具列表
+        
+        Args:
+            mcp_server_name: MCP Server 名称
+        
+        Returns:
+            工具定义列表
+        """
+        data = await self._request(mcp_server_name, "/mcp/tools",
+                                   f"Failed to list tools from {mcp_server_name}", timeout=10)
+        
+        return [
+            ToolDefinition(
+                name=tool_dict["name"],
+                description=tool_dict["description"],
+                parameters=tool_dict["parameters"]
+            )
+            for tool_dict in data.get("tools", [])
+        ]
+    
+    async def invoke_tool(self, mcp_server_name: str, tool_name: str,
+                          parameters: Dict, timeout: int = 30) -> Dict:
+        """
+        调用 MCP Server 的工具
+        
+        Args:
+            mcp_server_name: MCP Server 名称
+            tool_name: 工具名称
+            parameters: 工具参数
+            timeout: 超时时间（秒）
+        
+        Returns:
+            工具执行结果
+        """
+        return await self._request(mcp_server_name, f"/mcp/tools/{tool_name}/invoke",
+                                   f"Failed to invoke tool {tool_name}",
+                                   json={"parameters": parameters}, timeout=timeout)
@@ -0,0 +1,148 @@
+"""
+Async MCP Server - asyncio 版本的 MCP 服务端（基于 aiohttp）
+
+协程工具直接在事件循环中执行；普通（阻塞）工具放到线程池执行，不阻塞事件循环。
+"""
+import asyncio
+import inspect
+import sys
+from typing import Callable, Dict, Optional
+from serving import ServerOptions, run_async_app
+from .tool import Tool, ToolDefinition
+
+# 尝试导入可选依赖
+try:
+    from aiohttp import web
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+
+class AsyncMCPServer:
+    """asyncio 版本的 MCP 协议服务端，接口与 MCPServer 相同"""
+    
+    def __init__(self, server_name: str, port: int = 10002, tools: Optional[Dict[str, Tool]] = None,
+                 metrics: Optional[Dict[str, Callable[[], Dict]]] = None):
+        """
+        初始化 MCP 服务端
+        
+        Args:
+            server_name: MCP Server 名称
+            port: 服务端口
+            tools: 已注册的工具（如 MCPServer.tools），可在不同运行模式间复用
+            metrics: 已注册的运行指标（如 MCPServer.metrics）
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError("请安装 aiohttp: pip install aiohttp")
+        self.server_name = server_name
+        self.port = port
+        self.app = web.Application()
+        self.tools: Dict[str, Tool] = dict(tools or {})
+        self.metrics: Dict[str, Callable[[], Dict]] = dict(metrics or {})
+        
+        # 注册路由
+        self._register_routes()
+    
+    def _register_routes(self):
+        """注册 MCP 协议路由"""
+        self.app.router.add_get('/mcp/tools', self._list_tools)
+        self.app.router.add_post('/mcp/tools/{tool_name}/invoke', self._invoke_tool)
+        self.app.router.add_get('/mcp/health', self._health)
+        self.app.router.add_get('/mcp/metrics', self._metrics)
+    
+    async def _list_tools(self, request: "web.Request") -> "web.Response":
+        """列出所有工具"""
+        return web.json_response({
+            "tools": [tool.definition.to_dict() for tool in self.tools.values()],
+            "server": self.server_name
+        })
+    
+    async def _invoke_tool(self, request: "web.Request") -> "web.Response":
+        """调用工具"""
+        tool_name = request.match_info["tool_name"]
+        if tool_name not in self.tools:
+            return web.json_response({
+                "error": f"Tool {tool_name} not found",
+                "status": "error"
+            }, status=404)
+        
+        try:
+            data = await request.json() if request.can_read_body else {}
+            parameters = (data or {}).get("parameters", {})
+            
+            tool = self.tools[tool_name]
+            if inspect.iscoroutinefunction(tool.handler):
+                result = await tool.handler(**parameters)
+            else:
+                # 阻塞的工具（如数据库操作）放到线程池执行
+                result = await asyncio.to_thread(tool.invoke, parameters)
+            
+            return web.json_response({
+                "result": result,
+                "status": "success"
+            })
+        except Exception as e:
+            error_msg = str(e)
+            print(f"[AsyncMCPServer] 工具调用异常: {tool_name}: {error_msg}", file=sys.stderr, flush=True)
+            return web.json_response({
+                "error": error_msg,
+                "status": "error"
+            }, status=500)
+    
+    async def _health(self, request: "web.Request") -> "web.Response":
+        """健康检查接口"""
+        return web.json_response({
+            "status": "healthy",
+            "server": self.server_name,
+            "tools_count": len(self.tools)
+        })
+    
+    async def _metrics(self, request: "web.Request") -> "web.Response":
+        """运行指标接口"""
+        return web.json_response({
+            "server": self.server_name,
+            **{name: provider() for name, provider in self.metrics.items()}
+        })
+    
+    def register_tool(self, tool: Tool):
+        """
+        注册工具
+        
+        Args:
+            tool: Tool 对象
+        """
+        self.tools[tool.definition.name] = tool
+    
+    def register_metrics(self, name: str, provider: Callable[[], Dict]):
+        """
+        注册运行指标（通过 /mcp/metrics 查看）
+        
+        Args:
+            name: 指标名称（如 "database"）
+            provider: 返回统计字典的函数（如 DatabaseManager.stats）
+        """
+        self.metrics[name] = provider
+    
+    def register_tool_func(self, name: str, description: str,
+                           parameters: Dict, handler: callable):
+        """
+        注册工具（便捷方法）
+        
+        Args:
+            name: 工具名称
+            description: 工具描述
+            parameters: 参数定义（JSON Schema）
+            handler: 工具执行函数（普通函数或协程函数）
+        """
+        definition = ToolDefinition(name=name, description=description, parameters=parameters)
+        self.register_tool(Tool(definition=definition, handler=handler))
+    
+    def run(self, host: str = '0.0.0.0', options: Optional[ServerOptions] = None):
+        """
+        启动 MCP 服务（阻塞直到收到退出信号）
+        
+        Args:
+            host: 监听地址
+            options: 服务运行参数（backlog、keepalive、graceful_timeout 等），为 None 时使用默认配置
+        """
+        run_async_app(self.app, host=host, port=self.port, options=options)
@@ -4,20 +4,89 @@ MCP Client - Agent 调用 MCP Server 的工具
 import requests
 from typing import Dict, List, Optional
 from service_discovery import ServiceDiscovery
+from http_transport import HTTPTransport, get_default_transport, is_connect_error
+from load_balancer import LoadBalancer, get_default_balancer
 from .tool import ToolDefinition
 
 
 class MCPClient:
     """MCP 协议客户端 - 用于调用 MCP Server 的工具"""
     
-    def __init__(self, service_discovery: Optional[ServiceDiscovery] = None):
+    def __init__(self, service_discovery: Optional[ServiceDiscovery] = None,
+                 transport: Optional[HTTPTransport] = None,
+                 balancer: Optional[LoadBalancer] = None):
         """
         初始化 MCP 客户端
         
         Args:
             service_discovery: 服务发现实例
+            transport: HTTP 传输层（连接池），如果为 None 则使用进程内共享的默认实例
+            balancer: 负载均衡器（MCP Server 有多个实例时选择实例），如果为 None 则使用进程内共享的默认实例
         """
         self.sd = service_discovery or ServiceDiscovery(method="config")
+        self.transport = transport or get_default_transport()
+        self.balancer = balancer or get_default_balancer()
+        # 实例被删除时关闭到该实例的连接、删除其负载统计
+        self.sd.add_listener(self.transport.drain_instances)
+        self.sd.add_listener(self.balancer.forget_instances)
+    
+    def _request(self, mcp_server_name: str, path: str, error_message: str,
+                 json: Optional[Dict] = None, timeout: int = 30) -> Dict:
+        """
+        按负载均衡策略选择 MCP Server 实例并发送请求（json 为 None 时发送 GET，否则发送 POST）
+        
+        GET 是幂等的，连接失败、超时和 5xx 都换下一个实例重试；
+        POST（调用工具）只在请求发出之前失败（连接建立失败等）时换实例，请求发出后连接断开、超时或 5xx
+        都直接报错，避免在另一个实例上重复创建订单等副作用
+        
+        Args:
+            mcp_server_name: MCP Server 名称
+            path: 接口路径
+            error_message: 失败时的错误信息前缀
+            json: POST 请求体
+            timeout: 超时时间（秒）
+        
+        Returns:
+            响应 JSON
+        """
+        instances = self.sd.discover_all(mcp_server_name)
+        if not instances:
+            raise ValueError(f"MCP Server {mcp_server_name} not found")
+        urls = [instance["url"] for instance in instances]
+        
+        tried = []
+        while True:
+            url = self.balancer.select(mcp_server_name, urls, exclude=tried)
+            if url is None:
+                raise ConnectionError(f"{error_message}: all {len(urls)} instances unreachable")
+            try:
+                if json is None:
+                    response = self.transport.get(f"{url}{path}", timeout=timeout)
+                else:
+                    response = self.transport.post(
+                        f"{url}{path}",
+                        json=json,
+                        timeout=timeout,
+                        headers={"Content-Type": "application/json"}
+                    )
+                response.raise_for_status()
+                result = response.json()
+            except requests.exceptions.RequestException as e:
+                # 连接失败、超时和 5xx 计入实例的失败次数
+                failed = isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)) or (
+                    e.response is not None and e.response.status_code >= 500
+                )
+                self.balancer.release(url, failed=failed)
+                tried.append(url)
+                retryable = (json is None and failed) or is_connect_error(e)
+                if not retryable or len(tried) >= len(urls):
+                    raise ConnectionError(f"{error_message}: {str(e)}")
+                continue
+            except BaseException:
+                self.balancer.release(url)
+                raise
+            self.balancer.release(url, latency=response.elapsed.total_seconds())
+            return result
     
     def list_tools(self, mcp_server_name: str) -> List[ToolDefinition]:
         """
@@ -25,32 +94,22 @@ class MCPClient:
         
         Args:
             mcp_server_name: MCP Server 名称
-            
+        
         Returns:
             工具定义列表
         """
-        service = self.sd.discover(mcp_server_name)
-        if not service:
-            raise ValueError(f"MCP Server {mcp_server_name} not found")
-        
-        url = f"{service['url']}/mcp/tools"
+        data = self._request(mcp_server_name, "/mcp/tools",
+                             f"Failed to list tools from {mcp_server_name}", timeout=10)
         
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            # 转换为 ToolDefinition 对象
-            tools = []
-            for tool_dict in data.get("tools", []):
-                tools.append(ToolDefinition(
-                    name=tool_dict["name"],
-                    description=tool_dict["description"],
-                    parameters=tool_dict["parameters"]
-                ))
-            return tools
-        except requests.exceptions.RequestException as e:
-            raise ConnectionError(f"Failed to list tools from {mcp_server_name}: {str(e)}")
+        # 转换为 ToolDefinition 对象
+        tools = []
+        for tool_dict in data.get("tools", []):
+            tools.append(ToolDefinition(
+                name=tool_dict["name"],
+                description=tool_dict["description"],
+                parameters=tool_dict["parameters"]
+            ))
+        return tools
     
     def invoke_tool(self, mcp_server_name: str, tool_name: str, 
                    parameters: Dict, timeout: int = 30) -> Dict:
@@ -62,24 +121,10 @@ class MCPClient:
             tool_name: 工具名称
             parameters: 工具参数
             timeout: 超时时间（秒）
-            
+        
         Returns:
             工具执行结果
         """
-        service = self.sd.discover(mcp_server_name)
-        if not service:
-            raise ValueError(f"MCP Server {mcp_server_name} not found")
-        
-        url = f"{service['url']}/mcp/tools/{tool_name}/invoke"
-        
-        try:
-            response = requests.post(
-                url,
-                json={"parameters": parameters},
-                timeout=timeout,
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise ConnectionError(f"Failed to invoke tool {tool_name}: {str(e)}")
+        return self._request(mcp_server_name, f"/mcp/tools/{tool_name}/invoke",
+                             f"Failed to invoke tool {tool_name}",
+                             json={"parameters": parameters}, timeout=timeout)
@@ -2,7 +2,8 @@
 MCP Server - 提供工具给 Agent 使用
 """
 from flask import Flask, request, jsonify
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
+from serving import ServerOptions, run_app
 from .tool import Tool, ToolDefinition
 
 
@@ -21,6 +22,7 @@ class MCPServer:
         self.port = port
         self.app = Flask(__name__)
         self.tools: Dict[str, Tool] = {}
+        self.metrics: Dict[str, Callable[[], Dict]] = {}  # 指标名称 -> 返回统计的函数（如数据库连接池）
         
         # 注册路由
         self._register_routes()
@@ -81,6 +83,14 @@ class MCPServer:
                 "server": self.server_name,
                 "tools_count": len(self.tools)
             })
+        
+        @self.app.route('/mcp/metrics', methods=['GET'])
+        def metrics():
+            """运行指标接口"""
+            return jsonify({
+                "server": self.server_name,
+                **{name: provider() for name, provider in self.metrics.items()}
+            })
     
     def register_tool(self, tool: Tool):
         """
@@ -91,6 +101,16 @@ class MCPServer:
         """
         self.tools[tool.definition.name] = tool
     
+    def register_metrics(self, name: str, provider: Callable[[], Dict]):
+        """
+        注册运行指标（通过 /mcp/metrics 查看）
+        
+        Args:
+            name: 指标名称（如 "database"）
+            provider: 返回统计字典的函数（如 DatabaseManager.stats）
+        """
+        self.metrics[name] = provider
+    
     def register_tool_func(self, name: str, description: str, 
                            parameters: Dict, handler: callable):
         """
@@ -106,12 +126,19 @@ class MCPServer:
         tool = Tool(definition=definition, handler=handler)
         self.register_tool(tool)
     
-    def run(self, host: str = '0.0.0.0', debug: bool = False):
+    def run(self, host: str = '0.0.0.0', debug: bool = False, options: Optional[ServerOptions] = None):
         """
         启动 MCP 服务
         
         Args:
             host: 监听地址
-            debug: 是否开启调试模式
+            debug: 是否开启调试模式（仅 dev 模式有效）
+            options: 服务运行参数（dev / production 模式、进程数、线程数等），
+                     为 None 时使用默认配置。async 模式下使用 AsyncMCPServer 提供相同的工具
         """
-        self.app.run(host=host, port=self.port, debug=debug)
+        if options is not None and options.mode == "async":
+            from .async_server import AsyncMCPServer
+            AsyncMCPServer(self.server_name, port=self.port, tools=self.tools,
+                           metrics=self.metrics).run(host=host, options=options)
+            return
+        run_app(self.app, host=host, port=self.port, options=options, debug=debug)
@@ -3,10 +3,11 @@
 参考原项目的 OrderAgent 设计，支持 A2A 协议和 MCP 工具调用
 """
 import sys
+import time
 from pathlib import Path
 from typing import List, Dict, Optional
 import dashscope
-from dashscope import Generation
+from dashscope import Generation, AioGeneration
 
 # 添加项目根目录到路径
 project_root = Path(__file__).parent.parent
@@ -14,16 +15,24 @@ sys.path.insert(0, str(project_root))
 
 from config import DASHSCOPE_API_KEY, DASHSCOPE_MODEL
 from mcp.client import MCPClient
+from mcp.async_client import AsyncMCPClient
 from service_discovery import ServiceDiscovery
-from a2a.server import A2AServer
+from a2a.session import AgentSession, SessionManager
+from response_templates import ResponseTemplateEngine
+from history_manager import HistoryManager
+from agent_turns import AgentTurnMixin
+from order_agent.order_parser import OrderParser, FastPathStats
 
 # 设置 DashScope API Key
 dashscope.api_key = DASHSCOPE_API_KEY
 
 
-class OrderAgent:
+class OrderAgent(AgentTurnMixin):
     """订单智能体 - 处理订单相关业务，使用 MCP 工具"""
     
+    # A2A 服务端的默认端口
+    default_port = 10006
+    
     def __init__(self, user_id: str = "default_user", chat_id: str = "default_chat"):
         """
         初始化订单智能体
@@ -37,10 +46,22 @@ class OrderAgent:
         self.user_id = user_id
         self.chat_id = chat_id
         self.history: List[Dict[str, str]] = []
+        # A2A 服务端的会话管理器（启动 A2A Server 时创建）
+        self.session_manager: Optional[SessionManager] = None
         
         # MCP 客户端（用于调用工具）
         self.mcp_client = MCPClient()
+        # asyncio 版本的 MCP 客户端（在 asyncio 运行时中第一次使用时创建）
+        self._async_mcp_client: Optional[AsyncMCPClient] = None
         self.service_discovery = ServiceDiscovery(method="config")
+        # 回复模板（结果格式确定的工具调用不需要再调用 LLM 生成回复）
+        self.response_templates = ResponseTemplateEngine()
+        # 对话历史管理（按 token 预算裁剪，避免历史无限增长）
+        self.history_manager = HistoryManager()
+        
+        # 订单快速解析器（明确的订单请求不需要调用 LLM 提取参数）
+        self.order_parser = OrderParser()
+        self.fast_path_stats = FastPathStats()
         
         # 可用工具列表（从 MCP Server 获取）
         self.available_tools: List[Dict] = []
@@ -105,16 +126,19 @@ class OrderAgent:
 - 如果用户想要修改或删除订单,必须要和用户确认用户ID和订单号,确保用户ID和订单号匹配且唯一后才允许修改或删除订单，一次只允许修改一个订单。
 """
     
-    def _extract_tool_call(self, user_input: str) -> Optional[Dict]:
+    def _extract_tool_call(self, user_input: str, user_id: Optional[str] = None) -> Optional[Dict]:
         """
         从用户输入中提取工具调用信息（关键词匹配，作为 LLM 的备选方案）
         
         Args:
             user_input: 用户输入文本
+            user_id: 当前会话的用户ID，为 None 时使用智能体默认的用户ID
             
         Returns:
             工具调用信息，格式: {"tool": "tool_name", "parameters": {...}}
         """
+        user_id = user_id or self.user_id
+
         import re
         user_input_lower = user_input.lower()
         
@@ -137,7 +161,7 @@ class OrderAgent:
                 user_id = int(user_id_match.group(1))
             else:
                 # 使用当前会话的用户ID
-                user_id = int(self.user_id) if isinstance(self.user_id, str) else self.user_id
+                user_id = int(user_id) if isinstance(user_id, str) else user_id
             
             # 提取产品名称（简单匹配）
             products = ["云边茉莉", "桂花云露", "云雾观音", "珍珠奶茶", "红豆奶茶"]
@@ -195,45 +219,19 @@ class OrderAgent:
         
         return None
     
-    def _invoke_tool(self, tool_name: str, mcp_server: str, parameters: Dict) -> str:
+    def _build_tool_prompt(self, user_input: str, user_id: Optional[str] = None) -> str:
         """
-        调用工具
-        
-        Args:
-            tool_name: 工具名称
-            mcp_server: MCP Server 名称
-            parameters: 工具参数
-            
-        Returns:
-            工具执行结果
-        """
-        try:
-            print(f"[DEBUG] 调用工具: {tool_name}, 参数: {parameters}", file=sys.stderr, flush=True)
-            result = self.mcp_client.invoke_tool(mcp_server, tool_name, parameters)
-            print(f"[DEBUG] 工具调用结果: {result}", file=sys.stderr, flush=True)
-            if result.get("status") == "success":
-                return str(result.get("result", ""))
-            else:
-                error_msg = f"工具调用失败: {result.get('error', '未知错误')}"
-                print(f"[ERROR] {error_msg}", file=sys.stderr, flush=True)
-                return error_msg
-        except Exception as e:
-            error_msg = f"工具调用异常: {str(e)}"
-            print(f"[ERROR] {error_msg}", file=sys.stderr, flush=True)
-            import traceback
-            traceback.print_exc(file=sys.stderr)
-            return error_msg
-    
-    def _should_use_tool(self, user_input: str) -> Optional[Dict]:
-        """
-        使用 LLM 判断是否需要调用工具，并提取参数
+        构建让 LLM 判断是否需要调用工具、并提取参数的提示词
         
         Args:
             user_input: 用户输入
+            user_id: 当前会话的用户ID，为 None 时使用智能体默认的用户ID
             
         Returns:
-            工具调用信息，如果不需要则返回 None
+            提示词
         """
+        user_id = user_id or self.user_id
+
         # 构建工具列表描述
         tools_desc = ""
         for tool in self.available_tools:
@@ -252,10 +250,10 @@ class OrderAgent:
 用户请求: {user_input}
 
 重要提示:
-- 当前用户ID是: {self.user_id}（整数类型）
-- 如果工具需要 userId 参数，必须使用整数类型: {self.user_id}
+- 当前用户ID是: {user_id}（整数类型）
+- 如果工具需要 userId 参数，必须使用整数类型: {user_id}
 - 从用户输入中提取产品名称、甜度、冰量、数量等信息
-- 如果用户输入中包含用户ID，使用用户输入中的ID；否则使用当前会话的用户ID: {self.user_id}
+- 如果用户输入中包含用户ID，使用用户输入中的ID；否则使用当前会话的用户ID: {user_id}
 - **创建订单统一使用 order-create-order 工具，支持单个或多个产品**
 
 请判断：
@@ -264,7 +262,7 @@ class OrderAgent:
 
 请以 JSON 格式返回，格式如下：
 - 如果不需要工具: {{"use_tool": false}}
-- 如果需要创建订单: {{"use_tool": true, "tool_name": "order-create-order", "mcp_server": "order-mcp-server", "parameters": {{"userId": {self.user_id}, "items": [{{"productName": "产品名称", "sweetness": "甜度", "iceLevel": "冰量", "quantity": 数量, "remark": "备注"}}], "remark": "订单整体备注"}}}}
+- 如果需要创建订单: {{"use_tool": true, "tool_name": "order-create-order", "mcp_server": "order-mcp-server", "parameters": {{"userId": {user_id}, "items": [{{"productName": "产品名称", "sweetness": "甜度", "iceLevel": "冰量", "quantity": 数量, "remark": "备注"}}], "remark": "订单整体备注"}}}}
   - 如果用户只点一个产品，items 数组包含一个订单项
   - 如果用户点多个产品，items 数组包含多个订单项
 
@@ -273,221 +271,165 @@ class OrderAgent:
 - items 数组中的每个订单项都必须包含 productName, sweetness, iceLevel, quantity
 
 只返回 JSON，不要其他文字。"""
+        return prompt
+    
+    def _parse_tool_response(self, result_text: str) -> Optional[Dict]:
+        """
+        解析 LLM 返回的工具调用判断结果
+        
+        Args:
+            result_text: LLM 返回的文本
+            
+        Returns:
+            工具调用信息，如果不需要则返回 None
+        """
+        # 尝试解析 JSON（可能包含代码块标记）
+        import json
+        import re
+        
+        # 提取 JSON 部分（支持多行 JSON）
+        json_match = re.search(r'\{.*?\}', result_text, re.DOTALL)
+        if json_match:
+            try:
+                result_json = json.loads(json_match.group())
+                if result_json.get("use_tool"):
+                    tool_info = {
+                        "tool": result_json.get("tool_name"),
+                        "mcp_server": result_json.get("mcp_server", "order-mcp-server"),
+                        "parameters": result_json.get("parameters", {})
+                    }
+                    # 确保 userId 是整数类型
+                    if "userId" in tool_info["parameters"]:
+                        userId = tool_info["parameters"]["userId"]
+                        if isinstance(userId, str):
+                            tool_info["parameters"]["userId"] = int(userId)
+                        elif not isinstance(userId, int):
+                            tool_info["parameters"]["userId"] = int(userId)
+                    # 确保 quantity 是整数类型（单产品订单）
+                    if "quantity" in tool_info["parameters"]:
+                        quantity = tool_info["parameters"]["quantity"]
+                        if isinstance(quantity, str):
+                            tool_info["parameters"]["quantity"] = int(quantity)
+                        elif not isinstance(quantity, int):
+                            tool_info["parameters"]["quantity"] = int(quantity)
+                    
+                    # 确保 items 数组中的 quantity 是整数类型（多产品订单）
+                    if "items" in tool_info["parameters"] and isinstance(tool_info["parameters"]["items"], list):
+                        for item in tool_info["parameters"]["items"]:
+                            if "quantity" in item:
+                                quantity = item["quantity"]
+                                if isinstance(quantity, str):
+                                    item["quantity"] = int(quantity)
+                                elif not isinstance(quantity, int):
+                                    item["quantity"] = int(quantity)
+                    
+                    print(f"[OrderAgent] LLM 提取的工具调用: {tool_info}", file=sys.stderr, flush=True)
+                    return tool_info
+            except json.JSONDecodeError as e:
+                print(f"[OrderAgent] JSON 解析失败: {e}, 原始文本: {result_text[:200]}", file=sys.stderr, flush=True)
+        
+        return None
+    
+    def _fast_path_tool_call(self, user_input: str, user_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        使用确定性解析器提取工具调用（不调用 LLM）
+        
+        Args:
+            user_input: 用户输入
+            user_id: 当前会话的用户ID，为 None 时使用智能体默认的用户ID
+            
+        Returns:
+            解析结果完全确定时返回工具调用信息，否则返回 None（交给 LLM 判断）
+        """
+        start = time.perf_counter()
+        result = self.order_parser.parse(user_input, user_id or self.user_id)
+        hit = result.is_confident()
+        self.fast_path_stats.record_parse(result, hit, time.perf_counter() - start)
+        
+        if not hit:
+            return None
+        print(f"[OrderAgent] 快速路径解析: {result.tool_call}", file=sys.stderr, flush=True)
+        return result.tool_call
+    
+    def get_fast_path_stats(self) -> Dict:
+        """获取快速路径的命中率和节省的 LLM 调用耗时"""
+        return self.fast_path_stats.to_dict()
+    
+    def _extra_metrics(self) -> Dict:
+        """A2A 服务端额外返回快速路径的命中率"""
+        return {"fast_path": self.get_fast_path_stats()}
+    
+    def _should_use_tool(self, user_input: str, user_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        使用 LLM 判断是否需要调用工具，并提取参数
         
+        Args:
+            user_input: 用户输入
+            user_id: 当前会话的用户ID，为 None 时使用智能体默认的用户ID
+            
+        Returns:
+            工具调用信息，如果不需要则返回 None
+        """
+        prompt = self._build_tool_prompt(user_input, user_id)
         try:
+            start = time.perf_counter()
             response = Generation.call(
                 model=DASHSCOPE_MODEL,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.3,
                 result_format='message'
             )
-            
+            self.fast_path_stats.record_llm_call(time.perf_counter() - start)
             if response.status_code == 200:
-                result_text = response.output.choices[0].message.content.strip()
-                # 尝试解析 JSON（可能包含代码块标记）
-                import json
-                import re
-                
-                # 提取 JSON 部分（支持多行 JSON）
-                json_match = re.search(r'\{.*?\}', result_text, re.DOTALL)
-                if json_match:
-                    try:
-                        result_json = json.loads(json_match.group())
-                        if result_json.get("use_tool"):
-                            tool_info = {
-                                "tool": result_json.get("tool_name"),
-                                "mcp_server": result_json.get("mcp_server", "order-mcp-server"),
-                                "parameters": result_json.get("parameters", {})
-                            }
-                            # 确保 userId 是整数类型
-                            if "userId" in tool_info["parameters"]:
-                                userId = tool_info["parameters"]["userId"]
-                                if isinstance(userId, str):
-                                    tool_info["parameters"]["userId"] = int(userId)
-                                elif not isinstance(userId, int):
-                                    tool_info["parameters"]["userId"] = int(userId)
-                            # 确保 quantity 是整数类型（单产品订单）
-                            if "quantity" in tool_info["parameters"]:
-                                quantity = tool_info["parameters"]["quantity"]
-                                if isinstance(quantity, str):
-                                    tool_info["parameters"]["quantity"] = int(quantity)
-                                elif not isinstance(quantity, int):
-                                    tool_info["parameters"]["quantity"] = int(quantity)
-                            
-                            # 确保 items 数组中的 quantity 是整数类型（多产品订单）
-                            if "items" in tool_info["parameters"] and isinstance(tool_info["parameters"]["items"], list):
-                                for item in tool_info["parameters"]["items"]:
-                                    if "quantity" in item:
-                                        quantity = item["quantity"]
-                                        if isinstance(quantity, str):
-                                            item["quantity"] = int(quantity)
-                                        elif not isinstance(quantity, int):
-                                            item["quantity"] = int(quantity)
-                            
-                            import sys
-                            print(f"[OrderAgent] LLM 提取的工具调用: {tool_info}", file=sys.stderr, flush=True)
-                            return tool_info
-                    except json.JSONDecodeError as e:
-                        import sys
-                        print(f"[OrderAgent] JSON 解析失败: {e}, 原始文本: {result_text[:200]}", file=sys.stderr, flush=True)
+                return self._parse_tool_response(response.output.choices[0].message.content.strip())
         except Exception as e:
             print(f"[OrderAgent] LLM 工具判断失败: {str(e)}", file=sys.stderr, flush=True)
         
         return None
     
-    def chat(self, user_input: str) -> str:
+    async def _ashould_use_tool(self, user_input: str, user_id: Optional[str] = None) -> Optional[Dict]:
         """
-        处理用户输入并返回回复
+        _should_use_tool 的 asyncio 版本
         
         Args:
             user_input: 用户输入
+            user_id: 当前会话的用户ID，为 None 时使用智能体默认的用户ID
             
         Returns:
-            AI 回复
+            工具调用信息，如果不需要则返回 None
         """
-        # 添加用户输入到历史记录
-        self.history.append({
-            "role": "user",
-            "content": user_input
-        })
-        
+        prompt = self._build_tool_prompt(user_input, user_id)
         try:
-            # 使用 LLM 判断是否需要调用工具
-            tool_call = self._should_use_tool(user_input)
-            
-            # 如果 LLM 判断失败，尝试简单的关键词匹配
-            if not tool_call:
-                tool_call = self._extract_tool_call(user_input)
-            
-            if tool_call:
-                # 输出到 stderr，确保能看到（即使后台运行）
-                import sys
-                print(f"[OrderAgent] 检测到工具调用: {tool_call}", file=sys.stderr, flush=True)
-                # 调用工具
-                tool_result = self._invoke_tool(
-                    tool_call["tool"],
-                    tool_call["mcp_server"],
-                    tool_call["parameters"]
-                )
-                
-                # 将工具结果添加到对话历史
-                import sys
-                print(f"[OrderAgent] 工具调用结果: {tool_result[:200]}", file=sys.stderr, flush=True)
-                
-                # 检查工具调用是否成功
-                if "失败" in tool_result or "错误" in tool_result or "异常" in tool_result:
-                    # 工具调用失败，直接返回错误信息
-                    print(f"[OrderAgent] 工具调用失败，返回错误信息", file=sys.stderr, flush=True)
-                    self.history.append({
-                        "role": "assistant",
-                        "content": tool_result
-                    })
-                    return tool_result
-                
-                self.history.append({
-                    "role": "assistant",
-                    "content": f"工具调用结果: {tool_result}"
-                })
-                
-                # 使用 LLM 整合工具结果，生成友好回复
-                response = Generation.call(
-                    model=DASHSCOPE_MODEL,
-                    messages=self.history + [{
-                        "role": "user",
-                        "content": f"请根据工具调用结果，生成友好的回复给用户。工具结果: {tool_result}"
-                    }],
-                    temperature=0.7,
-                    result_format='message'
-                )
-                
-                if response.status_code == 200:
-                    ai_message = response.output.choices[0].message.content
-                    self.history.append({
-                        "role": "assistant",
-                        "content": ai_message
-                    })
-                    return ai_message
-                else:
-                    return tool_result  # 如果 LLM 调用失败，直接返回工具结果
-            else:
-                # 一般性对话，直接使用 LLM 处理
-                response = Generation.call(
-                    model=DASHSCOPE_MODEL,
-                    messages=self.history,
-                    temperature=0.7,
-                    result_format='message'
-                )
-                
-                if response.status_code == 200:
-                    ai_message = response.output.choices[0].message.content
-                    
-                    # 添加到历史记录
-                    self.history.append({
-                        "role": "assistant",
-                        "content": ai_message
-                    })
-                    
-                    return ai_message
-                else:
-                    error_msg = f"API 调用失败: {response.message}"
-                    print(f"[OrderAgent] 错误: {error_msg}", file=sys.stderr, flush=True)
-                    return "抱歉，处理您的请求时出现了问题，请稍后再试。"
-            
+            start = time.perf_counter()
+            response = await AioGeneration.call(
+                model=DASHSCOPE_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+                result_format='message'
+            )
+            self.fast_path_stats.record_llm_call(time.perf_counter() - start)
+            if response.status_code == 200:
+                return self._parse_tool_response(response.output.choices[0].message.content.strip())
         except Exception as e:
-            error_msg = f"处理请求时出现错误: {str(e)}"
-            print(f"[OrderAgent] 错误: {error_msg}", file=sys.stderr, flush=True)
-            import traceback
-            traceback.print_exc(file=sys.stderr)
-            return "抱歉，处理您的请求时出现了问题，请稍后再试。"
+            print(f"[OrderAgent] LLM 工具判断失败: {str(e)}", file=sys.stderr, flush=True)
+        
+        return None
     
     def clear_history(self):
         """清空对话历史"""
-        self.history = [{
+        self.history = self._new_history()
+    
+    def _new_history(self) -> List[Dict[str, str]]:
+        """创建新的对话历史（只包含系统提示词）"""
+        return [{
             "role": "system",
             "content": self.system_prompt
         }]
     
+    def _default_session(self) -> AgentSession:
+        """未指定会话时，使用智能体自身的 user_id 和历史记录（单会话模式）"""
+        return AgentSession(chat_id=self.chat_id, user_id=self.user_id, history=self.history)
+    
     def get_available_tools(self) -> List[Dict]:
         """获取可用工具列表"""
         return self.available_tools.copy()
-    
-    def start_a2a_server(self, host: str = '0.0.0.0', port: int = 10006, debug: bool = False):
-        """
-        启动 A2A 服务端，使其他 Agent 可以通过 A2A 协议调用
-        
-        Args:
-            host: 监听地址
-            port: 服务端口
-            debug: 是否开启调试模式
-        """
-        # 创建 A2A Server
-        a2a_server = A2AServer(agent_name=self.agent_name, port=port)
-        
-        # 设置处理函数
-        def handle_request(data: Dict) -> str:
-            """处理 A2A 协议请求"""
-            user_input = data.get("input", "")
-            # 从 A2A 请求中获取 user_id（如果存在）
-            request_user_id = data.get("user_id")
-            if request_user_id:
-                # 临时更新 user_id（用于本次请求）
-                original_user_id = self.user_id
-                self.user_id = str(request_user_id)  # 确保是字符串类型
-                try:
-                    # 调用 chat 方法处理
-                    result = self.chat(user_input)
-                    return result
-                finally:
-                    # 恢复原始 user_id
-                    self.user_id = original_user_id
-            else:
-                # 如果没有提供 user_id，使用默认值
-                return self.chat(user_input)
-        
-        a2a_server.set_handler(handle_request)
-        
-        print(f"{self.agent_name} A2A Server 启动在 http://{host}:{port}", file=sys.stderr, flush=True)
-        print(f"可用工具: {len(self.available_tools)} 个", file=sys.stderr, flush=True)
-        
-        # 启动服务
-        a2a_server.run(host=host, debug=debug)
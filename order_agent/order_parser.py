@@ -0,0 +1,370 @@
+"""
+订单快速解析器 - 在调用 LLM 之前，用确定性规则解析明确的订单请求
+
+解析结果带有置信度：只有产品、甜度、冰量、数量和用户ID全部明确、且没有歧义时，
+置信度才为 1.0，OrderAgent 会直接调用工具而跳过 LLM 参数提取；
+其他情况（缺少字段、同一产品出现多个甜度、否定 / 备注表达、有无法识别的内容等）交给 LLM 处理；
+用户撤回下单（"算了不要了"）时不生成工具调用。
+"""
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# 置信度达到该阈值时走快速路径（可通过环境变量覆盖）
+ORDER_FAST_PATH_THRESHOLD = float(os.getenv("ORDER_FAST_PATH_THRESHOLD", "1.0"))
+
+# 默认产品列表（与订单 MCP Server 的产品保持一致）
+DEFAULT_PRODUCTS = ["云边茉莉", "桂花云露", "云雾观音", "珍珠奶茶", "红豆奶茶"]
+
+# 甜度、冰量的同义表达（按长度从长到短匹配，避免 "少糖" 被 "糖" 误匹配）
+SWEETNESS_ALIASES = {
+    "标准糖": "标准糖", "正常糖": "标准糖", "全糖": "标准糖",
+    "不加糖": "无糖", "不要糖": "无糖", "无糖": "无糖",
+    "微糖": "微糖", "半糖": "半糖", "少糖": "少糖",
+}
+ICE_LEVEL_ALIASES = {
+    "正常冰": "正常冰", "标准冰": "正常冰",
+    "不加冰": "去冰", "不要冰": "去冰", "去冰": "去冰",
+    "少冰": "少冰",
+    "热饮": "热", "热的": "热", "要热": "热", "做热": "热",
+    "温的": "温", "温热": "温", "常温": "温",
+}
+
+# 中文数量词
+CHINESE_NUMBERS = {"一": 1, "两": 2, "二": 2, "三": 3, "四": 4, "五": 5,
+                   "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+
+# 意图关键词
+CREATE_KEYWORDS = ["下单", "点单", "点一", "点两", "来一", "来两", "来三", "要一", "要两", "要三",
+                   "买", "购买", "我要", "给我", "帮我点", "创建订单"]
+QUERY_KEYWORDS = ["查询", "查一下", "查看", "看看", "我的订单", "订单详情", "订单状态"]
+# 修改、删除订单需要和用户确认，始终交给 LLM 处理
+UNSUPPORTED_KEYWORDS = ["取消", "删除", "修改", "更改", "改成", "退单", "备注"]
+# 否定和备注表达（在去掉 "不加糖"、"不要冰" 等规格说法后检查），解析器无法表达为订单项，交给 LLM
+NEGATION_WORDS = ["不要", "不想", "不加", "不放", "别", "换", "去掉", "备注", "另加", "多加", "加", "除了"]
+# 撤回下单的表达，不生成工具调用
+CANCEL_WORDS = ["算了", "不要了", "不用了", "不买了", "不点了", "先不", "等等", "等一下"]
+# 不影响订单内容的语气词和客套话（计算未识别的内容时去掉）
+FILLER_WORDS = ["帮我", "麻烦", "谢谢", "一下", "请", "的", "吧", "呀", "啊", "哦", "呢", "想", "要", "来", "点",
+                "给", "我", "也", "再", "好"]
+SHARED_SPEC_WORDS = ["都", "全部", "一样"]  # 多个产品共用同一规格
+
+ORDER_ID_PATTERN = re.compile(r'ORDER_\d+', re.IGNORECASE)
+USER_ID_PATTERN = re.compile(r'(?:用户\s*ID|用户ID|userId|用户编号|用户号)\s*[是为：:=]?\s*(\d+)', re.IGNORECASE)
+# 不匹配 "十二杯" 这类多位中文数字（交给 LLM）
+QUANTITY_PATTERN = re.compile(r'(?<![\d一两二三四五六七八九十])(\d+|[一两二三四五六七八九十])\s*[杯份]')
+# 多个产品之间的分隔符
+CLAUSE_SEPARATORS = re.compile(r'[，,；;。、]|以及|还有|另外|再来|再要|和|跟')
+
+
+@dataclass
+class ParseResult:
+    """快速解析结果"""
+    
+    tool_call: Optional[Dict] = None  # 解析出的工具调用，格式同 OrderAgent._should_use_tool
+    confidence: float = 0.0  # 置信度 0~1
+    missing: List[str] = field(default_factory=list)  # 缺少的字段
+    ambiguities: List[str] = field(default_factory=list)  # 存在歧义的原因
+    
+    def is_confident(self, threshold: float = ORDER_FAST_PATH_THRESHOLD) -> bool:
+        """是否可以直接使用解析结果（跳过 LLM）"""
+        return self.tool_call is not None and self.confidence >= threshold
+
+
+class OrderParser:
+    """订单快速解析器 - 基于关键词和正则的确定性解析"""
+    
+    def __init__(self, products: Optional[List[str]] = None):
+        """
+        初始化解析器
+        
+        Args:
+            products: 可识别的产品名称列表，为 None 时使用默认产品列表
+        """
+        # 长名称优先匹配（如 "珍珠奶茶" 优先于 "奶茶"）
+        self.products = sorted(products or DEFAULT_PRODUCTS, key=len, reverse=True)
+        self._sweetness_aliases = sorted(SWEETNESS_ALIASES, key=len, reverse=True)
+        self._ice_aliases = sorted(ICE_LEVEL_ALIASES, key=len, reverse=True)
+    
+    def parse(self, user_input: str, user_id=None) -> ParseResult:
+        """
+        解析用户输入
+        
+        Args:
+            user_input: 用户输入
+            user_id: 当前会话的用户ID（输入中没有明确的用户ID时使用）
+        
+        Returns:
+            ParseResult 对象
+        """
+        text = user_input.strip()
+        if any(keyword in text for keyword in UNSUPPORTED_KEYWORDS):
+            return ParseResult(ambiguities=["需要确认的订单操作"])
+        
+        resolved_user_id, user_id_ambiguous = self._resolve_user_id(text, user_id)
+        order_ids = ORDER_ID_PATTERN.findall(text)
+        products = self._find_products(text)
+        is_query = ("订单" in text or bool(order_ids)) and any(keyword in text for keyword in QUERY_KEYWORDS)
+        is_create = bool(products) and any(keyword in text for keyword in CREATE_KEYWORDS)
+        
+        if is_query and is_create:
+            return ParseResult(ambiguities=["同时包含查询和下单意图"])
+        if is_query:
+            return self._parse_query(text, order_ids, resolved_user_id, user_id_ambiguous)
+        if is_create and not order_ids:
+            if any(word in text for word in CANCEL_WORDS):
+                return ParseResult(ambiguities=["用户撤回了下单"])
+            return self._parse_create(text, resolved_user_id, user_id_ambiguous)
+        return ParseResult()
+    
+    def _parse_query(self, text: str, order_ids: List[str], user_id: Optional[int],
+                     user_id_ambiguous: bool) -> ParseResult:
+        """解析查询订单请求"""
+        result = ParseResult()
+        if user_id_ambiguous:
+            result.ambiguities.append("用户ID不唯一")
+        if len(order_ids) > 1:
+            result.ambiguities.append("包含多个订单ID")
+        # 时间范围、产品等筛选条件（"上周的订单"、"有没有珍珠奶茶"）无法表达为查询参数
+        leftover = self._query_leftover(text)
+        if leftover:
+            result.ambiguities.append(f"包含无法识别的内容: {leftover}")
+        if user_id is None:
+            result.missing.append("userId")
+        
+        if order_ids:
+            parameters = {"orderId": order_ids[0].upper()}
+            if user_id is not None:
+                tool = "order-get-order-by-user"
+                parameters["userId"] = user_id
+            else:
+                tool = "order-get-order"
+        elif user_id is not None:
+            tool = "order-get-orders-by-user"
+            parameters = {"userId": user_id}
+        else:
+            return result
+        
+        result.tool_call = {"tool": tool, "mcp_server": "order-mcp-server", "parameters": parameters}
+        # 只能查询当前用户的订单，缺少用户ID时不走快速路径
+        result.confidence = self._score(resolved=2 - len(result.missing), required=2, ambiguities=result.ambiguities)
+        return result
+    
+    def _parse_create(self, text: str, user_id: Optional[int], user_id_ambiguous: bool) -> ParseResult:
+        """解析下单请求（支持一句话点多个产品）"""
+        result = ParseResult()
+        if user_id_ambiguous:
+            result.ambiguities.append("用户ID不唯一")
+        if user_id is None:
+            result.missing.append("userId")
+        
+        # 明确说明 "都 / 全部" 且整句只出现一种甜度 / 冰量时，作为所有产品的规格（如 "珍珠奶茶和红豆奶茶都少糖去冰"）
+        global_sweetness = global_ice = None
+        if any(word in text for word in SHARED_SPEC_WORDS):
+            global_sweetness = self._find_unique(text, self._sweetness_aliases, SWEETNESS_ALIASES)
+            global_ice = self._find_unique(text, self._ice_aliases, ICE_LEVEL_ALIASES)
+        
+        # 否定、备注（"不加珍珠"）和无法识别的内容会被订单项丢掉，不能直接下单
+        spec_free = self._strip(text, self._sweetness_aliases + self._ice_aliases)
+        negations = [word for word in NEGATION_WORDS if word in spec_free]
+        negations = [word for word in negations if not any(word != other and word in other for other in negations)]
+        if negations:
+            result.ambiguities.append(f"包含否定或备注表达: {'、'.join(negations)}")
+        leftover = self._leftover(text)
+        if leftover:
+            result.ambiguities.append(f"包含无法识别的内容: {leftover}")
+        
+        items = []
+        resolved = 0
+        required = 1  # userId
+        for clause in self._split_clauses(text):
+            clause_products = self._find_products(clause)
+            if not clause_products:
+                continue
+            if len(clause_products) > 1:
+                result.ambiguities.append(f"无法区分多个产品的规格: {clause}")
+            
+            sweetness = self._find_unique(clause, self._sweetness_aliases, SWEETNESS_ALIASES) or global_sweetness
+            ice_level = self._find_unique(clause, self._ice_aliases, ICE_LEVEL_ALIASES) or global_ice
+            quantities = QUANTITY_PATTERN.findall(clause)
+            quantity = self._to_int(quantities[0]) if len(quantities) == 1 else None
+            if len(quantities) > 1:
+                result.ambiguities.append(f"数量不唯一: {clause}")
+            
+            for product in clause_products:
+                item = {
+                    "productName": product,
+                    "sweetness": sweetness or "标准糖",
+                    "iceLevel": ice_level or "正常冰",
+                    "quantity": quantity or 1
+                }
+                items.append(item)
+                required += 4
+                resolved += 1  # productName
+                for name, value in (("sweetness", sweetness), ("iceLevel", ice_level), ("quantity", quantity)):
+                    if value:
+                        resolved += 1
+                    else:
+                        result.missing.append(f"{product}.{name}")
+        
+        if not items:
+            return result
+        if user_id is not None:
+            resolved += 1
+        
+        result.tool_call = {
+            "tool": "order-create-order",
+            "mcp_server": "order-mcp-server",
+            "parameters": {"userId": user_id, "items": items}
+        }
+        result.confidence = self._score(resolved=resolved, required=required, ambiguities=result.ambiguities)
+        return result
+    
+    def _score(self, resolved: int, required: int, ambiguities: List[str]) -> float:
+        """置信度 = 已解析字段比例，每个歧义减半"""
+        confidence = resolved / required if required else 0.0
+        for _ in ambiguities:
+            confidence *= 0.5
+        return round(confidence, 4)
+    
+    def _resolve_user_id(self, text: str, session_user_id) -> Tuple[Optional[int], bool]:
+        """解析用户ID：优先使用输入中明确给出的ID，否则使用会话的用户ID（必须是整数）"""
+        explicit = {int(value) for value in USER_ID_PATTERN.findall(text)}
+        if len(explicit) == 1:
+            return explicit.pop(), False
+        if len(explicit) > 1:
+            return None, True
+        if isinstance(session_user_id, int):
+            return session_user_id, False
+        if isinstance(session_user_id, str) and session_user_id.isdigit():
+            return int(session_user_id), False
+        return None, False
+    
+    def _find_products(self, text: str) -> List[str]:
+        """按出现顺序查找产品名称（长名称优先，已匹配的位置不重复匹配）"""
+        found = []
+        taken = [False] * len(text)
+        for product in self.products:
+            start = text.find(product)
+            while start != -1:
+                end = start + len(product)
+                if not any(taken[start:end]):
+                    found.append((start, product))
+                    for i in range(start, end):
+                        taken[i] = True
+                start = text.find(product, end)
+        found.sort()
+        products = []
+        for _, product in found:
+            if product not in products:
+                products.append(product)
+        return products
+    
+    @staticmethod
+    def _strip(text: str, words: List[str]) -> str:
+        """依次去掉文本中的词（替换为空格，避免前后的字拼成新词）"""
+        for word in words:
+            text = text.replace(word, " ")
+        return text
+    
+    def _leftover(self, text: str) -> str:
+        """去掉产品、规格、数量、用户ID、下单关键词和语气词后剩下的内容（为空表示整句都被解析）"""
+        remaining = USER_ID_PATTERN.sub(" ", text)
+        remaining = self._strip(remaining, self.products + self._sweetness_aliases + self._ice_aliases)
+        remaining = QUANTITY_PATTERN.sub(" ", remaining)
+        remaining = CLAUSE_SEPARATORS.sub(" ", remaining)
+        remaining = self._strip(remaining, sorted(CREATE_KEYWORDS + SHARED_SPEC_WORDS, key=len, reverse=True))
+        remaining = self._strip(remaining, FILLER_WORDS)
+        return re.sub(r"[\s\W_]+", "", remaining)
+    
+    def _query_leftover(self, text: str) -> str:
+        """去掉订单ID、用户ID、查询关键词和语气词后剩下的内容（为空表示整句都被解析）"""
+        remaining = ORDER_ID_PATTERN.sub(" ", text)
+        remaining = USER_ID_PATTERN.sub(" ", remaining)
+        remaining = CLAUSE_SEPARATORS.sub(" ", remaining)
+        remaining = self._strip(remaining, sorted(QUERY_KEYWORDS + ["订单"], key=len, reverse=True))
+        remaining = self._strip(remaining, FILLER_WORDS)
+        return re.sub(r"[\s\W_]+", "", remaining)
+    
+    def _find_unique(self, text: str, aliases: List[str], mapping: Dict[str, str]) -> Optional[str]:
+        """查找唯一的规格值，没有找到或找到多个不同的值时返回 None"""
+        values = set()
+        remaining = text
+        for alias in aliases:
+            if alias in remaining:
+                values.add(mapping[alias])
+                remaining = remaining.replace(alias, " ")
+        return values.pop() if len(values) == 1 else None
+    
+    def _split_clauses(self, text: str) -> List[str]:
+        """按分隔符把一句话拆成多个子句，没有产品的子句（如 "都少糖"）会被合并到前一个子句"""
+        clauses = []
+        for part in CLAUSE_SEPARATORS.split(text):
+            part = part.strip()
+            if not part:
+                continue
+            if clauses and not self._find_products(part):
+                clauses[-1] += "，" + part
+            else:
+                clauses.append(part)
+        return clauses
+    
+    def _to_int(self, value: str) -> int:
+        """数量转换为整数（支持中文数字）"""
+        return int(value) if value.isdigit() else CHINESE_NUMBERS[value]
+
+
+class FastPathStats:
+    """快速路径统计：命中率和节省的 LLM 调用耗时"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0  # 解析的请求数
+        self.hits = 0  # 直接走快速路径的请求数
+        self.misses = 0  # 交给 LLM 处理的请求数
+        self.parse_seconds = 0.0  # 解析器累计耗时
+        self.llm_calls = 0  # LLM 参数提取调用次数
+        self.llm_seconds = 0.0  # LLM 参数提取累计耗时
+        self.miss_reasons: Dict[str, int] = {}  # 未命中原因计数
+    
+    def record_parse(self, result: ParseResult, hit: bool, seconds: float):
+        """记录一次解析"""
+        with self._lock:
+            self.total += 1
+            self.parse_seconds += seconds
+            if hit:
+                self.hits += 1
+                return
+            self.misses += 1
+            if result.ambiguities:
+                reason = "ambiguous"
+            elif result.missing:
+                reason = "missing_fields"
+            else:
+                reason = "not_order_request"
+            self.miss_reasons[reason] = self.miss_reasons.get(reason, 0) + 1
+    
+    def record_llm_call(self, seconds: float):
+        """记录一次 LLM 参数提取调用的耗时"""
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_seconds += seconds
+    
+    def to_dict(self) -> Dict:
+        """导出统计信息，节省的耗时按 LLM 参数提取的平均耗时估算"""
+        with self._lock:
+            avg_llm = self.llm_seconds / self.llm_calls if self.llm_calls else 0.0
+            avg_parse = self.parse_seconds / self.total if self.total else 0.0
+            return {
+                "total": self.total,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / self.total, 4) if self.total else 0.0,
+                "miss_reasons": dict(self.miss_reasons),
+                "avg_parse_ms": round(avg_parse * 1000, 3),
+                "avg_llm_extraction_ms": round(avg_llm * 1000, 1),
+                "llm_calls_saved": self.hits,
+                "estimated_latency_saved_ms": round(self.hits * max(avg_llm - avg_parse, 0.0) * 1000, 1)
+            }
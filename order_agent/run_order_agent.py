@@ -2,6 +2,7 @@
 启动订单智能体服务
 """
 import sys
+import argparse
 from pathlib import Path
 
 # 添加项目根目录到路径
@@ -10,9 +11,15 @@ sys.path.insert(0, str(project_root))
 
 from order_agent import OrderAgent
 from service_discovery import ServiceDiscovery
+from serving import ServerOptions, add_server_arguments
+
 
 def main():
     """启动订单智能体"""
+    parser = argparse.ArgumentParser(description="启动订单智能体服务")
+    add_server_arguments(parser)
+    options = ServerOptions.from_args(parser.parse_args())
+    
     print("=" * 60)
     print("订单智能体服务")
     print("=" * 60)
@@ -39,7 +46,7 @@ def main():
     
     # 启动 A2A 服务
     try:
-        agent.start_a2a_server(host='0.0.0.0', port=10006, debug=False)
+        agent.start_a2a_server(host='0.0.0.0', port=10006, debug=False, options=options)
     except KeyboardInterrupt:
         print("\n服务已停止")
 
@@ -2,8 +2,9 @@
 数据库访问层 - 订单相关操作
 """
 import sys
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 from datetime import datetime
 
 # 添加项目根目录到路径
@@ -18,6 +19,8 @@ except ImportError:
     DB_AVAILABLE = False
     print("警告: 数据库模块未找到，将使用内存存储")
 
+ITEMS_BATCH_SIZE = 500  # 批量加载订单项时每条 IN 查询包含的订单数（SQLite 旧版本最多 999 个参数）
+
 
 class OrderDAO:
     """订单数据访问对象"""
@@ -37,6 +40,16 @@ class OrderDAO:
             self.memory_orders: List[Dict] = []
             print("使用内存存储订单数据（仅用于测试）")
     
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        在一个数据库事务中执行多个操作（如创建订单和订单项），出错时全部回滚
+        
+        事务内的查询使用同一个连接，能读到事务中尚未提交的写入；内存存储时不做任何处理
+        """
+        with (nullcontext() if self.use_memory else self.db.transaction()):
+            yield
+    
     def get_order_by_id(self, order_id: str) -> Optional[Dict]:
         """
         根据订单ID查询订单（包含订单项）
@@ -63,7 +76,7 @@ class OrderDAO:
             return None
         
         # 查询订单项
-        order["items"] = self.get_order_items(order_id)
+        self._attach_items([order])
         return order
     
     def get_order_by_user_and_id(self, user_id: int, order_id: str) -> Optional[Dict]:
@@ -92,7 +105,7 @@ class OrderDAO:
             return None
         
         # 查询订单项
-        order["items"] = self.get_order_items(order_id)
+        self._attach_items([order])
         return order
     
     def get_orders_by_user(self, user_id: int) -> List[Dict]:
@@ -114,10 +127,8 @@ class OrderDAO:
             query = "SELECT * FROM orders WHERE user_id = %s ORDER BY created_at DESC"
         orders = self.db.fetch_all(query, (user_id,))
         
-        # 为每个订单加载订单项
-        for order in orders:
-            order["items"] = self.get_order_items(order["order_id"])
-        return orders
+        # 一次查询加载所有订单的订单项
+        return self._attach_items(orders)
     
     def create_order(self, order_data: Dict) -> Dict:
         """
@@ -157,11 +168,7 @@ class OrderDAO:
         )
         
         print(f"[OrderDAO] 准备插入订单 - order_id: {order_data['order_id']}, user_id: {order_data['user_id']}")
-        cursor = self.db.execute(query, params)
-        # execute 方法已经自动提交，但为了确保，再次提交
-        if hasattr(self.db, 'connection'):
-            self.db.connection.commit()
-            print(f"[OrderDAO] 事务已提交")
+        self.db.execute(query, params)
         
         # 立即查询验证
         result = self.get_order_by_id(order_data["order_id"])
@@ -213,8 +220,6 @@ class OrderDAO:
         )
         
         self.db.execute(query, params)
-        if hasattr(self.db, 'connection'):
-            self.db.connection.commit()
         return item_data
     
     def get_order_items(self, order_id: str) -> List[Dict]:
@@ -239,6 +244,29 @@ class OrderDAO:
             query = "SELECT * FROM order_items WHERE order_id = %s"
         return self.db.fetch_all(query, (order_id,))
     
+    def _attach_items(self, orders: List[Dict]) -> List[Dict]:
+        """
+        批量加载订单项并填入每个订单的 items（每 ITEMS_BATCH_SIZE 个订单一条 IN 查询，而不是每个订单一条查询）
+        
+        Args:
+            orders: 订单列表（数据库查询结果）
+        
+        Returns:
+            填入 items 后的订单列表
+        """
+        items_by_order: Dict[str, List[Dict]] = {}
+        for order in orders:
+            order["items"] = items_by_order.setdefault(order["order_id"], [])
+        
+        order_ids = list(items_by_order)
+        placeholder = "?" if self.db.db_type == "sqlite" else "%s"
+        for start in range(0, len(order_ids), ITEMS_BATCH_SIZE):
+            batch = order_ids[start:start + ITEMS_BATCH_SIZE]
+            query = f"SELECT * FROM order_items WHERE order_id IN ({', '.join([placeholder] * len(batch))})"
+            for item in self.db.fetch_all(query, tuple(batch)):
+                items_by_order[item["order_id"]].append(item)
+        return orders
+    
     def delete_order(self, user_id: int, order_id: str) -> bool:
         """
         删除订单（级联删除订单项）
@@ -263,8 +291,6 @@ class OrderDAO:
         else:
             query = "DELETE FROM orders WHERE user_id = %s AND order_id = %s"
         self.db.execute(query, (user_id, order_id))
-        if hasattr(self.db, 'connection'):
-            self.db.connection.commit()
         # 检查是否删除成功（通过查询确认）
         deleted_order = self.get_order_by_user_and_id(user_id, order_id)
         return deleted_order is None
@@ -294,8 +320,6 @@ class OrderDAO:
         else:
             query = "UPDATE orders SET remark = %s, updated_at = %s WHERE user_id = %s AND order_id = %s"
         self.db.execute(query, (remark, datetime.now(), user_id, order_id))
-        if hasattr(self.db, 'connection'):
-            self.db.connection.commit()
         return self.get_order_by_user_and_id(user_id, order_id)
     
     def query_orders(self, user_id: int, filters: Optional[Dict] = None) -> List[Dict]:
@@ -335,9 +359,8 @@ class OrderDAO:
         query += " ORDER BY created_at DESC"
         orders = self.db.fetch_all(query, tuple(params))
         
-        # 为每个订单加载订单项
-        for order in orders:
-            order["items"] = self.get_order_items(order["order_id"])
+        # 一次查询加载所有订单的订单项
+        self._attach_items(orders)
         
         # 如果需要在订单项级别过滤，可以在这里进行
         # 目前简化处理，返回所有订单
@@ -11,29 +11,11 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from mcp.server import MCPServer, Tool, ToolDefinition
+from serving import ServerOptions
+from database.registry import get_default_database
 from .order_service import OrderService
 from .database import OrderDAO
 
-# 尝试导入数据库管理器
-try:
-    from database.db_manager import DatabaseManager
-    from database.config import DB_TYPE, MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE
-    
-    if DB_TYPE == "mysql":
-        db_manager = DatabaseManager(
-            db_type="mysql",
-            host=MYSQL_HOST,
-            port=MYSQL_PORT,
-            user=MYSQL_USER,
-            password=MYSQL_PASSWORD,
-            database=MYSQL_DATABASE
-        )
-    else:
-        db_manager = DatabaseManager(db_type="sqlite")
-except Exception as e:
-    print(f"警告: 无法初始化数据库，将使用内存存储: {str(e)}")
-    db_manager = None
-
 
 class OrderMCPServer:
     """订单 MCP Server - 提供订单相关的工具"""
@@ -47,12 +29,21 @@ class OrderMCPServer:
         """
         self.port = port
         
+        # 获取进程内共享的数据库（创建时检查表结构，连接在执行查询时才从连接池借出）
+        try:
+            db_manager = get_default_database()
+        except Exception as e:
+            print(f"警告: 无法初始化数据库，将使用内存存储: {str(e)}")
+            db_manager = None
+        
         # 初始化数据访问层和服务层
         order_dao = OrderDAO(db_manager=db_manager)
         self.order_service = OrderService(order_dao)
         
         # 创建 MCP Server
         self.mcp_server = MCPServer(server_name="order-mcp-server", port=port)
+        if db_manager is not None:
+            self.mcp_server.register_metrics("database", db_manager.stats)
         
         # 注册工具
         self._register_tools()
@@ -326,13 +317,14 @@ class OrderMCPServer:
         except Exception as e:
             return f"更新订单备注失败: {str(e)}"
     
-    def run(self, host: str = '0.0.0.0', debug: bool = False):
+    def run(self, host: str = '0.0.0.0', debug: bool = False, options: Optional[ServerOptions] = None):
         """
         启动 MCP Server
         
         Args:
             host: 监听地址
             debug: 是否开启调试模式
+            options: 服务运行参数（dev / production 模式等），为 None 时使用默认配置
         """
         print(f"订单 MCP Server 启动在 http://{host}:{self.port}")
         print(f"已注册工具: {len(self.mcp_server.tools)} 个")
@@ -340,4 +332,4 @@ class OrderMCPServer:
             print(f"  - {tool_name}")
         print()
         
-        self.mcp_server.run(host=host, debug=debug)
+        self.mcp_server.run(host=host, debug=debug, options=options)
@@ -11,30 +11,9 @@ from datetime import datetime
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+from database.registry import get_default_database
 from .database import OrderDAO
 
-# 尝试导入数据库管理器
-try:
-    from database.db_manager import DatabaseManager
-    from database.config import DB_TYPE, MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE
-    
-    if DB_TYPE == "mysql":
-        product_db = DatabaseManager(
-            db_type="mysql",
-            host=MYSQL_HOST,
-            port=MYSQL_PORT,
-            user=MYSQL_USER,
-            password=MYSQL_PASSWORD,
-            database=MYSQL_DATABASE
-        )
-    else:
-        product_db = DatabaseManager(db_type="sqlite")
-    PRODUCT_DB_AVAILABLE = True
-except Exception as e:
-    PRODUCT_DB_AVAILABLE = False
-    product_db = None
-    print(f"警告: 无法初始化产品数据库: {str(e)}")
-
 
 class OrderService:
     """订单服务 - 处理订单相关的业务逻辑"""
@@ -133,11 +112,13 @@ class OrderService:
             "remark": remark or "",
             "status": "UNPAID"  # 默认状态
         }
-        created_order = self.order_dao.create_order(order_data)
-        
-        # 创建每个订单项
-        for item in processed_items:
-            self.order_dao.create_order_item(item)
+        # 订单和订单项在一个事务中写入，任何一项失败都不会留下不完整的订单
+        with self.order_dao.transaction():
+            created_order = self.order_dao.create_order(order_data)
+            
+            # 创建每个订单项
+            for item in processed_items:
+                self.order_dao.create_order_item(item)
         
         created_order["items"] = processed_items
         return created_order
@@ -192,7 +173,13 @@ class OrderService:
         Returns:
             产品价格，如果不存在则返回 None
         """
-        if not PRODUCT_DB_AVAILABLE or product_db is None:
+        product_db = self.order_dao.db
+        if product_db is None:
+            try:
+                product_db = get_default_database()
+            except Exception as e:
+                print(f"警告: 无法初始化产品数据库: {str(e)}")
+        if product_db is None:
             # 如果没有数据库，使用默认价格
             default_prices = {
                 "云边茉莉": 18.00,
@@ -2,6 +2,7 @@
 启动订单 MCP Server
 """
 import sys
+import argparse
 from pathlib import Path
 
 # 添加项目根目录到路径
@@ -10,9 +11,15 @@ sys.path.insert(0, str(project_root))
 
 from order_mcp_server import OrderMCPServer
 from service_discovery import ServiceDiscovery
+from serving import ServerOptions, add_server_arguments
+
 
 def main():
     """启动订单 MCP Server"""
+    parser = argparse.ArgumentParser(description="启动订单 MCP Server")
+    add_server_arguments(parser)
+    options = ServerOptions.from_args(parser.parse_args())
+    
     print("=" * 60)
     print("订单 MCP Server")
     print("=" * 60)
@@ -36,7 +43,7 @@ def main():
     
     # 启动服务
     try:
-        server.run(host='0.0.0.0', debug=False)
+        server.run(host='0.0.0.0', debug=False, options=options)
     except KeyboardInterrupt:
         print("\n服务已停止")
 
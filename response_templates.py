@@ -0,0 +1,218 @@
+"""
+回复模板 - 为结果确定的工具调用在本地生成友好回复，省去第二次 LLM 调用
+
+工具调用成功后，Agent 原本会再调用一次 LLM 把工具结果改写成回复。
+对于订单创建 / 查询 / 删除、反馈记录等格式固定的结果，按 "工具名 + 结果格式" 匹配模板直接渲染；
+没有匹配的模板（如知识库检索这类开放式结果）时返回 None，由调用方继续使用 LLM 生成回复。
+"""
+import re
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Union
+
+# 模板可以是格式化字符串（可使用 {result} 和正则中的命名分组），也可以是渲染函数
+Renderer = Union[str, Callable[[Dict[str, str]], str]]
+
+
+@dataclass
+class ResponseTemplate:
+    """单个回复模板"""
+    
+    tool: str  # 工具名称
+    pattern: "re.Pattern"  # 工具结果需要匹配的格式
+    renderer: Renderer  # 回复模板或渲染函数
+    
+    def render(self, tool_result: str) -> Optional[str]:
+        """
+        渲染回复
+        
+        Args:
+            tool_result: 工具调用结果
+        
+        Returns:
+            渲染后的回复，结果格式不匹配时返回 None
+        """
+        match = self.pattern.search(tool_result)
+        if not match:
+            return None
+        fields = {key: (value or "").strip() for key, value in match.groupdict().items()}
+        fields["result"] = tool_result.strip()
+        if callable(self.renderer):
+            return self.renderer(fields)
+        return self.renderer.format(**fields)
+
+
+def _render_feedback_created(fields: Dict[str, str]) -> str:
+    """反馈记录创建成功：按反馈类型选择语气"""
+    feedback_type = fields.get("feedback_type", "")
+    feedback_id = fields.get("feedback_id", "")
+    if feedback_type == "投诉":
+        opening = "非常抱歉给您带来了不好的体验！您的投诉我们已经记录"
+        closing = "相关负责人会尽快核实并与您联系处理，感谢您的耐心。"
+    elif feedback_type == "建议":
+        opening = "感谢您的宝贵建议！我们已经记录"
+        closing = "我们会认真评估，持续改进云边奶茶铺的产品和服务。"
+    else:
+        opening = f"感谢您的{feedback_type or '反馈'}！我们已经记录"
+        closing = "您的意见对我们非常重要，我们会尽快跟进。"
+    return f"{opening}（反馈编号：{feedback_id}）。{closing}"
+
+
+# 默认模板（按注册顺序匹配，同一工具的第一个匹配模板生效）
+DEFAULT_TEMPLATES: List[ResponseTemplate] = [
+    # 订单
+    ResponseTemplate(
+        tool="order-create-order",
+        pattern=re.compile(r"^订单信息:\s*\n- 订单ID: (?P<order_id>\S+).*?- 订单总价: ¥(?P<total>[\d.]+)", re.S),
+        renderer="您的订单已创建成功，订单号 {order_id}，合计 ¥{total}。\n\n{result}\n\n我们会尽快为您制作，请留意取餐通知～"
+    ),
+    ResponseTemplate(
+        tool="order-get-order",
+        pattern=re.compile(r"^订单信息:\s*\n- 订单ID: (?P<order_id>\S+)", re.S),
+        renderer="为您查询到订单 {order_id} 的详细信息：\n\n{result}"
+    ),
+    ResponseTemplate(
+        tool="order-get-order",
+        pattern=re.compile(r"^订单不存在: (?P<order_id>\S+)"),
+        renderer="抱歉，没有找到订单 {order_id}，请确认订单号是否正确。"
+    ),
+    ResponseTemplate(
+        tool="order-get-order-by-user",
+        pattern=re.compile(r"^订单信息:\s*\n- 订单ID: (?P<order_id>\S+)", re.S),
+        renderer="为您查询到订单 {order_id} 的详细信息：\n\n{result}"
+    ),
+    ResponseTemplate(
+        tool="order-get-order-by-user",
+        pattern=re.compile(r"^订单不存在: (?P<order_id>\S+)"),
+        renderer="抱歉，在您的账户下没有找到订单 {order_id}，请确认订单号是否正确。"
+    ),
+    ResponseTemplate(
+        tool="order-get-orders-by-user",
+        pattern=re.compile(r"^用户 \d+ 的订单列表（共 (?P<count>\d+) 条）:\s*\n(?P<orders>.*)", re.S),
+        renderer="您共有 {count} 条订单记录：\n\n{orders}"
+    ),
+    ResponseTemplate(
+        tool="order-get-orders-by-user",
+        pattern=re.compile(r"^用户 \d+ 当前没有任何订单记录"),
+        renderer="您目前还没有订单记录，需要我帮您点一杯吗？"
+    ),
+    ResponseTemplate(
+        tool="order-delete-order",
+        pattern=re.compile(r"^订单删除成功: (?P<order_id>\S+)"),
+        renderer="订单 {order_id} 已成功删除。"
+    ),
+    ResponseTemplate(
+        tool="order-update-remark",
+        pattern=re.compile(r"^订单备注更新成功: (?P<order_id>\S+)\n新备注: (?P<remark>.*)", re.S),
+        renderer="订单 {order_id} 的备注已更新为「{remark}」。"
+    ),
+    # 反馈
+    ResponseTemplate(
+        tool="feedback-create-feedback",
+        pattern=re.compile(r"^反馈记录创建成功！\n反馈ID: (?P<feedback_id>\d+)\n.*?反馈类型: (?P<feedback_type>\S+)", re.S),
+        renderer=_render_feedback_created
+    ),
+    ResponseTemplate(
+        tool="feedback-get-feedback-by-user",
+        pattern=re.compile(r"^用户 \S+ 的反馈记录（共 (?P<count>\d+) 条）：\s*\n(?P<feedbacks>.*)", re.S),
+        renderer="您共有 {count} 条反馈记录：\n\n{feedbacks}"
+    ),
+    ResponseTemplate(
+        tool="feedback-get-feedback-by-user",
+        pattern=re.compile(r"^用户 \S+ 暂无反馈记录"),
+        renderer="您目前还没有提交过反馈。如果有任何意见或建议，随时告诉我～"
+    ),
+    ResponseTemplate(
+        tool="feedback-get-feedback-by-order",
+        pattern=re.compile(r"^订单 (?P<order_id>\S+) 的反馈记录（共 (?P<count>\d+) 条）：\s*\n(?P<feedbacks>.*)", re.S),
+        renderer="订单 {order_id} 共有 {count} 条反馈记录：\n\n{feedbacks}"
+    ),
+    ResponseTemplate(
+        tool="feedback-get-feedback-by-order",
+        pattern=re.compile(r"^订单 (?P<order_id>\S+) 暂无反馈记录"),
+        renderer="订单 {order_id} 还没有反馈记录。"
+    ),
+    ResponseTemplate(
+        tool="feedback-update-solution",
+        pattern=re.compile(r"^反馈ID (?P<feedback_id>\d+) 的解决方案更新成功：(?P<solution>.*)", re.S),
+        renderer="反馈 {feedback_id} 的解决方案已更新：{solution}"
+    ),
+    # 咨询（只处理 "未找到" 这类确定的结果，产品介绍和知识库检索需要结合用户问题回答，仍交给 LLM）
+    ResponseTemplate(
+        tool="consult-get-product-info",
+        pattern=re.compile(r"^产品不存在或已下架: (?P<product>.+)"),
+        renderer="抱歉，{product} 暂时不在我们的菜单上（可能已下架）。需要我为您介绍一下现有的产品吗？"
+    ),
+    ResponseTemplate(
+        tool="consult-search-products",
+        pattern=re.compile(r"^未找到匹配的产品: (?P<product>.+)"),
+        renderer="抱歉，没有找到和「{product}」相关的产品。需要我为您介绍一下现有的产品吗？"
+    ),
+]
+
+
+class ResponseTemplateEngine:
+    """回复模板引擎 - 按工具名称和结果格式选择模板，并统计命中情况"""
+    
+    def __init__(self, templates: Optional[List[ResponseTemplate]] = None):
+        """
+        初始化模板引擎
+        
+        Args:
+            templates: 模板列表，为 None 时使用默认模板
+        """
+        self._templates: Dict[str, List[ResponseTemplate]] = {}
+        for template in (DEFAULT_TEMPLATES if templates is None else templates):
+            self.register(template)
+        
+        self._lock = threading.Lock()
+        self.rendered = 0  # 使用模板生成回复的次数
+        self.fallbacks = 0  # 没有匹配模板、交给 LLM 的次数
+        self.by_tool: Dict[str, Dict[str, int]] = {}  # 按工具统计
+    
+    def register(self, template: ResponseTemplate):
+        """
+        注册模板
+        
+        Args:
+            template: ResponseTemplate 对象
+        """
+        self._templates.setdefault(template.tool, []).append(template)
+    
+    def render(self, tool_name: str, tool_result: str) -> Optional[str]:
+        """
+        渲染工具结果对应的回复
+        
+        Args:
+            tool_name: 工具名称
+            tool_result: 工具调用结果
+        
+        Returns:
+            渲染后的回复，没有匹配的模板时返回 None（需要调用 LLM 生成回复）
+        """
+        reply = None
+        for template in self._templates.get(tool_name, []):
+            reply = template.render(tool_result)
+            if reply is not None:
+                break
+        
+        with self._lock:
+            counts = self.by_tool.setdefault(tool_name, {"rendered": 0, "fallbacks": 0})
+            if reply is not None:
+                self.rendered += 1
+                counts["rendered"] += 1
+            else:
+                self.fallbacks += 1
+                counts["fallbacks"] += 1
+        return reply
+    
+    def stats(self) -> Dict:
+        """获取模板命中统计（rendered 即省去的 LLM 调用次数）"""
+        with self._lock:
+            total = self.rendered + self.fallbacks
+            return {
+                "rendered": self.rendered,
+                "fallbacks": self.fallbacks,
+                "hit_rate": round(self.rendered / total, 4) if total else 0.0,
+                "by_tool": {tool: dict(counts) for tool, counts in self.by_tool.items()}
+            }
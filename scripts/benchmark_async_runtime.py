@@ -0,0 +1,226 @@
+"""
+并发上限对比 - 线程运行时（Flask + gunicorn gthread）vs asyncio 运行时（aiohttp）
+
+用法:
+    python scripts/benchmark_async_runtime.py
+    python scripts/benchmark_async_runtime.py --concurrency 100 500 2000 --latency-ms 500 --threads 64
+
+模拟一次对话的调用链：压测客户端 → 被测 Agent → 上游服务（模拟 LLM / 子智能体，固定耗时）。
+被测 Agent 分别以线程模式（同步 A2AClient）和 asyncio 模式（AsyncA2AClient）运行，
+在不同并发数下统计吞吐量、延迟分位数，以及实际同时在途的对话数（吞吐量 × 单次耗时）。
+线程模式的在途对话数受线程数限制，asyncio 模式只受上游耗时和 CPU 限制。
+"""
+import sys
+import time
+import signal
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import aiohttp
+
+
+def serve_upstream(args):
+    """子进程：模拟 LLM / 子智能体的上游服务（asyncio，固定耗时）"""
+    from a2a.async_server import AsyncA2AServer
+    from serving import ServerOptions
+    
+    latency = args.latency_ms / 1000.0
+    
+    async def handler(data):
+        await asyncio.sleep(latency)
+        return f"echo: {data.get('input', '')}"
+    
+    server = AsyncA2AServer(agent_name="upstream_agent", port=args.port)
+    server.set_handler(handler)
+    server.run(host="127.0.0.1", options=ServerOptions(mode="async"))
+
+
+def _discovery(upstream_port: int):
+    """只包含上游服务的服务发现实例（不写入 services.json）"""
+    from service_discovery import ServiceDiscovery
+    
+    sd = ServiceDiscovery(method="config")
+    sd.services = {"upstream_agent": {
+        "host": "127.0.0.1",
+        "port": upstream_port,
+        "url": f"http://127.0.0.1:{upstream_port}"
+    }}
+    return sd
+
+
+def serve_threaded(args):
+    """子进程：线程模式的被测 Agent（每个在途请求占用一个线程）"""
+    from a2a.server import A2AServer
+    from a2a.client import A2AClient
+    from serving import ServerOptions
+    
+    client = A2AClient(service_discovery=_discovery(args.upstream_port))
+    
+    def handler(data):
+        return client.call_agent("upstream_agent", data, timeout=60)["output"]
+    
+    server = A2AServer(agent_name="threaded_agent", port=args.port)
+    server.set_handler(handler)
+    server.run(host="127.0.0.1", options=ServerOptions(
+        mode="production", workers=1, threads=args.threads,
+        max_connections=100000, backlog=4096, timeout=300
+    ))
+
+
+def serve_async(args):
+    """子进程：asyncio 模式的被测 Agent（等待上游时不占用线程）"""
+    from a2a.async_server import AsyncA2AServer
+    from a2a.async_client import AsyncA2AClient
+    from serving import ServerOptions
+    
+    client = AsyncA2AClient(service_discovery=_discovery(args.upstream_port))
+    
+    async def handler(data):
+        return (await client.call_agent("upstream_agent", data, timeout=60))["output"]
+    
+    server = AsyncA2AServer(agent_name="async_agent", port=args.port)
+    server.set_handler(handler)
+    server.run(host="127.0.0.1", options=ServerOptions(mode="async", backlog=4096))
+
+
+def spawn(role: str, port: int, args) -> subprocess.Popen:
+    """以子进程方式启动服务"""
+    cmd = [sys.executable, __file__, "--serve", role, "--port", str(port),
+           "--upstream-port", str(args.upstream_port), "--threads", str(args.threads),
+           "--latency-ms", str(args.latency_ms)]
+    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop(process: subprocess.Popen):
+    """停止子进程"""
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def wait_until_ready(url: str, timeout: float = 15.0) -> bool:
+    """等待服务启动"""
+    deadline = time.time() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.time() < deadline:
+            try:
+                async with session.get(f"{url}/a2a/health") as response:
+                    if response.status == 200:
+                        return True
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    return False
+
+
+async def run_load(url: str, concurrency: int, duration: float) -> dict:
+    """保持 concurrency 个在途请求持续 duration 秒，返回吞吐量和延迟统计"""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=120)
+    
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def worker(worker_id: int):
+            nonlocal errors
+            i = 0
+            while time.perf_counter() < deadline:
+                payload = {"input": f"ping {worker_id}-{i}", "chat_id": f"c{worker_id}"}
+                start = time.perf_counter()
+                try:
+                    async with session.post(f"{url}/a2a/invoke", json=payload) as response:
+                        await response.read()
+                        ok = response.status == 200
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+                i += 1
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else 0.0
+    return {
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": pick(0.50),
+        "p99_ms": pick(0.99),
+        "errors": errors
+    }
+
+
+async def benchmark(args):
+    """启动上游服务和两种模式的被测 Agent，依次在各并发数下压测"""
+    upstream = spawn("upstream", args.upstream_port, args)
+    results = []
+    try:
+        if not await wait_until_ready(f"http://127.0.0.1:{args.upstream_port}"):
+            print("❌ 上游服务启动失败（需要安装 aiohttp）")
+            return
+        
+        for index, role in enumerate(["threaded", "async"]):
+            port = args.port + index
+            process = spawn(role, port, args)
+            url = f"http://127.0.0.1:{port}"
+            try:
+                if not await wait_until_ready(url):
+                    print(f"❌ {role} 模式服务启动失败（threaded 模式需要安装 gunicorn 或 waitress）")
+                    continue
+                await run_load(url, 10, 1.0)  # 预热
+                for concurrency in args.concurrency:
+                    result = await run_load(url, concurrency, args.duration)
+                    result["mode"] = f"threaded (threads={args.threads})" if role == "threaded" else "async"
+                    result["concurrency"] = concurrency
+                    # 实际同时在途的对话数（Little 定律）
+                    result["in_flight"] = result["rps"] * args.latency_ms / 1000.0
+                    results.append(result)
+            finally:
+                stop(process)
+    finally:
+        stop(upstream)
+    
+    print("=" * 86)
+    print(f"并发上限对比（上游耗时={args.latency_ms}ms，每轮 {args.duration}s）")
+    print("=" * 86)
+    print(f"{'模式':<26}{'并发':>8}{'req/s':>10}{'在途':>8}{'p50(ms)':>10}{'p99(ms)':>10}{'错误':>8}")
+    for r in results:
+        print(f"{r['mode']:<26}{r['concurrency']:>8}{r['rps']:>10.1f}{r['in_flight']:>8.0f}"
+              f"{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="线程运行时与 asyncio 运行时的并发上限对比")
+    parser.add_argument("--serve", choices=["upstream", "threaded", "async"], help="内部使用：以子进程方式启动服务")
+    parser.add_argument("--port", type=int, default=18090)
+    parser.add_argument("--upstream-port", type=int, default=18099)
+    parser.add_argument("--threads", type=int, default=32, help="线程模式的线程数")
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="上游服务模拟的耗时（毫秒）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--duration", type=float, default=5.0, help="每轮压测时长（秒）")
+    args = parser.parse_args()
+    
+    if args.serve == "upstream":
+        serve_upstream(args)
+    elif args.serve == "threaded":
+        serve_threaded(args)
+    elif args.serve == "async":
+        serve_async(args)
+    else:
+        asyncio.run(benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+多会话网关压测 - 并发会话吞吐量（sessions/sec）和每个会话的内存占用
+
+用法:
+    DASHSCOPE_API_KEY=... python scripts/benchmark_gateway.py
+    DASHSCOPE_API_KEY=... python scripts/benchmark_gateway.py --sessions 2000 --turns 3 --concurrency 64 --latency-ms 50
+    DASHSCOPE_API_KEY=... python scripts/benchmark_gateway.py --multi-intent --concurrency 64 [--shared-executors]
+
+网关在本进程的后台线程中启动（Flask 多线程服务器），会话使用真实的 SupervisorAgent
+（关键词路由、历史裁剪等都照常执行），只把子智能体调用替换为 sleep 模拟的业务耗时，
+不需要启动子智能体和 LLM。压测客户端为每个会话依次发送 --turns 轮对话，
+多个会话之间并发执行；最后用 tracemalloc 统计每个会话占用的内存。
+
+--multi-intent 时每轮都是需要并发调用两个子智能体的消息，用来比较多意图线程池按并发数设置
+（默认，见 SupervisorAgent.size_executors）和所有会话共用默认大小线程池（--shared-executors）的吞吐量。
+"""
+import sys
+import time
+import logging
+import argparse
+import threading
+import tracemalloc
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import requests
+from werkzeug.serving import make_server
+
+from gateway import SupervisorGateway, SupervisorSessionPool
+from supervisor_agent import SupervisorAgent
+
+# 每轮对话的输入（都能被关键词路由命中，不调用 LLM）
+TURNS = ["来一杯云边茉莉", "有什么推荐", "我要投诉，奶茶太甜了", "再来两杯珍珠奶茶，少糖"]
+# 多意图消息（拆分给订单和咨询两个子智能体并发调用）
+MULTI_INTENT_TURNS = ["来一杯云边茉莉，另外有什么推荐"]
+
+
+def make_template(latency: float) -> SupervisorAgent:
+    """创建模板 SupervisorAgent，子智能体调用用 sleep 模拟"""
+    template = SupervisorAgent(user_id="benchmark", chat_id="benchmark")
+    
+    def call_sub_agent(agent_name: str, user_input: str) -> str:
+        time.sleep(latency)
+        return f"[{agent_name}] 已处理: {user_input}"
+    
+    # new_session 复制实例属性，所有会话都使用模拟的子智能体调用
+    template.call_sub_agent = call_sub_agent
+    return template
+
+
+def run_load(url: str, sessions: int, turns: int, concurrency: int, texts: list = TURNS) -> dict:
+    """并发执行多个会话，每个会话依次发送多轮对话"""
+    local = threading.local()
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    
+    def run_session(index: int):
+        nonlocal errors
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        for turn in range(turns):
+            start = time.perf_counter()
+            try:
+                response = local.session.post(f"{url}/chat", json={
+                    "user_id": f"user_{index}",
+                    "chat_id": f"chat_{index}",
+                    "input": texts[turn % len(texts)]
+                }, timeout=30)
+                ok = response.status_code == 200
+            except requests.exceptions.RequestException:
+                ok = False
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                if not ok:
+                    errors += 1
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(run_session, range(sessions)))
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    return {
+        "elapsed": elapsed,
+        "sessions_per_sec": sessions / elapsed,
+        "turns_per_sec": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "errors": errors
+    }
+
+
+def measure_memory(template: SupervisorAgent, sessions: int, turns: int) -> float:
+    """统计每个会话（含 turns 轮对话历史）平均占用的内存（字节）"""
+    pool = SupervisorSessionPool(template.new_session, max_sessions=sessions + 1, evict_interval=0)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for index in range(sessions):
+        with pool.session(f"chat_{index}", f"user_{index}") as session:
+            for turn in range(turns):
+                session.agent.chat(TURNS[turn % len(TURNS)])
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return total / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多会话网关压测")
+    parser.add_argument("--sessions", type=int, default=1000, help="会话数")
+    parser.add_argument("--turns", type=int, default=3, help="每个会话的对话轮数")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发会话数")
+    parser.add_argument("--latency-ms", type=float, default=20, help="模拟的子智能体耗时（毫秒）")
+    parser.add_argument("--port", type=int, default=18081)
+    parser.add_argument("--multi-intent", action="store_true", help="每轮都发送需要并发调用多个子智能体的消息")
+    parser.add_argument("--shared-executors", action="store_true",
+                        help="不按并发数设置线程池（所有会话共用默认大小的推测调用 / 多意图线程池）")
+    args = parser.parse_args()
+    
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # 不打印每个请求的访问日志
+    template = make_template(args.latency_ms / 1000.0)
+    if not args.shared_executors:
+        template.size_executors(args.concurrency)
+    texts = MULTI_INTENT_TURNS if args.multi_intent else TURNS
+    gateway = SupervisorGateway(port=args.port, pool=SupervisorSessionPool(template.new_session))
+    server = make_server("127.0.0.1", args.port, gateway.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{args.port}"
+    
+    print("=" * 60)
+    print(f"多会话网关压测: {args.sessions} 个会话 x {args.turns} 轮，并发 {args.concurrency}，"
+          f"子智能体耗时 {args.latency_ms:.0f} ms")
+    print("=" * 60)
+    result = run_load(url, args.sessions, args.turns, args.concurrency, texts)
+    server.shutdown()
+    
+    print(f"耗时: {result['elapsed']:.2f} s，错误: {result['errors']}")
+    print(f"吞吐量: {result['sessions_per_sec']:.1f} sessions/sec, {result['turns_per_sec']:.1f} turns/sec")
+    print(f"单轮延迟: p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms")
+    print(f"串行执行的理论吞吐量: {1000.0 / args.latency_ms / args.turns:.1f} sessions/sec")
+    print(f"网关会话统计: {gateway.pool.stats()}")
+    print(f"线程池: 推测调用 {template.speculation.max_workers} 个线程, 多意图 {template.multi_intent.max_workers} 个线程")
+    
+    memory_sessions = min(args.sessions, 500)
+    template.call_sub_agent = lambda agent_name, user_input: f"[{agent_name}] 已处理: {user_input}"
+    per_session = measure_memory(template, memory_sessions, args.turns)
+    print(f"每个会话的内存占用（{args.turns} 轮对话历史，{memory_sessions} 个会话平均）: {per_session / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
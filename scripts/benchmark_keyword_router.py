@@ -0,0 +1,132 @@
+"""
+关键词路由微基准 - 原实现（每次调用重建关键词列表、逐个子串查找）vs 编译后的 KeywordRouter
+
+用法:
+    python scripts/benchmark_keyword_router.py
+    python scripts/benchmark_keyword_router.py --iterations 20000
+
+先在一组典型输入上校验两种实现的路由结果一致，再分别统计单次路由的平均耗时，
+以及产品目录变大时的耗时变化（原实现的耗时随关键词数量线性增长，自动机只与输入长度有关）。
+原实现找到第一个命中的分组就返回，只能给出路由目标；KeywordRouter 一次扫描给出所有子智能体的得分。
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from supervisor_agent.keyword_router import KeywordRouter
+
+# 典型的用户输入（覆盖各子智能体和一般性对话）
+CORPUS = [
+    "我要一杯珍珠奶茶，少糖去冰",
+    "帮我查询订单 ORDER_1693654321000",
+    "珍珠奶茶两杯",
+    "红豆奶茶半糖热的",
+    "上次的奶茶太甜了，我要投诉",
+    "给你们提个建议，希望多出点新品",
+    "有什么推荐的吗",
+    "桂花云露是什么口味",
+    "最近有什么优惠活动",
+    "云雾观音怎么冲泡",
+    "你好",
+    "今天天气真不错",
+    "谢谢，再见",
+    "奶茶好喝吗",
+    "我觉得你们的服务有问题",
+    "How much is the bubble tea?",
+]
+
+
+def legacy_route(user_input: str, extra_products=()):
+    """原来的 SupervisorAgent._route_by_keywords 实现（作为对照），extra_products 模拟更大的产品目录"""
+    user_input_lower = user_input.lower()
+    
+    order_keywords = [
+        "下单", "订单", "点单", "购买", "结账", "支付", "购物车",
+        "取消订单", "修改订单", "查询订单", "我要", "给我", "来一杯",
+        "来一份", "要一杯", "要一份", "点一杯", "点一份"
+    ]
+    if any(keyword in user_input_lower for keyword in order_keywords):
+        return "order_agent"
+    
+    product_names = ["云边茉莉", "桂花云露", "云雾观音", "珍珠奶茶", "红豆奶茶", "奶茶"] + list(extra_products)
+    has_product = any(product in user_input for product in product_names)
+    has_quantity = any(word in user_input for word in ["一杯", "一份", "两杯", "两份", "1杯", "2杯", "三杯", "四杯"])
+    has_spec = any(word in user_input for word in ["少糖", "半糖", "微糖", "无糖", "标准糖",
+                                                    "正常冰", "少冰", "去冰", "温", "热", "热饮"])
+    if has_product and (has_quantity or has_spec):
+        return "order_agent"
+    
+    feedback_keywords = ["反馈", "投诉", "建议", "差评", "不满意", "问题", "意见"]
+    if any(keyword in user_input_lower for keyword in feedback_keywords):
+        return "feedback_agent"
+    
+    consult_keywords = ["咨询", "介绍", "推荐", "产品", "活动", "优惠", "价格", "口味", "什么", "怎么", "如何"]
+    if any(keyword in user_input_lower for keyword in consult_keywords):
+        return "consult_agent"
+    
+    return None
+
+
+def time_per_call(func, iterations: int) -> float:
+    """对整个语料重复调用 iterations 轮，返回单次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text in CORPUS:
+            func(text)
+    elapsed = time.perf_counter() - start
+    return elapsed / (iterations * len(CORPUS)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="关键词路由微基准")
+    parser.add_argument("--iterations", type=int, default=5000, help="语料重复轮数")
+    parser.add_argument("--catalog-sizes", type=int, nargs="+", default=[50, 200, 1000], help="模拟的产品目录大小")
+    args = parser.parse_args()
+    
+    router = KeywordRouter(reload_interval=0)
+    
+    # 1. 校验路由结果一致
+    mismatches = [(text, legacy_route(text), router.route(text))
+                  for text in CORPUS if legacy_route(text) != router.route(text)]
+    for text, expected, actual in mismatches:
+        print(f"❌ 路由结果不一致: {text!r}: 原实现={expected}, KeywordRouter={actual}")
+    if mismatches:
+        sys.exit(1)
+    print(f"✅ {len(CORPUS)} 条输入的路由结果与原实现一致")
+    
+    # 2. 统计耗时
+    legacy_us = time_per_call(legacy_route, args.iterations)
+    route_us = time_per_call(router.route, args.iterations)
+    scores_us = time_per_call(router.scores, args.iterations)
+    
+    print("=" * 60)
+    print(f"单次路由平均耗时（{len(CORPUS)} 条输入 × {args.iterations} 轮）")
+    print("=" * 60)
+    print(f"{'原实现 (_route_by_keywords)':<36}{legacy_us:>10.2f} µs")
+    print(f"{'KeywordRouter.route':<36}{route_us:>10.2f} µs  ({legacy_us / route_us:.2f}x)")
+    print(f"{'KeywordRouter.scores（全部得分）':<36}{scores_us:>10.2f} µs")
+    
+    # 3. 产品目录变大时的耗时
+    print(f"\n{'产品数':>8}{'原实现(µs)':>14}{'KeywordRouter(µs)':>20}{'加速比':>10}")
+    for size in args.catalog_sizes:
+        catalog = [f"新品{i}号奶茶" for i in range(size)]
+        sized_router = KeywordRouter(product_loader=lambda: catalog, reload_interval=0,
+                                     product_refresh_interval=0, miss_refresh_interval=0)
+        sized_router._refresh_thread.join()  # 等待后台获取产品目录
+        iterations = max(1, args.iterations // 10)
+        legacy_sized_us = time_per_call(lambda text: legacy_route(text, catalog), iterations)
+        sized_us = time_per_call(sized_router.route, iterations)
+        print(f"{size:>8}{legacy_sized_us:>14.2f}{sized_us:>20.2f}{legacy_sized_us / sized_us:>9.1f}x")
+    
+    print("\n各输入的得分:")
+    for text in CORPUS:
+        print(f"  {text:<32} → {router.route(text)!s:<16} {router.scores(text)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+订单列表查询基准 - 原实现（每个订单单独查询订单项，N+1 次查询）vs OrderDAO 批量加载订单项
+
+用法:
+    python scripts/benchmark_order_items.py
+    python scripts/benchmark_order_items.py --history 50 200 1000 --rounds 20
+
+在临时 SQLite 数据库中为每种历史订单数生成一个用户（每个订单 1~3 个订单项），
+先校验两种实现返回的订单和订单项一致，再统计 get_orders_by_user 每次调用的查询次数和平均耗时。
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.db_manager import DatabaseManager
+from order_mcp_server.database import OrderDAO
+
+PRODUCTS = [("云边茉莉", 18.0), ("桂花云露", 20.0), ("云雾观音", 22.0), ("珍珠奶茶", 15.0), ("红豆奶茶", 16.0)]
+
+
+class CountingDatabaseManager(DatabaseManager):
+    """记录查询次数的 DatabaseManager"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queries = 0
+    
+    def fetch_one(self, query, params=None):
+        self.queries += 1
+        return super().fetch_one(query, params)
+    
+    def fetch_all(self, query, params=None):
+        self.queries += 1
+        return super().fetch_all(query, params)
+
+
+def legacy_get_orders_by_user(dao: OrderDAO, user_id: int):
+    """原来的 OrderDAO.get_orders_by_user 实现（作为对照）：每个订单单独查询订单项"""
+    orders = dao.db.fetch_all("SELECT * FROM orders WHERE user_id = ? ORDER BY created_at DESC", (user_id,))
+    for order in orders:
+        order["items"] = dao.get_order_items(order["order_id"])
+    return orders
+
+
+def populate(db: DatabaseManager, user_id: int, orders: int, rng: random.Random):
+    """为用户生成 orders 个历史订单"""
+    with db.transaction() as cursor:
+        for i in range(orders):
+            order_id = f"ORDER_{user_id}_{i}"
+            cursor.execute("INSERT INTO orders (order_id, user_id, total_price, created_at) VALUES (?, ?, ?, ?)",
+                           (order_id, user_id, 0, f"2024-01-01 00:00:{i:06d}"))
+            items = [(order_id, name, rng.randint(1, 5), rng.randint(1, 4), price, price)
+                     for name, price in rng.sample(PRODUCTS, rng.randint(1, 3))]
+            cursor.executemany(
+                "INSERT INTO order_items (order_id, product_id, product_name, sweetness, ice_level, "
+                "quantity, unit_price, item_price) VALUES (?, 0, ?, ?, ?, 1, ?, ?)", items)
+
+
+def measure(db: CountingDatabaseManager, load, rounds: int):
+    """返回 (每次调用的查询次数, 平均耗时毫秒)"""
+    queries = db.queries
+    start = time.perf_counter()
+    for _ in range(rounds):
+        load()
+    elapsed = time.perf_counter() - start
+    return (db.queries - queries) / rounds, elapsed / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="订单列表查询基准")
+    parser.add_argument("--history", type=int, nargs="+", default=[10, 50, 200, 1000], help="用户的历史订单数")
+    parser.add_argument("--rounds", type=int, default=10, help="每种实现的调用次数")
+    args = parser.parse_args()
+    
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = CountingDatabaseManager(db_type="sqlite", db_path=os.path.join(temp_dir, "orders.db"))
+        dao = OrderDAO(db_manager=db)
+        for user_id, orders in enumerate(args.history, start=1):
+            populate(db, user_id, orders, rng)
+        
+        # 1. 校验结果一致
+        for user_id in range(1, len(args.history) + 1):
+            if legacy_get_orders_by_user(dao, user_id) != dao.get_orders_by_user(user_id):
+                print(f"❌ 用户 {user_id} 的查询结果与原实现不一致")
+                sys.exit(1)
+        print(f"✅ {len(args.history)} 个用户的订单和订单项与原实现一致")
+        
+        # 2. 统计查询次数和耗时
+        print("=" * 60)
+        print(f"get_orders_by_user（每种实现调用 {args.rounds} 次取平均）")
+        print("=" * 60)
+        print(f"{'订单数':>8}{'原实现查询数':>14}{'批量查询数':>12}{'原实现(ms)':>14}{'批量(ms)':>12}{'加速比':>10}")
+        for user_id, orders in enumerate(args.history, start=1):
+            legacy_queries, legacy_ms = measure(db, lambda: legacy_get_orders_by_user(dao, user_id), args.rounds)
+            batch_queries, batch_ms = measure(db, lambda: dao.get_orders_by_user(user_id), args.rounds)
+            print(f"{orders:>8}{legacy_queries:>14.0f}{batch_queries:>12.0f}"
+                  f"{legacy_ms:>14.2f}{batch_ms:>12.2f}{legacy_ms / batch_ms:>9.1f}x")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+服务运行模式吞吐量对比 - dev（Flask 开发服务器）vs production（gunicorn / waitress）
+
+用法:
+    python scripts/benchmark_server_modes.py
+    python scripts/benchmark_server_modes.py --requests 2000 --concurrency 64 --latency-ms 20
+
+每种模式会在子进程中启动一个 A2AServer，处理函数用 sleep 模拟业务耗时，
+然后用多线程客户端（Keep-Alive）并发请求 /a2a/invoke，统计 requests/sec 和延迟分位数。
+"""
+import sys
+import time
+import signal
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import requests
+
+
+def serve(args):
+    """子进程：启动一个模拟业务耗时的 A2AServer"""
+    from a2a.server import A2AServer
+    from serving import ServerOptions
+    
+    latency = args.latency_ms / 1000.0
+    
+    def handler(data):
+        time.sleep(latency)
+        return f"echo: {data.get('input', '')}"
+    
+    server = A2AServer(agent_name="benchmark_agent", port=args.port)
+    server.set_handler(handler)
+    options = ServerOptions(mode=args.mode, workers=args.workers, threads=args.threads)
+    server.run(host="127.0.0.1", options=options)
+
+
+def wait_until_ready(url: str, timeout: float = 15.0) -> bool:
+    """等待服务启动"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/a2a/health", timeout=0.5).status_code == 200:
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def run_load(url: str, total: int, concurrency: int) -> dict:
+    """并发发送请求，返回吞吐量和延迟统计"""
+    local = threading.local()
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    
+    def one(i: int):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{url}/a2a/invoke", json={"input": f"ping {i}", "chat_id": f"c{i % 100}"}, timeout=30)
+            ok = response.status_code == 200
+        except requests.exceptions.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors[0] += 1
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(total)))
+    duration = time.perf_counter() - start
+    
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else 0.0
+    return {
+        "rps": len(latencies) / duration if duration else 0.0,
+        "p50_ms": pick(0.50),
+        "p99_ms": pick(0.99),
+        "errors": errors[0],
+        "duration": duration
+    }
+
+
+def benchmark(args):
+    """依次启动各模式的服务并压测"""
+    modes = [("dev", 1), ("production", args.workers)]
+    results = []
+    for index, (mode, workers) in enumerate(modes):
+        port = args.port + index
+        cmd = [sys.executable, __file__, "--serve", "--mode", mode, "--port", str(port),
+               "--workers", str(workers), "--threads", str(args.threads),
+               "--latency-ms", str(args.latency_ms)]
+        process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        url = f"http://127.0.0.1:{port}"
+        try:
+            if not wait_until_ready(url):
+                print(f"❌ {mode} 模式服务启动失败（production 模式需要安装 gunicorn 或 waitress）")
+                continue
+            run_load(url, min(50, args.requests), args.concurrency)  # 预热
+            result = run_load(url, args.requests, args.concurrency)
+            result["mode"] = f"{mode} (workers={workers}, threads={args.threads})" if mode == "production" else mode
+            results.append(result)
+        finally:
+            # 发送 SIGTERM，production 模式会等待在途请求完成后退出
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=args.graceful_timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    
+    print("=" * 80)
+    print(f"服务运行模式吞吐量对比（请求数={args.requests}, 并发={args.concurrency}, 模拟耗时={args.latency_ms}ms）")
+    print("=" * 80)
+    print(f"{'模式':<40}{'req/s':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'错误':>8}")
+    for r in results:
+        print(f"{r['mode']:<40}{r['rps']:>10.1f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errors']:>8}")
+    if len(results) == 2 and results[0]["rps"] > 0:
+        print()
+        print(f"production / dev 吞吐量提升: {results[1]['rps'] / results[0]['rps']:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="服务运行模式吞吐量对比")
+    parser.add_argument("--serve", action="store_true", help="内部使用：以子进程方式启动测试服务")
+    parser.add_argument("--mode", default="dev")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="处理函数模拟的业务耗时（毫秒）")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--graceful-timeout", type=int, default=10)
+    args = parser.parse_args()
+    
+    if args.serve:
+        serve(args)
+    else:
+        benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+SQLite 性能配置基准 - SQLite 默认设置（回滚日志、synchronous=FULL）vs DatabaseManager 的 SQLITE_PRAGMAS
+
+用法:
+    python scripts/benchmark_sqlite_profile.py
+    python scripts/benchmark_sqlite_profile.py --orders 2000 --threads 8 --duration 3
+
+每种配置使用临时目录中的新数据库，通过 OrderDAO 依次测量：
+1. 下单吞吐：多个线程并发创建订单（订单 + 2 个订单项在一个事务中提交）
+2. 查询吞吐：多个线程并发按订单号 / 按用户查询订单
+3. 高峰混合负载：一半线程持续下单、一半线程持续查询，分别统计吞吐和查询延迟
+默认设置下每次提交都 fsync 回滚日志，且写入时读者被阻塞；WAL + NORMAL 下提交只追加写 WAL，读写互不阻塞。
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.db_manager import DatabaseManager
+from order_mcp_server.database import OrderDAO
+
+USERS = 50  # 模拟的用户数
+
+
+def place_order(dao: OrderDAO, order_id: str, user_id: int):
+    """创建订单和 2 个订单项（与 OrderService.create_order 相同，在一个事务中提交）"""
+    with dao.transaction():
+        dao.create_order({"order_id": order_id, "user_id": user_id, "total_price": 33.0})
+        for name, price in (("云边茉莉", 18.0), ("珍珠奶茶", 15.0)):
+            dao.create_order_item({
+                "order_id": order_id, "product_name": name, "sweetness": 3, "ice_level": 2,
+                "quantity": 1, "unit_price": price, "item_price": price
+            })
+
+
+def run_threads(threads: int, worker) -> float:
+    """启动 threads 个线程执行 worker(线程序号)，返回总耗时（秒）"""
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def percentile(values, p: float) -> float:
+    """取第 p 分位的值（p 为 0~1）"""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def benchmark(pragmas, args, temp_dir: str, label: str) -> dict:
+    """对一种配置运行全部负载"""
+    db = DatabaseManager(db_type="sqlite", db_path=os.path.join(temp_dir, f"{label}.db"),
+                         pool_size=args.threads, pragmas=pragmas)
+    dao = OrderDAO(db_manager=db)
+    result = {}
+    
+    # 1. 下单吞吐
+    per_thread = args.orders // args.threads
+    elapsed = run_threads(args.threads, lambda t: [
+        place_order(dao, f"ORDER_{label}_{t}_{i}", (t * per_thread + i) % USERS + 1) for i in range(per_thread)])
+    result["insert"] = per_thread * args.threads / elapsed
+    order_ids = [f"ORDER_{label}_{t}_{i}" for t in range(args.threads) for i in range(per_thread)]
+    
+    # 2. 查询吞吐
+    queries = args.orders
+    per_thread = queries // args.threads
+    
+    def query_worker(t: int):
+        rng = random.Random(t)
+        for i in range(per_thread):
+            if i % 2:
+                dao.get_order_by_id(rng.choice(order_ids))
+            else:
+                dao.get_orders_by_user(rng.randint(1, USERS))
+    
+    result["query"] = per_thread * args.threads / run_threads(args.threads, query_worker)
+    
+    # 3. 高峰混合负载
+    writers = max(1, args.threads // 2)
+    deadline = time.perf_counter() + args.duration
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    latencies = []
+    lock = threading.Lock()
+    
+    def mixed_worker(t: int):
+        rng = random.Random(t)
+        i = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if t < writers:
+                    place_order(dao, f"ORDER_{label}_mixed_{t}_{i}", rng.randint(1, USERS))
+                else:
+                    dao.get_order_by_id(rng.choice(order_ids))
+            except Exception:
+                with lock:
+                    counts["errors"] += 1
+                continue
+            finally:
+                i += 1
+            with lock:
+                if t < writers:
+                    counts["writes"] += 1
+                else:
+                    counts["reads"] += 1
+                    latencies.append(time.perf_counter() - start)
+    
+    elapsed = run_threads(args.threads, mixed_worker)
+    result["mixed_writes"] = counts["writes"] / elapsed
+    result["mixed_reads"] = counts["reads"] / elapsed
+    result["mixed_p99_ms"] = percentile(latencies, 0.99) * 1000
+    result["errors"] = counts["errors"]
+    result["maintenance"] = db.maintain()
+    db.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite 性能配置基准")
+    parser.add_argument("--orders", type=int, default=1000, help="下单 / 查询阶段的操作数")
+    parser.add_argument("--threads", type=int, default=8, help="并发线程数（也是连接池大小）")
+    parser.add_argument("--duration", type=float, default=2.0, help="混合负载阶段的持续时间（秒）")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):  # OrderDAO 每次下单都会打印日志
+            default = benchmark({}, args, temp_dir, "default")
+            tuned = benchmark(None, args, temp_dir, "tuned")
+    
+    print("=" * 60)
+    print(f"SQLite 性能配置基准（{args.threads} 线程，{args.orders} 次下单 / 查询）")
+    print("=" * 60)
+    print(f"{'指标':<24}{'默认设置':>12}{'SQLITE_PRAGMAS':>16}{'提升':>10}")
+    rows = [
+        ("下单 (单/秒)", "insert"),
+        ("查询 (次/秒)", "query"),
+        ("混合负载-下单 (单/秒)", "mixed_writes"),
+        ("混合负载-查询 (次/秒)", "mixed_reads"),
+    ]
+    for name, key in rows:
+        print(f"{name:<24}{default[key]:>12.1f}{tuned[key]:>16.1f}{tuned[key] / max(default[key], 1e-9):>9.2f}x")
+    print(f"{'混合负载-查询 p99 (ms)':<24}{default['mixed_p99_ms']:>12.2f}{tuned['mixed_p99_ms']:>16.2f}")
+    print(f"{'失败次数':<24}{default['errors']:>12}{tuned['errors']:>16}")
+    print(f"\n例行维护（wal_checkpoint + optimize）: {tuned['maintenance']}")
+
+
+if __name__ == "__main__":
+    main()
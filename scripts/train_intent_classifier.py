@@ -0,0 +1,113 @@
+"""
+意图分类器训练 / 评估工具
+
+用法:
+    # 用种子样本和路由决策日志训练模型，保存到 supervisor_agent/intent_model.npz
+    python scripts/train_intent_classifier.py train --log data/routing_decisions.jsonl
+    
+    # 离线评估：k 折交叉验证的准确率、各类别召回率、校准误差、阈值下的覆盖率，以及单次预测耗时
+    python scripts/train_intent_classifier.py report --log data/routing_decisions.jsonl --threshold 0.85
+
+路由决策日志由 SupervisorAgent 在设置 ROUTING_LOG_FILE 环境变量后写入，
+只有关键词路由和 LLM 给出的判断会作为训练标签（分类器自己的判断不参与训练）。
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+from supervisor_agent.intent_classifier import (
+    IntentClassifier, load_training_data, DEFAULT_SEED_FILE, INTENT_MODEL_FILE, INTENT_CONFIDENCE_THRESHOLD
+)
+
+
+def train(args):
+    """训练并保存模型"""
+    texts, labels = load_training_data([args.seed] + args.log)
+    if not texts:
+        print("❌ 没有可用的训练数据")
+        sys.exit(1)
+    model = IntentClassifier(alpha=args.alpha).fit_calibrated(texts, labels)
+    model.save(args.output)
+    counts = {label: labels.count(label) for label in model.labels}
+    print(f"✅ 使用 {len(texts)} 条样本训练完成: {counts}")
+    print(f"   词表大小: {len(model.vocabulary)}, 温度系数: {model.temperature:.2f}")
+    print(f"   模型已保存到 {args.output}")
+
+
+def report(args):
+    """k 折交叉验证评估"""
+    texts, labels = load_training_data([args.seed] + args.log)
+    if len(texts) < args.folds:
+        print("❌ 训练数据不足")
+        sys.exit(1)
+    
+    folds = np.array_split(np.random.default_rng(0).permutation(len(texts)), args.folds)
+    predictions, confidences, latencies = [], [], []
+    truth = []
+    for k, test_index in enumerate(folds):
+        train_index = np.concatenate([fold for j, fold in enumerate(folds) if j != k])
+        model = IntentClassifier(alpha=args.alpha).fit_calibrated(
+            [texts[i] for i in train_index], [labels[i] for i in train_index]
+        )
+        for i in test_index:
+            start = time.perf_counter()
+            label, confidence = model.predict(texts[i])
+            latencies.append(time.perf_counter() - start)
+            predictions.append(label)
+            confidences.append(confidence)
+            truth.append(labels[i])
+    
+    predictions, truth = np.array(predictions), np.array(truth)
+    confidences = np.array(confidences)
+    correct = predictions == truth
+    confident = confidences >= args.threshold
+    
+    # 期望校准误差（按置信度分 10 个桶）
+    bins = np.minimum((confidences * 10).astype(int), 9)
+    ece = sum(abs(correct[bins == b].mean() - confidences[bins == b].mean()) * (bins == b).mean()
+              for b in range(10) if (bins == b).any())
+    
+    latencies_us = np.array(latencies) * 1e6
+    print("=" * 60)
+    print(f"意图分类器离线评估（{len(texts)} 条样本，{args.folds} 折交叉验证）")
+    print("=" * 60)
+    print(f"准确率: {correct.mean():.1%}")
+    for label in IntentClassifier().labels:
+        mask = truth == label
+        if mask.any():
+            print(f"  {label:<16} 召回率 {correct[mask].mean():.1%}  ({mask.sum()} 条)")
+    print(f"期望校准误差 (ECE): {ece:.3f}")
+    print(f"阈值 {args.threshold}: 本地处理 {confident.mean():.1%}，"
+          f"其中准确率 {correct[confident].mean() if confident.any() else 0:.1%}，"
+          f"其余 {1 - confident.mean():.1%} 交给 LLM")
+    print(f"单次预测耗时: p50 {np.percentile(latencies_us, 50):.1f} µs, p99 {np.percentile(latencies_us, 99):.1f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="意图分类器训练 / 评估")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name in ("train", "report"):
+        sub = subparsers.add_parser(name)
+        sub.add_argument("--seed", default=str(DEFAULT_SEED_FILE), help="种子样本文件")
+        sub.add_argument("--log", nargs="*", default=[], help="路由决策日志文件")
+        sub.add_argument("--alpha", type=float, default=0.5, help="平滑系数")
+    subparsers.choices["train"].add_argument("--output", default=INTENT_MODEL_FILE, help="模型保存路径")
+    subparsers.choices["report"].add_argument("--folds", type=int, default=5)
+    subparsers.choices["report"].add_argument("--threshold", type=float, default=INTENT_CONFIDENCE_THRESHOLD)
+    args = parser.parse_args()
+    
+    if args.command == "train":
+        train(args)
+    else:
+        report(args)
+
+
+if __name__ == "__main__":
+    main()
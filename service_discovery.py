@@ -1,8 +1,37 @@
 """
 服务发现模块 - 支持多种方式
+
+配置文件方式:
+- 读取时最多每 DISCOVERY_RELOAD_INTERVAL 秒检查一次 services.json 的修改时间和大小，
+  发生变化时重新加载，服务迁移到新端口不需要重启进程
+- 重新加载时整体替换服务快照（读操作不加锁，只会看到完整的旧配置或新配置）；
+  文件内容不完整（正在被写入）时保留旧快照，下次检查时重试；本模块写文件时先写临时文件再原子替换
+- register / deregister 持有文件锁（.<配置文件名>.lock）重新读取文件后再合并写回，
+  多个进程同时注册时不会覆盖彼此的实例
+- 服务发生变化时调用变更回调，客户端据此关闭到已删除实例的空闲连接
+
+Redis 方式:
+- 每个实例保存为一个带过期时间的哈希（services:instance:<服务名>:<url>），
+  服务的实例列表保存在集合 services:index:<服务名> 中，过期的实例在读取时清理
+- register 后台心跳定期续期，进程退出后实例在 DISCOVERY_REDIS_TTL 秒内自动下线
+- discover / discover_all 读取进程内缓存（DISCOVERY_CACHE_TTL 秒），注册和注销时通过
+  发布订阅（services:changes 频道）通知其他进程立即失效缓存；订阅断开时退化为按缓存时间轮询
+
+数据库方式:
+- 实例保存在 service_instances 表中（默认使用 DatabaseManager 的 SQLite 数据库，支持 MySQL），
+  (service_name, url) 唯一索引用于按服务查询和注册时的 upsert，heartbeat_at 索引用于清理过期实例
+- register 后台心跳定期更新 heartbeat_at 并清理超过 DISCOVERY_DB_TTL 秒没有心跳的实例；
+  读取时同样忽略过期的实例，进程退出后实例自动下线
+- discover / discover_all 读取进程内缓存（DISCOVERY_CACHE_TTL 秒）；没有变更通知，
+  其他进程的注册 / 注销在缓存过期后可见，缓存刷新时发现实例被删除会调用变更回调
 """
+import os
+import sys
 import json
-from typing import Dict, Optional
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 
 # 尝试导入可选依赖
@@ -12,6 +41,20 @@ try:
 except ImportError:
     REDIS_AVAILABLE = False
 
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False  # Windows 上没有文件锁，只在进程内串行化配置文件的修改
+
+# 默认配置（可通过环境变量覆盖）
+DISCOVERY_REDIS_TTL = int(os.getenv("DISCOVERY_REDIS_TTL", "30"))  # Redis 中实例注册的过期时间（秒），由心跳续期
+DISCOVERY_HEARTBEAT_INTERVAL = float(os.getenv("DISCOVERY_HEARTBEAT_INTERVAL", "10"))  # 心跳间隔（秒）
+DISCOVERY_DB_TTL = int(os.getenv("DISCOVERY_DB_TTL", "30"))  # 数据库中实例多久没有心跳视为下线（秒）
+DISCOVERY_CACHE_TTL = float(os.getenv("DISCOVERY_CACHE_TTL", "5"))  # 服务发现结果的进程内缓存时间（秒）
+DISCOVERY_RELOAD_INTERVAL = float(os.getenv("DISCOVERY_RELOAD_INTERVAL", "1"))  # 检查 services.json 是否修改的间隔（秒），0 表示不重新加载
+DISCOVERY_CHANNEL = "services:changes"  # 服务变更通知频道（消息内容为服务名称）
+
 
 class ServiceDiscovery:
     """服务发现 - 支持配置文件、Redis、数据库等多种方式"""
@@ -25,31 +68,60 @@ class ServiceDiscovery:
             **kwargs: 配置参数
         """
         self.method = method
+        self._listeners: List[Callable[[str, List[str]], None]] = []  # 服务变更回调
         
         if method == "config":
             self.config_file = kwargs.get("config_file", "services.json")
+            self.reload_interval = kwargs.get("reload_interval", DISCOVERY_RELOAD_INTERVAL)
+            self._config_path = Path(__file__).parent / self.config_file
+            self._config_signature: Optional[Tuple[int, int]] = None  # 最近一次加载的 (修改时间, 大小)
+            self._next_check = time.monotonic() + self.reload_interval
+            self._reload_lock = threading.Lock()
+            self.reloads = 0
             self._load_from_config()
         elif method == "redis":
-            if not REDIS_AVAILABLE:
-                raise ImportError("请安装 redis: pip install redis")
-            self.redis_client = redis.Redis(
-                host=kwargs.get("redis_host", "localhost"),
-                port=kwargs.get("redis_port", 6379),
-                password=kwargs.get("redis_password"),
-                decode_responses=True
-            )
+            self.redis_client = kwargs.get("redis_client")  # 可传入已有客户端（如 LocalRedis）
+            if self.redis_client is None:
+                if not REDIS_AVAILABLE:
+                    raise ImportError("请安装 redis: pip install redis")
+                self.redis_client = redis.Redis(
+                    host=kwargs.get("redis_host", "localhost"),
+                    port=kwargs.get("redis_port", 6379),
+                    password=kwargs.get("redis_password"),
+                    decode_responses=True
+                )
+            self._init_registry(kwargs, DISCOVERY_REDIS_TTL)
         elif method == "database":
-            # TODO: 实现数据库方式
-            pass
+            self.db = kwargs.get("db_manager")  # 可传入已有的 DatabaseManager，默认与 MCP Server 共用连接池
+            if self.db is None:
+                self.db = self._create_db_manager()
+            self._init_registry(kwargs, DISCOVERY_DB_TTL)
+            self._init_db_table()
         else:
             raise ValueError(f"不支持的服务发现方式: {method}")
     
+    def _init_registry(self, kwargs: Dict, default_ttl: float):
+        """初始化 Redis 和数据库方式共用的注册、心跳和缓存状态"""
+        self.registration_ttl = kwargs.get("registration_ttl", default_ttl)
+        self.heartbeat_interval = kwargs.get("heartbeat_interval", DISCOVERY_HEARTBEAT_INTERVAL)
+        self.cache_ttl = kwargs.get("cache_ttl", DISCOVERY_CACHE_TTL)
+        self._cache: Dict[str, Tuple[float, List[Dict]]] = {}  # 服务名称 -> (读取时间, 实例列表)
+        self._cache_lock = threading.Lock()
+        self._registered: Dict[Tuple[str, str], Dict] = {}  # (服务名称, url) -> 本进程注册的实例（心跳续期）
+        self._stop = threading.Event()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._watch_thread: Optional[threading.Thread] = None
+        self._threads_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
     def _load_from_config(self):
         """从配置文件加载服务信息"""
-        config_path = Path(__file__).parent / self.config_file
+        config_path = self._config_path
         if config_path.exists():
             with open(config_path, 'r', encoding='utf-8') as f:
                 self.services = json.load(f)
+            self._config_signature = self._stat_config()
         else:
             # 默认配置
             self.services = {
@@ -73,10 +145,102 @@ class ServiceDiscovery:
             self._save_config()
     
     def _save_config(self):
-        """保存配置到文件"""
-        config_path = Path(__file__).parent / self.config_file
-        with open(config_path, 'w', encoding='utf-8') as f:
+        """保存配置到文件（先写临时文件再原子替换，其他进程不会读到写了一半的文件）"""
+        config_path = self._config_path
+        temp_path = config_path.with_name(f".{config_path.name}.{os.getpid()}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
             json.dump(self.services, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, config_path)
+        self._config_signature = self._stat_config()
+    
+    @contextmanager
+    def _config_update(self) -> Iterator[None]:
+        """
+        修改配置文件：持有进程内锁和文件锁，先重新读取文件（合并其他进程写入的修改），
+        调用方在此基础上修改 self.services 并 _save_config()；退出后通知重新读取时发现的变化
+        """
+        lock_path = self._config_path.with_name(f".{self._config_path.name}.lock")
+        with self._reload_lock:
+            with open(lock_path, 'a') as lock_file:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)  # 关闭文件时释放
+                changed = self._reread_config()
+                yield
+        for service_name, removed_urls in changed.items():
+            self._notify(service_name, removed_urls)
+    
+    def _reread_config(self) -> Dict[str, List[str]]:
+        """文件在上次加载 / 保存后被修改时重新读取（调用方需持有 self._reload_lock），返回变化的服务"""
+        signature = self._stat_config()
+        if signature is None or signature == self._config_signature:
+            return {}
+        try:
+            with open(self._config_path, 'r', encoding='utf-8') as f:
+                services = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[ServiceDiscovery] 重新读取 {self.config_file} 失败，在旧配置上修改: {e}", file=sys.stderr, flush=True)
+            return {}
+        old_services = self.services
+        self.services = services
+        self._config_signature = signature
+        self.reloads += 1
+        return self._diff_services(old_services, services)
+    
+    def _stat_config(self) -> Optional[Tuple[int, int]]:
+        """配置文件的 (修改时间, 大小)，文件不存在时返回 None"""
+        try:
+            stat = os.stat(self._config_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def _maybe_reload(self):
+        """配置文件发生变化时重新加载（最多每 reload_interval 秒检查一次）"""
+        if self.reload_interval <= 0:
+            return
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+        signature = self._stat_config()
+        if signature is None or signature == self._config_signature:
+            return
+        
+        with self._reload_lock:
+            if signature == self._config_signature:
+                return
+            try:
+                with open(self._config_path, 'r', encoding='utf-8') as f:
+                    services = json.load(f)
+            except (OSError, ValueError) as e:
+                # 文件正在被写入或内容有误：保留旧快照，下次检查时重试
+                print(f"[ServiceDiscovery] 重新加载 {self.config_file} 失败，继续使用旧配置: {e}", file=sys.stderr, flush=True)
+                return
+            old_services = self.services
+            self.services = services
+            self._config_signature = signature
+            self.reloads += 1
+        
+        changed = self._diff_services(old_services, services)
+        if changed:
+            print(f"[ServiceDiscovery] 已重新加载 {self.config_file}，变化的服务: {sorted(changed)}",
+                  file=sys.stderr, flush=True)
+        for service_name, removed_urls in changed.items():
+            self._notify(service_name, removed_urls)
+    
+    @classmethod
+    def _diff_services(cls, old_services: Dict, new_services: Dict) -> Dict[str, List[str]]:
+        """比较两份配置，返回 {发生变化的服务: 被删除的实例 URL}"""
+        changed = {}
+        for service_name in set(old_services) | set(new_services):
+            old_info = old_services.get(service_name)
+            new_info = new_services.get(service_name)
+            if old_info == new_info:
+                continue
+            new_urls = {instance.get("url") for instance in cls._expand_instances(new_info)}
+            changed[service_name] = [instance.get("url") for instance in cls._expand_instances(old_info)
+                                     if instance.get("url") not in new_urls]
+        return changed
     
     def discover(self, service_name: str) -> Optional[Dict]:
         """
@@ -84,27 +248,59 @@ class ServiceDiscovery:
         
         Args:
             service_name: 服务名称
-            
+        
         Returns:
             服务信息字典，包含 host, port, url 等
         """
         if self.method == "config":
-            return self.services.get(service_name)
-        elif self.method == "redis":
-            service_key = f"services:{service_name}"
-            service_info = self.redis_client.hgetall(service_key)
-            if service_info:
-                return {
-                    "host": service_info.get("host"),
-                    "port": int(service_info.get("port", 0)),
-                    "url": service_info.get("url", f"http://{service_info.get('host')}:{service_info.get('port')}")
-                }
-            return None
-        return None
+            self._maybe_reload()
+            instances = self._expand_instances(self.services.get(service_name))
+            return instances[0] if instances else None
+        instances = self._registry_discover(service_name)
+        return instances[0] if instances else None
+    
+    def discover_all(self, service_name: str) -> List[Dict]:
+        """
+        发现服务的所有实例（同一个 Agent 部署了多个副本时）
+        
+        配置文件中的服务可以用 "instances" 列出多个副本，其他字段（如 description）为所有副本共享:
+            "order_agent": {"description": "...", "instances": [{"host": "10.0.0.1", "port": 10006}, ...]}
+        
+        Args:
+            service_name: 服务名称
+        
+        Returns:
+            服务实例列表，每个实例包含 host, port, url 等；未找到时返回空列表
+        """
+        if self.method == "config":
+            self._maybe_reload()
+            return self._expand_instances(self.services.get(service_name))
+        return self._registry_discover(service_name)
+    
+    @staticmethod
+    def _expand_instances(service_info: Optional[Dict]) -> List[Dict]:
+        """把配置文件中的服务信息展开为实例列表"""
+        if not service_info:
+            return []
+        if "instances" not in service_info:
+            return [service_info]
+        shared = {key: value for key, value in service_info.items() if key != "instances"}
+        instances = []
+        for instance in service_info["instances"]:
+            merged = {**shared, **instance}
+            merged.setdefault("url", f"http://{merged.get('host')}:{merged.get('port')}")
+            instances.append(merged)
+        return instances
     
     def register(self, service_name: str, host: str, port: int, **kwargs):
         """
-        注册服务
+        注册服务实例
+        
+        配置文件方式下，同一服务注册不同地址的实例时追加到 "instances" 列表（多副本），
+        注册已有地址的实例时更新该实例
+        
+        Redis 和数据库方式下启动后台心跳定期续期（heartbeat=False 时不续期，
+        注册在 DISCOVERY_REDIS_TTL / DISCOVERY_DB_TTL 秒后过期）
         
         Args:
             service_name: 服务名称
@@ -112,6 +308,7 @@ class ServiceDiscovery:
             port: 服务端口
             **kwargs: 其他服务信息
         """
+        heartbeat = kwargs.pop("heartbeat", True)
         service_info = {
             "host": host,
             "port": port,
@@ -120,30 +317,457 @@ class ServiceDiscovery:
         }
         
         if self.method == "config":
-            self.services[service_name] = service_info
-            self._save_config()
+            with self._config_update():
+                # 复制后整体替换，不修改读操作正在使用的快照
+                self.services = {**self.services,
+                                 service_name: self._add_instance(self.services.get(service_name), service_info)}
+                self._save_config()
         elif self.method == "redis":
-            service_key = f"services:{service_name}"
-            self.redis_client.hset(service_key, mapping={
-                "host": host,
-                "port": str(port),
-                "url": service_info["url"],
-                "status": "active"
-            })
-            # 设置过期时间（可选，用于健康检查）
-            self.redis_client.expire(service_key, 300)  # 5分钟
+            self._redis_write(service_name, service_info)
+            self.redis_client.publish(DISCOVERY_CHANNEL, service_name)
+            self._invalidate(service_name)
+        else:
+            self._db_write([(service_name, service_info)])
+            self._invalidate(service_name)
+        if self.method != "config" and heartbeat:
+            self._registered[(service_name, service_info["url"])] = service_info
+            self._start_thread("_heartbeat_thread", self._heartbeat_loop, "discovery-heartbeat")
+    
+    @staticmethod
+    def _add_instance(existing: Optional[Dict], service_info: Dict) -> Dict:
+        """把实例加入配置文件中的服务信息（地址相同的实例被替换）"""
+        others = [instance for instance in ServiceDiscovery._expand_instances(existing)
+                  if instance.get("url") != service_info["url"]]
+        if not others:
+            return service_info
+        
+        # 所有实例相同的字段（如 description）放在服务上，其余字段放在各实例上
+        instances = others + [service_info]
+        shared = {key: value for key, value in instances[0].items()
+                  if all(instance.get(key) == value for instance in instances[1:])}
+        return {
+            **shared,
+            "instances": [{key: value for key, value in instance.items() if key not in shared}
+                          for instance in instances]
+        }
+    
+    def deregister(self, service_name: str, url: Optional[str] = None) -> bool:
+        """
+        注销服务实例
+        
+        Args:
+            service_name: 服务名称
+            url: 实例地址，为 None 时注销服务的所有实例
+        
+        Returns:
+            是否注销了实例
+        """
+        if self.method == "config":
+            with self._config_update():
+                instances = self._expand_instances(self.services.get(service_name))
+                remaining = [instance for instance in instances if url is not None and instance.get("url") != url]
+                if len(remaining) == len(instances):
+                    return False
+                service_info = None
+                for instance in remaining:
+                    service_info = self._add_instance(service_info, instance)
+                services = {name: info for name, info in self.services.items() if name != service_name}
+                if service_info is not None:
+                    services[service_name] = service_info
+                self.services = services
+                self._save_config()
+            remaining_urls = {instance.get("url") for instance in remaining}
+            self._notify(service_name, [instance.get("url") for instance in instances
+                                        if instance.get("url") not in remaining_urls])
+            return True
+        elif self.method == "redis":
+            index_key = self._redis_index_key(service_name)
+            urls = [url] if url is not None else list(self.redis_client.smembers(index_key))
+            for instance_url in urls:
+                self._registered.pop((service_name, instance_url), None)
+            if not urls:
+                return False
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.delete(*[self._redis_instance_key(service_name, instance_url) for instance_url in urls])
+            pipe.srem(index_key, *urls)
+            deleted, _ = pipe.execute()
+            self.redis_client.publish(DISCOVERY_CHANNEL, service_name)
+            self._invalidate(service_name)
+            self._notify(service_name, urls)
+            return bool(deleted)
+        
+        with self.db.transaction():
+            if url is not None:
+                urls = [url]
+                deleted = self._db_execute("DELETE FROM service_instances WHERE service_name = ? AND url = ?",
+                                           (service_name, url)).rowcount
+            else:
+                urls = [row["url"] for row in self._db_fetch_all(
+                    "SELECT url FROM service_instances WHERE service_name = ?", (service_name,))]
+                deleted = self._db_execute("DELETE FROM service_instances WHERE service_name = ?",
+                                           (service_name,)).rowcount
+        for instance_url in urls:
+            self._registered.pop((service_name, instance_url), None)
+        self._invalidate(service_name)
+        if deleted:
+            self._notify(service_name, urls)
+        return bool(deleted)
     
     def list_services(self) -> Dict[str, Dict]:
         """列出所有服务"""
         if self.method == "config":
+            self._maybe_reload()
             return self.services.copy()
         elif self.method == "redis":
+            # SCAN 遍历服务索引（不阻塞 Redis），实例列表和实例信息各用一次管道批量读取
+            index_prefix = self._redis_index_key("")
+            names = sorted(key[len(index_prefix):] for key in self.redis_client.scan_iter(match=index_prefix + "*", count=100))
+            pipe = self.redis_client.pipeline(transaction=False)
+            for name in names:
+                pipe.smembers(self._redis_index_key(name))
+            members = pipe.execute()
             services = {}
-            for key in self.redis_client.keys("services:*"):
-                service_name = key.replace("services:", "")
-                services[service_name] = self.discover(service_name)
+            for name, instances in zip(names, self._redis_read(names, members)):
+                service_info = None
+                for instance in instances:
+                    service_info = self._add_instance(service_info, instance)
+                if service_info is not None:
+                    services[name] = service_info
             return services
-        return {}
+        
+        services = {}
+        for row in self._db_fetch_fresh():
+            services[row["service_name"]] = self._add_instance(services.get(row["service_name"]),
+                                                               self._db_instance(row))
+        return services
+    
+    def add_listener(self, callback: Callable[[str, List[str]], None]):
+        """
+        注册服务变更回调（配置文件重新加载、注销实例、Redis 方式下收到其他进程的注册 / 注销通知、
+        缓存刷新时发现实例被删除时调用）
+        
+        同一个回调只注册一次（同一对象的绑定方法视为同一个回调）
+        
+        Args:
+            callback: 回调函数，参数为 (发生变更的服务名称, 被删除的实例 URL 列表)
+        """
+        if callback in self._listeners:
+            return
+        self._listeners.append(callback)
+        if self.method == "redis":
+            self._start_thread("_watch_thread", self._watch_loop, "discovery-watch")
+    
+    def _notify(self, service_name: str, removed_urls: Optional[List[str]] = None):
+        """调用服务变更回调"""
+        for callback in list(self._listeners):
+            try:
+                callback(service_name, removed_urls or [])
+            except Exception as e:
+                print(f"[ServiceDiscovery] 服务变更回调失败: {e}", file=sys.stderr, flush=True)
+    
+    def close(self):
+        """停止后台心跳和变更订阅（不注销已注册的实例，由过期时间自动下线）"""
+        if self.method != "config":
+            self._stop.set()
+            for thread in (self._heartbeat_thread, self._watch_thread):
+                if thread is not None:
+                    thread.join(timeout=2)
+    
+    def stats(self) -> Dict:
+        """获取服务发现统计"""
+        result = {"method": self.method}
+        if self.method == "config":
+            result["reloads"] = self.reloads
+        else:
+            result.update({
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "cached_services": len(self._cache),
+                "registered": len(self._registered)
+            })
+        return result
+    
+    # ---------- Redis 和数据库方式共用 ----------
+    
+    def _registry_discover(self, service_name: str) -> List[Dict]:
+        """读取服务的所有实例（优先使用进程内缓存）；缓存过期后重新读取时发现实例被删除则调用变更回调"""
+        now = time.time()
+        with self._cache_lock:
+            cached = self._cache.get(service_name)
+            if cached is not None and now - cached[0] < self.cache_ttl:
+                self.cache_hits += 1
+                return list(cached[1])
+            self.cache_misses += 1
+        
+        if self.method == "redis":
+            if self.cache_ttl > 0:
+                self._start_thread("_watch_thread", self._watch_loop, "discovery-watch")
+            members = self.redis_client.smembers(self._redis_index_key(service_name))
+            instances = self._redis_read([service_name], [members])[0]
+        else:
+            instances = [self._db_instance(row) for row in self._db_fetch_fresh(service_name)]
+        with self._cache_lock:
+            self._cache[service_name] = (now, instances)
+        
+        if cached is not None and self._listeners:
+            new_urls = {instance["url"] for instance in instances}
+            removed_urls = [instance["url"] for instance in cached[1] if instance["url"] not in new_urls]
+            if removed_urls:
+                self._notify(service_name, removed_urls)
+        return list(instances)
+    
+    # ---------- Redis 方式 ----------
+    
+    @staticmethod
+    def _redis_index_key(service_name: str) -> str:
+        return f"services:index:{service_name}"
+    
+    @staticmethod
+    def _redis_instance_key(service_name: str, url: str) -> str:
+        return f"services:instance:{service_name}:{url}"
+    
+    def _redis_write(self, service_name: str, service_info: Dict, pipe=None) -> List:
+        """写入实例信息、刷新过期时间并加入服务索引（pipe 为 None 时立即执行）"""
+        own_pipe = pipe is None
+        if own_pipe:
+            pipe = self.redis_client.pipeline(transaction=False)
+        instance_key = self._redis_instance_key(service_name, service_info["url"])
+        pipe.expire(instance_key, self.registration_ttl)
+        pipe.hset(instance_key, mapping={
+            **{key: str(value) for key, value in service_info.items() if value is not None},
+            "status": "active"
+        })
+        pipe.expire(instance_key, self.registration_ttl)
+        pipe.sadd(self._redis_index_key(service_name), service_info["url"])
+        return pipe.execute() if own_pipe else []
+    
+    def _redis_read(self, names: List[str], members: List) -> List[List[Dict]]:
+        """用一次管道读取多个服务的实例信息，顺便从索引中清理已过期的实例"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        keys = []
+        for name, urls in zip(names, members):
+            for url in sorted(urls):
+                keys.append((name, url))
+                pipe.hgetall(self._redis_instance_key(name, url))
+        values = pipe.execute() if keys else []
+        
+        result: Dict[str, List[Dict]] = {name: [] for name in names}
+        expired: Dict[str, List[str]] = {}
+        for (name, url), info in zip(keys, values):
+            if not info:
+                expired.setdefault(name, []).append(url)
+                continue
+            instance = dict(info)
+            instance.pop("status", None)
+            instance["port"] = int(instance.get("port") or 0)
+            instance.setdefault("url", url)
+            result[name].append(instance)
+        if expired:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for name, urls in expired.items():
+                pipe.srem(self._redis_index_key(name), *urls)
+            pipe.execute()
+        return [result[name] for name in names]
+    
+    def _on_redis_change(self, service_name: str):
+        """收到服务变更通知：失效缓存；有回调时重新读取，找出被删除的实例"""
+        with self._cache_lock:
+            cached = self._cache.pop(service_name, None)
+        if not self._listeners:
+            return
+        old_urls = [instance["url"] for instance in cached[1]] if cached else []
+        new_urls = {instance["url"] for instance in self._registry_discover(service_name)}
+        self._notify(service_name, [url for url in old_urls if url not in new_urls])
+    
+    def _invalidate(self, service_name: Optional[str] = None):
+        """失效缓存（service_name 为 None 时失效全部）"""
+        with self._cache_lock:
+            if service_name is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(service_name, None)
+    
+    def _start_thread(self, attribute: str, target: Callable, name: str):
+        """启动后台线程（已经启动时不重复启动）"""
+        with self._threads_lock:
+            thread = getattr(self, attribute)
+            if thread is None or not thread.is_alive():
+                self._stop.clear()
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                setattr(self, attribute, thread)
+                thread.start()
+    
+    def _heartbeat_loop(self):
+        """定期续期本进程注册的实例"""
+        while not self._stop.wait(self.heartbeat_interval):
+            registered = list(self._registered.items())
+            try:
+                if self.method == "redis":
+                    self._redis_heartbeat(registered)
+                else:
+                    if registered:
+                        self._db_write([(service_name, service_info) for (service_name, _), service_info in registered])
+                    self.reap_stale()
+            except Exception as e:
+                print(f"[ServiceDiscovery] 心跳失败: {e}", file=sys.stderr, flush=True)
+    
+    def _redis_heartbeat(self, registered: List[Tuple[Tuple[str, str], Dict]]):
+        """续期 Redis 中的实例；实例已经过期（如 Redis 重启）时重新写入并通知其他进程"""
+        if not registered:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        for (service_name, _), service_info in registered:
+            self._redis_write(service_name, service_info, pipe)
+        results = pipe.execute()
+        # 每个实例 4 条命令，第一条 EXPIRE 返回 False 表示实例已经过期
+        for i, ((service_name, url), _) in enumerate(registered):
+            if not results[i * 4]:
+                print(f"[ServiceDiscovery] 实例 {service_name} {url} 已过期，重新注册", file=sys.stderr, flush=True)
+                self.redis_client.publish(DISCOVERY_CHANNEL, service_name)
+    
+    def _watch_loop(self):
+        """订阅服务变更通知，收到通知时失效缓存并调用回调；订阅断开时清空缓存并重连"""
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(DISCOVERY_CHANNEL)
+                while not self._stop.is_set():
+                    message = pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None or message.get("type") != "message":
+                        continue
+                    service_name = message["data"]
+                    if isinstance(service_name, bytes):
+                        service_name = service_name.decode("utf-8")
+                    self._on_redis_change(service_name)
+            except Exception as e:
+                print(f"[ServiceDiscovery] 变更订阅断开，按缓存时间轮询: {e}", file=sys.stderr, flush=True)
+                self._invalidate()
+                self._stop.wait(1.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+    
+    
+    # ---------- 数据库方式 ----------
+    
+    @staticmethod
+    def _create_db_manager():
+        """获取按 database.config 配置的进程内共享 DatabaseManager"""
+        from database.registry import get_default_database
+        return get_default_database()
+    
+    def _init_db_table(self):
+        """创建实例表和索引"""
+        if self.db.db_type == "sqlite":
+            statements = [
+                """
+                CREATE TABLE IF NOT EXISTS service_instances (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    service_name VARCHAR(100) NOT NULL,
+                    url VARCHAR(255) NOT NULL,
+                    host VARCHAR(255),
+                    port INT,
+                    metadata TEXT,
+                    registered_at REAL NOT NULL,
+                    heartbeat_at REAL NOT NULL
+                )
+                """,
+                "CREATE UNIQUE INDEX IF NOT EXISTS uk_service_instances_name_url ON service_instances (service_name, url)",
+                "CREATE INDEX IF NOT EXISTS idx_service_instances_heartbeat ON service_instances (heartbeat_at)"
+            ]
+        else:  # MySQL
+            statements = ["""
+                CREATE TABLE IF NOT EXISTS service_instances (
+                    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                    service_name VARCHAR(100) NOT NULL,
+                    url VARCHAR(255) NOT NULL,
+                    host VARCHAR(255),
+                    port INT,
+                    metadata TEXT,
+                    registered_at DOUBLE NOT NULL,
+                    heartbeat_at DOUBLE NOT NULL,
+                    UNIQUE KEY uk_service_instances_name_url (service_name, url),
+                    KEY idx_service_instances_heartbeat (heartbeat_at)
+                )
+            """]
+        with self.db.transaction() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+    
+    def _db_sql(self, query: str) -> str:
+        """把 ? 占位符转换为当前数据库的占位符"""
+        return query.replace("?", "%s") if self.db.db_type == "mysql" else query
+    
+    def _db_execute(self, query: str, params: tuple = ()):
+        """执行写操作并提交"""
+        return self.db.execute(self._db_sql(query), params)
+    
+    def _db_fetch_all(self, query: str, params: tuple = ()) -> List[Dict]:
+        return self.db.fetch_all(self._db_sql(query), params)
+    
+    def _db_fetch_fresh(self, service_name: Optional[str] = None) -> List[Dict]:
+        """读取未过期的实例（指定服务时按 (service_name, url) 索引查询）"""
+        columns = "service_name, url, host, port, metadata"
+        since = time.time() - self.registration_ttl
+        if service_name is None:
+            return self._db_fetch_all(
+                f"SELECT {columns} FROM service_instances WHERE heartbeat_at >= ? ORDER BY service_name, url",
+                (since,))
+        return self._db_fetch_all(
+            f"SELECT {columns} FROM service_instances WHERE service_name = ? AND heartbeat_at >= ? ORDER BY url",
+            (service_name, since))
+    
+    @staticmethod
+    def _db_instance(row: Dict) -> Dict:
+        """把实例表的一行转换为实例信息"""
+        instance = json.loads(row["metadata"]) if row.get("metadata") else {}
+        instance.update({"host": row["host"], "port": int(row["port"] or 0), "url": row["url"]})
+        return instance
+    
+    def _db_write(self, instances: List[Tuple[str, Dict]]):
+        """写入实例并刷新心跳时间（已存在的实例保留注册时间），多个实例在一个事务中写入"""
+        now = time.time()
+        rows = []
+        for service_name, service_info in instances:
+            metadata = {key: value for key, value in service_info.items() if key not in ("host", "port", "url")}
+            rows.append((service_name, service_info["url"], service_info.get("host"), service_info.get("port"),
+                         json.dumps(metadata, ensure_ascii=False), now, now))
+        if self.db.db_type == "sqlite":
+            upsert = """
+                INSERT INTO service_instances (service_name, url, host, port, metadata, registered_at, heartbeat_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(service_name, url) DO UPDATE SET
+                    host = excluded.host, port = excluded.port,
+                    metadata = excluded.metadata, heartbeat_at = excluded.heartbeat_at
+            """
+        else:  # MySQL
+            upsert = """
+                INSERT INTO service_instances (service_name, url, host, port, metadata, registered_at, heartbeat_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    host = VALUES(host), port = VALUES(port),
+                    metadata = VALUES(metadata), heartbeat_at = VALUES(heartbeat_at)
+            """
+        self.db.executemany(upsert, rows)
+    
+    def reap_stale(self) -> int:
+        """
+        删除超过 registration_ttl 秒没有心跳的实例（数据库方式，心跳时自动调用）
+        
+        Returns:
+            删除的实例数量
+        """
+        if self.method != "database":
+            return 0
+        reaped = self._db_execute("DELETE FROM service_instances WHERE heartbeat_at < ?",
+                                  (time.time() - self.registration_ttl,)).rowcount
+        if reaped:
+            print(f"[ServiceDiscovery] 清理 {reaped} 个过期实例", file=sys.stderr, flush=True)
+        return reaped
 
 
 # 默认实例（使用配置文件方式）
@@ -0,0 +1,216 @@
+"""
+服务运行模式 - 支持 Flask 开发服务器和生产服务器
+
+- dev: Flask 自带的开发服务器（单进程、多线程），适合本地调试
+- production: 生产服务器，优先使用 gunicorn（多进程 + 多线程，支持优雅退出），
+  不可用时（如 Windows）回退到 waitress（单进程多线程）
+- async: asyncio 运行时（aiohttp），由 AsyncA2AServer / AsyncMCPServer 使用，
+  等待 LLM 和下游服务时不占用线程，单进程可同时保持数千个在途请求
+"""
+import os
+import sys
+import argparse
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+# 尝试导入可选依赖
+try:
+    from gunicorn.app.base import BaseApplication
+    GUNICORN_AVAILABLE = True
+except ImportError:
+    GUNICORN_AVAILABLE = False
+
+try:
+    import waitress
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
+
+# 默认配置（可通过环境变量覆盖）
+SERVER_MODE = os.getenv("SERVER_MODE", "dev")
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", "16"))
+SERVER_KEEPALIVE = int(os.getenv("SERVER_KEEPALIVE", "5"))
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+SERVER_MAX_CONNECTIONS = int(os.getenv("SERVER_MAX_CONNECTIONS", "1000"))
+SERVER_TIMEOUT = int(os.getenv("SERVER_TIMEOUT", "120"))
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+
+SERVER_MODES = ["dev", "production", "async"]
+
+
+@dataclass
+class ServerOptions:
+    """服务运行参数"""
+    
+    mode: str = SERVER_MODE  # 运行模式 "dev"、"production" 或 "async"
+    workers: int = SERVER_WORKERS  # 工作进程数（仅 gunicorn）
+    threads: int = SERVER_THREADS  # 每个进程的线程数
+    keepalive: int = SERVER_KEEPALIVE  # Keep-Alive 连接保持时间（秒）
+    backlog: int = SERVER_BACKLOG  # 等待 accept 的连接队列长度
+    max_connections: int = SERVER_MAX_CONNECTIONS  # 每个进程同时处理的最大连接数，超出的请求排队
+    timeout: int = SERVER_TIMEOUT  # 单个请求的最长处理时间（秒，仅 gunicorn）
+    graceful_timeout: int = SERVER_GRACEFUL_TIMEOUT  # 收到退出信号后等待在途请求完成的时间（秒）
+    
+    def to_dict(self) -> Dict:
+        """转换为字典"""
+        return asdict(self)
+    
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> 'ServerOptions':
+        """从命令行参数创建（参数由 add_server_arguments 定义）"""
+        return cls(
+            mode=args.mode,
+            workers=args.workers,
+            threads=args.threads,
+            keepalive=args.keepalive,
+            backlog=args.backlog,
+            max_connections=args.max_connections,
+            timeout=args.timeout,
+            graceful_timeout=args.graceful_timeout
+        )
+
+
+def add_server_arguments(parser: argparse.ArgumentParser, modes: Optional[List[str]] = None):
+    """
+    为 run_* 启动脚本添加服务运行模式相关的命令行参数
+    
+    Args:
+        parser: 命令行参数解析器
+        modes: 服务支持的运行模式，为 None 时支持全部模式（SERVER_MODES）。
+               SERVER_MODE 不在其中时默认使用第一个模式
+    """
+    modes = modes or SERVER_MODES
+    help_text = {"dev": "dev 为 Flask 开发服务器", "production": "production 为生产服务器",
+                 "async": "async 为 asyncio 运行时"}
+    group = parser.add_argument_group("服务运行模式")
+    group.add_argument("--mode", choices=modes, default=SERVER_MODE if SERVER_MODE in modes else modes[0],
+                       help=f"运行模式：{'，'.join(help_text[mode] for mode in modes)}（默认: %(default)s）")
+    group.add_argument("--workers", type=int, default=SERVER_WORKERS,
+                       help="工作进程数，仅 production 模式有效。每个进程有独立的会话内存（默认: %(default)s）")
+    group.add_argument("--threads", type=int, default=SERVER_THREADS,
+                       help="每个进程的线程数（默认: %(default)s）")
+    group.add_argument("--keepalive", type=int, default=SERVER_KEEPALIVE,
+                       help="Keep-Alive 连接保持时间，秒（默认: %(default)s）")
+    group.add_argument("--backlog", type=int, default=SERVER_BACKLOG,
+                       help="等待 accept 的连接队列长度（默认: %(default)s）")
+    group.add_argument("--max-connections", type=int, default=SERVER_MAX_CONNECTIONS,
+                       help="每个进程同时处理的最大连接数（默认: %(default)s）")
+    group.add_argument("--timeout", type=int, default=SERVER_TIMEOUT,
+                       help="单个请求的最长处理时间，秒（默认: %(default)s）")
+    group.add_argument("--graceful-timeout", type=int, default=SERVER_GRACEFUL_TIMEOUT,
+                       help="退出时等待在途请求完成的时间，秒（默认: %(default)s）")
+
+
+if GUNICORN_AVAILABLE:
+    class _GunicornApplication(BaseApplication):
+        """以编程方式启动 gunicorn，直接加载已创建好的 Flask 应用"""
+        
+        def __init__(self, app, options: Dict):
+            self.application = app
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+        
+        def load(self):
+            return self.application
+
+
+def _close_idle_database_connections(server, worker):
+    """gunicorn 的 pre_fork 钩子：fork 工作进程前关闭主进程连接池中的空闲数据库连接（连接不能跨进程共用）"""
+    try:
+        from database.registry import close_idle
+    except ImportError:
+        return
+    closed = close_idle()
+    if closed:
+        print(f"[serving] fork 工作进程前关闭了 {closed} 个空闲数据库连接", file=sys.stderr, flush=True)
+
+
+def run_app(app, host: str, port: int, options: Optional[ServerOptions] = None, debug: bool = False):
+    """
+    按指定模式启动 Flask 应用
+    
+    Args:
+        app: Flask 应用
+        host: 监听地址
+        port: 监听端口
+        options: 服务运行参数，为 None 时使用默认配置（环境变量）
+        debug: 是否开启调试模式（仅 dev 模式有效）
+    """
+    options = options or ServerOptions()
+    
+    if options.mode == "dev":
+        app.run(host=host, port=port, debug=debug, threaded=True)
+        return
+    
+    if options.mode == "async":
+        raise ValueError("async 模式需要使用 AsyncA2AServer / AsyncMCPServer 启动")
+    
+    if options.mode != "production":
+        raise ValueError(f"不支持的运行模式: {options.mode}")
+    
+    if GUNICORN_AVAILABLE:
+        print(f"[serving] gunicorn 生产模式: workers={options.workers}, threads={options.threads}, "
+              f"keepalive={options.keepalive}s, max_connections={options.max_connections}",
+              file=sys.stderr, flush=True)
+        _GunicornApplication(app, {
+            "bind": f"{host}:{port}",
+            "workers": options.workers,
+            "threads": options.threads,
+            "worker_class": "gthread",
+            "keepalive": options.keepalive,
+            "backlog": options.backlog,
+            "worker_connections": options.max_connections,
+            "timeout": options.timeout,
+            "graceful_timeout": options.graceful_timeout,
+            "pre_fork": _close_idle_database_connections,
+        }).run()
+    elif WAITRESS_AVAILABLE:
+        if options.workers > 1:
+            print(f"[serving] 警告: waitress 不支持多进程，忽略 workers={options.workers}",
+                  file=sys.stderr, flush=True)
+        print(f"[serving] waitress 生产模式: threads={options.threads}, "
+              f"max_connections={options.max_connections}", file=sys.stderr, flush=True)
+        waitress.serve(
+            app,
+            host=host,
+            port=port,
+            threads=options.threads,
+            connection_limit=options.max_connections,
+            backlog=options.backlog,
+            channel_timeout=options.keepalive
+        )
+    else:
+        raise ImportError("production 模式需要安装 gunicorn 或 waitress: pip install gunicorn")
+
+
+def run_async_app(app, host: str, port: int, options: Optional[ServerOptions] = None):
+    """
+    使用 aiohttp 启动 asyncio 应用（单进程单线程事件循环）
+    
+    Args:
+        app: aiohttp.web.Application
+        host: 监听地址
+        port: 监听端口
+        options: 服务运行参数（使用其中的 backlog、keepalive、graceful_timeout），
+                 为 None 时使用默认配置
+    """
+    from aiohttp import web
+    
+    options = options or ServerOptions()
+    print(f"[serving] asyncio 模式: keepalive={options.keepalive}s, backlog={options.backlog}",
+          file=sys.stderr, flush=True)
+    web.run_app(
+        app,
+        host=host,
+        port=port,
+        backlog=options.backlog,
+        keepalive_timeout=options.keepalive,
+        shutdown_timeout=options.graceful_timeout,
+        print=None
+    )
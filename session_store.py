@@ -0,0 +1,393 @@
+"""
+会话状态存储 - 把对话历史保存到进程外，多个副本可以处理同一个对话的任意一轮
+
+支持的后端:
+- memory: 进程内存（单进程，用于开发和测试）
+- sqlite: SQLite 文件（同一台机器上的多个进程共享）
+- redis: Redis（多台机器共享）；测试时可以用 LocalRedis 代替真实的 Redis 服务
+
+每个会话保存为一条记录：紧凑 JSON（较大时 zlib 压缩）+ 版本号 + 过期时间。
+保存时使用乐观并发控制：只有存储中的版本号与读取时一致才能写入，否则抛出 SessionVersionConflict，
+由 commit() 重新读取最新状态、追加本轮新增的消息后重试。
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# 尝试导入可选依赖
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+from local_redis import LocalRedis, WatchError
+
+# 默认配置（可通过环境变量覆盖）
+SESSION_STORE = os.getenv("SESSION_STORE", "")  # 会话存储后端 "memory"、"sqlite"、"redis"，为空时不使用外部存储
+SESSION_STORE_TTL = float(os.getenv("SESSION_STORE_TTL", "86400"))  # 会话过期时间（秒），每次保存时刷新
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", "data/sessions.db")  # SQLite 文件路径
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")  # Redis 地址
+SESSION_COMPRESS_MIN_BYTES = int(os.getenv("SESSION_COMPRESS_MIN_BYTES", "512"))  # 超过该大小的会话使用 zlib 压缩
+SESSION_COMMIT_RETRIES = 3  # 版本冲突时的重试次数
+
+STORE_BACKENDS = ["memory", "sqlite", "redis"]
+
+
+class SessionVersionConflict(Exception):
+    """保存会话时版本号与存储中的不一致（会话已被其他进程更新）"""
+
+
+@dataclass
+class SessionState:
+    """存储中的会话状态"""
+    
+    key: str  # 会话键（如 "order_agent:chat_123"）
+    history: List[Dict[str, Any]] = field(default_factory=list)  # 对话历史
+    meta: Dict[str, Any] = field(default_factory=dict)  # 附加信息（如 user_id）
+    version: int = 0  # 版本号，每次保存加 1，0 表示存储中还没有该会话
+
+
+def encode_state(history: List[Dict[str, Any]], meta: Dict[str, Any]) -> bytes:
+    """
+    序列化会话：紧凑 JSON，超过 SESSION_COMPRESS_MIN_BYTES 时 zlib 压缩
+    
+    Args:
+        history: 对话历史
+        meta: 附加信息
+    
+    Returns:
+        序列化后的字节串（首字节 "j" 表示 JSON，"z" 表示压缩后的 JSON）
+    """
+    payload = json.dumps({"h": history, "m": meta}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(payload) >= SESSION_COMPRESS_MIN_BYTES:
+        return b"z" + zlib.compress(payload, 6)
+    return b"j" + payload
+
+
+def decode_state(key: str, data: bytes, version: int) -> SessionState:
+    """
+    反序列化会话
+    
+    Args:
+        key: 会话键
+        data: encode_state 生成的字节串
+        version: 版本号
+    
+    Returns:
+        SessionState 对象
+    """
+    payload = zlib.decompress(data[1:]) if data[:1] == b"z" else data[1:]
+    state = json.loads(payload.decode("utf-8"))
+    return SessionState(key=key, history=state.get("h", []), meta=state.get("m", {}), version=version)
+
+
+class SessionStore:
+    """会话存储基类：子类实现 load / save / delete"""
+    
+    backend = ""  # 后端名称
+    
+    def __init__(self, ttl: float = SESSION_STORE_TTL):
+        """
+        初始化会话存储
+        
+        Args:
+            ttl: 会话过期时间（秒），每次保存时刷新，<= 0 表示不过期
+        """
+        self.ttl = ttl
+        self.conflicts = 0
+    
+    def load(self, key: str) -> Optional[SessionState]:
+        """
+        读取会话
+        
+        Args:
+            key: 会话键
+        
+        Returns:
+            SessionState 对象，不存在或已过期时返回 None
+        """
+        raise NotImplementedError
+    
+    def save(self, key: str, history: List[Dict[str, Any]], version: int,
+             meta: Optional[Dict[str, Any]] = None) -> int:
+        """
+        保存会话（乐观并发控制）
+        
+        Args:
+            key: 会话键
+            history: 对话历史
+            version: 读取时的版本号（新会话为 0）
+            meta: 附加信息
+        
+        Returns:
+            保存后的版本号
+        
+        Raises:
+            SessionVersionConflict: 存储中的版本号与 version 不一致
+        """
+        raise NotImplementedError
+    
+    def delete(self, key: str) -> bool:
+        """
+        删除会话
+        
+        Args:
+            key: 会话键
+        
+        Returns:
+            是否删除成功
+        """
+        raise NotImplementedError
+    
+    def commit(self, key: str, history: List[Dict[str, Any]], version: int,
+               new_messages: List[Dict[str, Any]],
+               meta: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        保存一轮对话后的会话；版本冲突时（其他进程同时处理了该对话）重新读取最新状态，
+        在其后追加本轮新增的消息再保存
+        
+        Args:
+            key: 会话键
+            history: 本轮结束后的对话历史
+            version: 本轮开始时读取的版本号
+            new_messages: 本轮新增的消息
+            meta: 附加信息
+        
+        Returns:
+            (实际保存的对话历史, 保存后的版本号) 二元组
+        """
+        for attempt in range(SESSION_COMMIT_RETRIES):
+            try:
+                return history, self.save(key, history, version, meta)
+            except SessionVersionConflict:
+                self.conflicts += 1
+                latest = self.load(key)
+                if latest is None:
+                    # 存储中的记录已过期或被删除：按新记录保存完整的历史，不丢弃会话已有的消息
+                    version = 0
+                else:
+                    history = latest.history + list(new_messages)
+                    version = latest.version
+                print(f"[SessionStore] 会话 {key} 版本冲突，合并后重试（第 {attempt + 1} 次）",
+                      file=sys.stderr, flush=True)
+        raise SessionVersionConflict(f"会话 {key} 保存失败: 多次版本冲突")
+    
+    def stats(self) -> Dict:
+        """获取存储统计信息"""
+        return {"backend": self.backend, "ttl": self.ttl, "conflicts": self.conflicts}
+    
+    def _expires_at(self) -> float:
+        """新的过期时间（不过期时为 0）"""
+        return time.time() + self.ttl if self.ttl > 0 else 0.0
+
+
+class MemorySessionStore(SessionStore):
+    """进程内存存储（保存序列化后的字节串，读写路径与其他后端一致）"""
+    
+    backend = "memory"
+    
+    def __init__(self, ttl: float = SESSION_STORE_TTL):
+        super().__init__(ttl)
+        self._records: Dict[str, Tuple[bytes, int, float]] = {}  # key -> (数据, 版本号, 过期时间)
+        self._lock = threading.Lock()
+    
+    def load(self, key: str) -> Optional[SessionState]:
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                return None
+            data, version, expires_at = record
+            if expires_at and expires_at <= time.time():
+                del self._records[key]
+                return None
+        return decode_state(key, data, version)
+    
+    def save(self, key: str, history: List[Dict[str, Any]], version: int,
+             meta: Optional[Dict[str, Any]] = None) -> int:
+        data = encode_state(history, meta or {})
+        with self._lock:
+            record = self._records.get(key)
+            current = 0
+            if record is not None and not (record[2] and record[2] <= time.time()):
+                current = record[1]
+            if current != version:
+                raise SessionVersionConflict(f"会话 {key} 版本冲突: 期望 {version}，实际 {current}")
+            self._records[key] = (data, version + 1, self._expires_at())
+        return version + 1
+    
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._records.pop(key, None) is not None
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite 存储（同一台机器上的多个进程共享一个文件）"""
+    
+    backend = "sqlite"
+    
+    def __init__(self, path: str = SESSION_STORE_PATH, ttl: float = SESSION_STORE_TTL):
+        """
+        初始化 SQLite 存储
+        
+        Args:
+            path: 数据库文件路径
+            ttl: 会话过期时间（秒）
+        """
+        super().__init__(ttl)
+        self.path = path
+        self._local = threading.local()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "key TEXT PRIMARY KEY, version INTEGER NOT NULL, expires_at REAL NOT NULL, data BLOB NOT NULL)"
+            )
+    
+    def _connection(self) -> sqlite3.Connection:
+        """当前线程的数据库连接（sqlite3 连接不能跨线程使用）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self._local.conn = conn
+        return conn
+    
+    def load(self, key: str) -> Optional[SessionState]:
+        row = self._connection().execute(
+            "SELECT data, version, expires_at FROM sessions WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[2] and row[2] <= time.time()):
+            return None
+        return decode_state(key, row[0], row[1])
+    
+    def save(self, key: str, history: List[Dict[str, Any]], version: int,
+             meta: Optional[Dict[str, Any]] = None) -> int:
+        data = encode_state(history, meta or {})
+        now = time.time()
+        with self._connection() as conn:
+            if version == 0:
+                # 新会话：已过期的旧记录视为不存在
+                conn.execute("DELETE FROM sessions WHERE key = ? AND expires_at > 0 AND expires_at <= ?", (key, now))
+                try:
+                    conn.execute("INSERT INTO sessions (key, version, expires_at, data) VALUES (?, 1, ?, ?)",
+                                 (key, self._expires_at(), data))
+                except sqlite3.IntegrityError:
+                    raise SessionVersionConflict(f"会话 {key} 版本冲突: 期望新会话") from None
+                return 1
+            cursor = conn.execute(
+                "UPDATE sessions SET version = version + 1, expires_at = ?, data = ? "
+                "WHERE key = ? AND version = ? AND (expires_at = 0 OR expires_at > ?)",
+                (self._expires_at(), data, key, version, now)
+            )
+            if cursor.rowcount != 1:
+                raise SessionVersionConflict(f"会话 {key} 版本冲突: 期望 {version}")
+        return version + 1
+    
+    def delete(self, key: str) -> bool:
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM sessions WHERE key = ?", (key,)).rowcount > 0
+    
+    def purge_expired(self) -> int:
+        """
+        删除已过期的会话
+        
+        Returns:
+            删除的会话数
+        """
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires_at > 0 AND expires_at <= ?",
+                                (time.time(),)).rowcount
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Redis 存储（多台机器共享）
+    
+    每个会话是一个字符串键，值为 "版本号:" + 序列化数据，过期时间由 Redis 的 PX 管理；
+    版本检查使用 WATCH / MULTI / EXEC 事务。
+    """
+    
+    backend = "redis"
+    
+    def __init__(self, client=None, url: str = SESSION_REDIS_URL,
+                 prefix: str = "session:", ttl: float = SESSION_STORE_TTL):
+        """
+        初始化 Redis 存储
+        
+        Args:
+            client: Redis 客户端（redis.Redis 或 LocalRedis），为 None 时按 url 创建
+            url: Redis 地址
+            prefix: 键前缀
+            ttl: 会话过期时间（秒）
+        """
+        super().__init__(ttl)
+        if client is None:
+            if not REDIS_AVAILABLE:
+                raise ImportError("请安装 redis: pip install redis")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+    
+    @staticmethod
+    def _split(raw: bytes) -> Tuple[int, bytes]:
+        """拆分存储的值为 (版本号, 序列化数据)"""
+        version, _, data = raw.partition(b":")
+        return int(version), data
+    
+    def load(self, key: str) -> Optional[SessionState]:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        version, data = self._split(raw)
+        return decode_state(key, data, version)
+    
+    def save(self, key: str, history: List[Dict[str, Any]], version: int,
+             meta: Optional[Dict[str, Any]] = None) -> int:
+        redis_key = self.prefix + key
+        value = str(version + 1).encode() + b":" + encode_state(history, meta or {})
+        px = int(self.ttl * 1000) if self.ttl > 0 else None
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(redis_key)
+                raw = pipe.get(redis_key)
+                current = self._split(raw)[0] if raw is not None else 0
+                if current != version:
+                    raise SessionVersionConflict(f"会话 {key} 版本冲突: 期望 {version}，实际 {current}")
+                pipe.multi()
+                pipe.set(redis_key, value, px=px)
+                pipe.execute()
+            except WatchError:
+                raise SessionVersionConflict(f"会话 {key} 版本冲突: 保存时被其他进程修改") from None
+        return version + 1
+    
+    def delete(self, key: str) -> bool:
+        return bool(self.client.delete(self.prefix + key))
+
+
+def create_session_store(backend: str = SESSION_STORE, **kwargs) -> Optional[SessionStore]:
+    """
+    按配置创建会话存储
+    
+    Args:
+        backend: 后端名称 "memory"、"sqlite"、"redis"，为空时返回 None（会话只保存在进程内存中）
+        **kwargs: 传给存储类的参数（如 path、url、client、ttl）
+    
+    Returns:
+        SessionStore 对象或 None
+    """
+    if not backend:
+        return None
+    if backend == "memory":
+        return MemorySessionStore(**kwargs)
+    if backend == "sqlite":
+        return SQLiteSessionStore(**kwargs)
+    if backend == "redis":
+        return RedisSessionStore(**kwargs)
+    raise ValueError(f"不支持的会话存储后端: {backend}")
@@ -0,0 +1,344 @@
+"""
+本地意图分类器 - 关键词路由未命中时，先用本地模型判断路由目标，置信度不足时才调用 LLM
+
+- 特征：归一化后的字符 n-gram（默认 1~2 元，种子样本上比 1~3 元的高置信度预测更准）
+- 模型：多项式朴素贝叶斯（基于 NumPy），训练和预测都只需要毫秒 / 微秒级
+- 校准：朴素贝叶斯的概率通常过于自信，用留出集拟合温度系数，使输出的置信度可以直接和阈值比较
+- 训练数据：种子样本（intent_seed.jsonl）+ 路由决策日志（关键词路由和 LLM 给出的判断）
+"""
+import os
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from supervisor_agent.route_cache import normalize_route_key
+
+# 默认文件
+DEFAULT_SEED_FILE = Path(__file__).parent / "intent_seed.jsonl"
+DEFAULT_MODEL_FILE = Path(__file__).parent / "intent_model.npz"
+
+# 默认配置（可通过环境变量覆盖）
+INTENT_MODEL_FILE = os.getenv("INTENT_MODEL_FILE", str(DEFAULT_MODEL_FILE))  # 训练好的模型文件
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.85"))  # 低于该置信度时交给 LLM 判断
+ROUTING_LOG_FILE = os.getenv("ROUTING_LOG_FILE", "")  # 路由决策日志（JSONL），为空时不记录
+
+# 分类标签（"none" 表示一般性对话，不需要路由到子智能体）
+NONE_LABEL = "none"
+LABELS = ["order_agent", "consult_agent", "feedback_agent", NONE_LABEL]
+
+# 作为训练标签的决策来源（分类器自己的判断不参与训练，避免自我强化）
+TRAINING_SOURCES = ("seed", "keyword", "llm")
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = (1, 2)) -> List[str]:
+    """
+    提取归一化文本的字符 n-gram
+    
+    Args:
+        text: 用户输入
+        ngram_range: n 的范围（包含两端）
+    
+    Returns:
+        n-gram 列表（可能重复）
+    """
+    text = normalize_route_key(text)
+    low, high = ngram_range
+    grams = []
+    for n in range(low, high + 1):
+        grams.extend(text[i:i + n] for i in range(len(text) - n + 1))
+    return grams
+
+
+class IntentClassifier:
+    """基于字符 n-gram 的多项式朴素贝叶斯意图分类器"""
+    
+    def __init__(self, ngram_range: Tuple[int, int] = (1, 2), alpha: float = 0.5,
+                 labels: Optional[List[str]] = None):
+        """
+        初始化分类器
+        
+        Args:
+            ngram_range: 字符 n-gram 的范围
+            alpha: 拉普拉斯平滑系数
+            labels: 分类标签，为 None 时使用 LABELS
+        """
+        self.ngram_range = ngram_range
+        self.alpha = alpha
+        self.labels: List[str] = list(labels or LABELS)
+        self.vocabulary: Dict[str, int] = {}
+        self.log_prior: Optional[np.ndarray] = None  # (类别数,)
+        self.log_likelihood: Optional[np.ndarray] = None  # (词表大小, 类别数)
+        self.temperature = 1.0
+        self.trained_samples = 0
+    
+    @property
+    def is_trained(self) -> bool:
+        return self.log_prior is not None
+    
+    def fit(self, texts: List[str], labels: List[str]) -> "IntentClassifier":
+        """
+        训练模型
+        
+        Args:
+            texts: 用户输入列表
+            labels: 对应的标签列表（取值为 self.labels 中的元素）
+        
+        Returns:
+            self
+        """
+        label_index = {label: index for index, label in enumerate(self.labels)}
+        vocabulary: Dict[str, int] = {}
+        rows, cols = [], []
+        for row, text in enumerate(texts):
+            for gram in char_ngrams(text, self.ngram_range):
+                rows.append(row)
+                cols.append(vocabulary.setdefault(gram, len(vocabulary)))
+        
+        counts = np.zeros((len(vocabulary), len(self.labels)), dtype=np.float64)
+        if rows:
+            classes = np.array([label_index[label] for label in labels])
+            np.add.at(counts, (np.array(cols), classes[np.array(rows)]), 1.0)
+        
+        class_counts = np.bincount([label_index[label] for label in labels], minlength=len(self.labels))
+        smoothed = counts + self.alpha
+        self.log_likelihood = np.log(smoothed / smoothed.sum(axis=0, keepdims=True))
+        self.log_prior = np.log((class_counts + 1.0) / (class_counts.sum() + len(self.labels)))
+        self.vocabulary = vocabulary
+        self.trained_samples = len(texts)
+        return self
+    
+    def _logits(self, text: str) -> np.ndarray:
+        """计算未归一化的对数概率"""
+        indices = [self.vocabulary[gram] for gram in char_ngrams(text, self.ngram_range) if gram in self.vocabulary]
+        if not indices:
+            return self.log_prior.copy()
+        return self.log_prior + self.log_likelihood[indices].sum(axis=0)
+    
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return shifted / shifted.sum(axis=-1, keepdims=True)
+    
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """
+        预测各类别的（校准后的）概率
+        
+        Args:
+            text: 用户输入
+        
+        Returns:
+            标签 -> 概率
+        """
+        probabilities = self._softmax(self._logits(text) / self.temperature)
+        return {label: float(p) for label, p in zip(self.labels, probabilities)}
+    
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        预测标签
+        
+        Args:
+            text: 用户输入
+        
+        Returns:
+            (标签, 置信度) 二元组
+        """
+        probabilities = self._softmax(self._logits(text) / self.temperature)
+        best = int(np.argmax(probabilities))
+        return self.labels[best], float(probabilities[best])
+    
+    def calibrate(self, texts: List[str], labels: List[str]) -> float:
+        """
+        在留出集上拟合温度系数（使负对数似然最小）
+        
+        Args:
+            texts: 留出集的用户输入
+            labels: 留出集的标签
+        
+        Returns:
+            拟合得到的温度系数
+        """
+        if not texts:
+            return self.temperature
+        label_index = {label: index for index, label in enumerate(self.labels)}
+        logits = np.stack([self._logits(text) for text in texts])
+        targets = np.array([label_index[label] for label in labels])
+        
+        best_temperature, best_nll = 1.0, float("inf")
+        for temperature in np.logspace(-1, 2, 61):
+            scaled = logits / temperature
+            scaled = scaled - scaled.max(axis=1, keepdims=True)
+            log_probs = scaled - np.log(np.exp(scaled).sum(axis=1, keepdims=True))
+            nll = -log_probs[np.arange(len(targets)), targets].mean()
+            if nll < best_nll:
+                best_temperature, best_nll = float(temperature), nll
+        self.temperature = best_temperature
+        return best_temperature
+    
+    def fit_calibrated(self, texts: List[str], labels: List[str],
+                       holdout: float = 0.2, seed: int = 0) -> "IntentClassifier":
+        """
+        训练并校准：先在训练集上训练、在留出集上拟合温度系数，再用全部数据重新训练
+        
+        Args:
+            texts: 用户输入列表
+            labels: 标签列表
+            holdout: 留出集比例
+            seed: 随机种子
+        
+        Returns:
+            self
+        """
+        order = np.random.default_rng(seed).permutation(len(texts))
+        split = int(len(texts) * (1 - holdout))
+        if len(texts) >= 20 and 0 < split < len(texts):
+            train, valid = order[:split], order[split:]
+            self.fit([texts[i] for i in train], [labels[i] for i in train])
+            temperature = self.calibrate([texts[i] for i in valid], [labels[i] for i in valid])
+        else:
+            temperature = 1.0
+        self.fit(texts, labels)
+        self.temperature = temperature
+        return self
+    
+    def save(self, path: str):
+        """
+        保存模型（NumPy .npz 格式）
+        
+        Args:
+            path: 文件路径
+        """
+        vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+        np.savez_compressed(
+            path,
+            labels=np.array(self.labels),
+            vocabulary=np.array(vocabulary, dtype=str),
+            log_prior=self.log_prior,
+            log_likelihood=self.log_likelihood,
+            temperature=np.array(self.temperature),
+            ngram_range=np.array(self.ngram_range),
+            alpha=np.array(self.alpha),
+            trained_samples=np.array(self.trained_samples)
+        )
+    
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        """
+        加载模型
+        
+        Args:
+            path: 文件路径
+        
+        Returns:
+            IntentClassifier 对象
+        """
+        with np.load(path, allow_pickle=False) as data:
+            model = cls(ngram_range=tuple(int(n) for n in data["ngram_range"]),
+                        alpha=float(data["alpha"]), labels=[str(label) for label in data["labels"]])
+            model.vocabulary = {str(gram): index for index, gram in enumerate(data["vocabulary"])}
+            model.log_prior = data["log_prior"]
+            model.log_likelihood = data["log_likelihood"]
+            model.temperature = float(data["temperature"])
+            model.trained_samples = int(data["trained_samples"])
+        return model
+
+
+def load_training_data(paths: Iterable[str], sources: Iterable[str] = TRAINING_SOURCES) -> Tuple[List[str], List[str]]:
+    """
+    从种子文件和路由决策日志读取训练数据（JSONL，每行 {"input", "agent", "source"}）
+    
+    Args:
+        paths: JSONL 文件路径列表（不存在的文件会被跳过）
+        sources: 作为训练标签的决策来源
+    
+    Returns:
+        (texts, labels) 二元组
+    """
+    sources = set(sources)
+    texts, labels = [], []
+    for path in paths:
+        if not path or not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("source") not in sources or not record.get("input"):
+                    continue
+                label = record.get("agent") or NONE_LABEL
+                if label in LABELS:
+                    texts.append(record["input"])
+                    labels.append(label)
+    return texts, labels
+
+
+def load_or_train(model_path: Optional[str] = INTENT_MODEL_FILE,
+                  training_files: Optional[List[str]] = None) -> Optional[IntentClassifier]:
+    """
+    加载训练好的模型；模型文件不存在时用种子样本（和决策日志）现场训练
+    
+    Args:
+        model_path: 模型文件路径
+        training_files: 训练数据文件，为 None 时使用种子样本和 ROUTING_LOG_FILE
+    
+    Returns:
+        IntentClassifier 对象，没有可用的模型和训练数据时返回 None
+    """
+    if model_path and os.path.exists(model_path):
+        try:
+            model = IntentClassifier.load(model_path)
+            print(f"[IntentClassifier] 已加载模型 {model_path}（{model.trained_samples} 条样本）", file=sys.stderr, flush=True)
+            return model
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[IntentClassifier] 加载模型失败 {model_path}: {str(e)}", file=sys.stderr, flush=True)
+    
+    texts, labels = load_training_data(training_files or [str(DEFAULT_SEED_FILE), ROUTING_LOG_FILE])
+    if not texts:
+        return None
+    model = IntentClassifier().fit_calibrated(texts, labels)
+    print(f"[IntentClassifier] 使用 {len(texts)} 条样本训练模型（温度系数 {model.temperature:.2f}）", file=sys.stderr, flush=True)
+    return model
+
+
+class RoutingDecisionLog:
+    """路由决策日志 - 记录每次路由判断，作为意图分类器的训练数据"""
+    
+    def __init__(self, path: Optional[str] = ROUTING_LOG_FILE or None):
+        """
+        初始化决策日志
+        
+        Args:
+            path: JSONL 文件路径，为 None 时不记录
+        """
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def record(self, user_input: str, agent: Optional[str], source: str, confidence: Optional[float] = None):
+        """
+        记录一次路由判断
+        
+        Args:
+            user_input: 用户输入
+            agent: 路由目标，None 表示一般性对话
+            source: 判断来源（keyword / classifier / llm）
+            confidence: 分类器给出的置信度
+        """
+        if not self.path:
+            return
+        record = {"ts": time.time(), "input": user_input, "agent": agent, "source": source}
+        if confidence is not None:
+            record["confidence"] = round(confidence, 4)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            print(f"[RoutingDecisionLog] 写入决策日志失败 {self.path}: {str(e)}", file=sys.stderr, flush=True)
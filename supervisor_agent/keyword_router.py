@@ -0,0 +1,312 @@
+"""
+关键词路由 - 基于 Aho–Corasick 自动机的多模式匹配
+
+关键词分组和路由规则来自路由表文件（routing_table.json），产品名称来自实时的产品目录。
+自动机只在加载时构建一次，路由时对输入做一次扫描即可得到所有分组的命中次数，
+再按规则顺序计算各子智能体的得分并选出路由目标。路由表文件修改后自动重新加载。
+
+产品目录在后台线程中获取（构造时不等待网络请求），之后每 ROUTER_PRODUCT_REFRESH_INTERVAL 秒刷新一次；
+关键词未命中时（可能是新上架的产品）最多每 ROUTER_PRODUCT_MISS_INTERVAL 秒提前刷新一次。
+"""
+import os
+import sys
+import json
+import time
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 默认路由表文件
+DEFAULT_ROUTING_TABLE = Path(__file__).parent / "routing_table.json"
+
+# 默认配置（可通过环境变量覆盖）
+ROUTER_RELOAD_INTERVAL = float(os.getenv("ROUTER_RELOAD_INTERVAL", "2"))  # 检查路由表文件是否修改的间隔（秒）
+ROUTER_PRODUCT_REFRESH_INTERVAL = float(os.getenv("ROUTER_PRODUCT_REFRESH_INTERVAL", "300"))  # 定期刷新产品目录的间隔（秒），<= 0 表示不定期刷新
+ROUTER_PRODUCT_MISS_INTERVAL = float(os.getenv("ROUTER_PRODUCT_MISS_INTERVAL", "30"))  # 关键词未命中时刷新产品目录的最小间隔（秒），<= 0 表示不刷新
+
+# 实时产品目录合并到的关键词分组
+PRODUCT_GROUP = "product"
+
+
+class KeywordAutomaton:
+    """Aho–Corasick 自动机：一次扫描统计每个关键词分组的命中次数"""
+    
+    def __init__(self, keyword_groups: Dict[str, List[str]]):
+        """
+        构建自动机
+        
+        Args:
+            keyword_groups: 分组名称 -> 关键词列表
+        """
+        self.groups: List[str] = list(keyword_groups)
+        group_index = {name: index for index, name in enumerate(self.groups)}
+        
+        # 1. 构建关键词前缀树
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[set] = [set()]
+        for name, keywords in keyword_groups.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if not keyword:
+                    continue
+                state = 0
+                for ch in keyword:
+                    next_state = goto[state].get(ch)
+                    if next_state is None:
+                        next_state = len(goto)
+                        goto[state][ch] = next_state
+                        goto.append({})
+                        outputs.append(set())
+                    state = next_state
+                outputs[state].add(group_index[name])
+        
+        # 2. 按层次遍历计算失败指针，并把失败指针上的输出合并到当前状态
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in goto[state].items():
+                queue.append(next_state)
+                target = fail[state]
+                while target and ch not in goto[target]:
+                    target = fail[target]
+                fail[next_state] = goto[target].get(ch, 0)
+                outputs[next_state] |= outputs[fail[next_state]]
+        
+        # 3. 展开为完整的转移表（匹配时不需要沿失败指针回退，每个字符只查一次字典）
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in range(len(goto) - 1)]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            transitions = dict(delta[fail[state]])
+            transitions.update(goto[state])
+            delta[state] = transitions
+            queue.extend(goto[state].values())
+        
+        self.delta = delta
+        self.outputs: List[Tuple[int, ...]] = [tuple(sorted(output)) for output in outputs]
+        self.states = len(goto)
+    
+    def count(self, text: str) -> List[int]:
+        """
+        统计文本中每个关键词分组的命中次数
+        
+        Args:
+            text: 输入文本
+        
+        Returns:
+            与 self.groups 顺序一致的命中次数列表（同一位置结束的多个同组关键词计一次）
+        """
+        counts = [0] * len(self.groups)
+        delta = self.delta
+        outputs = self.outputs
+        state = 0
+        for ch in text.lower():
+            state = delta[state].get(ch, 0)
+            for group in outputs[state]:
+                counts[group] += 1
+        return counts
+
+
+class KeywordRouter:
+    """编译后的关键词路由器，支持热加载路由表和刷新产品目录"""
+    
+    def __init__(self, table_path: Optional[str] = None,
+                 product_loader: Optional[Callable[[], List[str]]] = None,
+                 reload_interval: float = ROUTER_RELOAD_INTERVAL,
+                 product_refresh_interval: float = ROUTER_PRODUCT_REFRESH_INTERVAL,
+                 miss_refresh_interval: float = ROUTER_PRODUCT_MISS_INTERVAL):
+        """
+        初始化关键词路由器
+        
+        Args:
+            table_path: 路由表文件路径，为 None 时使用 supervisor_agent/routing_table.json
+            product_loader: 获取实时产品名称列表的函数（在后台线程中调用），失败或为 None 时只使用路由表中的产品名称
+            reload_interval: 检查路由表文件是否修改的间隔（秒），<= 0 表示不自动重新加载
+            product_refresh_interval: 定期刷新产品目录的间隔（秒），<= 0 表示不定期刷新
+            miss_refresh_interval: 关键词未命中时刷新产品目录的最小间隔（秒），<= 0 表示不刷新
+        """
+        self.table_path = Path(table_path) if table_path else DEFAULT_ROUTING_TABLE
+        self.product_loader = product_loader
+        self.reload_interval = reload_interval
+        self.product_refresh_interval = product_refresh_interval
+        self.miss_refresh_interval = miss_refresh_interval
+        
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._products: List[str] = []
+        # 自动机、规则和产品名称作为一个整体替换，路由时读取到的总是一致的快照
+        self._compiled: Optional[Tuple[KeywordAutomaton, List[Tuple[str, List[List[int]]]], List[str]]] = None
+        self.reloads = 0
+        
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._products_checked = float("-inf")  # 最近一次开始获取产品目录的时间（time.monotonic）
+        
+        self.reload()
+        self._schedule_refresh(0)
+    
+    def refresh_products(self) -> List[str]:
+        """
+        从产品目录重新获取产品名称（获取失败时保留上一次的结果）
+        
+        Returns:
+            当前使用的实时产品名称列表
+        """
+        if self.product_loader is None:
+            return self._products
+        self._products_checked = time.monotonic()
+        try:
+            products = [name for name in self.product_loader() if name]
+            if products and products != self._products:
+                self._products = products
+                if self._compiled is not None:
+                    self.reload()
+        except Exception as e:
+            print(f"[KeywordRouter] 获取产品目录失败，使用路由表中的产品名称: {str(e)}", file=sys.stderr, flush=True)
+        return self._products
+    
+    def _schedule_refresh(self, min_interval: float):
+        """距上次获取产品目录超过 min_interval 秒且没有正在进行的刷新时，在后台线程中刷新"""
+        if self.product_loader is None:
+            return
+        with self._refresh_lock:
+            running = self._refresh_thread is not None and self._refresh_thread.is_alive()
+            if running or time.monotonic() - self._products_checked < min_interval:
+                return
+            self._products_checked = time.monotonic()
+            self._refresh_thread = threading.Thread(target=self.refresh_products,
+                                                    name="keyword-router-products", daemon=True)
+            self._refresh_thread.start()
+    
+    def reload(self) -> bool:
+        """
+        重新加载路由表并构建自动机（加载失败时继续使用旧的路由表）
+        
+        Returns:
+            是否加载成功
+        """
+        with self._lock:
+            mtime = None
+            try:
+                mtime = self.table_path.stat().st_mtime
+                with open(self.table_path, "r", encoding="utf-8") as f:
+                    table = json.load(f)
+                
+                keyword_groups = {name: list(words) for name, words in table.get("keyword_groups", {}).items()}
+                # 合并实时产品目录
+                products = keyword_groups.setdefault(PRODUCT_GROUP, [])
+                products.extend(name for name in self._products if name not in products)
+                
+                automaton = KeywordAutomaton(keyword_groups)
+                group_index = {name: index for index, name in enumerate(automaton.groups)}
+                rules = []
+                # 规则的 when 中每一项是一组分组名称：组内任一分组命中即可，所有组都命中时规则成立
+                for rule in table.get("rules", []):
+                    rules.append((rule["agent"], [[group_index[name] for name in any_of] for any_of in rule["when"]]))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[KeywordRouter] 加载路由表失败 {self.table_path}: {str(e)}", file=sys.stderr, flush=True)
+                # 记录修改时间，文件再次修改前不重复加载
+                self._mtime = mtime
+                return False
+            
+            # 产品名称按长度倒序，find_products 优先匹配较长的名称（"珍珠奶茶" 而不是 "奶茶"）
+            self._compiled = (automaton, rules, sorted(products, key=len, reverse=True))
+            self._mtime = mtime
+            self.reloads += 1
+            print(f"[KeywordRouter] 已加载路由表: {len(rules)} 条规则, {automaton.states} 个状态", file=sys.stderr, flush=True)
+            return True
+    
+    def _maybe_reload(self):
+        """路由表文件修改后自动重新加载（按 reload_interval 限制检查频率）"""
+        if self.reload_interval <= 0:
+            return
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+        try:
+            mtime = self.table_path.stat().st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+    
+    def scores(self, user_input: str) -> Dict[str, int]:
+        """
+        一次扫描计算各子智能体的得分（成立的规则中所有分组的命中次数之和）
+        
+        Args:
+            user_input: 用户输入
+        
+        Returns:
+            子智能体名称 -> 得分（没有规则成立的子智能体不出现在结果中）
+        """
+        return self._evaluate(user_input)[1]
+    
+    def route(self, user_input: str) -> Optional[str]:
+        """
+        按路由表中的规则顺序选出路由目标
+        
+        Args:
+            user_input: 用户输入
+        
+        Returns:
+            第一条成立的规则对应的子智能体名称，没有规则成立时返回 None
+        """
+        return self._evaluate(user_input)[0]
+    
+    def find_products(self, user_input: str) -> List[str]:
+        """
+        找出输入中提到的产品名称（路由表中的产品和实时产品目录）
+        
+        Args:
+            user_input: 用户输入
+        
+        Returns:
+            按出现顺序排列的产品名称，已被较长名称包含的较短名称（如 "珍珠奶茶" 中的 "奶茶"）不重复返回
+        """
+        self._maybe_reload()
+        if self._compiled is None:
+            return []
+        found: List[Tuple[int, str]] = []
+        covered = [False] * len(user_input)
+        for name in self._compiled[2]:
+            start = user_input.find(name)
+            while start >= 0:
+                end = start + len(name)
+                if not any(covered[start:end]):
+                    covered[start:end] = [True] * len(name)
+                    found.append((start, name))
+                start = user_input.find(name, end)
+        return list(dict.fromkeys(name for _, name in sorted(found)))
+    
+    def _evaluate(self, user_input: str) -> Tuple[Optional[str], Dict[str, int]]:
+        """扫描输入并计算 (路由目标, 各子智能体得分)"""
+        self._maybe_reload()
+        if self._compiled is None:
+            return None, {}
+        automaton, rules, _ = self._compiled
+        counts = automaton.count(user_input)
+        
+        target = None
+        scores: Dict[str, int] = {}
+        for agent, when in rules:
+            hits = 0
+            for any_of in when:
+                matched = sum(counts[group] for group in any_of)
+                if not matched:
+                    break
+                hits += matched
+            else:
+                if target is None:
+                    target = agent
+                scores[agent] = scores.get(agent, 0) + hits
+        
+        # 未命中时可能是产品目录中的新产品，提前刷新；命中时按定期间隔刷新
+        interval = self.miss_refresh_interval if target is None else self.product_refresh_interval
+        if interval > 0:
+            self._schedule_refresh(interval)
+        return target, scores
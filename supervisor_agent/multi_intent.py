@@ -0,0 +1,163 @@
+"""
+多意图拆分 - 把一条消息中的多个请求拆分给不同的子智能体并发处理
+
+例如 "来两杯云边茉莉，顺便问下桂花云露是什么茶" 同时需要 order_agent 和 consult_agent：
+按标点和连接词拆分成片段，每个片段单独用关键词路由。只有每个片段都明确地只命中一个子智能体、
+且涉及两个以上子智能体时才拆分；有片段无法单独路由（如 "少糖"）或同时命中多个子智能体
+（如 "我要投诉"、"订单不满意"）时按单一意图处理整条消息，避免把一个请求拆散。
+同一子智能体的片段合并为一个子请求（同一对话的多个下单片段不会并发发给同一个子智能体），
+子请求没有提到产品时带上其他片段中的产品名称（如 "珍珠奶茶什么价格？我要两杯"）。
+总耗时取决于最慢的子智能体，而不是各个子智能体耗时之和。
+"""
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# 默认配置（可通过环境变量覆盖）
+MULTI_INTENT_ENABLED = os.getenv("MULTI_INTENT_ENABLED", "true").lower() in ("1", "true", "yes")  # 是否拆分多意图消息
+MULTI_INTENT_MAX = int(os.getenv("MULTI_INTENT_MAX", "3"))  # 一条消息最多拆分给几个子智能体，超过时按单一意图处理
+MULTI_INTENT_MAX_WORKERS = int(os.getenv("MULTI_INTENT_MAX_WORKERS", "8"))  # 并发调用子智能体的线程数
+
+# 片段分隔：句读标点，以及 "顺便"、"另外" 等连接词（连接词保留在后一个片段开头）
+_SEGMENT_PATTERN = re.compile(r"[，,。；;！!？?\n]+|(?=顺便|另外|还有|然后|同时|再帮我)")
+
+# 子请求没有提到产品时需要带上其他片段中产品名称的子智能体，以及表示指代的词（"它是什么茶"）
+_PRODUCT_CONTEXT_AGENTS = frozenset(["order_agent"])
+_REFERENCE_PATTERN = re.compile(r"它|这个|那个|这款|那款|这杯|那杯")
+
+# 合并回复时各子智能体回复之间的分隔
+REPLY_SEPARATOR = "\n\n"
+
+
+def split_segments(user_input: str) -> List[str]:
+    """
+    按标点和连接词把消息拆分为片段
+    
+    Args:
+        user_input: 用户输入
+    
+    Returns:
+        去掉空白后的非空片段列表
+    """
+    return [segment.strip() for segment in _SEGMENT_PATTERN.split(user_input) if segment and segment.strip()]
+
+
+class MultiIntentDispatcher:
+    """多意图拆分：生成子请求计划，并提供并发调用子智能体的线程池"""
+    
+    def __init__(self, router,
+                 enabled: bool = MULTI_INTENT_ENABLED,
+                 max_intents: int = MULTI_INTENT_MAX,
+                 max_workers: int = MULTI_INTENT_MAX_WORKERS):
+        """
+        初始化多意图拆分
+        
+        Args:
+            router: 本地关键词路由器（KeywordRouter，使用其 scores 和 find_products），不调用 LLM
+            enabled: 是否启用
+            max_intents: 一条消息最多拆分给几个子智能体
+            max_workers: 同步版本中并发调用子智能体的线程数
+        """
+        self.router = router
+        self.enabled = enabled
+        self.max_intents = max_intents
+        self.max_workers = max_workers
+        
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.fan_outs = 0  # 拆分为多个子请求的消息数
+        self.sub_requests = 0  # 拆分出的子请求总数
+    
+    def plan(self, user_input: str) -> List[Tuple[str, str]]:
+        """
+        生成子请求计划
+        
+        Args:
+            user_input: 用户输入
+        
+        Returns:
+            按子智能体在原文中第一次出现的顺序排列的 (子智能体名称, 子请求文本) 列表，每个子智能体一个子请求；
+            不需要拆分（单一意图、有片段不能明确路由或超过 max_intents）时返回空列表
+        """
+        if not self.enabled:
+            return []
+        segments = split_segments(user_input)
+        if len(segments) < 2:
+            return []
+        
+        # 每个片段都必须明确地只命中一个子智能体
+        agents: List[str] = []
+        for segment in segments:
+            scores = self.router.scores(segment)
+            if len(scores) != 1:
+                return []
+            agents.append(next(iter(scores)))
+        
+        # 同一子智能体的片段合并为一个子请求（按第一次出现的顺序）
+        groups: Dict[str, List[str]] = {}
+        for agent, segment in zip(agents, segments):
+            groups.setdefault(agent, []).append(segment)
+        if len(groups) < 2 or len(groups) > self.max_intents:
+            return []
+        
+        products = self.router.find_products(user_input)
+        plan = []
+        for agent, parts in groups.items():
+            text = "，".join(parts)
+            if products and not self.router.find_products(text) and (
+                    agent in _PRODUCT_CONTEXT_AGENTS or _REFERENCE_PATTERN.search(text)):
+                text = f"{'、'.join(products)}，{text}"
+            plan.append((agent, text))
+        
+        with self._lock:
+            self.fan_outs += 1
+            self.sub_requests += len(plan)
+        return plan
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """并发调用子智能体的线程池（第一次使用时创建）"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="multi-intent")
+            return self._executor
+    
+    def resize(self, max_workers: int):
+        """
+        调整线程数（已创建的线程池在进行中的任务完成后关闭，之后按新的线程数重新创建）
+        
+        Args:
+            max_workers: 新的线程数
+        """
+        with self._lock:
+            if max(1, max_workers) == self.max_workers:
+                return
+            self.max_workers = max(1, max_workers)
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+    
+    def stats(self) -> Dict:
+        """获取多意图拆分统计"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "max_workers": self.max_workers,
+                "fan_outs": self.fan_outs,
+                "sub_requests": self.sub_requests
+            }
+
+
+def merge_replies(replies: List[str]) -> str:
+    """
+    按子请求顺序合并各子智能体的回复
+    
+    Args:
+        replies: 各子智能体的回复
+    
+    Returns:
+        合并后的回复
+    """
+    return REPLY_SEPARATOR.join(reply.strip() for reply in replies if reply and reply.strip())
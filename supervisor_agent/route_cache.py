@@ -0,0 +1,224 @@
+"""
+路由缓存 - 缓存 LLM 路由判断的结果
+
+关键词路由未命中时，SupervisorAgent 会调用 LLM 判断路由目标。很多用户会发送相同或几乎相同的问题
+（如 "有什么推荐"、"营业时间？"），对输入做归一化（全角/半角、大小写、空白和标点）后缓存路由结果，
+重复的问题不再需要 LLM 调用。缓存使用 LRU + TTL 淘汰，可选持久化到 JSON 文件，重启后继续使用。
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# 默认配置（可通过环境变量覆盖）
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "10000"))  # 最多缓存的路由结果数
+ROUTE_CACHE_TTL = float(os.getenv("ROUTE_CACHE_TTL", "86400"))  # 缓存有效期（秒）
+ROUTE_CACHE_FILE = os.getenv("ROUTE_CACHE_FILE", "")  # 持久化文件路径，为空时不持久化
+ROUTE_CACHE_MAX_KEY_LENGTH = int(os.getenv("ROUTE_CACHE_MAX_KEY_LENGTH", "200"))  # 超过该长度的输入不缓存
+ROUTE_CACHE_SAVE_EVERY = int(os.getenv("ROUTE_CACHE_SAVE_EVERY", "50"))  # 每新增多少条结果写一次文件
+
+
+def normalize_route_key(text: str) -> str:
+    """
+    归一化用户输入，作为缓存键
+    
+    NFKC 归一化（全角转半角）、转小写，并去掉空白、标点和符号，
+    使 "有什么推荐？"、"有什么推荐"、"有 什么 推荐!" 对应同一个缓存键。
+    
+    Args:
+        text: 用户输入
+    
+    Returns:
+        归一化后的文本
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] not in ("P", "S", "Z", "C"))
+
+
+class RouteCache:
+    """路由结果缓存（LRU + TTL，线程安全）"""
+    
+    def __init__(self, max_size: int = ROUTE_CACHE_SIZE, ttl: float = ROUTE_CACHE_TTL,
+                 path: Optional[str] = ROUTE_CACHE_FILE or None,
+                 max_key_length: int = ROUTE_CACHE_MAX_KEY_LENGTH,
+                 save_every: int = ROUTE_CACHE_SAVE_EVERY):
+        """
+        初始化路由缓存
+        
+        Args:
+            max_size: 最多缓存的路由结果数
+            ttl: 缓存有效期（秒），<= 0 表示不过期
+            path: 持久化文件路径，为 None 时只缓存在内存中
+            max_key_length: 归一化后超过该长度的输入不缓存（长文本很少重复）
+            save_every: 每新增多少条结果写一次文件（进程退出时也会写入）
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.max_key_length = max_key_length
+        self.save_every = save_every
+        
+        # 缓存键 -> (路由目标, 过期时间)；路由目标为 None 表示一般性对话
+        self._entries: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # 串行写文件（多个线程同时达到 save_every 时）
+        self._dirty = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        
+        if self.path:
+            self.load()
+            atexit.register(self._save_if_dirty)
+    
+    def get(self, user_input: str) -> Tuple[bool, Optional[str]]:
+        """
+        查询缓存的路由结果
+        
+        Args:
+            user_input: 用户输入
+        
+        Returns:
+            (是否命中, 路由目标) 二元组；命中时路由目标可能为 None（一般性对话）
+        """
+        key = normalize_route_key(user_input)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl > 0 and entry[1] <= time.time():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+    
+    def peek(self, user_input: str) -> bool:
+        """
+        判断是否有未过期的缓存结果（不更新 LRU 顺序和命中统计）
+        
+        Args:
+            user_input: 用户输入
+        
+        Returns:
+            是否有缓存结果
+        """
+        key = normalize_route_key(user_input)
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (self.ttl <= 0 or entry[1] > time.time())
+    
+    def put(self, user_input: str, agent: Optional[str]):
+        """
+        缓存路由结果（只应缓存 LLM 成功给出的判断，调用失败时不要缓存）
+        
+        Args:
+            user_input: 用户输入
+            agent: 路由目标，None 表示一般性对话
+        """
+        key = normalize_route_key(user_input)
+        if not key or len(key) > self.max_key_length:
+            return
+        expires_at = time.time() + self.ttl if self.ttl > 0 else float("inf")
+        with self._lock:
+            self._entries[key] = (agent, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._dirty += 1
+            should_save = self.path and self._dirty >= self.save_every
+        if should_save:
+            self.save()
+    
+    def clear(self):
+        """清空缓存（如修改了路由规则或子智能体列表之后）"""
+        with self._lock:
+            self._entries.clear()
+            self._dirty += 1
+    
+    def load(self) -> int:
+        """
+        从持久化文件加载未过期的路由结果
+        
+        Returns:
+            加载的条目数
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            print(f"[RouteCache] 加载路由缓存失败 {self.path}: {str(e)}", file=sys.stderr, flush=True)
+            return 0
+        
+        now = time.time()
+        with self._lock:
+            # 文件中按最近使用从旧到新排列
+            for key, agent, expires_at in data.get("entries", []):
+                if expires_at is None:
+                    expires_at = float("inf")
+                if expires_at > now:
+                    self._entries[key] = (agent, expires_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            loaded = len(self._entries)
+        print(f"[RouteCache] 从 {self.path} 加载了 {loaded} 条路由缓存", file=sys.stderr, flush=True)
+        return loaded
+    
+    def save(self) -> bool:
+        """
+        写入持久化文件（先写临时文件再替换，避免写到一半时进程退出导致文件损坏）
+        
+        Returns:
+            是否写入成功
+        """
+        if not self.path:
+            return False
+        with self._lock:
+            entries = [[key, agent, None if expires_at == float("inf") else expires_at]
+                       for key, (agent, expires_at) in self._entries.items()]
+            self._dirty = 0
+        temp_path = f"{self.path}.tmp"
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with self._save_lock:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump({"version": 1, "entries": entries}, f, ensure_ascii=False)
+                os.replace(temp_path, self.path)
+            return True
+        except OSError as e:
+            print(f"[RouteCache] 保存路由缓存失败 {self.path}: {str(e)}", file=sys.stderr, flush=True)
+            return False
+    
+    def _save_if_dirty(self):
+        """进程退出时写入尚未保存的路由结果"""
+        if self._dirty:
+            self.save()
+    
+    def stats(self) -> Dict:
+        """获取缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+    
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,158 @@
+"""
+推测执行 - 路由还没确定时，提前调用最可能的子智能体
+
+需要 LLM 判断路由时，SupervisorAgent 可以在等待 LLM 的同时，按本地意图分类器的最佳猜测提前调用子智能体：
+LLM 的判断与猜测一致时直接使用已经在进行中的调用（省去一次串行的子智能体耗时），不一致时取消 / 丢弃。
+只允许对只读的子智能体（默认只有 consult_agent）推测执行，避免重复下单、重复记录反馈等副作用。
+"""
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, Optional, Set
+
+# 默认配置（可通过环境变量覆盖）
+SPECULATIVE_DISPATCH = os.getenv("SPECULATIVE_DISPATCH", "true").lower() in ("1", "true", "yes")  # 是否启用推测执行
+SPECULATIVE_AGENTS = os.getenv("SPECULATIVE_AGENTS", "consult_agent")  # 允许推测执行的只读子智能体（逗号分隔）
+SPECULATION_MIN_CONFIDENCE = float(os.getenv("SPECULATION_MIN_CONFIDENCE", "0.5"))  # 分类器的猜测达到该概率才推测执行
+SPECULATION_MAX_WORKERS = int(os.getenv("SPECULATION_MAX_WORKERS", "8"))  # 推测调用的线程数
+
+# 流式响应结束标记
+_DONE = object()
+
+
+class SpeculationPolicy:
+    """推测执行策略：是否启用、允许推测的子智能体、最低猜测概率，以及命中统计"""
+    
+    def __init__(self, enabled: bool = SPECULATIVE_DISPATCH,
+                 agents: Optional[Set[str]] = None,
+                 min_confidence: float = SPECULATION_MIN_CONFIDENCE,
+                 max_workers: int = SPECULATION_MAX_WORKERS):
+        """
+        初始化推测执行策略
+        
+        Args:
+            enabled: 是否启用推测执行
+            agents: 允许推测执行的子智能体（必须是只读的），为 None 时使用 SPECULATIVE_AGENTS
+            min_confidence: 分类器猜测的最低概率（太低的猜测大概率被丢弃，白白浪费一次调用）
+            max_workers: 同步版本中执行推测调用的线程数
+        """
+        self.enabled = enabled
+        self.agents: Set[str] = set(agents) if agents is not None else {
+            name.strip() for name in SPECULATIVE_AGENTS.split(",") if name.strip()
+        }
+        self.min_confidence = min_confidence
+        self.max_workers = max_workers
+        
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.started = 0  # 发起的推测调用数
+        self.used = 0  # 猜测正确、结果被使用的次数
+        self.discarded = 0  # 猜测错误、结果被丢弃的次数
+    
+    def allows(self, agent: Optional[str], confidence: float) -> bool:
+        """
+        判断是否可以对该猜测推测执行
+        
+        Args:
+            agent: 分类器猜测的子智能体
+            confidence: 猜测的概率
+        
+        Returns:
+            是否推测执行
+        """
+        return self.enabled and agent in self.agents and confidence >= self.min_confidence
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """执行推测调用的线程池（第一次使用时创建）"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="speculation")
+            return self._executor
+    
+    def resize(self, max_workers: int):
+        """
+        调整线程数（已创建的线程池在进行中的任务完成后关闭，之后按新的线程数重新创建）
+        
+        Args:
+            max_workers: 新的线程数
+        """
+        with self._lock:
+            if max(1, max_workers) == self.max_workers:
+                return
+            self.max_workers = max(1, max_workers)
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+    
+    def record(self, used: bool):
+        """
+        记录一次推测调用的结果
+        
+        Args:
+            used: 猜测是否正确（结果被使用）
+        """
+        with self._lock:
+            self.started += 1
+            if used:
+                self.used += 1
+            else:
+                self.discarded += 1
+    
+    def stats(self) -> Dict:
+        """获取推测执行统计"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "agents": sorted(self.agents),
+                "max_workers": self.max_workers,
+                "started": self.started,
+                "used": self.used,
+                "discarded": self.discarded,
+                "hit_rate": round(self.used / self.started, 4) if self.started else 0.0
+            }
+
+
+class SpeculativeStream:
+    """在后台线程中提前读取子智能体的流式响应，路由确认后按顺序回放，不一致时停止读取"""
+    
+    def __init__(self, stream_factory: Callable[[], Iterator[str]], executor: ThreadPoolExecutor):
+        """
+        开始推测性的流式调用
+        
+        Args:
+            stream_factory: 创建流式响应迭代器的函数（如 lambda: call_sub_agent_stream(agent, text)）
+            executor: 执行后台读取的线程池
+        """
+        self._queue: "queue.Queue" = queue.Queue()
+        self._cancelled = threading.Event()
+        self._future = executor.submit(self._run, stream_factory)
+    
+    def _run(self, stream_factory: Callable[[], Iterator[str]]):
+        """后台线程：读取流式响应并放入队列"""
+        stream = None
+        try:
+            stream = stream_factory()
+            for chunk in stream:
+                if self._cancelled.is_set():
+                    break
+                self._queue.put(chunk)
+        finally:
+            # 关闭生成器会关闭底层的 HTTP 连接，子智能体随即停止生成
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+            self._queue.put(_DONE)
+    
+    def cancel(self):
+        """放弃推测调用（还没开始时直接取消，已经开始时停止读取并关闭连接）"""
+        self._cancelled.set()
+        self._future.cancel()
+    
+    def __iter__(self) -> Iterator[str]:
+        """按顺序返回已读取和后续读取到的片段"""
+        while True:
+            chunk = self._queue.get()
+            if chunk is _DONE:
+                return
+            yield chunk
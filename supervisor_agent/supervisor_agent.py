@@ -1,11 +1,16 @@
 """
 监督者智能体 - 负责路由和协调子智能体
 """
+import re
 import sys
+import copy
+import asyncio
+import uuid
 from pathlib import Path
-from typing import List, Dict, Optional
+from concurrent.futures import Future
+from typing import List, Dict, Optional, Iterator, Tuple, Union
 import dashscope
-from dashscope import Generation
+from dashscope import Generation, AioGeneration
 
 # 添加项目根目录到路径，以便导入 config
 project_root = Path(__file__).parent.parent
@@ -14,6 +19,16 @@ sys.path.insert(0, str(project_root))
 from config import DASHSCOPE_API_KEY, DASHSCOPE_MODEL
 from service_discovery import ServiceDiscovery
 from a2a.client import A2AClient
+from a2a.async_client import AsyncA2AClient
+from history_manager import HistoryManager
+from mcp.client import MCPClient
+from supervisor_agent.keyword_router import KeywordRouter
+from supervisor_agent.route_cache import RouteCache
+from supervisor_agent.intent_classifier import (
+    load_or_train, RoutingDecisionLog, INTENT_CONFIDENCE_THRESHOLD, NONE_LABEL
+)
+from supervisor_agent.speculation import SpeculationPolicy, SpeculativeStream
+from supervisor_agent.multi_intent import MultiIntentDispatcher, merge_replies, REPLY_SEPARATOR
 
 # 设置 DashScope API Key
 dashscope.api_key = DASHSCOPE_API_KEY
@@ -59,6 +74,8 @@ class SupervisorAgent:
             "role": "system",
             "content": self.system_prompt
         })
+        # 对话历史管理（按 token 预算裁剪，避免历史无限增长）
+        self.history_manager = HistoryManager()
         
         # 服务发现（用于查找子智能体地址）
         self.service_discovery = ServiceDiscovery(method="config")
@@ -84,6 +101,23 @@ class SupervisorAgent:
         
         # A2A 客户端（用于调用子智能体）
         self.a2a_client = A2AClient(service_discovery=self.service_discovery)
+        # asyncio 版本的 A2A 客户端（在 achat 中第一次使用时创建）
+        self._async_a2a_client: Optional[AsyncA2AClient] = None
+        
+        # 关键词路由器（路由表来自 routing_table.json，产品名称来自咨询服务的产品目录，在后台获取并定期刷新）
+        self.keyword_router = KeywordRouter(product_loader=self._load_product_names)
+        # LLM 路由结果缓存（相同或仅标点、空白不同的问题不重复调用 LLM）
+        self.route_cache = RouteCache()
+        # 本地意图分类器（关键词未命中时先用它判断，置信度不足才调用 LLM）和路由决策日志（分类器的训练数据）
+        self.intent_classifier = load_or_train()
+        self.intent_threshold = INTENT_CONFIDENCE_THRESHOLD
+        self.decision_log = RoutingDecisionLog()
+        # 推测执行策略（等待 LLM 路由时提前调用最可能的只读子智能体）
+        self.speculation = SpeculationPolicy()
+        # 本轮命中的推测调用 (子智能体, 推测调用 ID)，结果使用完后通知子智能体把这一轮写入会话
+        self._speculation: Optional[Tuple[str, str]] = None
+        # 多意图拆分（一条消息同时需要多个子智能体时并发调用，只使用关键词路由拆分）
+        self.multi_intent = MultiIntentDispatcher(router=self.keyword_router)
     
     def route_to_agent(self, user_input: str) -> Optional[str]:
         """
@@ -95,59 +129,175 @@ class SupervisorAgent:
         Returns:
             应该调用的子智能体名称，如果不需要特定智能体则返回 None
         """
-        # 第一步：快速关键词匹配
-        result = self._route_by_keywords(user_input)
-        if result:
+        # 第一步、第二步：关键词匹配和本地意图分类器
+        decided, result = self._route_locally(user_input)
+        if decided:
             return result
         
-        # 第二步：如果关键词匹配失败，使用 LLM 判断（更智能）
+        # 第三步：本地无法确定时，使用 LLM 判断（更智能）
         return self._route_by_llm(user_input)
     
-    def _route_by_keywords(self, user_input: str) -> Optional[str]:
+    async def aroute_to_agent(self, user_input: str) -> Optional[str]:
         """
-        使用关键词匹配进行路由（快速但可能不够准确）
+        route_to_agent 的 asyncio 版本
+        
+        Args:
+            user_input: 用户输入
+            
+        Returns:
+            应该调用的子智能体名称，如果不需要特定智能体则返回 None
         """
-        user_input_lower = user_input.lower()
+        decided, result = self._route_locally(user_input)
+        if decided:
+            return result
+        return await self._aroute_by_llm(user_input)
+    
+    def _route_locally(self, user_input: str) -> Tuple[bool, Optional[str]]:
+        """
+        不调用 LLM 的路由判断：先匹配关键词，再使用本地意图分类器
         
-        # 订单相关关键词（扩展版）
-        order_keywords = [
-            "下单", "订单", "点单", "购买", "结账", "支付", "购物车",
-            "取消订单", "修改订单", "查询订单", "我要", "给我", "来一杯",
-            "来一份", "要一杯", "要一份", "点一杯", "点一份"
-        ]
-        if any(keyword in user_input_lower for keyword in order_keywords):
-            return "order_agent"
+        Returns:
+            (是否已确定, 路由目标) 二元组；未确定时需要继续使用 LLM 判断
+        """
+        result = self._route_by_keywords(user_input)
+        if result:
+            self.decision_log.record(user_input, result, source="keyword")
+            return True, result
+        return self._route_by_classifier(user_input)
+    
+    def _speculation_target(self, user_input: str) -> Optional[str]:
+        """
+        选择推测执行的子智能体（本地路由未确定、且 LLM 路由没有缓存时才推测执行）
         
-        # 产品名称列表
-        product_names = ["云边茉莉", "桂花云露", "云雾观音", "珍珠奶茶", "红豆奶茶", "奶茶"]
+        Returns:
+            推测调用的子智能体名称，不推测执行时返回 None
+        """
+        if not self.speculation.enabled or self.intent_classifier is None:
+            return None
+        if self.route_cache.peek(user_input):
+            return None
+        label, confidence = self.intent_classifier.predict(user_input)
+        if not self.speculation.allows(label, confidence):
+            return None
+        if not self.sub_agents.get(label, {}).get("implemented"):
+            return None
+        return label
+    
+    def _route_speculatively(self, user_input: str, stream: bool = False
+                             ) -> Tuple[Optional[str], Optional[Union[Future, SpeculativeStream]]]:
+        """
+        路由判断；需要 LLM 判断时，同时推测性地调用最可能的只读子智能体
         
-        # 产品名称 + 数量/规格匹配（如"一杯"、"一份"、"少糖"等）
-        has_product = any(product in user_input for product in product_names)
-        has_quantity = any(word in user_input for word in ["一杯", "一份", "两杯", "两份", "1杯", "2杯", "三杯", "四杯"])
-        has_spec = any(word in user_input for word in ["少糖", "半糖", "微糖", "无糖", "标准糖", 
-                                                        "正常冰", "少冰", "去冰", "温", "热", "热饮"])
+        Args:
+            user_input: 用户输入
+            stream: 推测调用是否使用流式接口
+            
+        Returns:
+            (路由目标, 推测调用) 二元组：推测调用不为 None 时表示已经在调用路由目标，
+            直接使用其结果即可（非流式为 Future，流式为 SpeculativeStream）
+        """
+        decided, result = self._route_locally(user_input)
+        if decided:
+            return result, None
         
-        # 如果包含产品名称 + (数量或规格)，认为是下单请求
-        if has_product and (has_quantity or has_spec):
-            return "order_agent"
+        guess = self._speculation_target(user_input)
+        if guess is None:
+            return self._route_by_llm(user_input), None
         
-        # 反馈相关关键词
-        feedback_keywords = ["反馈", "投诉", "建议", "差评", "不满意", "问题", "意见"]
-        if any(keyword in user_input_lower for keyword in feedback_keywords):
-            return "feedback_agent"
+        # 推测调用不写入子智能体的会话，猜测正确、结果使用完后再通过 commit_speculation 写入
+        speculation_id = f"spec_{uuid.uuid4().hex}"
+        if stream:
+            speculative = SpeculativeStream(
+                lambda: self.call_sub_agent_stream(guess, user_input, speculation_id=speculation_id),
+                self.speculation.executor
+            )
+        else:
+            speculative = self.speculation.executor.submit(self.call_sub_agent, guess, user_input,
+                                                           speculation_id=speculation_id)
         
-        # 咨询相关关键词
-        consult_keywords = ["咨询", "介绍", "推荐", "产品", "活动", "优惠", "价格", "口味", "什么", "怎么", "如何"]
-        if any(keyword in user_input_lower for keyword in consult_keywords):
-            return "consult_agent"
+        target = self._route_by_llm(user_input)
+        used = target == guess
+        self.speculation.record(used)
+        if used:
+            print(f"[SupervisorAgent] 推测调用 {guess} 命中", file=sys.stderr, flush=True)
+            self._speculation = (guess, speculation_id)
+            return target, speculative
         
-        return None
+        # 猜测错误：取消推测调用（已经开始的调用结果直接丢弃；只读子智能体不会产生副作用）
+        print(f"[SupervisorAgent] 推测调用 {guess} 未命中（LLM 路由: {target}），已丢弃", file=sys.stderr, flush=True)
+        speculative.cancel()
+        return target, None
     
-    def _route_by_llm(self, user_input: str) -> Optional[str]:
+    async def _aroute_speculatively(self, user_input: str) -> Tuple[Optional[str], Optional[asyncio.Task]]:
         """
-        使用 LLM 进行智能路由判断（准确但需要 API 调用）
+        _route_speculatively 的 asyncio 版本：推测调用作为 Task 与 LLM 路由并发执行
+        
+        Args:
+            user_input: 用户输入
+            
+        Returns:
+            (路由目标, 推测调用的 Task) 二元组
+        """
+        decided, result = self._route_locally(user_input)
+        if decided:
+            return result, None
+        
+        guess = self._speculation_target(user_input)
+        if guess is None:
+            return await self._aroute_by_llm(user_input), None
+        
+        speculation_id = f"spec_{uuid.uuid4().hex}"
+        speculative = asyncio.ensure_future(self.acall_sub_agent(guess, user_input, speculation_id=speculation_id))
+        try:
+            target = await self._aroute_by_llm(user_input)
+        except BaseException:
+            speculative.cancel()
+            raise
+        used = target == guess
+        self.speculation.record(used)
+        if used:
+            print(f"[SupervisorAgent] 推测调用 {guess} 命中", file=sys.stderr, flush=True)
+            self._speculation = (guess, speculation_id)
+            return target, speculative
+        
+        print(f"[SupervisorAgent] 推测调用 {guess} 未命中（LLM 路由: {target}），已取消", file=sys.stderr, flush=True)
+        speculative.cancel()
+        return target, None
+    
+    def _route_by_keywords(self, user_input: str) -> Optional[str]:
         """
-        prompt = f"""你是云边奶茶铺的监督者智能体，需要分析用户请求并路由到合适的子智能体。
+        使用关键词匹配进行路由（快速但可能不够准确）
+        """
+        return self.keyword_router.route(user_input)
+    
+    def _route_by_classifier(self, user_input: str) -> Tuple[bool, Optional[str]]:
+        """
+        使用本地意图分类器进行路由（微秒级，不需要 API 调用）
+        
+        Returns:
+            (是否有把握, 路由目标) 二元组；没有把握时应继续使用 LLM 判断
+        """
+        if self.intent_classifier is None:
+            return False, None
+        label, confidence = self.intent_classifier.predict(user_input)
+        if confidence < self.intent_threshold:
+            return False, None
+        result = None if label == NONE_LABEL else label
+        print(f"[SupervisorAgent] 意图分类器路由: {user_input[:50]}... → {result} ({confidence:.2f})", file=sys.stderr, flush=True)
+        self.decision_log.record(user_input, result, source="classifier", confidence=confidence)
+        return True, result
+    
+    def _load_product_names(self) -> List[str]:
+        """从 consult-mcp-server 获取当前在售的产品名称（用于关键词路由）"""
+        response = MCPClient(service_discovery=self.service_discovery).invoke_tool(
+            "consult-mcp-server", "consult-get-products", {}, timeout=5
+        )
+        # 产品列表格式: "- 产品名称: 描述, 价格: ..., 库存: ..."
+        return re.findall(r"^- ([^:：\n]+)[:：]", str(response.get("result", "")), re.M)
+    
+    def _build_route_prompt(self, user_input: str) -> str:
+        """构建 LLM 路由判断的提示词"""
+        return f"""你是云边奶茶铺的监督者智能体，需要分析用户请求并路由到合适的子智能体。
 
 可用子智能体：
 1. order_agent - 处理订单相关业务，包括下单、查询、修改等
@@ -163,38 +313,90 @@ class SupervisorAgent:
 - 一般性对话 → 返回 None
 
 请只返回智能体名称（order_agent、consult_agent、feedback_agent）或 None，不要其他文字。"""
-
+    
+    def _parse_route_response(self, user_input: str, result: str) -> Tuple[bool, Optional[str]]:
+        """
+        解析 LLM 返回的路由判断结果
+        
+        Returns:
+            (是否给出了明确的判断, 子智能体名称) 二元组：回复为子智能体名称或 None / null（一般性对话）时
+            判断明确，其他无法解析的回复按一般性对话处理，但不应缓存
+        """
+        # 清理可能的格式问题
+        result = result.strip().lower().replace(" ", "_").replace("\"", "").replace("'", "").rstrip("。.")
+        
+        if result in ["order_agent", "consult_agent", "feedback_agent"]:
+            print(f"[SupervisorAgent] LLM 路由判断: {user_input[:50]}... → {result}", file=sys.stderr, flush=True)
+            return True, result
+        if result in ["none", "null"]:
+            return True, None
+        print(f"[SupervisorAgent] 无法解析 LLM 路由判断: {result[:50]}", file=sys.stderr, flush=True)
+        return False, None
+    
+    def _route_by_llm(self, user_input: str) -> Optional[str]:
+        """
+        使用 LLM 进行智能路由判断（准确但需要 API 调用，结果会被缓存）
+        """
+        hit, cached = self.route_cache.get(user_input)
+        if hit:
+            return cached
+        
         try:
             response = Generation.call(
                 model=DASHSCOPE_MODEL,
-                messages=[{"role": "user", "content": prompt}],
+                messages=[{"role": "user", "content": self._build_route_prompt(user_input)}],
                 temperature=0.1,  # 低温度，确保路由准确性
                 result_format='message'
             )
             
             if response.status_code == 200:
-                result = response.output.choices[0].message.content.strip()
-                # 清理可能的格式问题
-                result = result.lower().replace(" ", "_").replace("\"", "").replace("'", "")
-                
-                if result in ["order_agent", "consult_agent", "feedback_agent"]:
-                    print(f"[SupervisorAgent] LLM 路由判断: {user_input[:50]}... → {result}", file=sys.stderr, flush=True)
-                    return result
-                elif result == "none" or result == "null":
-                    return None
+                understood, result = self._parse_route_response(user_input, response.output.choices[0].message.content)
+                # 只缓存 LLM 明确给出的判断（包括一般性对话），调用失败或回复无法解析时下次重新判断
+                if understood:
+                    self.route_cache.put(user_input, result)
+                    self.decision_log.record(user_input, result, source="llm")
+                return result
+        except Exception as e:
+            print(f"[SupervisorAgent] LLM 路由判断失败: {str(e)}", file=sys.stderr, flush=True)
+        
+        return None
+    
+    async def _aroute_by_llm(self, user_input: str) -> Optional[str]:
+        """
+        _route_by_llm 的 asyncio 版本
+        """
+        hit, cached = self.route_cache.get(user_input)
+        if hit:
+            return cached
+        
+        try:
+            response = await AioGeneration.call(
+                model=DASHSCOPE_MODEL,
+                messages=[{"role": "user", "content": self._build_route_prompt(user_input)}],
+                temperature=0.1,
+                result_format='message'
+            )
+            
+            if response.status_code == 200:
+                understood, result = self._parse_route_response(user_input, response.output.choices[0].message.content)
+                if understood:
+                    self.route_cache.put(user_input, result)
+                    self.decision_log.record(user_input, result, source="llm")
+                return result
         except Exception as e:
             print(f"[SupervisorAgent] LLM 路由判断失败: {str(e)}", file=sys.stderr, flush=True)
         
         return None
     
-    def call_sub_agent(self, agent_name: str, user_input: str) -> str:
+    def call_sub_agent(self, agent_name: str, user_input: str, speculation_id: Optional[str] = None) -> str:
         """
         调用子智能体处理请求（使用 A2A 协议）
         
         Args:
             agent_name: 子智能体名称
             user_input: 用户输入
-            
+            speculation_id: 推测调用 ID（推测调用时子智能体不把这一轮写入会话，等待 commit_speculation 确认）
+        
         Returns:
             子智能体的响应
         """
@@ -210,11 +412,7 @@ class SupervisorAgent:
         # 使用 A2A 协议调用子智能体
         try:
             # 构建 A2A 协议请求数据
-            a2a_request = {
-                "input": user_input,
-                "chat_id": self.chat_id,
-                "user_id": self.user_id
-            }
+            a2a_request = self._a2a_request(user_input, speculation_id)
             
             # 通过 A2A Client 调用子智能体
             a2a_response = self.a2a_client.call_agent(agent_name, a2a_request)
@@ -241,6 +439,212 @@ class SupervisorAgent:
             print(f"调用 {agent_name} 时出现错误: {error_msg}")
             return f"抱歉，调用 {agent_info['name']} 时出现了问题，请稍后再试。"
     
+    def call_sub_agent_stream(self, agent_name: str, user_input: str,
+                              speculation_id: Optional[str] = None) -> Iterator[str]:
+        """
+        流式调用子智能体（使用 A2A 协议的 /a2a/stream 接口），收到一段就转发一段
+        
+        Args:
+            agent_name: 子智能体名称
+            user_input: 用户输入
+            speculation_id: 推测调用 ID（同 call_sub_agent）
+        
+        Yields:
+            子智能体响应的增量片段
+        """
+        if agent_name not in self.sub_agents:
+            yield f"错误：未知的子智能体 {agent_name}"
+            return
+        
+        agent_info = self.sub_agents[agent_name]
+        
+        if not agent_info["implemented"]:
+            yield f"我理解您的需求，这需要 {agent_info['name']} 来处理。该功能正在开发中，敬请期待。"
+            return
+        
+        a2a_request = self._a2a_request(user_input, speculation_id)
+        
+        received = False
+        try:
+            for event in self.a2a_client.call_agent_stream(agent_name, a2a_request):
+                if "error" in event:
+                    print(f"调用 {agent_name} 时出现错误: {event['error']}", file=sys.stderr, flush=True)
+                    if not received:
+                        yield f"抱歉，调用 {agent_info['name']} 时出现了问题，请稍后再试。"
+                    return
+                chunk = event.get("delta") or event.get("output") or ""
+                if chunk:
+                    received = True
+                    yield chunk
+        except ValueError:
+            # 服务未找到
+            if not received:
+                yield f"抱歉，{agent_info['name']} 服务暂时不可用，请稍后再试。"
+        except ConnectionError:
+            # 连接错误
+            if not received:
+                yield f"抱歉，无法连接到 {agent_info['name']}，请确保服务已启动。"
+        except Exception as e:
+            print(f"调用 {agent_name} 时出现错误: {str(e)}", file=sys.stderr, flush=True)
+            if not received:
+                yield f"抱歉，调用 {agent_info['name']} 时出现了问题，请稍后再试。"
+    
+    async def acall_sub_agent(self, agent_name: str, user_input: str, speculation_id: Optional[str] = None) -> str:
+        """
+        call_sub_agent 的 asyncio 版本：等待子智能体响应时让出事件循环
+        
+        Args:
+            agent_name: 子智能体名称
+            user_input: 用户输入
+            speculation_id: 推测调用 ID（同 call_sub_agent）
+        
+        Returns:
+            子智能体的响应
+        """
+        if agent_name not in self.sub_agents:
+            return f"错误：未知的子智能体 {agent_name}"
+        
+        agent_info = self.sub_agents[agent_name]
+        
+        if not agent_info["implemented"]:
+            return f"我理解您的需求，这需要 {agent_info['name']} 来处理。该功能正在开发中，敬请期待。"
+        
+        if self._async_a2a_client is None:
+            self._async_a2a_client = AsyncA2AClient(service_discovery=self.service_discovery)
+        
+        try:
+            a2a_response = await self._async_a2a_client.call_agent(
+                agent_name, self._a2a_request(user_input, speculation_id))
+            if isinstance(a2a_response, dict):
+                return a2a_response.get("output", "") or str(a2a_response)
+            return str(a2a_response)
+        except ValueError:
+            return f"抱歉，{agent_info['name']} 服务暂时不可用，请稍后再试。"
+        except ConnectionError:
+            return f"抱歉，无法连接到 {agent_info['name']}，请确保服务已启动。"
+        except Exception as e:
+            print(f"调用 {agent_name} 时出现错误: {str(e)}", file=sys.stderr, flush=True)
+            return f"抱歉，调用 {agent_info['name']} 时出现了问题，请稍后再试。"
+    
+    def _fan_out(self, plan: List[Tuple[str, str]]) -> str:
+        """
+        并发调用多个子智能体，按子请求顺序合并回复
+        
+        Args:
+            plan: (子智能体名称, 子请求文本) 列表
+            
+        Returns:
+            合并后的回复
+        """
+        print(f"[SupervisorAgent] 多意图拆分: {plan}", file=sys.stderr, flush=True)
+        futures = [self.multi_intent.executor.submit(self.call_sub_agent, agent_name, text)
+                   for agent_name, text in plan]
+        return merge_replies([future.result() for future in futures])
+    
+    async def _afan_out(self, plan: List[Tuple[str, str]]) -> str:
+        """
+        _fan_out 的 asyncio 版本
+        
+        Args:
+            plan: (子智能体名称, 子请求文本) 列表
+            
+        Returns:
+            合并后的回复
+        """
+        print(f"[SupervisorAgent] 多意图拆分: {plan}", file=sys.stderr, flush=True)
+        replies = await asyncio.gather(*(self.acall_sub_agent(agent_name, text) for agent_name, text in plan))
+        return merge_replies(list(replies))
+    
+    def _fan_out_stream(self, plan: List[Tuple[str, str]]) -> Iterator[str]:
+        """
+        _fan_out 的流式版本：所有子智能体同时开始生成，按子请求顺序依次转发
+        
+        Args:
+            plan: (子智能体名称, 子请求文本) 列表
+            
+        Yields:
+            合并后回复的增量片段
+        """
+        print(f"[SupervisorAgent] 多意图拆分: {plan}", file=sys.stderr, flush=True)
+        streams = [
+            SpeculativeStream(lambda agent_name=agent_name, text=text: self.call_sub_agent_stream(agent_name, text),
+                              self.multi_intent.executor)
+            for agent_name, text in plan
+        ]
+        try:
+            emitted = False
+            for stream in streams:
+                separated = not emitted
+                for chunk in stream:
+                    if not separated:
+                        yield REPLY_SEPARATOR
+                        separated = True
+                    emitted = True
+                    yield chunk
+        finally:
+            # 调用方提前停止时，停止读取尚未转发完的子智能体响应
+            for stream in streams:
+                stream.cancel()
+    
+    def _a2a_request(self, user_input: str, speculation_id: Optional[str] = None) -> Dict:
+        """
+        构建 A2A 协议请求数据
+        
+        Args:
+            user_input: 用户输入
+            speculation_id: 推测调用 ID，为 None 时是普通调用
+        
+        Returns:
+            A2A 请求数据
+        """
+        a2a_request = {
+            "input": user_input,
+            "chat_id": self.chat_id,
+            "user_id": self.user_id
+        }
+        if speculation_id:
+            a2a_request["speculation_id"] = speculation_id
+        return a2a_request
+    
+    def _take_speculation(self) -> Optional[Tuple[str, str]]:
+        """取出本轮命中的推测调用"""
+        speculation, self._speculation = self._speculation, None
+        return speculation
+    
+    def commit_speculation(self):
+        """推测调用的结果被使用后，通知子智能体把这一轮写入会话（推测调用本身不写入）"""
+        speculation = self._take_speculation()
+        if speculation is None:
+            return
+        agent_name, speculation_id = speculation
+        try:
+            self.a2a_client.call_agent(agent_name, {
+                "input": "",
+                "chat_id": self.chat_id,
+                "user_id": self.user_id,
+                "commit_speculation": speculation_id
+            })
+        except Exception as e:
+            print(f"[SupervisorAgent] 确认推测调用 {speculation_id} 失败: {str(e)}", file=sys.stderr, flush=True)
+    
+    async def acommit_speculation(self):
+        """commit_speculation 的 asyncio 版本"""
+        speculation = self._take_speculation()
+        if speculation is None:
+            return
+        agent_name, speculation_id = speculation
+        if self._async_a2a_client is None:
+            self._async_a2a_client = AsyncA2AClient(service_discovery=self.service_discovery)
+        try:
+            await self._async_a2a_client.call_agent(agent_name, {
+                "input": "",
+                "chat_id": self.chat_id,
+                "user_id": self.user_id,
+                "commit_speculation": speculation_id
+            })
+        except Exception as e:
+            print(f"[SupervisorAgent] 确认推测调用 {speculation_id} 失败: {str(e)}", file=sys.stderr, flush=True)
+    
     def chat(self, user_input: str) -> str:
         """
         处理用户输入并返回回复
@@ -256,14 +660,30 @@ class SupervisorAgent:
             "role": "user",
             "content": user_input
         })
+        # 按 token 预算裁剪对话历史（始终保留系统提示词）
+        self.history_manager.trim(self.history)
         
         try:
-            # 先判断是否需要路由到特定子智能体
-            target_agent = self.route_to_agent(user_input)
+            # 一条消息包含多个子智能体的请求时，并发调用后按顺序合并回复
+            plan = self.multi_intent.plan(user_input)
+            if plan:
+                agent_response = self._fan_out(plan)
+                self.history.append({
+                    "role": "assistant",
+                    "content": agent_response
+                })
+                return agent_response
+            
+            # 先判断是否需要路由到特定子智能体（需要 LLM 判断时可能已经推测性地开始调用子智能体）
+            target_agent, speculative = self._route_speculatively(user_input)
             
             if target_agent:
                 # 需要特定子智能体处理
-                agent_response = self.call_sub_agent(target_agent, user_input)
+                if speculative is not None:
+                    agent_response = speculative.result()
+                    self.commit_speculation()
+                else:
+                    agent_response = self.call_sub_agent(target_agent, user_input)
                 
                 # 将路由决策和子智能体响应添加到历史记录
                 self.history.append({
@@ -301,6 +721,157 @@ class SupervisorAgent:
             print(f"错误: {error_msg}")
             return "抱歉，处理您的请求时出现了问题，请稍后再试。"
     
+    async def achat(self, user_input: str) -> str:
+        """
+        chat 的 asyncio 版本：路由判断、子智能体调用和 LLM 调用都不阻塞事件循环
+        
+        Args:
+            user_input: 用户输入
+            
+        Returns:
+            AI 回复
+        """
+        self.history.append({
+            "role": "user",
+            "content": user_input
+        })
+        self.history_manager.trim(self.history)
+        
+        try:
+            plan = self.multi_intent.plan(user_input)
+            target_agent, speculative = (None, None) if plan else await self._aroute_speculatively(user_input)
+            
+            if plan:
+                ai_message = await self._afan_out(plan)
+            elif target_agent:
+                if speculative is not None:
+                    ai_message = await speculative
+                    await self.acommit_speculation()
+                else:
+                    ai_message = await self.acall_sub_agent(target_agent, user_input)
+            else:
+                response = await AioGeneration.call(
+                    model=DASHSCOPE_MODEL,
+                    messages=self.history,
+                    temperature=0.7,
+                    result_format='message'
+                )
+                if response.status_code != 200:
+                    print(f"错误: API 调用失败: {response.message}", file=sys.stderr, flush=True)
+                    return "抱歉，处理您的请求时出现了问题，请稍后再试。"
+                ai_message = response.output.choices[0].message.content
+            
+            self.history.append({
+                "role": "assistant",
+                "content": ai_message
+            })
+            return ai_message
+        except Exception as e:
+            print(f"错误: 处理请求时出现错误: {str(e)}", file=sys.stderr, flush=True)
+            return "抱歉，处理您的请求时出现了问题，请稍后再试。"
+    
+    def chat_stream(self, user_input: str) -> Iterator[str]:
+        """
+        处理用户输入并流式返回回复（子智能体或 LLM 每生成一段就返回一段）
+        
+        Args:
+            user_input: 用户输入
+            
+        Yields:
+            AI 回复的增量片段
+        """
+        self.history.append({
+            "role": "user",
+            "content": user_input
+        })
+        self.history_manager.trim(self.history)
+        
+        parts: List[str] = []
+        try:
+            plan = self.multi_intent.plan(user_input)
+            target_agent, speculative = (None, None) if plan else self._route_speculatively(user_input, stream=True)
+            
+            if plan:
+                for chunk in self._fan_out_stream(plan):
+                    parts.append(chunk)
+                    yield chunk
+            elif target_agent:
+                chunks = speculative if speculative is not None else self.call_sub_agent_stream(target_agent, user_input)
+                for chunk in chunks:
+                    parts.append(chunk)
+                    yield chunk
+                if speculative is not None:
+                    self.commit_speculation()
+            else:
+                # 一般性对话，直接使用 LLM 流式输出
+                responses = Generation.call(
+                    model=DASHSCOPE_MODEL,
+                    messages=self.history,
+                    temperature=0.7,
+                    result_format='message',
+                    stream=True,
+                    incremental_output=True
+                )
+                for response in responses:
+                    if response.status_code != 200:
+                        print(f"错误: API 调用失败: {response.message}", file=sys.stderr, flush=True)
+                        if not parts:
+                            fallback = "抱歉，处理您的请求时出现了问题，请稍后再试。"
+                            parts.append(fallback)
+                            yield fallback
+                        break
+                    chunk = response.output.choices[0].message.content
+                    if chunk:
+                        parts.append(chunk)
+                        yield chunk
+        except Exception as e:
+            print(f"错误: 处理请求时出现错误: {str(e)}", file=sys.stderr, flush=True)
+            if not parts:
+                fallback = "抱歉，处理您的请求时出现了问题，请稍后再试。"
+                parts.append(fallback)
+                yield fallback
+        finally:
+            # 生成结束（或调用方提前停止）后记录完整回复
+            self.history.append({
+                "role": "assistant",
+                "content": "".join(parts)
+            })
+    
+    def size_executors(self, concurrency: int):
+        """
+        按同时处理的对话数设置推测调用和多意图并发调用的线程数
+        
+        new_session 创建的会话共用这两个线程池，默认的线程数（各 8 个）只够单个对话使用；
+        每个在途对话最多占用 1 个推测调用线程和 max_intents 个多意图线程。
+        
+        Args:
+            concurrency: 同时处理的对话数（如网关每个进程的线程数）
+        """
+        self.speculation.resize(max(self.speculation.max_workers, concurrency))
+        self.multi_intent.resize(max(self.multi_intent.max_workers, concurrency * self.multi_intent.max_intents))
+    
+    def new_session(self, user_id: str, chat_id: str) -> "SupervisorAgent":
+        """
+        创建一个新的对话会话：只有对话历史是独立的，路由器、路由缓存、意图分类器、
+        A2A 客户端和线程池等与当前实例共享（避免每个会话重复加载路由表、训练分类器），
+        线程池的大小见 size_executors
+        
+        Args:
+            user_id: 用户ID
+            chat_id: 对话ID
+            
+        Returns:
+            新的 SupervisorAgent 实例
+        """
+        session = copy.copy(self)
+        session.user_id = user_id
+        session.chat_id = chat_id
+        # asyncio 客户端绑定创建时的事件循环，不在会话之间共享
+        session._async_a2a_client = None
+        session._speculation = None
+        session.clear_history()
+        return session
+    
     def clear_history(self):
         """清空对话历史"""
         self.history = [{
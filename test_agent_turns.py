@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+测试子智能体共用的对话轮次处理（AgentTurnMixin）
+验证：
+1. 订单、咨询、反馈智能体使用同一份 chat / chat_stream / achat / achat_stream 实现
+2. 快速路径、回复模板、工具调用失败和异常时的回复（同步、流式和 asyncio 版本一致）
+3. 各智能体的差异（回复提示、兜底回复、异常回复）通过类属性和方法覆盖
+4. A2A 服务端的请求处理函数和运行指标（智能体特有的指标通过 _extra_metrics 提供），推测调用确认后才写入会话
+"""
+import os
+import sys
+import asyncio
+from pathlib import Path
+from typing import Dict, Optional
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+os.environ.setdefault("DASHSCOPE_API_KEY", "test-key")
+
+from agent_turns import AgentTurnMixin
+from a2a.session import AgentSession, SessionManager
+from history_manager import HistoryManager
+from response_templates import ResponseTemplateEngine
+
+ORDER_RESULT = """订单信息:
+- 订单ID: ORDER_1693654321000
+- 用户ID: 12
+- 订单总价: ¥18.00
+- 订单备注: 无
+- 创建时间: 2024-09-02 10:00:00
+
+订单项（共 1 项）:
+  1. 珍珠奶茶 x1 (少糖, 去冰) - 单价: ¥18.00, 小计: ¥18.00"""
+
+
+class ToolAgent(AgentTurnMixin):
+    """只提供工具相关方法的智能体（工具调用由 tool_call / tool_result 决定，不调用 LLM 判断）"""
+    
+    def __init__(self, tool_call: Optional[Dict], tool_result: str = ORDER_RESULT):
+        self.tool_call = tool_call
+        self.tool_result = tool_result
+        self.history_manager = HistoryManager()
+        self.response_templates = ResponseTemplateEngine()
+        self.llm_checks = 0
+        self.agent_name = "tool_agent"
+        self.chat_id = "default_chat"
+        self.user_id = "default_user"
+        self.session_manager = SessionManager(history_factory=self._new_history)
+    
+    def _new_history(self):
+        return [{"role": "system", "content": "系统提示词"}]
+    
+    def _fast_path_tool_call(self, user_input: str, user_id: Optional[str] = None) -> Optional[Dict]:
+        return self.tool_call
+    
+    def _should_use_tool(self, user_input: str, user_id: Optional[str] = None) -> Optional[Dict]:
+        self.llm_checks += 1
+        return None
+    
+    async def _ashould_use_tool(self, user_input: str, user_id: Optional[str] = None) -> Optional[Dict]:
+        return self._should_use_tool(user_input, user_id)
+    
+    def _extract_tool_call(self, user_input: str, user_id: Optional[str] = None) -> Optional[Dict]:
+        return None
+    
+    def _invoke_tool(self, tool_name: str, mcp_server: str, parameters: Dict) -> str:
+        if isinstance(self.tool_result, Exception):
+            raise self.tool_result
+        return self.tool_result
+    
+    async def _ainvoke_tool(self, tool_name: str, mcp_server: str, parameters: Dict) -> str:
+        return self._invoke_tool(tool_name, mcp_server, parameters)
+
+
+CREATE_ORDER = {"tool": "order-create-order", "mcp_server": "order-mcp-server", "parameters": {"userId": 12}}
+
+
+def _session() -> AgentSession:
+    return AgentSession(chat_id="c1", user_id="12", history=[{"role": "system", "content": "系统提示词"}])
+
+
+async def _collect(stream) -> str:
+    return "".join([chunk async for chunk in stream])
+
+
+def _replies(agent: ToolAgent, user_input: str):
+    """四种方式处理同一轮对话的回复，以及每种方式写入的对话历史"""
+    replies, histories = [], []
+    for run in (lambda s: agent.chat(user_input, s),
+                lambda s: "".join(agent.chat_stream(user_input, s)),
+                lambda s: asyncio.run(agent.achat(user_input, s)),
+                lambda s: asyncio.run(_collect(agent.achat_stream(user_input, s)))):
+        session = _session()
+        replies.append(run(session))
+        histories.append([message["role"] for message in session.history])
+    return replies, histories
+
+
+def test_shared_implementation():
+    """测试三个智能体共用同一份实现"""
+    from order_agent.order_agent import OrderAgent
+    from consult_agent.consult_agent import ConsultAgent
+    from feedback_agent.feedback_agent import FeedbackAgent
+    for agent_class in (OrderAgent, ConsultAgent, FeedbackAgent):
+        for name in ("chat", "chat_stream", "achat", "achat_stream", "_prepare_reply", "_aprepare_reply",
+                     "_invoke_tool", "_ainvoke_tool", "_format_tool_result",
+                     "start_a2a_server", "start_async_a2a_server"):
+            assert getattr(agent_class, name) is getattr(AgentTurnMixin, name), f"{agent_class.__name__}.{name}"
+    assert OrderAgent._fast_path_tool_call is not AgentTurnMixin._fast_path_tool_call
+    assert ConsultAgent.tool_reply_prompt != AgentTurnMixin.tool_reply_prompt
+    assert FeedbackAgent.no_tool_fallback != AgentTurnMixin.no_tool_fallback
+    assert FeedbackAgent._error_reply is not AgentTurnMixin._error_reply
+    print("✅ 三个智能体共用对话轮次实现")
+
+
+def test_template_reply():
+    """测试快速路径 + 回复模板（不调用 LLM）"""
+    agent = ToolAgent(CREATE_ORDER)
+    replies, histories = _replies(agent, "我要一杯珍珠奶茶，少糖去冰")
+    assert len(set(replies)) == 1 and "ORDER_1693654321000" in replies[0], replies
+    assert all(history == ["system", "user", "assistant", "assistant"] for history in histories), histories
+    assert agent.llm_checks == 0, "快速路径确定工具调用时不应调用 LLM 判断"
+    print("✅ 回复模板通过")
+
+
+def test_tool_failure_and_error():
+    """测试工具调用失败和异常"""
+    replies, histories = _replies(ToolAgent(CREATE_ORDER, tool_result="创建订单失败: 库存不足"), "来一杯")
+    assert set(replies) == {"创建订单失败: 库存不足"}
+    assert all(history == ["system", "user", "assistant"] for history in histories)
+    
+    replies, _ = _replies(ToolAgent(CREATE_ORDER, tool_result=RuntimeError("连接断开")), "来一杯")
+    assert set(replies) == {"抱歉，处理您的请求时出现了问题，请稍后再试。"}, "异常时返回通用的错误回复"
+    
+    class StubMCPClient:
+        def __init__(self, result):
+            self.result = result
+        
+        def invoke_tool(self, mcp_server, tool_name, parameters):
+            if isinstance(self.result, Exception):
+                raise self.result
+            return self.result
+    
+    agent = ToolAgent(CREATE_ORDER)
+    agent.mcp_client = StubMCPClient({"status": "success", "result": ORDER_RESULT})
+    assert AgentTurnMixin._invoke_tool(agent, "order-create-order", "order-mcp-server", {}) == ORDER_RESULT
+    agent.mcp_client = StubMCPClient({"status": "error", "error": "库存不足"})
+    assert AgentTurnMixin._invoke_tool(agent, "order-create-order", "order-mcp-server", {}) == "工具调用失败: 库存不足"
+    agent.mcp_client = StubMCPClient(RuntimeError("连接断开"))
+    assert AgentTurnMixin._invoke_tool(agent, "order-create-order", "order-mcp-server", {}) == "工具调用异常: 连接断开"
+    print("✅ 工具调用失败和异常通过")
+
+
+def test_request_handlers():
+    """测试共用的 A2A 请求处理函数和运行指标"""
+    agent = ToolAgent(CREATE_ORDER)
+    reply = agent._handle_request({"input": "来一杯", "chat_id": "c9", "user_id": "12"})
+    assert "ORDER_1693654321000" in reply
+    assert len(agent.session_manager.get("c9", "12").history) == 4, "请求按 user_id 和 chat_id 写入对应会话"
+    assert "".join(agent._handle_stream_request({"input": "来一杯", "chat_id": "c9", "user_id": "12"})) == reply
+    assert len(agent.session_manager.get("c9", "12").history) == 7
+    agent._handle_request({"input": "来一杯"})
+    assert len(agent.session_manager.get("default_chat", "default_user").history) == 4, "未提供时使用默认 chat_id 和 user_id"
+    assert asyncio.run(agent._ahandle_request({"input": "来一杯", "chat_id": "c9", "user_id": "12"})) == reply
+    assert len(agent.session_manager.get("c9", "12").history) == 10
+    
+    # 推测调用不写入会话，确认后才写入
+    speculative = {"input": "来一杯", "chat_id": "c9", "user_id": "12", "speculation_id": "spec_1"}
+    assert "".join(agent._handle_stream_request(speculative)) == reply
+    assert asyncio.run(agent._ahandle_request(dict(speculative, speculation_id="spec_2"))) == reply
+    assert len(agent.session_manager.get("c9", "12").history) == 10, "推测调用不应写入会话"
+    assert agent._handle_request({"chat_id": "c9", "user_id": "12", "commit_speculation": "spec_1"}) == "committed"
+    assert len(agent.session_manager.get("c9", "12").history) == 13
+    assert agent._handle_request({"chat_id": "c9", "user_id": "12", "commit_speculation": "spec_x"}) == "expired"
+    
+    metrics = agent._metrics()
+    assert set(metrics) == {"response_templates", "history", "sessions", "load_balancer"}, metrics
+    assert metrics["sessions"]["sessions"] == 2, metrics["sessions"]
+    
+    from order_agent.order_agent import OrderAgent
+    from consult_agent.consult_agent import ConsultAgent
+    from feedback_agent.feedback_agent import FeedbackAgent
+    assert (OrderAgent.default_port, ConsultAgent.default_port, FeedbackAgent.default_port) == (10006, 10005, 10007)
+    assert "fast_path" in OrderAgent._extra_metrics(type("Stub", (), {"get_fast_path_stats": lambda self: {}})())
+    print("✅ A2A 请求处理函数和运行指标通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("子智能体对话轮次处理测试")
+    print("=" * 60)
+    test_shared_implementation()
+    test_template_reply()
+    test_tool_failure_and_error()
+    test_request_handlers()
+
+
+if __name__ == "__main__":
+    main()
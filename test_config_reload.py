@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+测试 services.json 热加载
+验证：
+1. 修改配置文件后自动重新加载，并通知被删除的实例
+2. 文件内容不完整时保留旧配置，修复后重新加载
+3. 读操作在并发重新加载时只会看到完整的旧配置或新配置
+4. HTTPTransport 关闭到已删除实例的连接池，LoadBalancer 删除其统计
+5. 多个 ServiceDiscovery 同时注册时不会覆盖彼此写入配置文件的实例
+"""
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import threading
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from werkzeug.serving import make_server
+
+from service_discovery import ServiceDiscovery
+from http_transport import HTTPTransport
+from load_balancer import LoadBalancer
+from mcp import MCPClient, MCPServer
+
+
+def _write(path: str, services: dict):
+    """原子写入配置文件"""
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(services, f)
+    os.replace(temp_path, path)
+
+
+def _service(port: int) -> dict:
+    return {"host": "127.0.0.1", "port": port, "url": f"http://127.0.0.1:{port}"}
+
+
+def test_reload():
+    """测试重新加载和变更通知"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "services.json")
+        _write(path, {"order_agent": _service(10006), "consult_agent": _service(10005)})
+        sd = ServiceDiscovery(method="config", config_file=path, reload_interval=0.05)
+        changes = []
+        sd.add_listener(lambda service_name, removed_urls: changes.append((service_name, removed_urls)))
+        
+        _write(path, {"order_agent": _service(10016), "consult_agent": _service(10005),
+                      "feedback_agent": _service(10007)})
+        time.sleep(0.06)
+        assert sd.discover("order_agent")["port"] == 10016, "修改后应重新加载"
+        assert sorted(changes) == [("feedback_agent", []), ("order_agent", ["http://127.0.0.1:10006"])]
+        assert sd.stats()["reloads"] == 1
+        
+        # 写了一半的文件：保留旧配置
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"order_agent": {"host": "127.0.0.1", "po')
+        time.sleep(0.06)
+        assert sd.discover("order_agent")["port"] == 10016, "文件不完整时应保留旧配置"
+        _write(path, {"order_agent": _service(10026)})
+        time.sleep(0.06)
+        assert sd.discover("order_agent")["port"] == 10026, "修复后应重新加载"
+        assert sd.discover("consult_agent") is None
+        
+        # 本进程写入的配置不触发重新加载
+        sd.register("order_agent", host="127.0.0.1", port=10036)
+        reloads = sd.stats()["reloads"]
+        time.sleep(0.06)
+        assert len(sd.discover_all("order_agent")) == 2 and sd.stats()["reloads"] == reloads
+        assert not any(name.endswith(".tmp") for name in os.listdir(temp_dir)), "临时文件应被替换"
+        
+        # 其他进程看到同样的配置
+        other = ServiceDiscovery(method="config", config_file=path, reload_interval=0.05)
+        assert other.discover_all("order_agent") == sd.discover_all("order_agent")
+    print("✅ 重新加载 / 变更通知通过")
+
+
+def test_concurrent_readers():
+    """测试并发读取时的一致性"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "services.json")
+        _write(path, {"order_agent": _service(20000)})
+        sd = ServiceDiscovery(method="config", config_file=path, reload_interval=0.001)
+        stop = threading.Event()
+        errors = []
+        
+        def reader():
+            while not stop.is_set():
+                service = sd.discover("order_agent")
+                if service is None or service["url"] != f"http://127.0.0.1:{service['port']}":
+                    errors.append(service)
+        
+        threads = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for i in range(1, 50):
+            _write(path, {"order_agent": _service(20000 + i)})
+            time.sleep(0.004)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        assert not errors, f"读到了不完整的配置: {errors[:3]}"
+        assert sd.stats()["reloads"] > 0
+    print(f"✅ 并发读取一致性通过（重新加载 {sd.stats()['reloads']} 次）")
+
+
+def test_drain():
+    """测试关闭到已删除实例的连接"""
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = MCPServer(server_name="order-mcp-server", port=18291)
+    http_server = make_server("127.0.0.1", 18291, server.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "services.json")
+        _write(path, {"order-mcp-server": _service(18291)})
+        sd = ServiceDiscovery(method="config", config_file=path, reload_interval=0.05)
+        transport = HTTPTransport()
+        balancer = LoadBalancer()
+        client = MCPClient(service_discovery=sd, transport=transport, balancer=balancer)
+        MCPClient(service_discovery=sd, transport=transport, balancer=balancer)
+        assert len(sd._listeners) == 2, "同一个传输层和负载均衡器的回调只注册一次"
+        
+        assert client.list_tools("order-mcp-server") == []
+        assert len(transport.adapter.poolmanager.pools) == 1
+        assert "http://127.0.0.1:18291" in balancer.stats()["instances"]
+        
+        _write(path, {"order-mcp-server": _service(18292)})
+        time.sleep(0.06)
+        assert sd.discover("order-mcp-server")["port"] == 18292
+        assert len(transport.adapter.poolmanager.pools) == 0, "到已删除实例的连接池应被关闭"
+        assert "http://127.0.0.1:18291" not in balancer.stats()["instances"]
+    http_server.shutdown()
+    print("✅ 连接池清理通过")
+
+
+def test_concurrent_register():
+    """测试多个 ServiceDiscovery 同时注册"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "services.json")
+        _write(path, {})
+        # 不自动重新加载：注册时必须自己重新读取文件，才能保留其他实例写入的注册
+        replicas = [ServiceDiscovery(method="config", config_file=path, reload_interval=0) for _ in range(2)]
+        
+        def register(sd, offset):
+            for i in range(10):
+                sd.register("order_agent", "127.0.0.1", 18300 + offset + i)
+        
+        threads = [threading.Thread(target=register, args=(sd, i * 10)) for i, sd in enumerate(replicas)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with open(path, encoding="utf-8") as f:
+            ports = sorted(instance["port"] for instance in json.load(f)["order_agent"]["instances"])
+        assert ports == list(range(18300, 18320)), f"注册的实例被覆盖: {ports}"
+        assert replicas[0].deregister("order_agent", "http://127.0.0.1:18310")
+        assert replicas[1].deregister("order_agent", "http://127.0.0.1:18300")
+        with open(path, encoding="utf-8") as f:
+            assert len(json.load(f)["order_agent"]["instances"]) == 18
+    print("✅ 并发注册通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("services.json 热加载测试")
+    print("=" * 60)
+    test_reload()
+    test_concurrent_readers()
+    test_drain()
+    test_concurrent_register()
+
+
+if __name__ == "__main__":
+    main()
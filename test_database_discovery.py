@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+测试数据库服务发现（使用临时目录中的 SQLite 数据库）
+验证：
+1. 多实例注册、发现和注销，多个进程共享同一个数据库
+2. 进程内缓存：重复查询不访问数据库；缓存过期后看到其他进程的变更并通知被删除的实例
+3. 心跳续期：注册的实例不会过期；没有心跳的实例在读取时被忽略并被清理
+4. 按服务查询和清理过期实例使用索引（EXPLAIN QUERY PLAN）
+5. list_services 一次查询读取所有服务
+"""
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from database.db_manager import DatabaseManager
+from service_discovery import ServiceDiscovery
+
+
+class CountingDatabaseManager(DatabaseManager):
+    """记录查询次数的 DatabaseManager"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queries = 0
+    
+    def fetch_all(self, query, params=None):
+        self.queries += 1
+        return super().fetch_all(query, params)
+
+
+_temp_dir = tempfile.TemporaryDirectory()
+
+
+def _db_path(name: str) -> str:
+    """临时目录中的 SQLite 数据库路径（每个测试使用独立的数据库）"""
+    return os.path.join(_temp_dir.name, f"{name}.db")
+
+
+def _wait_for(condition, timeout: float = 3.0) -> bool:
+    """等待条件成立"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_register_and_discover():
+    """测试多实例注册、发现、缓存和注销"""
+    db_path = _db_path("register")
+    db = CountingDatabaseManager(db_type="sqlite", db_path=db_path)
+    sd = ServiceDiscovery(method="database", db_manager=db, cache_ttl=60)
+    sd.register("order_agent", host="10.0.0.2", port=10006, description="订单智能体", heartbeat=False)
+    sd.register("order_agent", host="10.0.0.1", port=10006, description="订单智能体", heartbeat=False)
+    
+    instances = sd.discover_all("order_agent")
+    assert [instance["url"] for instance in instances] == ["http://10.0.0.1:10006", "http://10.0.0.2:10006"]
+    assert instances[0]["port"] == 10006 and instances[0]["description"] == "订单智能体"
+    assert sd.discover("order_agent")["host"] == "10.0.0.1"
+    assert sd.discover("unknown") is None
+    
+    queries = db.queries
+    for _ in range(100):
+        sd.discover_all("order_agent")
+    assert db.queries == queries, "缓存有效期内不应访问数据库"
+    assert sd.stats()["cache_hits"] >= 100
+    
+    # 其他进程（另一个连接）看到同样的实例
+    other = ServiceDiscovery(method="database", db_manager=DatabaseManager(db_type="sqlite", db_path=db_path))
+    assert other.discover_all("order_agent") == instances
+    
+    # 重复注册更新实例信息
+    sd.register("order_agent", host="10.0.0.1", port=10006, description="订单智能体 v2", heartbeat=False)
+    assert sd.discover("order_agent")["description"] == "订单智能体 v2", "注册后应立即失效缓存"
+    assert len(sd.discover_all("order_agent")) == 2
+    
+    assert sd.deregister("order_agent", "http://10.0.0.1:10006")
+    assert not sd.deregister("order_agent", "http://10.0.0.1:10006")
+    assert [instance["host"] for instance in sd.discover_all("order_agent")] == ["10.0.0.2"]
+    assert sd.deregister("order_agent")
+    assert sd.discover_all("order_agent") == []
+    sd.close()
+    print(f"✅ 注册 / 发现 / 注销通过: {sd.stats()}")
+
+
+def test_change_polling():
+    """测试缓存过期后发现其他进程删除的实例"""
+    db_path = _db_path("polling")
+    publisher = ServiceDiscovery(method="database", db_manager=DatabaseManager(db_type="sqlite", db_path=db_path))
+    subscriber = ServiceDiscovery(method="database", db_manager=DatabaseManager(db_type="sqlite", db_path=db_path),
+                                  cache_ttl=0.05)
+    changes = []
+    subscriber.add_listener(lambda service_name, removed_urls: changes.append((service_name, removed_urls)))
+    
+    publisher.register("order-mcp-server", host="10.0.0.1", port=10002, heartbeat=False)
+    publisher.register("order-mcp-server", host="10.0.0.2", port=10002, heartbeat=False)
+    assert len(subscriber.discover_all("order-mcp-server")) == 2
+    
+    publisher.deregister("order-mcp-server", "http://10.0.0.1:10002")
+    assert len(subscriber.discover_all("order-mcp-server")) == 2, "缓存有效期内仍使用旧结果"
+    time.sleep(0.06)
+    assert len(subscriber.discover_all("order-mcp-server")) == 1
+    assert changes == [("order-mcp-server", ["http://10.0.0.1:10002"])], f"应通知被删除的实例: {changes}"
+    print("✅ 变更轮询通过")
+
+
+def test_heartbeat():
+    """测试心跳续期和过期清理"""
+    db_path = _db_path("heartbeat")
+    registrar = ServiceDiscovery(method="database", db_manager=DatabaseManager(db_type="sqlite", db_path=db_path),
+                                 registration_ttl=0.3, heartbeat_interval=0.05, cache_ttl=0)
+    reader = ServiceDiscovery(method="database", db_manager=DatabaseManager(db_type="sqlite", db_path=db_path),
+                              registration_ttl=0.3, cache_ttl=0)
+    registrar.register("feedback_agent", host="10.0.0.1", port=10007)
+    registrar.register("consult_agent", host="10.0.0.1", port=10005, heartbeat=False)
+    
+    time.sleep(0.5)
+    assert len(reader.discover_all("feedback_agent")) == 1, "心跳应续期注册"
+    assert reader.discover_all("consult_agent") == [], "没有心跳的注册应过期"
+    count = reader.db.fetch_one("SELECT COUNT(*) AS count FROM service_instances WHERE service_name = ?",
+                                ("consult_agent",))["count"]
+    assert count == 0, "心跳时应清理过期的实例"
+    
+    registered_at = reader.db.fetch_one("SELECT registered_at, heartbeat_at FROM service_instances WHERE url = ?",
+                                        ("http://10.0.0.1:10007",))
+    assert registered_at["heartbeat_at"] > registered_at["registered_at"], "心跳应保留注册时间"
+    
+    registrar.close()
+    assert _wait_for(lambda: reader.discover_all("feedback_agent") == []), "停止心跳后应自动下线"
+    assert reader.reap_stale() == 1
+    print("✅ 心跳续期 / 过期清理通过")
+
+
+def test_indexes():
+    """测试查询使用索引"""
+    db_path = _db_path("indexes")
+    db = DatabaseManager(db_type="sqlite", db_path=db_path)
+    ServiceDiscovery(method="database", db_manager=db)
+    lookup = " ".join(row["detail"] for row in db.fetch_all(
+        "EXPLAIN QUERY PLAN SELECT service_name, url, host, port, metadata FROM service_instances "
+        "WHERE service_name = ? AND heartbeat_at >= ? ORDER BY url", ("order_agent", 0)))
+    assert "uk_service_instances_name_url" in lookup and "TEMP B-TREE" not in lookup, lookup
+    reap = " ".join(row["detail"] for row in db.fetch_all(
+        "EXPLAIN QUERY PLAN DELETE FROM service_instances WHERE heartbeat_at < ?", (0,)))
+    assert "idx_service_instances_heartbeat" in reap, reap
+    print(f"✅ 索引查询通过: {lookup}")
+
+
+def test_list_services():
+    """测试 list_services"""
+    db_path = _db_path("list")
+    db = CountingDatabaseManager(db_type="sqlite", db_path=db_path)
+    sd = ServiceDiscovery(method="database", db_manager=db, cache_ttl=0)
+    for i in range(20):
+        sd.register(f"service_{i}", host="10.0.0.1", port=11000 + i, heartbeat=False)
+    sd.register("service_0", host="10.0.0.2", port=11000, heartbeat=False)
+    
+    queries = db.queries
+    services = sd.list_services()
+    assert len(services) == 20
+    assert len(services["service_0"]["instances"]) == 2 and services["service_1"]["port"] == 11001
+    assert db.queries - queries == 1, "应一次查询读取所有服务"
+    print("✅ list_services 通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("数据库服务发现测试")
+    print("=" * 60)
+    test_register_and_discover()
+    test_change_polling()
+    test_heartbeat()
+    test_indexes()
+    test_list_services()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+测试数据库表结构迁移（database.migrations）
+验证：
+1. 新数据库按顺序执行所有迁移并记录版本，重复执行不再迁移
+2. 旧版本的数据库（只有基础表结构）升级时只执行新的迁移，已有数据保留
+3. 多个连接同时迁移同一个数据库时每个迁移只执行一次
+4. OrderDAO / FeedbackDAO 按用户、订单查询时使用索引，并且不需要额外排序（EXPLAIN QUERY PLAN）
+"""
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from database.db_manager import DatabaseManager
+from database.migrations import MIGRATIONS, SCHEMA_VERSION, applied_versions, migrate
+from order_mcp_server.database import OrderDAO
+from feedback_mcp_server.database import FeedbackDAO
+
+_temp_dir = tempfile.TemporaryDirectory()
+
+
+def _db_path(name: str) -> str:
+    """临时目录中的 SQLite 数据库路径（每个测试使用独立的数据库）"""
+    return os.path.join(_temp_dir.name, f"{name}.db")
+
+
+class RecordingDatabaseManager(DatabaseManager):
+    """记录执行过的查询语句的 DatabaseManager"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queries = []
+    
+    def fetch_one(self, query, params=None):
+        self.queries.append((query, params))
+        return super().fetch_one(query, params)
+    
+    def fetch_all(self, query, params=None):
+        self.queries.append((query, params))
+        return super().fetch_all(query, params)
+
+
+def _indexes(db: DatabaseManager):
+    return {row["name"] for row in db.fetch_all("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_fresh_database():
+    """测试新数据库执行所有迁移"""
+    db = DatabaseManager(db_type="sqlite", db_path=_db_path("fresh"))
+    assert applied_versions(db) == [migration.version for migration in MIGRATIONS]
+    assert db.schema_version() == SCHEMA_VERSION
+    assert {"idx_orders_user_created", "idx_order_items_order",
+            "idx_feedback_user_created", "idx_feedback_order_created"} <= _indexes(db)
+    assert migrate(db) == [], "已是最新版本时不应再执行迁移"
+    assert not db.ensure_schema()
+    print(f"✅ 新数据库迁移通过: 版本 {applied_versions(db)}")
+
+
+def test_upgrade():
+    """测试旧版本数据库升级"""
+    db_path = _db_path("upgrade")
+    old = DatabaseManager(db_type="sqlite", db_path=db_path, init_schema=False)
+    assert migrate(old, target=1) == [1]
+    old.execute("INSERT INTO orders (order_id, user_id, total_price) VALUES (?, ?, ?)", ("ORDER_OLD", 1, 18.0))
+    assert "idx_orders_user_created" not in _indexes(old)
+    
+    db = DatabaseManager(db_type="sqlite", db_path=db_path)
+    assert applied_versions(db) == [1, 2] and "idx_orders_user_created" in _indexes(db)
+    assert db.fetch_one("SELECT order_id FROM orders")["order_id"] == "ORDER_OLD", "升级应保留已有数据"
+    print("✅ 旧版本数据库升级通过")
+
+
+def test_concurrent_migrate():
+    """测试多个连接同时迁移"""
+    db_path = _db_path("concurrent")
+    managers = [DatabaseManager(db_type="sqlite", db_path=db_path, init_schema=False) for _ in range(4)]
+    results, errors = [], []
+    
+    def run(db):
+        try:
+            results.append(migrate(db))
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=run, args=(db,)) for db in managers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    assert sorted(version for executed in results for version in executed) == [1, 2], f"每个迁移只执行一次: {results}"
+    print(f"✅ 并发迁移通过: {results}")
+
+
+def test_query_plans():
+    """测试 DAO 的查询使用索引"""
+    db = RecordingDatabaseManager(db_type="sqlite", db_path=_db_path("plans"))
+    order_dao = OrderDAO(db_manager=db)
+    feedback_dao = FeedbackDAO(db_manager=db)
+    order_dao.create_order({"order_id": "ORDER_1", "user_id": 1, "total_price": 18.0})
+    
+    expected = [
+        (lambda: order_dao.get_orders_by_user(1), "orders", "idx_orders_user_created"),
+        (lambda: order_dao.query_orders(1, {}), "orders", "idx_orders_user_created"),
+        (lambda: order_dao.get_order_items("ORDER_1"), "order_items", "idx_order_items_order"),
+        (lambda: order_dao.get_orders_by_user(1), "order_items", "idx_order_items_order"),
+        (lambda: feedback_dao.get_feedbacks_by_user_id(1), "feedback", "idx_feedback_user_created"),
+        (lambda: feedback_dao.get_feedbacks_by_order_id("ORDER_1"), "feedback", "idx_feedback_order_created"),
+    ]
+    for call, table, index in expected:
+        db.queries.clear()
+        call()
+        queries = [(query, params) for query, params in db.queries if f"FROM {table}" in query]
+        assert queries, f"{index}: 没有查询 {table}"
+        for query, params in queries:
+            plan = " ".join(row["detail"] for row in db.fetch_all(f"EXPLAIN QUERY PLAN {query}", params))
+            assert f"USING INDEX {index}" in plan, f"{query} 未使用 {index}: {plan}"
+            assert "TEMP B-TREE" not in plan, f"{query} 需要额外排序: {plan}"
+            print(f"  {index}: {plan}")
+    print("✅ 查询索引通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("数据库表结构迁移测试")
+    print("=" * 60)
+    test_fresh_database()
+    test_upgrade()
+    test_concurrent_migrate()
+    test_query_plans()
+
+
+if __name__ == "__main__":
+    main()
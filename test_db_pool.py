@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+测试数据库连接池（ConnectionPool / DatabaseManager）
+验证：
+1. 多个线程同时读写同一个 SQLite 数据库，连接数不超过上限
+2. 连接都被借出时等待，超过等待时间抛出 PoolTimeoutError 并计入统计
+3. 事务：正常结束提交、出错回滚；嵌套事务和事务内的查询使用同一个连接
+4. 健康检查：空闲连接检查失败时重新连接，无法回滚的连接被丢弃
+5. OrderDAO / FeedbackDAO 使用连接池，MCP Server 通过 /mcp/metrics 提供连接池统计
+6. SQLite 性能配置应用到每个连接（WAL 下读写互不阻塞），并定期执行 wal_checkpoint / optimize
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from database.db_manager import DatabaseManager
+from database.pool import ConnectionPool, PoolTimeoutError
+from order_mcp_server.database import OrderDAO
+from feedback_mcp_server.database import FeedbackDAO
+from mcp import MCPServer
+
+_temp_dir = tempfile.TemporaryDirectory()
+
+
+def _db(name: str, **kwargs) -> DatabaseManager:
+    """临时目录中的 SQLite 数据库（每个测试使用独立的数据库）"""
+    return DatabaseManager(db_type="sqlite", db_path=os.path.join(_temp_dir.name, f"{name}.db"), **kwargs)
+
+
+class FakeConnection:
+    """记录 ping / close 调用的连接"""
+    
+    def __init__(self, healthy: bool = True):
+        self.healthy = healthy
+        self.closed = False
+    
+    def ping(self):
+        if not self.healthy:
+            raise ConnectionError("server has gone away")
+    
+    def rollback(self):
+        if not self.healthy:
+            raise ConnectionError("server has gone away")
+    
+    def close(self):
+        self.closed = True
+
+
+def test_concurrent_access():
+    """测试多线程并发读写"""
+    db = _db("concurrent", pool_size=4)
+    created = db.stats()["created"]  # 检查表结构时建立的连接（检查完已关闭）
+    db.execute("CREATE TABLE counters (id INTEGER PRIMARY KEY AUTOINCREMENT, worker INT, value INT)")
+    errors = []
+    
+    def worker(worker_id: int):
+        try:
+            for i in range(50):
+                db.execute("INSERT INTO counters (worker, value) VALUES (?, ?)", (worker_id, i))
+                rows = db.fetch_all("SELECT value FROM counters WHERE worker = ?", (worker_id,))
+                assert len(rows) == i + 1, f"worker {worker_id} 读到 {len(rows)} 行"
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors[:3]
+    assert db.fetch_one("SELECT COUNT(*) AS count FROM counters")["count"] == 600
+    stats = db.stats()
+    assert stats["size"] <= 4 and stats["in_use"] == 0, stats
+    assert stats["created"] - created <= 4, "连接应被复用"
+    print(f"✅ 并发读写通过: {stats}")
+
+
+def test_timeout():
+    """测试连接数上限和等待超时"""
+    pool = ConnectionPool(FakeConnection, max_size=2, timeout=0.1)
+    first, second = pool.acquire(), pool.acquire()
+    start = time.monotonic()
+    try:
+        pool.acquire()
+        assert False, "超过连接数上限时应等待超时"
+    except PoolTimeoutError:
+        pass
+    assert time.monotonic() - start >= 0.1
+    
+    # 其他线程归还连接后等待的线程拿到连接
+    threading.Timer(0.03, pool.release, args=(first,)).start()
+    assert pool.acquire() is first
+    stats = pool.stats()
+    assert stats["timeouts"] == 1 and stats["in_use"] == 2 and stats["created"] == 2, stats
+    assert stats["max_wait_ms"] >= 20, "应记录等待归还的时间"
+    pool.release(first)
+    pool.release(second)
+    pool.close()
+    assert first.closed and second.closed, "关闭连接池时应关闭空闲连接"
+    print(f"✅ 连接数上限 / 等待超时通过: {stats}")
+
+
+def test_transaction():
+    """测试事务提交、回滚和嵌套"""
+    db = _db("transaction", pool_size=2)
+    db.execute("CREATE TABLE items (name TEXT)")
+    
+    with db.transaction() as cursor:
+        cursor.execute("INSERT INTO items (name) VALUES (?)", ("a",))
+        db.execute("INSERT INTO items (name) VALUES (?)", ("b",))
+        assert len(db.fetch_all("SELECT * FROM items")) == 2, "事务内的查询应读到未提交的写入"
+        # 其他线程（其他连接）读不到未提交的写入
+        result = []
+        reader = threading.Thread(target=lambda: result.append(len(db.fetch_all("SELECT * FROM items"))))
+        reader.start()
+        reader.join()
+        assert result == [0], result
+    assert len(db.fetch_all("SELECT * FROM items")) == 2
+    
+    try:
+        with db.transaction() as cursor:
+            cursor.execute("INSERT INTO items (name) VALUES (?)", ("c",))
+            with db.transaction() as inner:
+                inner.execute("INSERT INTO items (name) VALUES (?)", ("d",))
+            raise ValueError("业务校验失败")
+    except ValueError:
+        pass
+    assert [row["name"] for row in db.fetch_all("SELECT * FROM items")] == ["a", "b"], "出错时应回滚整个事务"
+    
+    assert db.execute("UPDATE items SET name = ? WHERE name = ?", ("B", "b")).rowcount == 1
+    assert db.stats()["in_use"] == 0
+    print("✅ 事务提交 / 回滚 / 嵌套通过")
+
+
+def test_health_check():
+    """测试健康检查和丢弃不可用的连接"""
+    connections = []
+    
+    def connect():
+        connections.append(FakeConnection())
+        return connections[-1]
+    
+    pool = ConnectionPool(connect, max_size=2, ping=lambda conn: conn.ping(), ping_interval=0.05)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn, "刚归还的连接不需要检查"
+    pool.release(conn)
+    
+    conn.healthy = False
+    time.sleep(0.06)
+    replacement = pool.acquire()
+    assert replacement is not conn and conn.closed, "检查失败的连接应重新建立"
+    pool.release(replacement, discard=True)
+    assert replacement.closed
+    stats = pool.stats()
+    assert stats["discarded"] == 2 and stats["size"] == 0 and stats["created"] == 2, stats
+    
+    # DatabaseManager：回滚失败的连接不再放回连接池
+    db = _db("health", pool_size=2)
+    db.pool = ConnectionPool(lambda: FakeConnection(healthy=False), max_size=1)
+    try:
+        with db.connection():
+            raise ConnectionError("连接断开")
+    except ConnectionError:
+        pass
+    assert db.pool.stats()["discarded"] == 1 and db.pool.stats()["size"] == 0
+    print("✅ 健康检查 / 重新连接通过")
+
+
+def test_dao():
+    """测试 DAO 使用连接池和事务"""
+    db = _db("dao", pool_size=4)
+    order_dao = OrderDAO(db_manager=db)
+    order = order_dao.create_order({"order_id": "ORDER_1", "user_id": 1, "total_price": 18.0})
+    assert order["order_id"] == "ORDER_1"
+    
+    try:
+        with order_dao.transaction():
+            order_dao.create_order({"order_id": "ORDER_2", "user_id": 1, "total_price": 20.0})
+            assert order_dao.get_order_by_id("ORDER_2") is not None
+            order_dao.create_order_item({"order_id": "ORDER_2", "product_name": "桂花云露"})  # 缺少字段
+    except KeyError:
+        pass
+    assert order_dao.get_order_by_id("ORDER_2") is None, "订单项写入失败时订单应一起回滚"
+    
+    feedback_dao = FeedbackDAO(db_manager=db)
+    feedback = feedback_dao.create_feedback(user_id=1, feedback_type=1, content="很好喝", order_id="ORDER_1", rating=5)
+    assert feedback["content"] == "很好喝"
+    assert feedback_dao.update_feedback_solution(feedback["id"], "感谢反馈")
+    assert not feedback_dao.update_feedback_solution(feedback["id"] + 100, "不存在")
+    assert db.stats()["in_use"] == 0
+    
+    server = MCPServer(server_name="order-mcp-server")
+    server.register_metrics("database", db.stats)
+    metrics = server.app.test_client().get("/mcp/metrics").get_json()
+    assert metrics["server"] == "order-mcp-server" and metrics["database"]["checkouts"] > 0
+    print(f"✅ DAO / 指标接口通过: {metrics['database']}")
+
+
+def test_sqlite_profile():
+    """测试 SQLite 性能配置和例行维护"""
+    db = _db("profile", pool_size=2, maintenance_interval=0.05)
+    created = db.stats()["created"]
+    db.execute("CREATE TABLE items (name TEXT)")
+    with db.connection() as first:
+        # 在另一个线程借出第二个连接，确认每个连接都应用了配置
+        second = []
+        reader = threading.Thread(target=lambda: second.append(
+            db.fetch_one("PRAGMA synchronous")["synchronous"]))
+        reader.start()
+        reader.join()
+        assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert first.execute("PRAGMA synchronous").fetchone()[0] == 1 and second == [1], "synchronous 应为 NORMAL"
+        assert first.execute("PRAGMA temp_store").fetchone()[0] == 2, "temp_store 应为 MEMORY"
+        assert first.execute("PRAGMA busy_timeout").fetchone()[0] == db.pragmas["busy_timeout"]
+        assert first.execute("PRAGMA cache_size").fetchone()[0] == db.pragmas["cache_size"]
+    assert db.stats()["created"] - created == 2 and db.stats()["journal_mode"] == "WAL"
+    
+    # WAL：读事务进行中时写入不被阻塞，读事务仍看到开始时的快照
+    with db.connection() as reader:
+        reader.execute("BEGIN")
+        assert reader.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+        writer = threading.Thread(target=db.execute, args=("INSERT INTO items (name) VALUES (?)", ("a",)))
+        writer.start()
+        writer.join(timeout=1)
+        assert not writer.is_alive(), "读事务不应阻塞写入"
+        assert reader.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+        reader.execute("COMMIT")
+    assert db.fetch_one("SELECT COUNT(*) AS count FROM items")["count"] == 1
+    
+    # 例行维护：间隔到期后归还连接时执行检查点，把 WAL 中的页写回数据库文件
+    time.sleep(0.06)
+    runs = db.stats()["maintenance_runs"]
+    db.fetch_all("SELECT * FROM items")
+    assert db.stats()["maintenance_runs"] == runs + 1
+    result = db.maintain()
+    assert result is not None and not result["busy"] and result["checkpointed"] == result["wal_pages"], result
+    
+    # pragmas={} 时使用 SQLite 的默认设置
+    plain = _db("plain", pragmas={}, maintenance_interval=0)
+    assert plain.fetch_one("PRAGMA journal_mode")["journal_mode"] == "delete"
+    print(f"✅ SQLite 性能配置 / 例行维护通过: {result}")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("数据库连接池测试")
+    print("=" * 60)
+    test_concurrent_access()
+    test_timeout()
+    test_transaction()
+    test_health_check()
+    test_dao()
+    test_sqlite_profile()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+测试进程内共享的数据库注册表（database.registry）
+验证：
+1. 同一个数据库（相对路径和绝对路径视为同一个）只创建一个 DatabaseManager，并发获取也只创建一次
+2. 导入 MCP Server 模块时不连接数据库；多个 MCP Server 共用一个连接池
+3. 表结构已是最新版本时不再执行建表语句
+4. 创建后和 fork 工作进程前不在连接池中留下空闲连接
+"""
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+_temp_dir = tempfile.TemporaryDirectory()
+os.environ["DB_TYPE"] = "sqlite"
+os.environ["SQLITE_DB_PATH"] = os.path.join(_temp_dir.name, "milk_tea.db")
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from database import registry
+from database.config import SQLITE_DB_PATH
+from database.db_manager import DatabaseManager, SCHEMA_VERSION
+from order_mcp_server.order_mcp_server import OrderMCPServer
+from feedback_mcp_server.feedback_mcp_server import FeedbackMCPServer
+from feedback_mcp_server.feedback_service import get_feedback_service
+
+
+class CountingDatabaseManager(DatabaseManager):
+    """记录建表次数的 DatabaseManager"""
+    
+    table_inits = 0
+    
+    def _init_tables(self):
+        CountingDatabaseManager.table_inits += 1
+        super()._init_tables()
+
+
+def test_shared_instance():
+    """测试同一个数据库只创建一个 DatabaseManager"""
+    db_path = os.path.join(_temp_dir.name, "shared.db")
+    db = registry.get_database("sqlite", db_path=db_path)
+    assert registry.get_database("sqlite", db_path=os.path.relpath(db_path)) is db, "相对路径应指向同一个实例"
+    assert registry.get_database("sqlite", db_path=os.path.join(_temp_dir.name, "other.db")) is not db
+    assert registry.make_dsn("mysql", host="db", user="app", password="secret", database="shop") == "mysql://app@db:3306/shop"
+    
+    results = []
+    db_path = os.path.join(_temp_dir.name, "concurrent.db")
+    threads = [threading.Thread(target=lambda: results.append(registry.get_database("sqlite", db_path=db_path)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(result) for result in results}) == 1, "并发获取应只创建一个实例"
+    print(f"✅ 共享实例通过: {len(registry.registered_databases())} 个数据库")
+
+
+def test_lazy_mcp_servers():
+    """测试 MCP Server 懒加载并共用连接池"""
+    default_dsn = registry.make_dsn("sqlite", db_path=SQLITE_DB_PATH)
+    assert default_dsn not in registry.registered_databases(), "导入模块时不应连接数据库"
+    
+    order_server = OrderMCPServer(port=18301)
+    feedback_server = FeedbackMCPServer(port=18302)
+    db = order_server.order_service.order_dao.db
+    assert db is feedback_server.feedback_service.feedback_dao.db is get_feedback_service().feedback_dao.db
+    assert db is registry.get_default_database()
+    assert db.pool.stats()["created"] == 1, "多个 MCP Server 应共用一个连接池"
+    assert db.pool.stats()["idle"] == 0, "检查完表结构后不应在连接池中留下空闲连接（fork 前不持有连接）"
+    
+    # fork 工作进程前关闭空闲连接，之后按需重新连接
+    db.fetch_one("SELECT 1 AS one")
+    assert registry.close_idle() >= 1 and db.pool.stats()["idle"] == 0
+    assert db.fetch_one("SELECT 1 AS one")["one"] == 1 and db.pool.stats()["created"] == 3
+    
+    metrics = order_server.mcp_server.app.test_client().get("/mcp/metrics").get_json()
+    assert metrics["database"]["max_size"] == db.pool_size
+    print(f"✅ MCP Server 懒加载 / 共用连接池通过: {registry.registered_databases()[default_dsn]}")
+
+
+def test_schema_version():
+    """测试只在表结构版本落后时建表"""
+    db_path = os.path.join(_temp_dir.name, "schema.db")
+    first = CountingDatabaseManager(db_type="sqlite", db_path=db_path)
+    assert CountingDatabaseManager.table_inits == 1 and first.schema_version() == SCHEMA_VERSION
+    second = CountingDatabaseManager(db_type="sqlite", db_path=db_path)
+    assert CountingDatabaseManager.table_inits == 1, "表结构已是最新版本时不应再建表"
+    assert not second.ensure_schema()
+    
+    # 版本记录被删除（如旧版本创建的数据库）时重新执行建表语句
+    second.execute("DELETE FROM schema_migrations")
+    assert second.schema_version() == 0
+    assert second.ensure_schema() and CountingDatabaseManager.table_inits == 2
+    
+    second.init_products()
+    second.init_products()
+    assert second.fetch_one("SELECT COUNT(*) AS count FROM products")["count"] == 5, "产品数据只初始化一次"
+    print("✅ 表结构版本检查通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("数据库注册表测试")
+    print("=" * 60)
+    test_shared_instance()
+    test_lazy_mcp_servers()
+    test_schema_version()
+    registry.close_all()
+
+
+if __name__ == "__main__":
+    main()
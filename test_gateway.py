@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+测试多会话网关（SupervisorGateway / SupervisorSessionPool）
+验证：
+1. 会话按 (user_id, chat_id) 隔离，LRU 淘汰和空闲超时淘汰，正在处理请求的会话不被淘汰
+2. 同一会话的请求串行执行，不同会话并行执行；多个网关副本通过会话存储继续同一个对话
+3. /chat、/chat/stream（SSE）、DELETE /sessions 和 /metrics 接口，缺少 chat_id 的请求不共享会话
+4. SupervisorAgent.new_session 共享路由组件、对话历史独立，共用的线程池按网关的并发数设置
+5. 网关不提供 async 运行模式
+"""
+import os
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+os.environ.setdefault("DASHSCOPE_API_KEY", "test-key")
+
+from gateway import SupervisorGateway, SupervisorSessionPool
+
+
+class EchoAgent:
+    """回显输入的会话对象，记录并发执行的情况"""
+    
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+    
+    def __init__(self, user_id: str, chat_id: str, delay: float = 0.05):
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.delay = delay
+        self.history = []
+    
+    def chat(self, user_input: str) -> str:
+        with EchoAgent.lock:
+            EchoAgent.active += 1
+            EchoAgent.max_active = max(EchoAgent.max_active, EchoAgent.active)
+        time.sleep(self.delay)
+        with EchoAgent.lock:
+            EchoAgent.active -= 1
+        self.history.append({"role": "user", "content": user_input})
+        return f"{self.chat_id}: {user_input} (第 {len(self.history)} 轮)"
+    
+    def chat_stream(self, user_input: str):
+        for chunk in self.chat(user_input).split(" "):
+            yield chunk + " "
+
+
+def test_pool_eviction():
+    """测试 LRU 和空闲超时淘汰"""
+    pool = SupervisorSessionPool(EchoAgent, max_sessions=2, idle_ttl=0, evict_interval=0)
+    first = pool.get("c1", "u1")
+    assert pool.get("c1", "u1") is first, "同一会话应复用"
+    assert pool.get("c1", "u2") is not first, "不同用户的会话应隔离"
+    pool.get("c1", "u1")  # u1 的会话变为最近使用
+    pool.get("c1", "u3")
+    assert len(pool) == 2 and pool.stats()["evictions"] == 1
+    assert pool.get("c1", "u1") is first, "最近使用的会话不应被淘汰"
+    
+    pool = SupervisorSessionPool(EchoAgent, max_sessions=10, idle_ttl=0.05, evict_interval=0)
+    busy = pool.get("c1", "u1")
+    pool.get("c2", "u2")
+    with busy.lock:
+        time.sleep(0.1)
+        assert pool.evict_idle() == 1, "正在处理请求的会话不应被淘汰"
+    assert len(pool) == 1
+    print("✅ 会话 LRU / 空闲超时淘汰通过")
+
+
+def test_session_locking():
+    """测试同一会话串行、不同会话并行"""
+    pool = SupervisorSessionPool(EchoAgent, evict_interval=0)
+    
+    def turn(user_id: str, chat_id: str):
+        with pool.session(chat_id, user_id) as session:
+            session.agent.chat("你好")
+    
+    EchoAgent.max_active = 0
+    threads = [threading.Thread(target=turn, args=("u1", "c1")) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert EchoAgent.max_active == 1, "同一会话的请求应串行执行"
+    assert pool.get("c1", "u1").turns == 4
+    
+    EchoAgent.max_active = 0
+    start = time.perf_counter()
+    threads = [threading.Thread(target=turn, args=(f"u{i}", "c1")) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert EchoAgent.max_active > 1, "不同会话的请求应并行执行"
+    assert time.perf_counter() - start < 0.15
+    print("✅ 会话锁通过")
+
+
+def test_pool_store():
+    """测试多个网关副本通过会话存储继续同一个对话"""
+    from session_store import MemorySessionStore
+    store = MemorySessionStore()
+    replica_a = SupervisorSessionPool(EchoAgent, evict_interval=0, store=store)
+    replica_b = SupervisorSessionPool(EchoAgent, evict_interval=0, store=store)
+    with replica_a.session("c1", "u1") as session:
+        assert session.agent.chat("你好") == "c1: 你好 (第 1 轮)"
+    with replica_b.session("c1", "u1") as session:
+        assert session.agent.chat("再见") == "c1: 再见 (第 2 轮)", "其他副本应能继续同一个对话"
+        assert session.history is session.agent.history
+    assert [m["content"] for m in store.load("supervisor:u1:c1").history] == ["你好", "再见"]
+    assert replica_b.remove("c1", "u1") and store.load("supervisor:u1:c1") is None
+    print("✅ 网关副本共享会话存储通过")
+
+
+def test_http_api():
+    """测试网关 HTTP 接口"""
+    gateway = SupervisorGateway(pool=SupervisorSessionPool(EchoAgent, evict_interval=0))
+    client = gateway.app.test_client()
+    
+    response = client.post("/chat", json={"user_id": "u1", "chat_id": "c1", "input": "你好"})
+    assert response.status_code == 200 and response.get_json()["output"] == "c1: 你好 (第 1 轮)"
+    response = client.post("/chat", json={"user_id": "u1", "chat_id": "c1", "input": "再见"})
+    assert response.get_json()["output"] == "c1: 再见 (第 2 轮)", "同一会话应保留对话历史"
+    assert response.get_json()["chat_id"] == "c1"
+    assert client.post("/chat", json={"user_id": "u1"}).status_code == 400
+    
+    # 没有 chat_id 的请求各自使用新的会话
+    first = client.post("/chat", json={"user_id": "u3", "input": "你好"}).get_json()
+    second = client.post("/chat", json={"user_id": "u3", "input": "你好"}).get_json()
+    assert first["chat_id"] != second["chat_id"] and second["output"].endswith("(第 1 轮)"), "缺少 chat_id 时不应共享会话"
+    assert client.delete(f"/sessions/u3/{first['chat_id']}").status_code == 200
+    assert client.delete(f"/sessions/u3/{second['chat_id']}").status_code == 200
+    
+    response = client.post("/chat/stream", json={"user_id": "u2", "chat_id": "c2", "input": "你好"})
+    assert response.mimetype == "text/event-stream" and response.headers["X-Chat-Id"] == "c2"
+    events = [json.loads(line[len("data: "):]) for line in response.get_data(as_text=True).split("\n\n") if line]
+    assert events[-1] == {"done": True}
+    assert "".join(event.get("delta", "") for event in events).strip() == "c2: 你好 (第 1 轮)"
+    
+    metrics = client.get("/metrics").get_json()
+    assert metrics["sessions"] == 2 and metrics["busy"] == 0
+    assert client.delete("/sessions/u1/c1").status_code == 200
+    assert client.delete("/sessions/u1/c1").status_code == 404
+    assert client.get("/health").get_json()["sessions"] == 1
+    print(f"✅ HTTP 接口通过: {metrics}")
+
+
+def test_server_modes():
+    """测试网关只提供支持的运行模式"""
+    import argparse
+    from contextlib import redirect_stderr
+    from serving import add_server_arguments
+    parser = argparse.ArgumentParser()
+    add_server_arguments(parser, modes=["dev", "production"])
+    assert parser.parse_args(["--mode", "production"]).mode == "production"
+    rejected = False
+    with open(os.devnull, "w") as devnull, redirect_stderr(devnull):
+        try:
+            parser.parse_args(["--mode", "async"])
+        except SystemExit:
+            rejected = True
+    assert rejected, "网关不应接受 async 模式"
+    print("✅ 网关运行模式通过")
+
+
+def test_new_session():
+    """测试 SupervisorAgent.new_session"""
+    from supervisor_agent import SupervisorAgent
+    template = SupervisorAgent(user_id="gateway", chat_id="gateway")
+    first = template.new_session("u1", "c1")
+    second = template.new_session("u2", "c2")
+    assert first.keyword_router is template.keyword_router and first.route_cache is second.route_cache
+    first.history.append({"role": "user", "content": "来一杯云边茉莉"})
+    assert len(second.history) == 1 and len(template.history) == 1, "对话历史应独立"
+    assert (first.user_id, first.chat_id) == ("u1", "c1")
+    
+    # 会话共用模板的线程池，按网关同时处理的请求数设置线程数
+    old_executor = template.multi_intent.executor
+    template.size_executors(16)
+    assert template.speculation.max_workers == 16
+    assert template.multi_intent.max_workers == 16 * template.multi_intent.max_intents
+    assert first.multi_intent.executor is template.multi_intent.executor is not old_executor
+    assert first.multi_intent.executor._max_workers == template.multi_intent.max_workers
+    template.size_executors(1)
+    assert template.speculation.max_workers == 16, "线程数不会被调小"
+    print("✅ SupervisorAgent.new_session 通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("多会话网关测试")
+    print("=" * 60)
+    test_pool_eviction()
+    test_session_locking()
+    test_pool_store()
+    test_http_api()
+    test_server_modes()
+    test_new_session()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+测试一致性哈希会话亲和（HashRing / AffinitySelector / A2AClient 多副本）
+验证：
+1. 对话在副本之间分布均匀，增加副本时只有约 1/N 的对话换到其他副本
+2. 有界负载：首选副本满载时顺延到下一个副本
+3. 连接失败的副本进入冷却并被跳过
+4. A2AClient 同一个对话的请求都发往同一个副本，副本宕机时自动换到其他副本
+5. 对话请求发出后连接被断开时不换副本重发（避免同一轮对话在两个副本上各下一次单）
+6. 副本返回的响应不是合法的 JSON 时按连接错误（ConnectionError）处理
+"""
+import sys
+import asyncio
+import logging
+import threading
+from collections import Counter
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from werkzeug.serving import make_server
+from werkzeug.wrappers import Response
+
+from a2a import A2AClient, A2AServer, AsyncA2AClient
+from a2a.hash_ring import HashRing, AffinitySelector
+from service_discovery import ServiceDiscovery
+from test_load_balancer import _start_dropping_server
+
+
+def test_ring_distribution():
+    """测试分布均匀性和增加副本时的迁移比例"""
+    nodes = [f"http://10.0.0.{i}:10006" for i in range(1, 5)]
+    ring = HashRing(nodes)
+    keys = [f"chat_{i}" for i in range(20000)]
+    owners = {key: ring.get(key) for key in keys}
+    counts = Counter(owners.values())
+    assert max(counts.values()) / min(counts.values()) < 1.3, f"分布不均匀: {counts}"
+    
+    bigger = HashRing(nodes + ["http://10.0.0.5:10006"])
+    moved = sum(1 for key in keys if bigger.get(key) != owners[key])
+    assert moved / len(keys) < 0.3, f"迁移比例过高: {moved / len(keys):.2%}"
+    assert list(ring.iter_nodes("chat_1"))[0] == ring.get("chat_1")
+    assert sorted(ring.iter_nodes("chat_1")) == sorted(nodes)
+    print(f"✅ 哈希环分布通过（{dict(counts)}，增加副本迁移 {moved / len(keys):.1%}）")
+
+
+def test_bounded_load_and_cooldown():
+    """测试有界负载和失败副本冷却"""
+    urls = ["http://a", "http://b", "http://c"]
+    selector = AffinitySelector(load_factor=1.0, cooldown=60)
+    preferred = HashRing(urls).get("chat_hot")
+    
+    # 同一个热点对话的并发请求：满载后顺延到其他副本
+    chosen = [selector.select("order_agent", urls, "chat_hot") for _ in range(6)]
+    assert chosen[0] == preferred
+    assert set(chosen) == set(urls), "首选副本满载时应顺延到其他副本"
+    assert max(Counter(chosen).values()) <= 2
+    for url in chosen:
+        selector.release(url)
+    assert selector.stats()["in_flight"] == {}
+    
+    url = selector.select("order_agent", urls, "chat_hot")
+    selector.release(url, failed=True)
+    assert selector.stats()["down"] == [preferred]
+    url = selector.select("order_agent", urls, "chat_hot")
+    assert url != preferred, "冷却中的副本应被跳过"
+    selector.release(url)
+    print(f"✅ 有界负载 / 冷却通过: {selector.stats()}")
+
+
+def _start_replica(name: str, port: int):
+    """启动一个返回副本名称的 A2A 服务"""
+    server = A2AServer(agent_name="order_agent", port=port)
+    server.set_handler(lambda data: f"{name}:{data.get('chat_id')}")
+    http_server = make_server("127.0.0.1", port, server.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    return http_server
+
+
+def test_client_affinity():
+    """测试 A2AClient 多副本会话亲和和故障转移"""
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    replicas = [_start_replica("r1", 18091), _start_replica("r2", 18092)]
+    sd = ServiceDiscovery(method="config")
+    sd.services = {"order_agent": {"description": "订单智能体", "instances": [
+        {"host": "127.0.0.1", "port": 18091},
+        {"host": "127.0.0.1", "port": 18092},
+        {"host": "127.0.0.1", "port": 18099}  # 没有启动的副本
+    ]}}
+    assert len(sd.discover_all("order_agent")) == 3
+    assert sd.discover("order_agent")["url"] == "http://127.0.0.1:18091"
+    
+    client = A2AClient(service_discovery=sd)
+    served = {}
+    for i in range(30):
+        chat_id = f"chat_{i}"
+        outputs = {client.call_agent("order_agent", {"input": "你好", "chat_id": chat_id})["output"]
+                   for _ in range(3)}
+        assert len(outputs) == 1, f"同一个对话应发往同一个副本: {outputs}"
+        served[chat_id] = outputs.pop().split(":")[0]
+    assert set(served.values()) == {"r1", "r2"}, "对话应分布到多个副本"
+    assert "http://127.0.0.1:18099" in client.selector.stats()["down"], "宕机的副本应进入冷却"
+    
+    events = list(client.call_agent_stream("order_agent", {"input": "你好", "chat_id": "chat_0"}))
+    assert events[-1]["output"].startswith(served["chat_0"])
+    
+    async def call_async():
+        async_client = AsyncA2AClient(service_discovery=sd)
+        result = await async_client.call_agent("order_agent", {"input": "你好", "chat_id": "chat_1"})
+        from http_transport import get_default_async_transport
+        await get_default_async_transport().close()
+        return result
+    
+    assert asyncio.run(call_async())["output"].startswith(served["chat_1"])
+    
+    for replica in replicas:
+        replica.shutdown()
+    print(f"✅ A2AClient 会话亲和 / 故障转移通过: {client.selector.stats()}")
+
+
+def test_no_replay_after_send():
+    """测试对话请求发出后连接断开时不重发"""
+    received = []
+    listeners = [_start_dropping_server(18095, received), _start_dropping_server(18096, received)]
+    sd = ServiceDiscovery(method="config")
+    sd.services = {"order_agent": {"instances": [
+        {"host": "127.0.0.1", "port": 18095},
+        {"host": "127.0.0.1", "port": 18096}
+    ]}}
+    client = A2AClient(service_discovery=sd)
+    try:
+        client.call_agent("order_agent", {"input": "我要一杯云边茉莉", "chat_id": "chat_replay"})
+        assert False, "连接被断开时应报错"
+    except ConnectionError:
+        pass
+    assert received == ["POST /a2a/invoke HTTP/1.1"], f"请求已经发出后不应换副本重发: {received}"
+    for listener in listeners:
+        listener.close()
+    print("✅ 对话请求发出后断开连接不重发通过")
+
+
+def test_invalid_json_response():
+    """测试副本返回非 JSON 响应时报 ConnectionError"""
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    app = lambda environ, start_response: Response("<html>502 Bad Gateway</html>", mimetype="application/json")(environ, start_response)
+    http_server = make_server("127.0.0.1", 18097, app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    sd = ServiceDiscovery(method="config")
+    sd.services = {"order_agent": {"instances": [{"host": "127.0.0.1", "port": 18097}]}}
+    client = A2AClient(service_discovery=sd)
+    try:
+        client.call_agent("order_agent", {"input": "你好", "chat_id": "chat_html"})
+        assert False, "响应不是 JSON 时应报错"
+    except ConnectionError as e:
+        assert "order_agent" in str(e), e
+    assert client.selector.stats()["in_flight"] == {}, "解析失败时也应释放副本"
+    
+    async def call_async():
+        async_client = AsyncA2AClient(service_discovery=sd)
+        try:
+            await async_client.call_agent("order_agent", {"input": "你好", "chat_id": "chat_html"})
+            assert False, "响应不是 JSON 时应报错"
+        except ConnectionError:
+            pass
+        finally:
+            from http_transport import get_default_async_transport
+            await get_default_async_transport().close()
+    
+    asyncio.run(call_async())
+    http_server.shutdown()
+    print("✅ 非 JSON 响应按连接错误处理通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("一致性哈希会话亲和测试")
+    print("=" * 60)
+    test_ring_distribution()
+    test_bounded_load_and_cooldown()
+    test_client_affinity()
+    test_no_replay_after_send()
+    test_invalid_json_response()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+测试对话历史管理（HistoryManager）
+验证：
+1. token 估算（中文按字、英文按 4 个字符估算）
+2. 超出 token 预算时保留系统提示词、最近的工具调用结果和最新消息
+3. 消息数上限
+4. 长对话中对话历史保持有界
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from history_manager import HistoryManager, estimate_tokens, TOOL_RESULT_PREFIX
+
+
+def _message(role: str, content: str) -> dict:
+    return {"role": role, "content": content}
+
+
+def test_estimate_tokens():
+    """测试 token 估算"""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("珍珠奶茶") == 4
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("我要 2 杯") == 4, estimate_tokens("我要 2 杯")
+    print("✅ token 估算通过")
+
+
+def test_keeps_system_prompt_and_tool_results():
+    """测试裁剪时保留系统提示词和最近的工具调用结果"""
+    manager = HistoryManager(max_tokens=120, max_messages=0, keep_tool_results=1)
+    history = [_message("system", "你是云边奶茶铺的订单智能体")]
+    history.append(_message("assistant", f"{TOOL_RESULT_PREFIX} 订单信息: ORDER_1"))
+    for i in range(20):
+        history.append(_message("user", f"第 {i} 轮对话，随便聊聊天气和奶茶口味"))
+        history.append(_message("assistant", f"好的，这是第 {i} 轮回复"))
+    history.append(_message("user", "我的订单做好了吗"))
+    
+    original_length = len(history)
+    trimmed = manager.trim(history)
+    assert trimmed is history, "应原地裁剪"
+    assert len(history) < original_length
+    assert manager.count_tokens(history) <= 120 or len(history) <= 3
+    assert history[0]["role"] == "system"
+    assert history[1]["content"].startswith(TOOL_RESULT_PREFIX), "最近的工具调用结果应保留"
+    assert history[-1]["content"] == "我的订单做好了吗", "最新消息应保留"
+    
+    stats = manager.stats()
+    assert stats["trims"] == 1 and stats["dropped_messages"] == original_length - len(history)
+    print(f"✅ 裁剪后保留 {len(history)}/{original_length} 条消息: {stats}")
+
+
+def test_max_messages():
+    """测试消息数上限"""
+    manager = HistoryManager(max_tokens=100000, max_messages=4, keep_tool_results=0)
+    history = [_message("system", "系统提示词")] + [_message("user", f"消息 {i}") for i in range(10)]
+    manager.trim(history)
+    assert [m["content"] for m in history] == ["系统提示词", "消息 6", "消息 7", "消息 8", "消息 9"]
+    
+    # 未超出限制时不修改
+    assert manager.window(history) == history
+    print("✅ 消息数上限通过")
+
+
+def test_long_conversation_is_bounded():
+    """测试长对话中对话历史保持有界"""
+    manager = HistoryManager(max_tokens=500, max_messages=40, keep_tool_results=2)
+    history = [_message("system", "系统提示词")]
+    for i in range(1000):
+        history.append(_message("user", f"我要一杯珍珠奶茶，少糖去冰（第 {i} 次）"))
+        manager.trim(history)
+        history.append(_message("assistant", f"{TOOL_RESULT_PREFIX} 订单创建成功 ORDER_{i}"))
+        history.append(_message("assistant", "您的订单已创建成功"))
+    assert len(history) <= 43, len(history)
+    assert manager.count_tokens(history) < 600
+    print(f"✅ 1000 轮对话后历史记录为 {len(history)} 条，约 {manager.count_tokens(history)} tokens")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("对话历史管理测试")
+    print("=" * 60)
+    test_estimate_tokens()
+    test_keeps_system_prompt_and_tool_results()
+    test_max_messages()
+    test_long_conversation_is_bounded()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+测试本地意图分类器（IntentClassifier）
+验证：
+1. 用种子样本训练后，对训练样本的预测正确
+2. 概率归一化、温度校准和高置信度判断
+3. 模型保存 / 加载
+4. 路由决策日志：分类器自己的判断不作为训练数据
+5. 单次预测耗时远低于 1 毫秒
+"""
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from supervisor_agent.intent_classifier import (
+    IntentClassifier, RoutingDecisionLog, load_training_data, DEFAULT_SEED_FILE, LABELS
+)
+
+
+def _seed_model() -> IntentClassifier:
+    texts, labels = load_training_data([str(DEFAULT_SEED_FILE)])
+    return IntentClassifier().fit_calibrated(texts, labels)
+
+
+def test_train_on_seed():
+    """测试用种子样本训练"""
+    texts, labels = load_training_data([str(DEFAULT_SEED_FILE)])
+    assert len(texts) >= 100 and set(labels) == set(LABELS)
+    
+    model = _seed_model()
+    accuracy = sum(model.predict(text)[0] == label for text, label in zip(texts, labels)) / len(texts)
+    assert accuracy > 0.9, f"训练集准确率过低: {accuracy:.2f}"
+    print(f"✅ 种子样本训练通过（训练集准确率 {accuracy:.1%}，温度系数 {model.temperature:.2f}）")
+
+
+def test_probabilities():
+    """测试概率输出"""
+    model = _seed_model()
+    probabilities = model.predict_proba("我想要一杯珍珠奶茶")
+    assert set(probabilities) == set(LABELS)
+    assert abs(sum(probabilities.values()) - 1.0) < 1e-6
+    assert max(probabilities, key=probabilities.get) == "order_agent"
+    
+    # 完全没见过的输入退化为先验，不应给出高置信度
+    label, confidence = model.predict("ⅹⅹⅹ")
+    assert confidence < 0.5, f"未知输入的置信度过高: {confidence}"
+    print(f"✅ 概率输出通过: {probabilities}")
+
+
+def test_save_and_load():
+    """测试模型保存和加载"""
+    model = _seed_model()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "intent_model.npz")
+        model.save(path)
+        restored = IntentClassifier.load(path)
+    for text in ["店员态度很差", "营业时间是几点", "你好"]:
+        assert restored.predict(text) == model.predict(text)
+    assert restored.temperature == model.temperature
+    print("✅ 模型保存 / 加载通过")
+
+
+def test_decision_log():
+    """测试路由决策日志"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "routing_decisions.jsonl")
+        log = RoutingDecisionLog(path)
+        log.record("来杯热的", "order_agent", source="llm")
+        log.record("随便聊聊", None, source="llm")
+        log.record("有优惠吗", "consult_agent", source="classifier", confidence=0.93)
+        log.record("我要投诉", "order_agent", source="keyword")
+        
+        texts, labels = load_training_data([path])
+    assert texts == ["来杯热的", "随便聊聊", "我要投诉"], "分类器自己的判断不应作为训练数据"
+    assert labels == ["order_agent", "none", "order_agent"]
+    
+    RoutingDecisionLog(None).record("不记录", None, source="llm")  # 未配置日志文件时不报错
+    print("✅ 路由决策日志通过")
+
+
+def test_latency():
+    """测试单次预测耗时"""
+    model = _seed_model()
+    inputs = ["营业时间是几点", "我想喝点甜的", "你们的服务越来越差了", "今天天气怎么样"] * 250
+    start = time.perf_counter()
+    for text in inputs:
+        model.predict(text)
+    per_call_ms = (time.perf_counter() - start) / len(inputs) * 1000
+    assert per_call_ms < 1.0, f"单次预测耗时过长: {per_call_ms:.3f} ms"
+    print(f"✅ 单次预测耗时 {per_call_ms * 1000:.1f} µs")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("本地意图分类器测试")
+    print("=" * 60)
+    test_train_on_seed()
+    test_probabilities()
+    test_save_and_load()
+    test_decision_log()
+    test_latency()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+测试关键词路由器（KeywordRouter）
+验证：
+1. Aho–Corasick 自动机一次扫描统计各分组的命中次数
+2. 默认路由表的路由结果与原来的关键词路由一致
+3. 实时产品目录在后台获取并合并到产品分组，获取失败时使用路由表中的产品名称，未命中时提前刷新
+4. 路由表文件修改后自动重新加载
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from supervisor_agent.keyword_router import KeywordAutomaton, KeywordRouter, DEFAULT_ROUTING_TABLE
+
+
+def test_automaton_counts():
+    """测试自动机的多模式匹配（包括重叠和嵌套的关键词）"""
+    automaton = KeywordAutomaton({"order": ["订单", "查询订单", "我要"], "spec": ["少糖", "糖"]})
+    assert automaton.count("我要查询订单") == [2, 0]
+    assert automaton.count("少糖，再少糖") == [0, 2]
+    assert automaton.count("随便聊聊") == [0, 0]
+    assert KeywordAutomaton({"a": ["he", "she", "his", "hers"]}).count("this here") == [2]
+    print("✅ 自动机多模式匹配通过")
+
+
+def test_default_routing_table():
+    """测试默认路由表的路由结果"""
+    router = KeywordRouter(reload_interval=0)
+    cases = [
+        ("我要一杯珍珠奶茶", "order_agent"),
+        ("珍珠奶茶少糖", "order_agent"),  # 产品 + 规格
+        ("奶茶好喝吗", None),  # 只有产品名称
+        ("我要投诉", "order_agent"),  # 与原实现一致：订单关键词优先
+        ("给你们提个建议", "feedback_agent"),
+        ("有什么推荐", "consult_agent"),
+        ("你好", None),
+    ]
+    for text, expected in cases:
+        assert router.route(text) == expected, f"{text}: 期望 {expected}, 实际 {router.route(text)}"
+    assert router.scores("上次的奶茶太甜了，我要投诉") == {"order_agent": 1, "feedback_agent": 1}
+    print(f"✅ {len(cases)} 条输入的路由结果正确")
+
+
+def test_product_catalog():
+    """测试实时产品目录"""
+    catalog = ["芋泥波波"]
+    started = threading.Event()
+    
+    def slow_loader():
+        started.set()
+        time.sleep(0.2)
+        return list(catalog)
+    
+    start = time.perf_counter()
+    router = KeywordRouter(product_loader=slow_loader, reload_interval=0, miss_refresh_interval=0.05)
+    assert time.perf_counter() - start < 0.1, "构造时不应等待产品目录"
+    assert started.wait(1)
+    router._refresh_thread.join()
+    assert router.route("芋泥波波少冰") == "order_agent"
+    assert router.find_products("两杯芋泥波波和一杯珍珠奶茶，再来一杯奶茶") == ["芋泥波波", "珍珠奶茶", "奶茶"]
+    assert router.find_products("有什么推荐") == []
+    
+    def broken_loader():
+        raise ConnectionError("consult-mcp-server 未启动")
+    
+    # 新上架的产品：未命中时在后台刷新
+    catalog.append("杨枝甘露")
+    assert router.route("杨枝甘露少冰") is None
+    time.sleep(0.06)
+    assert router.route("杨枝甘露少冰") is None
+    router._refresh_thread.join()
+    assert router.route("杨枝甘露少冰") == "order_agent", "未命中时应刷新产品目录"
+    
+    router = KeywordRouter(product_loader=broken_loader, reload_interval=0)
+    router._refresh_thread.join()
+    assert router.route("芋泥波波少冰") is None
+    assert router.route("珍珠奶茶少冰") == "order_agent", "获取失败时应使用路由表中的产品名称"
+    print("✅ 实时产品目录通过")
+
+
+def test_hot_reload():
+    """测试路由表文件修改后自动重新加载"""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        table_path = os.path.join(temp_dir, "routing_table.json")
+        shutil.copy(DEFAULT_ROUTING_TABLE, table_path)
+        router = KeywordRouter(table_path=table_path, reload_interval=0.01)
+        assert router.route("申请退款") is None
+        
+        with open(table_path, "r", encoding="utf-8") as f:
+            table = json.load(f)
+        table["keyword_groups"]["order"].append("退款")
+        with open(table_path, "w", encoding="utf-8") as f:
+            json.dump(table, f, ensure_ascii=False)
+        os.utime(table_path, (0, os.path.getmtime(table_path) + 1))
+        
+        router._next_check = 0
+        assert router.route("申请退款") == "order_agent", "修改路由表后应重新加载"
+        
+        # 路由表格式错误时继续使用旧的路由表
+        with open(table_path, "w", encoding="utf-8") as f:
+            f.write("{ invalid json")
+        os.utime(table_path, (0, os.path.getmtime(table_path) + 2))
+        router._next_check = 0
+        assert router.route("申请退款") == "order_agent"
+        assert router.reloads == 2
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    print("✅ 路由表热加载通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("关键词路由器测试")
+    print("=" * 60)
+    test_automaton_counts()
+    test_default_routing_table()
+    test_product_catalog()
+    test_hot_reload()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+测试客户端负载均衡（LoadBalancer / MCPClient / A2AClient 多实例）
+验证：
+1. round_robin / least_outstanding / p2c 三种策略
+2. 连续失败的实例被摘除，到期后自动恢复，再次失败时摘除时间翻倍；摘除比例有上限
+3. ServiceDiscovery 注册 / 注销多个实例
+4. MCPClient 在多个 MCP Server 实例之间分配请求，实例宕机时换到其他实例并将其摘除
+5. 工具调用（POST）发出后连接被断开时不换实例重发，避免重复创建订单
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import logging
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from werkzeug.serving import make_server
+
+from load_balancer import LoadBalancer
+from service_discovery import ServiceDiscovery
+from mcp import MCPClient, MCPServer
+from a2a import A2AClient
+
+URLS = ["http://a", "http://b", "http://c"]
+
+
+def test_policies():
+    """测试负载均衡策略"""
+    balancer = LoadBalancer(policy="round_robin")
+    chosen = []
+    for _ in range(9):
+        url = balancer.select("svc", URLS)
+        balancer.release(url, latency=0.01)
+        chosen.append(url)
+    assert Counter(chosen) == Counter({url: 3 for url in URLS}), "轮询应均匀分配"
+    
+    balancer = LoadBalancer(policy="least_outstanding")
+    busy = [balancer.select("svc", URLS) for _ in range(3)]
+    assert sorted(busy) == sorted(URLS), "应优先选择在途请求最少的实例"
+    balancer.release(busy[1], latency=0.01)
+    assert balancer.select("svc", URLS) == busy[1]
+    
+    # p2c：慢实例分到的请求明显更少
+    balancer = LoadBalancer(policy="p2c", rng=random.Random(0))
+    latencies = {"http://a": 0.01, "http://b": 0.01, "http://c": 0.5}
+    chosen = []
+    for _ in range(300):
+        url = balancer.select("svc", URLS)
+        balancer.release(url, latency=latencies[url])
+        chosen.append(url)
+    counts = Counter(chosen)
+    assert counts["http://c"] < counts["http://a"] / 3, f"慢实例分到的请求过多: {counts}"
+    
+    try:
+        LoadBalancer(policy="random")
+        assert False, "不支持的策略应报错"
+    except ValueError:
+        pass
+    print(f"✅ 负载均衡策略通过（p2c: {dict(counts)}）")
+
+
+def test_ejection():
+    """测试摘除和恢复"""
+    balancer = LoadBalancer(policy="round_robin", eject_failures=3, eject_time=0.1, max_eject_percent=50)
+    balancer.available("svc", URLS)
+    for _ in range(2):
+        balancer.acquire("http://a")
+        balancer.release("http://a", failed=True)
+    assert not balancer.is_ejected("http://a"), "未达到连续失败次数时不应摘除"
+    balancer.acquire("http://a")
+    balancer.release("http://a", failed=True)
+    assert balancer.is_ejected("http://a")
+    assert "http://a" not in balancer.available("svc", URLS)
+    for _ in range(6):
+        url = balancer.select("svc", URLS)
+        assert url != "http://a", "被摘除的实例不应被选中"
+        balancer.release(url)
+    
+    # 摘除比例上限：3 个实例最多摘除 1 个
+    for _ in range(3):
+        balancer.acquire("http://b")
+        balancer.release("http://b", failed=True)
+    assert not balancer.is_ejected("http://b"), "超过摘除比例上限时不应继续摘除"
+    
+    # 到期后恢复；恢复后再失败一次就重新摘除，摘除时间翻倍
+    time.sleep(0.12)
+    assert "http://a" in balancer.available("svc", URLS)
+    balancer.acquire("http://a")
+    balancer.release("http://a", failed=True)
+    assert balancer.is_ejected("http://a")
+    time.sleep(0.12)
+    assert balancer.is_ejected("http://a"), "第二次摘除时间应翻倍"
+    time.sleep(0.1)
+    balancer.acquire("http://a")
+    balancer.release("http://a", latency=0.01)
+    balancer.acquire("http://a")
+    balancer.release("http://a", failed=True)
+    assert not balancer.is_ejected("http://a"), "成功调用后应恢复正常"
+    
+    # 所有实例都被摘除时仍然返回实例
+    balancer = LoadBalancer(eject_failures=1, max_eject_percent=100)
+    for url in URLS:
+        balancer.available("svc", URLS)
+        balancer.acquire(url)
+        balancer.release(url, failed=True)
+    assert balancer.available("svc", URLS) == URLS
+    print(f"✅ 摘除 / 恢复通过: {balancer.stats()['instances']['http://a']}")
+
+
+def test_registration():
+    """测试多实例注册和注销"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config_file = os.path.join(temp_dir, "services.json")
+        sd = ServiceDiscovery(method="config", config_file=config_file)
+        sd.register("order-mcp-server", host="localhost", port=10002, description="订单管理 MCP Server")
+        sd.register("order-mcp-server", host="localhost", port=10012, description="订单管理 MCP Server")
+        sd.register("order-mcp-server", host="localhost", port=10002, description="订单管理 MCP Server")
+        instances = sd.discover_all("order-mcp-server")
+        assert [instance["port"] for instance in instances] == [10012, 10002]
+        assert all(instance["description"] == "订单管理 MCP Server" for instance in instances)
+        
+        with open(config_file, encoding="utf-8") as f:
+            saved = json.load(f)["order-mcp-server"]
+        assert saved["description"] == "订单管理 MCP Server" and len(saved["instances"]) == 2
+        
+        assert sd.deregister("order-mcp-server", "http://localhost:10012")
+        assert not sd.deregister("order-mcp-server", "http://localhost:10012")
+        assert sd.discover("order-mcp-server")["port"] == 10002
+        assert "instances" not in sd.services["order-mcp-server"]
+        assert sd.deregister("order-mcp-server")
+        assert sd.discover("order-mcp-server") is None
+    print("✅ 多实例注册 / 注销通过")
+
+
+def _start_mcp_server(name: str, port: int):
+    """启动一个返回实例名称的 MCP Server"""
+    server = MCPServer(server_name="order-mcp-server", port=port)
+    server.register_tool_func("whoami", "返回实例名称", {"type": "object", "properties": {}},
+                              lambda: name)
+    http_server = make_server("127.0.0.1", port, server.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    return http_server
+
+
+def test_mcp_client():
+    """测试 MCPClient 多实例负载均衡和故障转移"""
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    servers = [_start_mcp_server("m1", 18191), _start_mcp_server("m2", 18192)]
+    sd = ServiceDiscovery(method="config")
+    sd.services = {"order-mcp-server": {"instances": [
+        {"host": "127.0.0.1", "port": 18191},
+        {"host": "127.0.0.1", "port": 18192},
+        {"host": "127.0.0.1", "port": 18199}  # 没有启动的实例
+    ]}}
+    balancer = LoadBalancer(policy="round_robin", eject_failures=1, eject_time=60)
+    client = MCPClient(service_discovery=sd, balancer=balancer)
+    
+    assert [tool.name for tool in client.list_tools("order-mcp-server")] == ["whoami"]
+    results = Counter(client.invoke_tool("order-mcp-server", "whoami", {})["result"] for _ in range(20))
+    assert set(results) == {"m1", "m2"}, f"请求应分配到两个实例: {results}"
+    assert balancer.is_ejected("http://127.0.0.1:18199"), "宕机的实例应被摘除"
+    stats = balancer.stats()["instances"]
+    assert stats["http://127.0.0.1:18199"]["failures"] == 1, "被摘除后不应再收到请求"
+    assert all(instance["outstanding"] == 0 for instance in stats.values())
+    
+    # 没有 chat_id 的 A2A 请求同样按负载均衡策略选择副本
+    a2a_client = A2AClient(service_discovery=sd, balancer=balancer)
+    assert a2a_client.balancer is balancer
+    
+    for server in servers:
+        server.shutdown()
+    try:
+        client.invoke_tool("order-mcp-server", "whoami", {})
+        assert False, "所有实例都不可用时应报错"
+    except ConnectionError:
+        pass
+    print(f"✅ MCPClient 负载均衡 / 故障转移通过: {dict(results)}")
+
+
+def _start_dropping_server(port: int, received: list):
+    """启动一个读完请求后不响应就断开连接的服务（模拟实例在执行工具后崩溃），记录收到的请求"""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(("127.0.0.1", port))
+    listener.listen(8)
+    
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            data = b""
+            while b"\r\n\r\n" not in data:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+            head, _, body = data.partition(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            while len(body) < length:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    break
+                body += chunk
+            received.append(head.split(b"\r\n", 1)[0].decode())
+            conn.close()
+    
+    threading.Thread(target=serve, daemon=True).start()
+    return listener
+
+
+def test_no_replay_after_send():
+    """测试工具调用发出后连接断开时不重发"""
+    received = []
+    listeners = [_start_dropping_server(18193, received), _start_dropping_server(18194, received)]
+    sd = ServiceDiscovery(method="config")
+    sd.services = {"order-mcp-server": {"instances": [
+        {"host": "127.0.0.1", "port": 18193},
+        {"host": "127.0.0.1", "port": 18194}
+    ]}}
+    client = MCPClient(service_discovery=sd, balancer=LoadBalancer(policy="round_robin"))
+    try:
+        client.invoke_tool("order-mcp-server", "order-create-order", {"user_id": 1})
+        assert False, "连接被断开时应报错"
+    except ConnectionError as e:
+        assert "RemoteDisconnected" in str(e) or "aborted" in str(e), e
+    assert len(received) == 1, f"请求已经发出后不应换实例重发: {received}"
+    assert received[0].startswith("POST /mcp/tools/order-create-order/invoke")
+    for listener in listeners:
+        listener.close()
+    print("✅ 工具调用发出后断开连接不重发通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("客户端负载均衡测试")
+    print("=" * 60)
+    test_policies()
+    test_ejection()
+    test_registration()
+    test_mcp_client()
+    test_no_replay_after_send()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+测试多意图拆分（MultiIntentDispatcher）
+验证：
+1. 按标点和连接词拆分片段
+2. 子请求计划：每个片段都明确只命中一个子智能体时才拆分，同一子智能体的片段合并，缺少的产品名称从其他片段带上
+3. SupervisorAgent 并发调用子智能体并按顺序合并回复（同步 / asyncio / 流式）
+"""
+import os
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+os.environ.setdefault("DASHSCOPE_API_KEY", "test-key")
+
+from supervisor_agent.keyword_router import KeywordRouter
+from supervisor_agent.multi_intent import MultiIntentDispatcher, split_segments, merge_replies
+from supervisor_agent.supervisor_agent import SupervisorAgent
+
+
+def test_split_segments():
+    """测试片段拆分"""
+    assert split_segments("来两杯云边茉莉，顺便问下桂花云露是什么茶") == ["来两杯云边茉莉", "顺便问下桂花云露是什么茶"]
+    assert split_segments("来两杯云边茉莉顺便问下桂花云露是什么茶") == ["来两杯云边茉莉", "顺便问下桂花云露是什么茶"]
+    assert split_segments("有什么推荐？") == ["有什么推荐"]
+    print("✅ 片段拆分通过")
+
+
+def test_plan():
+    """测试子请求计划"""
+    dispatcher = MultiIntentDispatcher(router=KeywordRouter(), enabled=True, max_intents=3)
+    assert dispatcher.plan("来两杯云边茉莉，顺便问下桂花云露是什么茶") == [
+        ("order_agent", "来两杯云边茉莉"),
+        ("consult_agent", "顺便问下桂花云露是什么茶")
+    ]
+    assert dispatcher.plan("奶茶有问题，另外有什么优惠活动") == [
+        ("feedback_agent", "奶茶有问题"),
+        ("consult_agent", "另外有什么优惠活动")
+    ]
+    
+    # 单一意图：规格片段并入下单请求，缺少上下文的片段不单独拆分
+    assert dispatcher.plan("来一杯云边茉莉，少糖") == []
+    assert dispatcher.plan("云边茉莉怎么样，来两杯") == []
+    assert dispatcher.plan("有什么推荐") == []
+    
+    # 片段同时命中多个子智能体（投诉 / 订单不满意）时不拆分，整条消息按单一意图处理
+    assert dispatcher.plan("我要投诉，你们的云边茉莉怎么这么甜") == []
+    assert dispatcher.plan("我对上次的订单不满意，怎么退款") == []
+    
+    # 下单片段没有提到产品时带上其他片段中的产品
+    assert dispatcher.plan("珍珠奶茶什么价格？我要两杯") == [
+        ("consult_agent", "珍珠奶茶什么价格"),
+        ("order_agent", "珍珠奶茶，我要两杯")
+    ]
+    
+    # 同一子智能体的多个片段合并为一个子请求，不会并发发给同一个子智能体
+    assert dispatcher.plan("我要一杯云边茉莉，另外推荐一下活动，还有给我一杯红豆奶茶") == [
+        ("order_agent", "我要一杯云边茉莉，还有给我一杯红豆奶茶"),
+        ("consult_agent", "另外推荐一下活动")
+    ]
+    
+    assert MultiIntentDispatcher(router=KeywordRouter(), max_intents=1).plan("奶茶有问题，另外有什么优惠活动") == []
+    assert MultiIntentDispatcher(router=KeywordRouter(), enabled=False).plan("奶茶有问题，另外有什么优惠活动") == []
+    assert dispatcher.stats()["fan_outs"] == 4
+    print(f"✅ 子请求计划通过: {dispatcher.stats()}")
+
+
+def _make_agent(delay: float = 0.1) -> SupervisorAgent:
+    """构造一个子智能体调用被替换为本地函数的 SupervisorAgent"""
+    agent = SupervisorAgent()
+    agent.multi_intent.enabled = True
+    agent.calls = []
+    
+    def call_sub_agent(name, text):
+        agent.calls.append((name, text))
+        time.sleep(delay)
+        return f"[{name}] {text}"
+    
+    async def acall_sub_agent(name, text):
+        agent.calls.append((name, text))
+        await asyncio.sleep(delay)
+        return f"[{name}] {text}"
+    
+    def call_sub_agent_stream(name, text):
+        agent.calls.append((name, text))
+        for chunk in (f"[{name}] ", text):
+            time.sleep(delay / 2)
+            yield chunk
+    
+    agent.call_sub_agent = call_sub_agent
+    agent.acall_sub_agent = acall_sub_agent
+    agent.call_sub_agent_stream = call_sub_agent_stream
+    return agent
+
+
+def test_supervisor_fan_out():
+    """测试 SupervisorAgent 并发调用和合并回复"""
+    message = "来两杯云边茉莉，顺便问下桂花云露是什么茶"
+    expected = merge_replies(["[order_agent] 来两杯云边茉莉", "[consult_agent] 顺便问下桂花云露是什么茶"])
+    
+    agent = _make_agent()
+    start = time.perf_counter()
+    reply = agent.chat(message)
+    elapsed = time.perf_counter() - start
+    assert reply == expected, reply
+    assert elapsed < 0.18, f"子智能体应并发调用: {elapsed:.3f}s"
+    assert agent.history[-1] == {"role": "assistant", "content": expected}
+    
+    agent = _make_agent()
+    start = time.perf_counter()
+    assert asyncio.run(agent.achat(message)) == expected
+    assert time.perf_counter() - start < 0.18
+    
+    agent = _make_agent()
+    start = time.perf_counter()
+    chunks = list(agent.chat_stream(message))
+    elapsed = time.perf_counter() - start
+    assert "".join(chunks) == expected and chunks[0] == "[order_agent] "
+    assert elapsed < 0.18, f"子智能体应并发生成: {elapsed:.3f}s"
+    print(f"✅ SupervisorAgent 多意图并发调用通过（{elapsed * 1000:.0f} ms）")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("多意图拆分测试")
+    print("=" * 60)
+    test_split_segments()
+    test_plan()
+    test_supervisor_fan_out()
+
+
+if __name__ == "__main__":
+    main()
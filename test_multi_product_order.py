@@ -21,7 +21,7 @@ def init_database():
     """初始化数据库和产品数据"""
     db_manager = DatabaseManager(db_type="sqlite")
     # 初始化产品数据
-    db_manager._init_products()
+    db_manager.init_products()
     return db_manager
 
 
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+测试 OrderDAO 批量加载订单项
+验证：
+1. get_orders_by_user / query_orders 的查询次数与订单数无关（订单 1 次 + 订单项 1 次）
+2. 订单数超过 ITEMS_BATCH_SIZE 时分批查询，每个订单的订单项完整且顺序不变
+3. get_order_by_id / get_order_by_user_and_id 的结果与逐个查询订单项一致，没有订单项的订单 items 为空列表
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from database.db_manager import DatabaseManager
+from order_mcp_server import database as order_database
+from order_mcp_server.database import OrderDAO
+
+_temp_dir = tempfile.TemporaryDirectory()
+
+
+class CountingDatabaseManager(DatabaseManager):
+    """记录查询次数的 DatabaseManager"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queries = 0
+    
+    def fetch_one(self, query, params=None):
+        self.queries += 1
+        return super().fetch_one(query, params)
+    
+    def fetch_all(self, query, params=None):
+        self.queries += 1
+        return super().fetch_all(query, params)
+
+
+def _dao(name: str, orders: int) -> OrderDAO:
+    """创建 orders 个订单的 OrderDAO（第 i 个订单有 i % 3 个订单项）"""
+    db = CountingDatabaseManager(db_type="sqlite", db_path=os.path.join(_temp_dir.name, f"{name}.db"))
+    with db.transaction() as cursor:
+        for i in range(orders):
+            cursor.execute("INSERT INTO orders (order_id, user_id, total_price, created_at) VALUES (?, ?, ?, ?)",
+                           (f"ORDER_{i}", 1, 18.0, f"2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}"))
+            cursor.executemany(
+                "INSERT INTO order_items (order_id, product_id, product_name, sweetness, ice_level, "
+                "quantity, unit_price, item_price) VALUES (?, 0, ?, 3, 2, 1, 18.0, 18.0)",
+                [(f"ORDER_{i}", f"产品{j}") for j in range(i % 3)])
+    return OrderDAO(db_manager=db)
+
+
+def test_list_queries():
+    """测试订单列表的查询次数和订单项"""
+    dao = _dao("list", 200)
+    for load in (lambda: dao.get_orders_by_user(1), lambda: dao.query_orders(1, {})):
+        queries = dao.db.queries
+        orders = load()
+        assert dao.db.queries - queries == 2, f"应只有 2 次查询，实际 {dao.db.queries - queries} 次"
+        assert len(orders) == 200 and orders[0]["order_id"] == "ORDER_199", "应按创建时间倒序"
+        for order in orders:
+            assert order["items"] == dao.get_order_items(order["order_id"]), order["order_id"]
+    assert dao.get_orders_by_user(2) == []
+    print("✅ 订单列表批量加载订单项通过: 200 个订单 2 次查询")
+
+
+def test_batches():
+    """测试订单数超过批量大小时分批查询"""
+    dao = _dao("batches", 25)
+    batch_size = order_database.ITEMS_BATCH_SIZE
+    order_database.ITEMS_BATCH_SIZE = 10
+    try:
+        queries = dao.db.queries
+        orders = dao.get_orders_by_user(1)
+        assert dao.db.queries - queries == 1 + 3, "25 个订单应分 3 批查询订单项"
+    finally:
+        order_database.ITEMS_BATCH_SIZE = batch_size
+    assert sum(len(order["items"]) for order in orders) == sum(i % 3 for i in range(25))
+    assert [item["product_name"] for item in orders[-3]["items"]] == ["产品0", "产品1"], "订单项顺序应不变"
+    print("✅ 分批加载订单项通过")
+
+
+def test_single_order():
+    """测试单个订单查询"""
+    dao = _dao("single", 3)
+    order = dao.get_order_by_id("ORDER_2")
+    assert [item["product_name"] for item in order["items"]] == ["产品0", "产品1"]
+    assert dao.get_order_by_id("ORDER_0")["items"] == [], "没有订单项时 items 应为空列表"
+    assert dao.get_order_by_user_and_id(1, "ORDER_1")["items"] == dao.get_order_items("ORDER_1")
+    assert dao.get_order_by_id("ORDER_404") is None and dao.get_order_by_user_and_id(2, "ORDER_1") is None
+    print("✅ 单个订单查询通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("OrderDAO 订单项批量加载测试")
+    print("=" * 60)
+    test_list_queries()
+    test_batches()
+    test_single_order()
+
+
+if __name__ == "__main__":
+    main()
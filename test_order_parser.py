@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+测试订单快速解析器（OrderParser）
+验证：
+1. 产品、甜度、冰量、数量、用户ID全部明确时，置信度为 1.0，直接走快速路径
+2. 缺少字段或存在歧义时，置信度低于阈值，交给 LLM 处理
+3. 查询订单请求的解析
+4. 快速路径统计（命中率、节省的耗时）
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from order_agent.order_parser import OrderParser, FastPathStats
+
+
+def test_single_product_fully_resolved():
+    """测试单产品、规格完整的下单请求"""
+    parser = OrderParser()
+    result = parser.parse("我要一杯珍珠奶茶，少糖去冰", user_id="123")
+    
+    assert result.is_confident(), f"期望走快速路径，实际置信度 {result.confidence}"
+    assert result.tool_call["tool"] == "order-create-order"
+    assert result.tool_call["parameters"] == {
+        "userId": 123,
+        "items": [{"productName": "珍珠奶茶", "sweetness": "少糖", "iceLevel": "去冰", "quantity": 1}]
+    }
+    print("✅ 单产品下单请求解析通过")
+
+
+def test_multi_product_fully_resolved():
+    """测试一句话点多个产品，每个产品有各自的规格"""
+    parser = OrderParser()
+    result = parser.parse("用户ID是 888，来两杯珍珠奶茶少糖少冰和一杯红豆奶茶半糖热的", user_id="default_user")
+    
+    assert result.is_confident(), f"期望走快速路径，实际置信度 {result.confidence}"
+    items = result.tool_call["parameters"]["items"]
+    assert result.tool_call["parameters"]["userId"] == 888
+    assert [(i["productName"], i["sweetness"], i["iceLevel"], i["quantity"]) for i in items] == [
+        ("珍珠奶茶", "少糖", "少冰", 2),
+        ("红豆奶茶", "半糖", "热", 1),
+    ], f"订单项不匹配: {items}"
+    
+    # "都" 表示多个产品共用同一规格
+    result = parser.parse("来两杯珍珠奶茶和两杯红豆奶茶，都少糖去冰", user_id=7)
+    assert result.is_confident()
+    assert all(i["sweetness"] == "少糖" and i["iceLevel"] == "去冰" for i in result.tool_call["parameters"]["items"])
+    print("✅ 多产品下单请求解析通过")
+
+
+def test_incomplete_or_ambiguous_falls_back_to_llm():
+    """测试缺少字段或存在歧义的请求不走快速路径"""
+    parser = OrderParser()
+    cases = [
+        ("我要一杯珍珠奶茶", "42"),  # 缺少甜度和冰量
+        ("我要一杯珍珠奶茶少糖去冰", "default_user"),  # 缺少用户ID
+        ("我要十二杯云边茉莉 半糖 正常冰", "42"),  # 多位中文数字
+        ("我要一杯珍珠奶茶少糖半糖去冰", "42"),  # 甜度冲突
+        ("我要一杯珍珠奶茶少糖少冰，一杯红豆奶茶", "42"),  # 第二个产品缺少规格
+        ("我要一杯珍珠奶茶少糖去冰，不要红豆奶茶", "42"),  # 否定表达
+        ("我要一杯云边茉莉少糖去冰，不加珍珠", "42"),  # 备注（无法表达为订单项）
+        ("我要一杯云边茉莉少糖去冰，送到公司", "42"),  # 有无法识别的内容
+        ("我要一杯云边茉莉少糖去冰，算了不要了", "42"),  # 撤回下单
+        ("帮我取消订单 ORDER_1693654321000", "42"),  # 需要确认的操作
+        ("看看珍珠奶茶", "42"),  # 不是订单请求
+    ]
+    for text, user_id in cases:
+        result = parser.parse(text, user_id=user_id)
+        assert not result.is_confident(), f"不应走快速路径: {text} (置信度 {result.confidence})"
+    assert parser.parse("我要一杯云边茉莉少糖去冰，算了不要了", user_id="42").tool_call is None, "撤回下单时不应生成工具调用"
+    print(f"✅ {len(cases)} 个不确定的请求均交给 LLM 处理")
+
+
+def test_query_order():
+    """测试查询订单请求"""
+    parser = OrderParser()
+    result = parser.parse("查询订单 ORDER_1693654321000", user_id="12")
+    assert result.is_confident()
+    assert result.tool_call["tool"] == "order-get-order-by-user"
+    assert result.tool_call["parameters"] == {"orderId": "ORDER_1693654321000", "userId": 12}
+    
+    result = parser.parse("查看我的订单", user_id="12")
+    assert result.is_confident()
+    assert result.tool_call["tool"] == "order-get-orders-by-user"
+    
+    # 没有用户ID时不走快速路径（只能查询当前用户的订单）
+    assert not parser.parse("查看我的订单", user_id="default_user").is_confident()
+    
+    # 时间范围、产品等查询条件无法表达为工具参数，交给 LLM
+    for text in ["我想查看上周的订单", "看看我的订单里有没有珍珠奶茶"]:
+        result = parser.parse(text, user_id="12")
+        assert not result.is_confident(), f"不应走快速路径: {text} (置信度 {result.confidence})"
+        assert any("无法识别" in reason for reason in result.ambiguities), result.ambiguities
+    assert parser.parse("帮我查一下我的订单，用户ID 12", user_id="default_user").is_confident()
+    print("✅ 查询订单请求解析通过")
+
+
+def test_fast_path_stats():
+    """测试快速路径统计"""
+    parser = OrderParser()
+    stats = FastPathStats()
+    for text in ["我要一杯珍珠奶茶，少糖去冰", "我要一杯珍珠奶茶"]:
+        result = parser.parse(text, user_id="1")
+        stats.record_parse(result, result.is_confident(), 0.0001)
+    stats.record_llm_call(0.8)
+    
+    data = stats.to_dict()
+    assert data["total"] == 2 and data["hits"] == 1 and data["hit_rate"] == 0.5
+    assert data["miss_reasons"] == {"missing_fields": 1}
+    assert data["estimated_latency_saved_ms"] > 790
+    print(f"✅ 快速路径统计: {data}")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("订单快速解析器测试")
+    print("=" * 60)
+    test_single_product_fully_resolved()
+    test_multi_product_fully_resolved()
+    test_incomplete_or_ambiguous_falls_back_to_llm()
+    test_query_order()
+    test_fast_path_stats()
+
+
+if __name__ == "__main__":
+    main()
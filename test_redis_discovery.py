@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+测试 Redis 服务发现（使用进程内的 LocalRedis 代替 Redis 服务）
+验证：
+1. 多实例注册、发现和注销
+2. 进程内缓存：重复查询不访问 Redis；其他进程注册 / 注销时通过发布订阅立即失效缓存
+3. 心跳续期：注册的实例不会过期；停止心跳后自动下线并从索引中清理；Redis 丢失数据后重新注册
+4. list_services 使用 SCAN 和管道批量读取，不使用 KEYS
+"""
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from local_redis import LocalRedis
+from service_discovery import ServiceDiscovery
+
+
+class CountingRedis(LocalRedis):
+    """记录访问次数的 LocalRedis"""
+    
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+        self.pipelines = 0
+    
+    def smembers(self, name):
+        self.reads += 1
+        return super().smembers(name)
+    
+    def pipeline(self, transaction=True):
+        self.pipelines += 1
+        return super().pipeline(transaction)
+    
+    def keys(self, pattern="*"):
+        raise AssertionError("不应使用阻塞的 KEYS 命令")
+
+
+def _wait_for(condition, timeout: float = 3.0) -> bool:
+    """等待条件成立"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_register_and_discover():
+    """测试多实例注册、发现和注销"""
+    client = CountingRedis()
+    sd = ServiceDiscovery(method="redis", redis_client=client, cache_ttl=60)
+    sd.register("order_agent", host="10.0.0.1", port=10006, description="订单智能体", heartbeat=False)
+    sd.register("order_agent", host="10.0.0.2", port=10006, description="订单智能体", heartbeat=False)
+    
+    instances = sd.discover_all("order_agent")
+    assert [instance["url"] for instance in instances] == ["http://10.0.0.1:10006", "http://10.0.0.2:10006"]
+    assert instances[0]["port"] == 10006 and instances[0]["description"] == "订单智能体"
+    assert sd.discover("order_agent")["host"] == "10.0.0.1"
+    assert sd.discover("unknown") is None
+    
+    reads = client.reads
+    for _ in range(100):
+        sd.discover_all("order_agent")
+    assert client.reads == reads, "缓存有效期内不应访问 Redis"
+    assert sd.stats()["cache_hits"] >= 100
+    
+    assert sd.deregister("order_agent", "http://10.0.0.1:10006")
+    assert [instance["host"] for instance in sd.discover_all("order_agent")] == ["10.0.0.2"], "注销后应立即失效缓存"
+    assert sd.deregister("order_agent")
+    assert sd.discover_all("order_agent") == []
+    sd.close()
+    print(f"✅ 注册 / 发现 / 注销通过: {sd.stats()}")
+
+
+def test_change_notification():
+    """测试其他进程注册时通过发布订阅失效缓存"""
+    client = LocalRedis()
+    publisher = ServiceDiscovery(method="redis", redis_client=client, cache_ttl=60)
+    subscriber = ServiceDiscovery(method="redis", redis_client=client, cache_ttl=60)
+    changes = []
+    subscriber.add_listener(lambda service_name, removed_urls: changes.append((service_name, removed_urls)))
+    
+    publisher.register("order-mcp-server", host="10.0.0.1", port=10002, heartbeat=False)
+    assert _wait_for(lambda: changes == [("order-mcp-server", [])]), "应收到变更通知"
+    assert len(subscriber.discover_all("order-mcp-server")) == 1
+    
+    publisher.register("order-mcp-server", host="10.0.0.2", port=10002, heartbeat=False)
+    assert _wait_for(lambda: len(subscriber.discover_all("order-mcp-server")) == 2), "缓存应被立即失效"
+    
+    publisher.deregister("order-mcp-server", "http://10.0.0.1:10002")
+    assert _wait_for(lambda: ("order-mcp-server", ["http://10.0.0.1:10002"]) in changes), "应通知被删除的实例"
+    publisher.close()
+    subscriber.close()
+    print("✅ 变更通知通过")
+
+
+def test_heartbeat():
+    """测试心跳续期和过期清理"""
+    client = LocalRedis()
+    registrar = ServiceDiscovery(method="redis", redis_client=client,
+                                 registration_ttl=0.3, heartbeat_interval=0.05, cache_ttl=0)
+    reader = ServiceDiscovery(method="redis", redis_client=client, cache_ttl=0)
+    registrar.register("feedback_agent", host="10.0.0.1", port=10007)
+    registrar.register("consult_agent", host="10.0.0.1", port=10005, heartbeat=False)
+    
+    time.sleep(0.5)
+    assert len(reader.discover_all("feedback_agent")) == 1, "心跳应续期注册"
+    assert reader.discover_all("consult_agent") == [], "没有心跳的注册应过期"
+    assert client.smembers("services:index:consult_agent") == set(), "过期的实例应从索引中清理"
+    
+    # 模拟 Redis 丢失数据：心跳重新写入
+    client.delete("services:instance:feedback_agent:http://10.0.0.1:10007", "services:index:feedback_agent")
+    assert _wait_for(lambda: len(reader.discover_all("feedback_agent")) == 1), "心跳应重新注册"
+    
+    registrar.close()
+    assert _wait_for(lambda: reader.discover_all("feedback_agent") == []), "停止心跳后应自动下线"
+    print("✅ 心跳续期 / 过期清理通过")
+
+
+def test_list_services():
+    """测试 list_services 批量读取"""
+    client = CountingRedis()
+    sd = ServiceDiscovery(method="redis", redis_client=client, cache_ttl=0)
+    for i in range(20):
+        sd.register(f"service_{i}", host="10.0.0.1", port=11000 + i, heartbeat=False)
+    sd.register("service_0", host="10.0.0.2", port=11000, heartbeat=False)
+    
+    pipelines = client.pipelines
+    services = sd.list_services()
+    assert len(services) == 20
+    assert len(services["service_0"]["instances"]) == 2 and services["service_1"]["port"] == 11001
+    assert client.pipelines - pipelines == 2, "实例列表和实例信息应各用一次管道读取"
+    sd.close()
+    print("✅ list_services（SCAN + 管道）通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Redis 服务发现测试")
+    print("=" * 60)
+    test_register_and_discover()
+    test_change_notification()
+    test_heartbeat()
+    test_list_services()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+测试回复模板（ResponseTemplateEngine）
+验证：
+1. 订单创建 / 查询 / 删除 / 备注更新的结果直接渲染为回复
+2. 反馈记录创建按反馈类型选择语气
+3. 开放式结果（知识库检索、产品介绍）不渲染，交给 LLM 生成回复
+4. 模板命中统计
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from response_templates import ResponseTemplateEngine
+
+ORDER_RESULT = """订单信息:
+- 订单ID: ORDER_1693654321000
+- 用户ID: 12
+- 订单总价: ¥36.00
+- 订单备注: 无
+- 创建时间: 2024-09-02 10:00:00
+
+订单项（共 2 项）:
+  1. 珍珠奶茶 x2 (少糖, 去冰) - 单价: ¥18.00, 小计: ¥36.00"""
+
+
+def test_order_results():
+    """测试订单工具结果的模板渲染"""
+    engine = ResponseTemplateEngine()
+    
+    reply = engine.render("order-create-order", ORDER_RESULT)
+    assert reply is not None and "ORDER_1693654321000" in reply and "¥36.00" in reply
+    assert "珍珠奶茶 x2" in reply, "回复中应包含订单明细"
+    
+    reply = engine.render("order-get-order-by-user", ORDER_RESULT)
+    assert reply.startswith("为您查询到订单 ORDER_1693654321000")
+    
+    reply = engine.render("order-get-order", "订单不存在: ORDER_1")
+    assert "没有找到订单 ORDER_1" in reply
+    
+    assert engine.render("order-get-orders-by-user", "用户 12 当前没有任何订单记录。") is not None
+    reply = engine.render("order-get-orders-by-user", "用户 12 的订单列表（共 1 条）:\n\n" + ORDER_RESULT)
+    assert reply.startswith("您共有 1 条订单记录") and "ORDER_1693654321000" in reply
+    
+    assert engine.render("order-delete-order", "订单删除成功: ORDER_1") == "订单 ORDER_1 已成功删除。"
+    reply = engine.render("order-update-remark", "订单备注更新成功: ORDER_1\n新备注: 多放珍珠")
+    assert reply == "订单 ORDER_1 的备注已更新为「多放珍珠」。"
+    print("✅ 订单工具结果模板渲染通过")
+
+
+def test_feedback_results():
+    """测试反馈工具结果的模板渲染"""
+    engine = ResponseTemplateEngine()
+    
+    complaint = "反馈记录创建成功！\n反馈ID: 7\n用户ID: 12\n反馈类型: 投诉\n内容: 等了很久\n关联订单: ORDER_1"
+    reply = engine.render("feedback-create-feedback", complaint)
+    assert "抱歉" in reply and "7" in reply, f"投诉应使用致歉语气: {reply}"
+    
+    suggestion = "反馈记录创建成功！\n反馈ID: 8\n用户ID: 12\n反馈类型: 建议\n评分: ⭐⭐⭐⭐⭐\n内容: 希望出新品\n"
+    reply = engine.render("feedback-create-feedback", suggestion)
+    assert "建议" in reply and "8" in reply
+    
+    assert engine.render("feedback-get-feedback-by-user", "用户 12 暂无反馈记录") is not None
+    reply = engine.render("feedback-update-solution", "反馈ID 7 的解决方案更新成功：已补发优惠券")
+    assert reply == "反馈 7 的解决方案已更新：已补发优惠券"
+    print("✅ 反馈工具结果模板渲染通过")
+
+
+def test_open_ended_results_fall_back_to_llm():
+    """测试开放式结果不使用模板"""
+    engine = ResponseTemplateEngine()
+    cases = [
+        ("consult-search-knowledge", "知识库检索结果:\n1. 珍珠奶茶采用..."),
+        ("consult-get-product-info", "产品名称: 珍珠奶茶\n价格: ¥18.00"),
+        ("order-create-order", "订单已提交，请稍候"),  # 结果格式未知
+        ("unknown-tool", "订单删除成功: ORDER_1"),  # 没有为该工具注册模板
+    ]
+    for tool_name, tool_result in cases:
+        assert engine.render(tool_name, tool_result) is None, f"不应使用模板: {tool_name}"
+    print(f"✅ {len(cases)} 个开放式结果均交给 LLM 生成回复")
+
+
+def test_stats():
+    """测试模板命中统计"""
+    engine = ResponseTemplateEngine()
+    engine.render("order-delete-order", "订单删除成功: ORDER_1")
+    engine.render("consult-search-knowledge", "知识库检索结果")
+    
+    stats = engine.stats()
+    assert stats["rendered"] == 1 and stats["fallbacks"] == 1 and stats["hit_rate"] == 0.5
+    assert stats["by_tool"]["order-delete-order"] == {"rendered": 1, "fallbacks": 0}
+    print(f"✅ 模板命中统计: {stats}")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("回复模板测试")
+    print("=" * 60)
+    test_order_results()
+    test_feedback_results()
+    test_open_ended_results_fall_back_to_llm()
+    test_stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+测试路由缓存（RouteCache）
+验证：
+1. 输入归一化（全角/半角、大小写、空白和标点）
+2. 命中 / 未命中，缓存 "一般性对话"（None）的判断
+3. LRU 淘汰和 TTL 过期
+4. 持久化到文件，重启后继续使用
+5. SupervisorAgent 只缓存 LLM 明确给出的路由判断（子智能体名称或 None），无法解析的回复不缓存
+"""
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+os.environ.setdefault("DASHSCOPE_API_KEY", "test-key")
+
+from supervisor_agent.route_cache import RouteCache, normalize_route_key
+
+
+def test_normalize():
+    """测试输入归一化"""
+    key = normalize_route_key("有什么推荐")
+    for text in ["有什么推荐？", "有 什么 推荐!", "　有什么推荐。", "有什么推荐~~"]:
+        assert normalize_route_key(text) == key, text
+    assert normalize_route_key("ＡＢＣ营业时间") == normalize_route_key("abc 营业时间")
+    assert normalize_route_key("营业时间") != key
+    print("✅ 输入归一化通过")
+
+
+def test_hit_and_miss():
+    """测试命中和未命中"""
+    cache = RouteCache(path=None)
+    assert cache.get("有什么推荐") == (False, None)
+    
+    cache.put("有什么推荐", "consult_agent")
+    cache.put("你好呀", None)
+    assert cache.get("有什么推荐？") == (True, "consult_agent")
+    assert cache.get("你好呀！") == (True, None), "一般性对话的判断也应缓存"
+    
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["size"] == 2
+    print(f"✅ 命中 / 未命中通过: {stats}")
+
+
+def test_lru_and_ttl():
+    """测试 LRU 淘汰和 TTL 过期"""
+    cache = RouteCache(max_size=2, ttl=0, path=None)
+    cache.put("a", "order_agent")
+    cache.put("b", "consult_agent")
+    cache.get("a")  # a 变为最近使用
+    cache.put("c", "feedback_agent")
+    assert cache.get("b") == (False, None), "最久未使用的条目应被淘汰"
+    assert cache.get("a")[0] and cache.get("c")[0]
+    
+    cache = RouteCache(ttl=0.05, path=None)
+    cache.put("营业时间", "consult_agent")
+    time.sleep(0.1)
+    assert cache.get("营业时间") == (False, None)
+    assert cache.stats()["expirations"] == 1
+    print("✅ LRU 淘汰和 TTL 过期通过")
+
+
+def test_persistence():
+    """测试持久化"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "route_cache.json")
+        cache = RouteCache(path=path, save_every=1000)
+        cache.put("有什么推荐", "consult_agent")
+        cache.put("你好", None)
+        assert cache.save()
+        
+        restored = RouteCache(path=path)
+        assert len(restored) == 2
+        assert restored.get("有什么推荐") == (True, "consult_agent")
+        assert restored.get("你好") == (True, None)
+        
+        # 文件损坏时从空缓存开始
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("not json")
+        assert len(RouteCache(path=path)) == 0
+    print("✅ 持久化通过")
+
+
+def test_llm_route_caching():
+    """测试 SupervisorAgent 只缓存明确的 LLM 路由判断"""
+    from types import SimpleNamespace
+    from supervisor_agent import supervisor_agent as module
+    
+    replies = []
+    
+    class FakeGeneration:
+        @staticmethod
+        def call(**kwargs):
+            content = replies.pop(0)
+            message = SimpleNamespace(content=content)
+            return SimpleNamespace(status_code=200, output=SimpleNamespace(choices=[SimpleNamespace(message=message)]))
+    
+    agent = module.SupervisorAgent()
+    agent.route_cache = RouteCache()
+    records = []
+    agent.decision_log = SimpleNamespace(record=lambda text, target, source: records.append(target))
+    original = module.Generation
+    module.Generation = FakeGeneration
+    try:
+        replies.extend(["我觉得应该交给咨询智能体", "consult_agent"])
+        assert agent._route_by_llm("新品好喝吗") is None
+        assert agent.route_cache.get("新品好喝吗") == (False, None), "无法解析的回复不应缓存"
+        assert agent._route_by_llm("新品好喝吗") == "consult_agent", "下次应重新调用 LLM 判断"
+        assert agent.route_cache.get("新品好喝吗") == (True, "consult_agent")
+        
+        replies.extend(["None", "NULL。"])
+        assert agent._route_by_llm("你好") is None and agent.route_cache.get("你好") == (True, None)
+        assert agent._route_by_llm("在吗") is None and agent.route_cache.get("在吗") == (True, None)
+        assert records == ["consult_agent", None, None], "无法解析的回复不应记录为训练数据"
+    finally:
+        module.Generation = original
+    print("✅ LLM 路由判断缓存通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("路由缓存测试")
+    print("=" * 60)
+    test_normalize()
+    test_hit_and_miss()
+    test_lru_and_ttl()
+    test_persistence()
+    test_llm_route_caching()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+测试会话状态存储（SessionStore）
+验证：
+1. 紧凑序列化和压缩
+2. 各后端（memory / sqlite / redis）的读写、乐观版本控制、TTL 过期和删除
+3. 版本冲突时合并本轮新增的消息，存储中的记录过期或被删除时不丢弃已有的历史
+4. 多个 SessionManager 副本共享存储：任意副本都能继续同一个对话，重启后对话不丢失
+5. SessionManager 按 (user_id, chat_id) 隔离会话，超时淘汰时跳过正在处理请求的会话
+6. 推测调用的一轮不写入会话，确认使用后才写入
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from session_store import (
+    MemorySessionStore, SQLiteSessionStore, RedisSessionStore, LocalRedis, SessionVersionConflict,
+    encode_state, decode_state, create_session_store
+)
+from a2a.session import SessionManager
+
+
+def _new_history():
+    return [{"role": "system", "content": "你是云边奶茶铺的智能助手"}]
+
+
+def test_serialization():
+    """测试序列化"""
+    history = [{"role": "user", "content": "来一杯云边茉莉"}, {"role": "assistant", "content": "好的"}]
+    data = encode_state(history, {"user_id": "u1"})
+    assert data[:1] == b"j"
+    state = decode_state("k", data, 3)
+    assert state.history == history and state.meta == {"user_id": "u1"} and state.version == 3
+    
+    long_history = history * 50
+    data = encode_state(long_history, {})
+    assert data[:1] == b"z", "较大的会话应压缩"
+    assert len(data) < len(encode_state(history, {})) * 5
+    assert decode_state("k", data, 1).history == long_history
+    print(f"✅ 序列化通过（100 条消息压缩后 {len(data)} 字节）")
+
+
+def _check_backend(store):
+    """各后端通用的检查"""
+    assert store.load("order_agent:c1") is None
+    version = store.save("order_agent:c1", _new_history(), 0, {"user_id": "u1"})
+    assert version == 1
+    state = store.load("order_agent:c1")
+    assert state.history == _new_history() and state.version == 1 and state.meta["user_id"] == "u1"
+    
+    try:
+        store.save("order_agent:c1", [], 0)
+        assert False, "重复创建应版本冲突"
+    except SessionVersionConflict:
+        pass
+    assert store.save("order_agent:c1", _new_history() * 2, 1) == 2
+    try:
+        store.save("order_agent:c1", [], 1)
+        assert False, "过期的版本号应冲突"
+    except SessionVersionConflict:
+        pass
+    
+    assert store.delete("order_agent:c1") and store.load("order_agent:c1") is None
+    assert not store.delete("order_agent:c1")
+    
+    store.ttl = 0.05
+    store.save("order_agent:c2", _new_history(), 0)
+    time.sleep(0.1)
+    assert store.load("order_agent:c2") is None, "过期的会话应视为不存在"
+    assert store.save("order_agent:c2", _new_history(), 0) == 1, "过期后可以重新创建"
+
+
+def test_backends():
+    """测试各后端"""
+    _check_backend(MemorySessionStore())
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = SQLiteSessionStore(path=os.path.join(temp_dir, "sessions.db"))
+        _check_backend(store)
+        assert store.purge_expired() == 0
+    _check_backend(RedisSessionStore(client=LocalRedis()))
+    assert create_session_store("") is None
+    assert create_session_store("memory").backend == "memory"
+    print("✅ memory / sqlite / redis（LocalRedis）后端通过")
+
+
+def test_commit_merge():
+    """测试版本冲突时的合并"""
+    store = MemorySessionStore()
+    store.save("c", _new_history(), 0)
+    
+    # 两个副本同时从版本 1 开始处理同一个对话
+    first = {"role": "user", "content": "来一杯云边茉莉"}
+    second = {"role": "user", "content": "有什么推荐"}
+    history, version = store.commit("c", _new_history() + [first], 1, [first])
+    assert version == 2
+    history, version = store.commit("c", _new_history() + [second], 1, [second])
+    assert version == 3 and history == _new_history() + [first, second], "后保存的副本应在最新状态后追加本轮消息"
+    assert store.load("c").history == history and store.conflicts == 1
+    
+    # 记录已过期或被删除时不丢弃已有的历史
+    store.delete("c")
+    history, version = store.commit("c", _new_history() + [first, second], 3, [second])
+    assert version == 1 and history == _new_history() + [first, second]
+    
+    manager = SessionManager(_new_history, store=store, namespace="order_agent")
+    with manager.session("c1", "u1") as session:
+        session.history.append({"role": "user", "content": "1"})
+    store.delete("order_agent:u1:c1")
+    with manager.session("c1", "u1") as session:
+        assert session.version == 0, "存储中没有记录时版本号应重置"
+        session.history.append({"role": "user", "content": "2"})
+    state = store.load("order_agent:u1:c1")
+    assert [m["content"] for m in state.history[1:]] == ["1", "2"] and state.version == 1
+    print("✅ 版本冲突合并通过")
+
+
+def test_replicas():
+    """测试多个副本共享会话存储"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "sessions.db")
+        replica_a = SessionManager(_new_history, store=SQLiteSessionStore(path=path), namespace="order_agent")
+        replica_b = SessionManager(_new_history, store=SQLiteSessionStore(path=path), namespace="order_agent")
+        
+        with replica_a.session("c1", "u1") as session:
+            session.history.append({"role": "user", "content": "第一轮"})
+        with replica_b.session("c1", "u1") as session:
+            assert session.history[-1]["content"] == "第一轮", "其他副本应能继续同一个对话"
+            session.history.append({"role": "user", "content": "第二轮"})
+        with replica_a.session("c1", "u1") as session:
+            assert [m["content"] for m in session.history[1:]] == ["第一轮", "第二轮"]
+            assert session.version == 2
+        
+        # 进程重启后对话不丢失
+        restarted = SessionManager(_new_history, store=SQLiteSessionStore(path=path), namespace="order_agent")
+        with restarted.session("c1", "u1") as session:
+            assert len(session.history) == 3
+        assert restarted.stats()["store"]["backend"] == "sqlite"
+        
+        # 不同 Agent 的会话互不影响
+        other = SessionManager(_new_history, store=SQLiteSessionStore(path=path), namespace="consult_agent")
+        with other.session("c1", "u1") as session:
+            assert session.history == _new_history()
+        
+        # 同一个对话被两个副本并发处理时，两轮的消息都会保留
+        barrier = threading.Barrier(2)
+        
+        def turn(manager, content):
+            with manager.session("c2", "u1") as session:
+                barrier.wait()
+                session.history.append({"role": "user", "content": content})
+        
+        threads = [threading.Thread(target=turn, args=(manager, content))
+                   for manager, content in ((replica_a, "A"), (replica_b, "B"))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        state = SQLiteSessionStore(path=path).load("order_agent:u1:c2")
+        assert sorted(m["content"] for m in state.history[1:]) == ["A", "B"]
+    print("✅ 多副本共享会话通过")
+
+
+def test_session_isolation():
+    """测试会话按用户隔离和超时淘汰"""
+    store = MemorySessionStore()
+    manager = SessionManager(_new_history, ttl=0.05, store=store, namespace="order_agent")
+    with manager.session("c1", "u1") as session:
+        session.history.append({"role": "user", "content": "u1 的订单"})
+    with manager.session("c1", "u2") as session:
+        assert session.user_id == "u2" and session.history == _new_history(), "不同用户的相同 chat_id 应是不同的会话"
+    assert manager.get("c1", "u1").user_id == "u1", "已有会话的用户ID不应被改写"
+    assert store.load("order_agent:u1:c1").history[-1]["content"] == "u1 的订单"
+    assert store.load("order_agent:u2:c1").history == _new_history()
+    assert len(manager) == 2
+    
+    # 正在处理请求的会话超时也不淘汰
+    busy = manager.get("c2", "u1")
+    with busy.lock:
+        time.sleep(0.1)
+        manager.get("c3", "u1")
+        assert manager.get("c2", "u1") is busy, "正在处理请求的会话不应被淘汰"
+        assert manager.stats()["sessions"] == 2, "空闲超时的会话应被淘汰"
+    assert manager.remove("c2", "u1") and len(manager) == 1
+    print("✅ 会话隔离和超时淘汰通过")
+
+
+def test_speculative_session():
+    """测试推测调用的临时会话"""
+    store = MemorySessionStore()
+    manager = SessionManager(_new_history, store=store, namespace="consult_agent", speculation_ttl=0.05)
+    with manager.session("c1", "u1") as session:
+        session.history.append({"role": "user", "content": "第一轮"})
+    
+    # 猜测错误：推测调用的一轮不留下记录
+    with manager.speculative_session("c1", "u1", "spec_miss") as session:
+        assert session.history[-1]["content"] == "第一轮", "推测调用应能看到对话已有的历史"
+        session.history.append({"role": "user", "content": "推测"})
+    assert manager.get("c1", "u1").history[-1]["content"] == "第一轮"
+    assert store.load("consult_agent:u1:c1").version == 1, "推测调用不应写入会话存储"
+    
+    # 猜测正确：确认后写入会话和会话存储
+    with manager.speculative_session("c1", "u1", "spec_hit") as session:
+        session.history.extend([{"role": "user", "content": "第二轮"}, {"role": "assistant", "content": "回复"}])
+    assert not manager.commit_speculation("c1", "u2", "spec_hit"), "不能确认其他会话的推测调用"
+    assert manager.commit_speculation("c1", "u1", "spec_hit")
+    assert not manager.commit_speculation("c1", "u1", "spec_hit"), "同一个推测调用只能确认一次"
+    assert [m["content"] for m in store.load("consult_agent:u1:c1").history[1:]] == ["第一轮", "第二轮", "回复"]
+    
+    # 超时未确认的推测调用直接丢弃
+    with manager.speculative_session("c1", "u1", "spec_late") as session:
+        session.history.append({"role": "user", "content": "超时"})
+    time.sleep(0.06)
+    assert not manager.commit_speculation("c1", "u1", "spec_late")
+    assert manager.stats()["pending_speculations"] <= 2
+    print("✅ 推测调用的临时会话通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("会话状态存储测试")
+    print("=" * 60)
+    test_serialization()
+    test_backends()
+    test_commit_merge()
+    test_replicas()
+    test_session_isolation()
+    test_speculative_session()
+
+
+if __name__ == "__main__":
+    main()
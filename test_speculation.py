@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+测试推测执行（SpeculationPolicy / SpeculativeStream）
+验证：
+1. 推测策略只允许只读子智能体和足够高的猜测概率
+2. 流式推测调用按顺序回放，取消后停止读取
+3. SupervisorAgent 路由：猜测正确时复用推测调用并确认写入子智能体的会话，猜测错误时丢弃
+4. 推测调用与 LLM 路由并发执行，总耗时接近两者中较长的一个
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+os.environ.setdefault("DASHSCOPE_API_KEY", "test-key")
+
+from supervisor_agent.speculation import SpeculationPolicy, SpeculativeStream
+from supervisor_agent.supervisor_agent import SupervisorAgent
+
+
+def test_policy():
+    """测试推测策略"""
+    policy = SpeculationPolicy(enabled=True, agents={"consult_agent"}, min_confidence=0.5)
+    assert policy.allows("consult_agent", 0.6)
+    assert not policy.allows("consult_agent", 0.3), "猜测概率太低时不推测执行"
+    assert not policy.allows("order_agent", 0.99), "有副作用的子智能体不推测执行"
+    assert not SpeculationPolicy(enabled=False, agents={"consult_agent"}).allows("consult_agent", 0.99)
+    
+    policy.record(True)
+    policy.record(False)
+    stats = policy.stats()
+    assert stats["started"] == 2 and stats["used"] == 1 and stats["hit_rate"] == 0.5
+    print(f"✅ 推测策略通过: {stats}")
+
+
+def test_stream_replay_and_cancel():
+    """测试流式推测调用的回放和取消"""
+    policy = SpeculationPolicy(enabled=True, agents={"consult_agent"})
+    stream = SpeculativeStream(lambda: iter(["你好", "，", "欢迎光临"]), policy.executor)
+    time.sleep(0.05)  # 路由确认前已经读取完毕
+    assert list(stream) == ["你好", "，", "欢迎光临"]
+    
+    closed = threading.Event()
+    
+    def slow_stream():
+        try:
+            for i in range(100):
+                time.sleep(0.01)
+                yield str(i)
+        finally:
+            closed.set()
+    
+    stream = SpeculativeStream(slow_stream, policy.executor)
+    time.sleep(0.03)
+    stream.cancel()
+    assert closed.wait(1.0), "取消后应关闭底层的流式响应"
+    print("✅ 流式推测调用回放 / 取消通过")
+
+
+def _make_agent(guess: str, llm_target, delay: float = 0.1) -> SupervisorAgent:
+    """构造一个路由和子智能体调用都被替换为本地函数的 SupervisorAgent"""
+    agent = SupervisorAgent()
+    agent.speculation = SpeculationPolicy(enabled=True, agents={"consult_agent"}, min_confidence=0.0)
+    agent.sub_agents[guess]["implemented"] = True
+    agent.calls = []
+    agent.speculation_ids = []
+    agent.commits = []
+    
+    agent._route_locally = lambda text: (False, None)
+    agent.intent_classifier.predict = lambda text: (guess, 0.6)
+    
+    def route_by_llm(text):
+        time.sleep(delay)
+        return llm_target
+    
+    def call_sub_agent(name, text, speculation_id=None):
+        agent.calls.append(name)
+        agent.speculation_ids.append(speculation_id)
+        time.sleep(delay)
+        return f"{name} 的回复"
+    
+    async def aroute_by_llm(text):
+        await asyncio.sleep(delay)
+        return llm_target
+    
+    async def acall_sub_agent(name, text, speculation_id=None):
+        agent.calls.append(name)
+        agent.speculation_ids.append(speculation_id)
+        await asyncio.sleep(delay)
+        return f"{name} 的回复"
+    
+    def commit_speculation():
+        agent.commits.append(agent._take_speculation())
+    
+    async def acommit_speculation():
+        commit_speculation()
+    
+    agent._route_by_llm = route_by_llm
+    agent.call_sub_agent = call_sub_agent
+    agent._aroute_by_llm = aroute_by_llm
+    agent.acall_sub_agent = acall_sub_agent
+    agent.commit_speculation = commit_speculation
+    agent.acommit_speculation = acommit_speculation
+    return agent
+
+
+def test_supervisor_speculation():
+    """测试 SupervisorAgent 的推测执行"""
+    agent = _make_agent("consult_agent", "consult_agent")
+    start = time.perf_counter()
+    reply = agent.chat("你们那个新品怎么样")
+    elapsed = time.perf_counter() - start
+    assert reply == "consult_agent 的回复"
+    assert agent.calls == ["consult_agent"], "猜测正确时不应重复调用子智能体"
+    assert elapsed < 0.18, f"推测调用应与 LLM 路由并发执行: {elapsed:.3f}s"
+    speculation_id = agent.speculation_ids[0]
+    assert speculation_id and speculation_id.startswith("spec_"), "推测调用应带上 speculation_id，子智能体不写入会话"
+    assert agent.commits == [("consult_agent", speculation_id)], "猜测正确时确认推测调用"
+    
+    agent = _make_agent("consult_agent", "order_agent")
+    reply = agent.chat("来一杯新品")
+    assert reply == "order_agent 的回复"
+    assert agent.calls[-1] == "order_agent"
+    assert agent.speculation_ids[-1] is None, "路由确定后的调用是普通调用"
+    assert agent.speculation.stats()["discarded"] == 1
+    assert agent.commits == [], "猜测错误时不确认推测调用"
+    
+    agent = _make_agent("consult_agent", "consult_agent")
+    start = time.perf_counter()
+    reply = asyncio.run(agent.achat("你们那个新品怎么样"))
+    elapsed = time.perf_counter() - start
+    assert reply == "consult_agent 的回复" and agent.calls == ["consult_agent"]
+    assert agent.commits == [("consult_agent", agent.speculation_ids[0])]
+    assert elapsed < 0.18, f"推测调用应与 LLM 路由并发执行: {elapsed:.3f}s"
+    
+    agent = _make_agent("consult_agent", None)
+    target, speculative = asyncio.run(agent._aroute_speculatively("随便聊聊"))
+    assert target is None and speculative is None
+    print("✅ SupervisorAgent 推测执行通过")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("推测执行测试")
+    print("=" * 60)
+    test_policy()
+    test_stream_replay_and_cancel()
+    test_supervisor_speculation()
+
+
+if __name__ == "__main__":
+    main()